@@ -0,0 +1,156 @@
+"""
+Benchmark de l'acquisition multiprocessus : régularité de l'échantillonnage
+des ultrasons et du MPU9250 pendant que le processus principal est chargé
+(sérialisation JSON d'un snapshot en boucle), en mode un seul processus (thread
+d'acquisition soumis au GIL) et en mode multiprocessus (processus dédiés et
+tampons en mémoire partagée). Mesure aussi le temps de reprise après l'arrêt
+brutal d'un processus d'acquisition.
+
+Les mesures ultrason chronomètrent l'impulsion echo en Python : une attente
+du GIL pendant l'impulsion fausse la distance, l'erreur est donc reportée.
+
+Usage:
+    python -m benchmarks.bench_acquisition [--duration 5] [--door-rate 50] [--imu-rate 200] [--load 0.8]
+"""
+
+import argparse
+import json
+import os
+import signal
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import fake_hardware  # noqa: E402
+
+TRUE_DISTANCE = 80.0
+# Par l'environnement : les processus d'acquisition réinstallent le matériel simulé
+os.environ[fake_hardware.DISTANCES_ENV] = json.dumps({24: TRUE_DISTANCE})
+hardware = fake_hardware.install()
+
+from utils.acquisition import (  # noqa: E402
+    AcquisitionSupervisor, RECORD_FORMATS, STATUS_OK, acquisition_loop, create_sensor
+)
+from utils.shm_ring import SharedRingBuffer  # noqa: E402
+
+SENSORS = {
+    'ultrasonic_entry': ('ultrasonic', {'trigger_pin': 23, 'echo_pin': 24}),
+    'mpu9250': ('mpu9250', {}),
+}
+
+
+def main_loop_load(duration: float, busy_fraction: float):
+    """Simule le processus principal : sérialisation de snapshots (GIL tenu) puis attente"""
+    snapshot = {'sensors': {f's{i}': {'values': list(range(50)), 'unit': 'cm'} for i in range(40)}}
+    period = 0.02
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        busy_until = time.monotonic() + period * busy_fraction
+        while time.monotonic() < busy_until:
+            json.dumps(snapshot)
+        time.sleep(period * (1 - busy_fraction))
+
+
+def summarize(records: list, rate: float, kind: str) -> dict:
+    """Cadence obtenue et gigue des intervalles entre échantillons"""
+    times = [r[0] for r in records]
+    intervals = [(b - a) * 1000 for a, b in zip(times, times[1:])]
+    period_ms = 1000.0 / rate
+    deviations = sorted(abs(i - period_ms) for i in intervals)
+    result = {
+        'samples_per_s': round(len(records) / (times[-1] - times[0]), 1) if len(times) > 1 else 0.0,
+        'jitter_std_ms': round(statistics.pstdev(intervals), 3) if intervals else None,
+        'jitter_p99_ms': round(deviations[int(0.99 * (len(deviations) - 1))], 3) if deviations else None,
+        'max_gap_ms': round(max(intervals), 2) if intervals else None,
+    }
+    if kind == 'ultrasonic':
+        distances = [r[2] for r in records if r[1] == STATUS_OK]
+        result['distance_error_cm'] = round(statistics.mean(abs(d - TRUE_DISTANCE) for d in distances), 2) if distances else None
+    return result
+
+
+def run_single(rates: dict, duration: float, load: float) -> dict:
+    """Acquisition dans des threads du processus principal"""
+    stop = threading.Event()
+    rings, threads = {}, []
+    for name, (kind, params) in SENSORS.items():
+        ring = SharedRingBuffer(RECORD_FORMATS[kind], capacity=1 << 16)
+        sensor = create_sensor(kind, params)
+        thread = threading.Thread(target=acquisition_loop, args=(kind, sensor, ring, rates[kind], stop), daemon=True)
+        rings[name] = ring
+        threads.append(thread)
+        thread.start()
+    
+    main_loop_load(duration, load)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    
+    results = {}
+    for name, ring in rings.items():
+        results[name] = summarize(ring.read_new(), rates[SENSORS[name][0]], SENSORS[name][0])
+        ring.close()
+        ring.unlink()
+    return results
+
+
+def run_multiprocess(rates: dict, duration: float, load: float) -> dict:
+    """Acquisition dans des processus dédiés supervisés"""
+    supervisor = AcquisitionSupervisor(capacity=1 << 16, check_interval=0.1, base_backoff=0.1, log_level='WARNING')
+    proxies = {name: supervisor.add(name, kind, params, rates[kind]) for name, (kind, params) in SENSORS.items()}
+    supervisor.start()
+    
+    main_loop_load(duration, load)
+    
+    results = {}
+    for name, proxy in proxies.items():
+        results[name] = summarize(proxy.ring.read_new(), rates[SENSORS[name][0]], SENSORS[name][0])
+    
+    # Reprise après un arrêt brutal : délai entre SIGKILL et le premier nouvel échantillon
+    ring = proxies['ultrasonic_entry'].ring
+    ring.read_new()
+    killed = time.monotonic()
+    os.kill(supervisor.stats()['ultrasonic_entry']['pid'], signal.SIGKILL)
+    time.sleep(0.05)
+    ring.read_new()
+    recovery = None
+    while time.monotonic() - killed < 10:
+        if ring.read_new():
+            recovery = round((time.monotonic() - killed) * 1000, 1)
+            break
+        time.sleep(0.005)
+    results['restart_recovery_ms'] = recovery
+    results['restarts'] = supervisor.stats()['ultrasonic_entry']['restarts']
+    supervisor.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--door-rate', type=float, default=50.0)
+    parser.add_argument('--imu-rate', type=float, default=200.0)
+    parser.add_argument('--load', type=float, default=0.8, help="Fraction du temps où le processus principal tient le GIL")
+    args = parser.parse_args()
+    
+    rates = {'ultrasonic': args.door_rate, 'mpu9250': args.imu_rate}
+    print(f"CPU disponibles: {len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()}, "
+          f"charge du processus principal: {args.load:.0%}, durée: {args.duration}s")
+    
+    for mode, runner in (('un processus', run_single), ('multiprocessus', run_multiprocess)):
+        results = runner(rates, args.duration, args.load)
+        print(f"\n[{mode}]")
+        for name in SENSORS:
+            target = rates[SENSORS[name][0]]
+            metrics = ', '.join(f"{k}={v}" for k, v in results[name].items())
+            print(f"  {name:<17} cible {target:g} Hz: {metrics}")
+        if 'restart_recovery_ms' in results:
+            print(f"  reprise après SIGKILL: {results['restart_recovery_ms']} ms ({results['restarts']} redémarrage)")
+
+
+if __name__ == '__main__':
+    main()
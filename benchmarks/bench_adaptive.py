@@ -0,0 +1,253 @@
+"""
+Benchmark de l'échantillonnage adaptatif sur une journée simulée
+
+Une trace de 24 h (dépôt la nuit, service avec trajets, arrêts avec montées
+et descentes, pauses aux terminus) est rejouée en temps virtuel avec :
+    fixe        tous les capteurs, un snapshot et un envoi toutes les 5 s (comportement actuel)
+    fixe_portes idem, mais portes lues toutes les 0,5 s pour ne pas rater de passage
+    adaptatif   AdaptiveSampler avec les profils par défaut
+
+Les lectures, snapshots et requêtes comptés sont convertis en temps CPU,
+octets écrits et octets envoyés à partir de coûts unitaires mesurés sur les
+pilotes (matériel simulé) et sur DataLogger. Les passages aux portes
+détectés sont comparés aux passages réels de la trace.
+
+Usage:
+    python -m benchmarks.bench_adaptive [--seed 5]
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import fake_hardware  # noqa: E402
+
+hardware = fake_hardware.install()
+
+from utils.adaptive import AdaptiveSampler, MotionStateEstimator  # noqa: E402
+
+DAY = 24 * 3600
+SENSORS = ('gps', 'dht22', 'mpu9250', 'ultrasonic_entry', 'ultrasonic_exit')
+DETECTION_THRESHOLD = 3.0
+HTTP_OVERHEAD = 250  # en-têtes de requête et de réponse, en octets
+
+
+def generate_day(seed: int) -> dict:
+    """
+    Trace seconde par seconde : vitesse (km/h), amplitude de vibration (g) et
+    passages aux portes (instants de début, un passage dure 0,8 s)
+    """
+    rng = random.Random(seed)
+    speed = [0.0] * DAY
+    vibration = [0.002] * DAY
+    passages = {'ultrasonic_entry': [], 'ultrasonic_exit': []}
+    
+    t = 6 * 3600
+    for i in range(600):  # moteur chaud au dépôt
+        vibration[t + i] = 0.05
+    t += 600
+    next_layover = t + 3600
+    while t < 21.5 * 3600:
+        # Trajet entre deux arrêts
+        duration = rng.randint(90, 240)
+        cruise = rng.uniform(20, 50)
+        for i in range(min(duration, DAY - t)):
+            speed[t + i] = cruise
+            vibration[t + i] = 0.08
+        t += duration
+        
+        # Arrêt avec montées et descentes
+        dwell = rng.randint(20, 60)
+        for i in range(dwell):
+            vibration[t + i] = 0.05
+        for door in passages:
+            for _ in range(rng.randint(0, 6)):
+                passages[door].append(t + rng.uniform(2, dwell - 2))
+        t += dwell
+        
+        if t >= next_layover:
+            for i in range(480):  # pause au terminus, moteur au ralenti
+                vibration[t + i] = 0.05
+            t += 480
+            next_layover = t + 3600
+    return {'speed': speed, 'vibration': vibration, 'passages': passages}
+
+
+class TraceReader:
+    """Mesures de la trace à un instant donné"""
+    
+    def __init__(self, trace: dict, seed: int):
+        self.trace = trace
+        self.rng = random.Random(seed)
+        self.sorted_passages = {door: sorted(times) for door, times in trace['passages'].items()}
+    
+    def speed(self, t: float) -> float:
+        return self.trace['speed'][int(t) % DAY]
+    
+    def acceleration(self, t: float) -> dict:
+        amplitude = self.trace['vibration'][int(t) % DAY]
+        return {'x': self.rng.gauss(0, amplitude), 'y': self.rng.gauss(0, amplitude),
+                'z': 1.0 + self.rng.gauss(0, amplitude)}
+    
+    def door_distance(self, door: str, t: float) -> float:
+        for start in self.sorted_passages[door]:
+            if start <= t < start + 0.8:
+                return 2.5
+            if start > t:
+                break
+        return 100.0
+
+
+def measure_costs() -> dict:
+    """Coûts unitaires mesurés : CPU par lecture de capteur, CPU et octets par snapshot"""
+    from sensors import GPSNeo6M, DHT22, MPU9250, Ultrasonic
+    from utils.data_logger import DataLogger
+    
+    hardware.distances[24] = 100.0
+    hardware.distances[26] = 100.0
+    gps = GPSNeo6M(port='/dev/fake')
+    gps.connect()
+    drivers = {
+        'gps': gps,
+        'dht22': DHT22(pin=4, max_retries=1),
+        'mpu9250': MPU9250(),
+        'ultrasonic_entry': Ultrasonic(trigger_pin=23, echo_pin=24),
+        'ultrasonic_exit': Ultrasonic(trigger_pin=25, echo_pin=26),
+    }
+    costs = {}
+    snapshot = {'timestamp': '2024-01-01T12:00:00', 'sensors': {}}
+    for name, driver in drivers.items():
+        start = time.process_time()
+        for _ in range(50):
+            data = driver.read_data()
+        costs[name] = (time.process_time() - start) / 50
+        if data:
+            snapshot['sensors'][name] = data
+    snapshot.update({'passengers': {'count': 5, 'max': 10, 'is_full': False},
+                     'health': {name: 'ok' for name in drivers}, 'bus_id': 'Bus1',
+                     'motion_state': 'moving'})
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = DataLogger(tmp)
+        start = time.process_time()
+        for i in range(200):
+            logger.save_json(snapshot, filename=f'snapshot_{i}.json')
+        costs['snapshot_cpu'] = (time.process_time() - start) / 200
+        costs['snapshot_bytes'] = (Path(tmp) / 'snapshot_0.json').stat().st_size
+    costs['upload_bytes'] = len(json.dumps(snapshot).encode())
+    return costs
+
+
+def simulate(trace: dict, seed: int, policy: str) -> dict:
+    """Rejoue la journée et compte lectures, snapshots, requêtes et passages détectés"""
+    reader = TraceReader(trace, seed)
+    sampler = AdaptiveSampler(MotionStateEstimator()) if policy == 'adaptatif' else None
+    fixed_tick = 0.5 if policy == 'fixe_portes' else 5.0
+    reads = dict.fromkeys(SENSORS, 0)
+    snapshots = requests = pending = 0
+    uploaded_snapshots = 0
+    detected = dict.fromkeys(trace['passages'], 0)
+    door_flags = dict.fromkeys(trace['passages'], False)
+    state_time = {}
+    
+    t = 0.0
+    while t < DAY:
+        if sampler:
+            due = [name for name in SENSORS if sampler.sensor_due(name, now=t)]
+        else:
+            # Les portes à chaque itération, les autres capteurs et le snapshot toutes les 5 s
+            every_5s = int(round(t / fixed_tick)) % int(round(5.0 / fixed_tick)) == 0
+            due = [name for name in SENSORS if every_5s or name.startswith('ultrasonic')]
+        for name in due:
+            reads[name] += 1
+        
+        door_active = False
+        for door in trace['passages']:
+            if door not in due:
+                continue
+            present = reader.door_distance(door, t) <= DETECTION_THRESHOLD
+            if present and not door_flags[door]:
+                detected[door] += 1
+            door_flags[door] = present
+            door_active = door_active or present
+        
+        if sampler:
+            sampler.update(
+                reader.speed(t) if 'gps' in due else None,
+                reader.acceleration(t) if 'mpu9250' in due else None,
+                door_active, now=t
+            )
+            tick = sampler.tick
+            state_time[sampler.state] = state_time.get(sampler.state, 0.0) + tick
+            if sampler.snapshot_due(now=t):
+                snapshots += 1
+                pending += 1
+                if pending >= sampler.profile['upload_batch']:
+                    requests += 1
+                    uploaded_snapshots += pending
+                    pending = 0
+        else:
+            tick = fixed_tick
+            if every_5s:
+                snapshots += 1
+                requests += 1
+                uploaded_snapshots += 1
+        t += tick
+    
+    return {'reads': reads, 'snapshots': snapshots, 'requests': requests,
+            'uploaded_snapshots': uploaded_snapshots, 'detected': detected, 'state_time': state_time}
+
+
+def totals(result: dict, costs: dict) -> dict:
+    cpu = sum(costs[name] * count for name, count in result['reads'].items())
+    cpu += result['snapshots'] * costs['snapshot_cpu']
+    return {
+        'cpu_s': cpu,
+        'bytes_written': result['snapshots'] * costs['snapshot_bytes'],
+        'bytes_sent': result['uploaded_snapshots'] * costs['upload_bytes'] + result['requests'] * HTTP_OVERHEAD,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type=int, default=5)
+    args = parser.parse_args()
+    
+    trace = generate_day(args.seed)
+    costs = measure_costs()
+    true_passages = {door: len(times) for door, times in trace['passages'].items()}
+    
+    results = {}
+    for policy in ('fixe', 'fixe_portes', 'adaptatif'):
+        result = simulate(trace, args.seed, policy)
+        results[policy] = (result, totals(result, costs))
+    
+    print("Coûts unitaires: " + ', '.join(
+        f"{k}={v * 1000:.2f} ms" if isinstance(v, float) else f"{k}={v} o" for k, v in costs.items()))
+    for name, (result, total) in results.items():
+        print(f"\n[{name}]")
+        print(f"  lectures: {result['reads']}")
+        print(f"  snapshots: {result['snapshots']}, requêtes: {result['requests']}")
+        print(f"  CPU: {total['cpu_s']:.1f} s, écrit: {total['bytes_written'] / 1e6:.2f} Mo, "
+              f"envoyé: {total['bytes_sent'] / 1e6:.2f} Mo")
+        print(f"  passages détectés: {result['detected']} (réels: {true_passages})")
+        if result['state_time']:
+            print("  temps par état: " + ', '.join(f"{s}={v / 3600:.1f} h" for s, v in sorted(result['state_time'].items())))
+    
+    adaptive = results['adaptatif'][1]
+    for reference in ('fixe', 'fixe_portes'):
+        fixed = results[reference][1]
+        print(f"\nAdaptatif par rapport à {reference}: " + ', '.join(
+            f"{label} {adaptive[key] / fixed[key] - 1:+.0%}"
+            for key, label in (('cpu_s', 'CPU'), ('bytes_written', 'écritures'), ('bytes_sent', 'envoi'))
+        ))
+
+
+if __name__ == '__main__':
+    main()
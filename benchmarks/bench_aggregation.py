@@ -0,0 +1,168 @@
+"""
+Benchmark du moteur d'agrégation côté serveur (server/aggregation.py)
+
+Une flotte de plusieurs milliers de bus envoie des snapshots (un par minute
+et par bus) et des montées/descentes pendant plusieurs heures. Mesures :
+    ingestion    débit (snapshots/s) : stockage brut seul (référence) et
+                 stockage brut + mise à jour des agrégats
+    requêtes     latence du résumé d'un bus et de la flotte : agrégats
+                 précalculés (en cache et juste après une ingestion) comparés
+                 à l'agrégation des documents bruts à chaque requête
+    sauvegarde   durée et taille de la sauvegarde, durée du rechargement
+
+Usage:
+    python -m benchmarks.bench_aggregation [--buses 2000] [--hours 6]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from server.aggregation import FleetAggregator  # noqa: E402
+
+
+def generate(buses: int, hours: int, seed: int = 5):
+    """Génère les requêtes reçues, minute par minute : (bus_id, snapshot, événements)"""
+    rng = random.Random(seed)
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours)
+    passengers = [0] * buses
+    for minute in range(hours * 60):
+        timestamp = (start + timedelta(minutes=minute)).isoformat()
+        for bus in range(buses):
+            events = []
+            if rng.random() < 0.2:
+                for _ in range(rng.randint(0, passengers[bus])):
+                    passengers[bus] -= 1
+                    events.append({'type': 'alighting', 'timestamp': timestamp, 'data': {}})
+                for _ in range(rng.randint(0, 3)):
+                    if passengers[bus] < 40:
+                        passengers[bus] += 1
+                        events.append({'type': 'boarding', 'timestamp': timestamp, 'data': {}})
+            snapshot = {
+                'timestamp': timestamp,
+                'bus_id': f'Bus{bus}',
+                'sensors': {
+                    'gps': {'speed': rng.uniform(0, 60), 'has_fix': True},
+                    'dht22': {'temperature': rng.uniform(18, 32), 'humidity': 50.0},
+                },
+                'passengers': {'count': passengers[bus], 'max': 40, 'is_full': passengers[bus] >= 40},
+            }
+            yield f'Bus{bus}', snapshot, events
+
+
+def raw_summary(snapshots: list, events: list) -> dict:
+    """Agrégation des documents bruts au moment de la requête (référence)"""
+    occupancy = [0] * 11
+    temperatures, speeds = [], []
+    for snapshot in snapshots:
+        passengers = snapshot['passengers']
+        occupancy[int(min(passengers['count'] / passengers['max'], 1.0) * 10)] += 1
+        temperatures.append(snapshot['sensors']['dht22']['temperature'])
+        speeds.append(snapshot['sensors']['gps']['speed'])
+    hourly = defaultdict(lambda: [0, 0])
+    for event in events:
+        hourly[event['timestamp'][:13]][event['type'] == 'alighting'] += 1
+    return {
+        'occupancy': occupancy,
+        'temperature': statistics.fmean(temperatures) if temperatures else None,
+        'speed': statistics.fmean(speeds) if speeds else None,
+        'hourly': dict(hourly),
+    }
+
+
+def timed(function, repeat: int) -> tuple:
+    """Latences (ms) médiane et p99"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start) * 1000)
+    durations.sort()
+    return statistics.median(durations), durations[int(0.99 * (len(durations) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--buses', type=int, default=2000)
+    parser.add_argument('--hours', type=int, default=6)
+    args = parser.parse_args()
+    
+    requests = list(generate(args.buses, args.hours))
+    total_events = sum(len(events) for _, _, events in requests)
+    print(f"{args.buses} bus, {args.hours} h: {len(requests)} snapshots, {total_events} événements")
+    
+    raw_snapshots, raw_events = defaultdict(list), defaultdict(list)
+    start = time.perf_counter()
+    for bus_id, snapshot, events in requests:
+        raw_snapshots[bus_id].append(snapshot)
+        raw_events[bus_id].extend(events)
+    raw_time = time.perf_counter() - start
+    raw_snapshots, raw_events = defaultdict(list), defaultdict(list)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        state_file = Path(tmp) / 'aggregates.json'
+        aggregator = FleetAggregator(window_hours=24, state_file=state_file)
+        start = time.perf_counter()
+        for bus_id, snapshot, events in requests:
+            raw_snapshots[bus_id].append(snapshot)
+            aggregator.ingest_snapshot(snapshot, bus_id)
+            if events:
+                raw_events[bus_id].extend(events)
+                aggregator.ingest_events(bus_id, events)
+        aggregated_time = time.perf_counter() - start
+        
+        print("\n[ingestion] snapshots/s (événements inclus)")
+        print(f"  stockage brut seul          {len(requests) / raw_time:10.0f}")
+        print(f"  brut + agrégats             {len(requests) / aggregated_time:10.0f}")
+        
+        all_snapshots = [s for snapshots in raw_snapshots.values() for s in snapshots]
+        all_events = [e for events in raw_events.values() for e in events]
+        rng = random.Random(6)
+        last_bus, last_snapshot, _ = requests[-1]
+        
+        def bus_query():
+            aggregator.bus_summary(f'Bus{rng.randrange(args.buses)}')
+        
+        def fleet_after_ingest():
+            aggregator.ingest_snapshot(last_snapshot, last_bus)
+            aggregator.fleet_summary()
+        
+        def raw_bus_query():
+            bus_id = f'Bus{rng.randrange(args.buses)}'
+            raw_summary(raw_snapshots[bus_id], raw_events[bus_id])
+        
+        print("\n[requêtes] latence en ms (médiane / p99)")
+        for label, function, repeat in (
+            ('bus, précalculé', bus_query, 2000),
+            ('flotte, précalculé (cache)', aggregator.fleet_summary, 2000),
+            ('flotte, après une ingestion', fleet_after_ingest, 500),
+            ('bus, documents bruts', raw_bus_query, 200),
+            ('flotte, documents bruts', lambda: raw_summary(all_snapshots, all_events), 3),
+        ):
+            p50, p99 = timed(function, repeat)
+            print(f"  {label:<30} {p50:9.3f} / {p99:9.3f}")
+        
+        fleet = aggregator.fleet_summary()
+        print(f"  flotte: {fleet['buses']} bus, occupation moyenne {fleet['occupancy']['mean']:.2f}, "
+              f"{fleet['boardings']} montées, vitesse moyenne {fleet['speed']['mean']:.1f} km/h")
+        
+        start = time.perf_counter()
+        aggregator.save()
+        save_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        reloaded = FleetAggregator(window_hours=24, state_file=state_file)
+        load_ms = (time.perf_counter() - start) * 1000
+        assert reloaded.fleet_summary()['boardings'] == fleet['boardings']
+        print(f"\n[sauvegarde] {save_ms:.0f} ms, {state_file.stat().st_size / 1e6:.1f} Mo ; rechargement {load_ms:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Benchmark de l'alignement des flux (utils/alignment.py) : débit de
+rééchantillonnage de nombreux flux à cadences mixtes
+
+--streams flux de 3 champs (sinusoïdes de 0,2 Hz, horodatages avec 2 % de
+gigue) répartis entre 1, 10, 50, 100 et 1000 Hz (GPS, DHT22 ralenti,
+ultrasons, IMU, FIFO). Toutes les --cycle secondes, les mesures arrivées
+sont ajoutées par rafales (push_many), puis chaque flux est rééchantillonné
+à --tick-rate Hz sur le cycle écoulé décalé de --delay secondes (le retard
+laisse arriver la mesure suivante, nécessaire à l'interpolation). Cycles de
+100 ms puis de 1 s (plus d'instants par appel).
+
+Modes :
+    numpy         resample() vectorisé, tous les instants du cycle d'un coup
+    Python        même calcul sans numpy (bisect)
+    instantanés   snapshot() appelé instant par instant (numpy)
+
+Mesures : mesures ajoutées/s, valeurs rééchantillonnées/s (instants x champs
+x flux) ; erreur RMS par rapport au signal exact (amplitude 1) par
+interpolation, par maintien de la dernière valeur et sans alignement
+(dernière valeur lue considérée comme actuelle), âge moyen des valeurs.
+
+Usage:
+    python -m benchmarks.bench_align [--streams 64] [--duration 20] [--tick-rate 100] [--delay 1.0]
+"""
+
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+
+from utils import alignment as alignment_module  # noqa: E402
+from utils.alignment import StreamAligner  # noqa: E402
+
+RATES = (1, 10, 50, 100, 1000)
+FIELDS = ('x', 'y', 'z')
+SIGNAL_HZ = 0.2
+CYCLE = 0.1
+
+
+def signal(times: np.ndarray, phase: float) -> np.ndarray:
+    """Valeur exacte des trois champs aux instants donnés"""
+    angle = 2 * math.pi * SIGNAL_HZ * times[:, None] + phase + np.arange(3) * 2.0
+    return np.sin(angle)
+
+
+def generate(streams: int, duration: float, seed: int = 3) -> list:
+    """Flux simulés : (nom, cadence, phase, instants, valeurs)"""
+    rng = np.random.default_rng(seed)
+    data = []
+    for i in range(streams):
+        rate = RATES[i % len(RATES)]
+        times = np.arange(0.0, duration, 1.0 / rate) + rng.uniform(0.0, 0.02 / rate, size=int(math.ceil(duration * rate)))
+        phase = rng.uniform(0.0, 2 * math.pi)
+        data.append((f"capteur_{i}", rate, phase, times, signal(times, phase)))
+    return data
+
+
+def run(data: list, duration: float, tick_rate: float, delay: float, mode: str, cycle: float = CYCLE) -> dict:
+    """Rejoue les flux cycle par cycle ; retourne débits et erreurs"""
+    alignment_module.NUMPY_AVAILABLE = mode != 'python'
+    try:
+        aligner = StreamAligner(capacity=int(max(RATES) * (delay + 2 * cycle)) + 16, max_gap=2.0)
+        hold = StreamAligner(capacity=aligner.capacity, method='hold', max_gap=2.0)
+        for name, *_ in data:
+            aligner.add_stream(name, FIELDS)
+            hold.add_stream(name, FIELDS)
+        cursors = [0] * len(data)
+        pushed = values = 0
+        push_time = resample_time = 0.0
+        errors = {rate: {'linear': [], 'hold': [], 'raw': [], 'age': []} for rate in RATES}
+        
+        now = cycle
+        while now <= duration + 1e-9:
+            start = time.perf_counter()
+            chunks = []
+            for index, (name, _, _, times, samples) in enumerate(data):
+                end = int(np.searchsorted(times, now, side='right'))
+                chunk_t, chunk_v = times[cursors[index]:end], samples[cursors[index]:end]
+                if mode == 'python':
+                    chunk_t, chunk_v = chunk_t.tolist(), chunk_v.tolist()
+                aligner.push_many(name, chunk_t, chunk_v)
+                chunks.append((chunk_t, chunk_v))
+                pushed += end - cursors[index]
+                cursors[index] = end
+            push_time += time.perf_counter() - start
+            if mode == 'numpy':
+                for (name, *_), chunk in zip(data, chunks):
+                    hold.push_many(name, *chunk)
+            
+            ticks = np.arange(now - delay - cycle, now - delay - 1e-9, 1.0 / tick_rate)
+            ticks = ticks[ticks >= 0]
+            if len(ticks):
+                start = time.perf_counter()
+                if mode == 'snapshot':
+                    for tick in ticks.tolist():
+                        aligner.snapshot(tick)
+                else:
+                    results = [aligner.resample(name, ticks) for name, *_ in data]
+                resample_time += time.perf_counter() - start
+                values += len(ticks) * len(FIELDS) * len(data)
+                
+                if mode == 'numpy':
+                    for index, (name, rate, phase, times, samples) in enumerate(data):
+                        linear, ages = results[index]
+                        known = ~np.isnan(ages)
+                        if not known.any():
+                            continue
+                        truth = signal(ticks[known], phase)
+                        held, _ = hold.resample(name, ticks[known])
+                        group = errors[rate]
+                        group['linear'].append(((linear[known] - truth) ** 2).ravel())
+                        group['hold'].append(((held - truth) ** 2).ravel())
+                        group['age'].append(ages[known])
+                        # Sans alignement : dernière valeur reçue, considérée comme mesurée maintenant
+                        group['raw'].append((samples[cursors[index] - 1] - signal(np.array([now]), phase)[0]) ** 2)
+            now += cycle
+    finally:
+        alignment_module.NUMPY_AVAILABLE = alignment_module.np is not None
+    
+    summary = {}
+    for rate, group in errors.items():
+        if group['linear']:
+            summary[rate] = {key: math.sqrt(float(np.mean(np.concatenate(group[key])))) for key in ('linear', 'hold', 'raw')}
+            summary[rate]['age'] = float(np.mean(np.concatenate(group['age'])))
+    return {
+        'push': pushed / push_time if push_time else 0.0,
+        'resample': values / resample_time if resample_time else 0.0,
+        'errors': summary,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--streams', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--tick-rate', type=float, default=100.0)
+    parser.add_argument('--delay', type=float, default=1.0)
+    args = parser.parse_args()
+    
+    data = generate(args.streams, args.duration)
+    total = sum(len(times) for *_, times, _ in data)
+    print(f"{args.streams} flux ({', '.join(f'{rate} Hz' for rate in RATES)}), {total} mesures sur {args.duration:g} s, "
+          f"instants à {args.tick_rate:g} Hz, retard {args.delay:g} s")
+    
+    results = {}
+    for cycle in (CYCLE, 1.0):
+        print(f"\n[débit, cycles de {cycle * 1000:.0f} ms : {cycle * args.tick_rate:.0f} instants par flux et par appel]")
+        for label, mode in (('numpy', 'numpy'), ('Python', 'python'), ('instantanés', 'snapshot')):
+            result = run(data, args.duration, args.tick_rate, args.delay, mode, cycle)
+            results.setdefault(mode, result)
+            print(f"  {label:<12} ajout {result['push']:11.0f} mesures/s   "
+                  f"rééchantillonnage {result['resample']:11.0f} valeurs/s")
+    
+    print("\n[erreur RMS par cadence] interpolation / maintien / sans alignement, âge moyen")
+    for rate, error in results['numpy']['errors'].items():
+        print(f"  {rate:5d} Hz : {error['linear']:.4f} / {error['hold']:.4f} / {error['raw']:.4f}   "
+              f"âge {error['age'] * 1000:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
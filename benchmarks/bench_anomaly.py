@@ -0,0 +1,204 @@
+"""
+Benchmark de la détection d'anomalies (utils/anomaly.py) : coût par mesure
+sur tous les champs des capteurs actuels, détections et fausses alertes
+
+Les champs viennent d'une lecture réelle de chaque pilote (matériel simulé
+par benchmarks/fake_hardware.py) : GPS, DHT22, MPU9250 en mode FIFO,
+ultrasons d'entrée et de sortie. --samples mesures par capteur sont
+ensuite générées autour de ces valeurs (bruit gaussien), quantifiées comme
+les vraies mesures : DHT22 au dixième (résolution du capteur ; température
+stable à ±0,02 °C près qui évolue lentement de ±0,2 °C, d'où de longues
+séries de valeurs identiques), ultrasons au centième (arrondi du pilote),
+MPU9250 et GPS au millième.
+
+Scénarios :
+    sain       aucun défaut : toute alerte est fausse
+    défauts    température du DHT22 figée, pic d'humidité, dérive de
+               l'ultrason d'entrée (+0,05 cm par mesure), gyroscope z figé
+
+Mesures : µs par lecture et par champ, pour chaque capteur ; mémoire
+allouée après la mise en route (tracemalloc) ; alertes et délai de
+détection de chaque défaut (en mesures).
+
+Usage:
+    python -m benchmarks.bench_anomaly [--samples 5000]
+"""
+
+import argparse
+import logging
+import math
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import fake_hardware  # noqa: E402
+
+hardware = fake_hardware.install()
+
+from sensors import GPSNeo6M, DHT22, MPU9250, Ultrasonic  # noqa: E402
+from utils.anomaly import AnomalyDetector  # noqa: E402
+
+# Défauts injectés : (capteur, chemin du champ, type, première mesure concernée)
+FAULTS = (
+    ('dht22', ('temperature',), 'stuck', 1500),
+    ('dht22', ('humidity',), 'spike', 1200),
+    ('ultrasonic_entry', ('distance',), 'drift', 1000),
+    ('mpu9250', ('gyroscope', 'z'), 'stuck', 1800),
+)
+
+# Pas de quantification des mesures par capteur (résolution du matériel ou arrondi du pilote)
+RESOLUTION = {'dht22': 0.1, 'ultrasonic_entry': 0.01, 'ultrasonic_exit': 0.01}
+DEFAULT_RESOLUTION = 0.001
+# Bruit (écart-type) des champs au bruit connu ; les autres : 0,5 % de la valeur + 0,01
+NOISE = {'dht22.temperature': 0.02, 'dht22.humidity': 0.08}
+# Évolution lente (amplitude d'une sinusoïde sur tout le parcours) : la température
+# traverse plusieurs pas de quantification, séries longues quand elle est au milieu d'un pas
+WANDER = {'dht22.temperature': 0.2}
+
+
+def templates() -> dict:
+    """Une lecture réelle de chaque pilote"""
+    hardware.distances = {24: 120.0, 26: 95.0}
+    gps = GPSNeo6M()
+    gps.connect()
+    mpu = MPU9250(fifo=True)
+    time.sleep(0.05)
+    return {
+        'gps': gps.read_data(),
+        'dht22': DHT22(4).read_data(),
+        'mpu9250': mpu.read_data(),
+        'ultrasonic_entry': Ultrasonic(23, 24).read_data(),
+        'ultrasonic_exit': Ultrasonic(25, 26).read_data(),
+    }
+
+
+def leaves(data: dict, prefix: tuple = ()) -> list:
+    """Chemins des champs numériques d'une lecture"""
+    paths = []
+    for key, value in data.items():
+        if isinstance(value, dict):
+            paths.extend(leaves(value, prefix + (key,)))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and key != 'timestamp':
+            paths.append(prefix + (key,))
+    return paths
+
+
+def get(data: dict, path: tuple):
+    for key in path:
+        data = data[key]
+    return data
+
+
+def put(data: dict, path: tuple, value):
+    for key in path[:-1]:
+        data = data[key]
+    data[path[-1]] = value
+
+
+def generate(template: dict, sensor: str, samples: int, faulty: bool, rng: random.Random) -> list:
+    """Lectures simulées autour des valeurs du modèle, défauts injectés si `faulty`"""
+    paths = leaves(template)
+    step = RESOLUTION.get(sensor, DEFAULT_RESOLUTION)
+    readings = []
+    for i in range(samples):
+        reading = {key: dict(value) if isinstance(value, dict) else value for key, value in template.items()}
+        for path in paths:
+            base = get(template, path)
+            if isinstance(base, int):
+                continue
+            name = '.'.join((sensor,) + path)
+            sigma = NOISE.get(name, 0.005 * abs(base) + 0.01)
+            level = base + WANDER.get(name, 0.0) * math.sin(2 * math.pi * i / samples)
+            put(reading, path, round(round((level + rng.gauss(0.0, sigma)) / step) * step, 3))
+        if faulty:
+            for fault_sensor, path, kind, start in FAULTS:
+                if fault_sensor != sensor or i < start:
+                    continue
+                if kind == 'stuck':
+                    put(reading, path, get(readings[start - 1], path))
+                elif kind == 'spike' and i == start:
+                    put(reading, path, 0.0)
+                elif kind == 'drift':
+                    put(reading, path, round(round((get(reading, path) + 0.05 * (i - start)) / step) * step, 3))
+        readings.append(reading)
+    return readings
+
+
+def run(streams: dict, traced: bool = False, **options) -> dict:
+    """Passe toutes les lectures au détecteur, capteur par capteur à chaque cycle"""
+    detector = AnomalyDetector(**options)
+    elapsed = {sensor: 0.0 for sensor in streams}
+    events = []
+    samples = len(next(iter(streams.values())))
+    base = 0
+    if traced:
+        tracemalloc.start()
+    for i in range(samples):
+        for sensor, readings in streams.items():
+            start = time.perf_counter()
+            found = detector.update(sensor, readings[i])
+            elapsed[sensor] += time.perf_counter() - start
+            events.extend((i, event) for event in found)
+        if traced and i == detector.warmup + detector.window:
+            base = tracemalloc.get_traced_memory()[0]
+    growth = 0
+    if traced:
+        growth = tracemalloc.get_traced_memory()[0] - base
+        tracemalloc.stop()
+    return {'detector': detector, 'elapsed': elapsed, 'events': events, 'growth': growth}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', type=int, default=5000)
+    args = parser.parse_args()
+    
+    logging.disable(logging.WARNING)
+    models = templates()
+    clean = {sensor: generate(model, sensor, args.samples, False, random.Random(1)) for sensor, model in models.items()}
+    faulty = {sensor: generate(model, sensor, args.samples, True, random.Random(2)) for sensor, model in models.items()}
+    
+    # Coût sur tous les champs (sans exclusion), puis avec les exclusions par défaut
+    every = run(clean, exclude=(), spike_exclude=())
+    result = run(clean)
+    print(f"[coût] {args.samples} lectures par capteur, tous les champs / exclusions par défaut")
+    totals = {'every': [0, 0.0], 'default': [0, 0.0]}
+    for sensor in clean:
+        row = []
+        for key, outcome in (('every', every), ('default', result)):
+            fields = sum(1 for name in outcome['detector'].monitored() if name.startswith(sensor + '.'))
+            per_reading = outcome['elapsed'][sensor] / args.samples * 1e6
+            totals[key][0] += fields
+            totals[key][1] += per_reading
+            row.append(f"{fields:2d} champs {per_reading:6.2f} µs ({per_reading / max(fields, 1):4.2f} µs/champ)")
+        print(f"  {sensor:<17} {'   /   '.join(row)}")
+    print(f"  {'cycle complet':<17} {totals['every'][0]:2d} champs {totals['every'][1]:6.2f} µs"
+          f"{'':17}/   {totals['default'][0]:2d} champs {totals['default'][1]:6.2f} µs")
+    detector = result['detector']
+    traced = run(clean, traced=True, exclude=(), spike_exclude=())
+    print(f"  mémoire : {detector.memory_per_field()} valeurs par champ, "
+          f"{traced['growth']:+d} octets alloués après la mise en route")
+    
+    print(f"\n[sain] {len(result['events'])} alerte(s) sur {detector.stats['samples']} valeurs")
+    for i, event in result['events'][:5]:
+        print(f"  mesure {i}: {event['sensor']}.{event['field']} {event['type']} (score {event['score']})")
+    
+    faults = run(faulty)
+    print(f"\n[défauts] {sum(1 for _, e in faults['events'] if e['active'])} alerte(s)")
+    for sensor, path, kind, start in FAULTS:
+        field = '.'.join(path)
+        hits = [i for i, e in faults['events']
+                if e['sensor'] == sensor and e['field'] == field and e['type'] == kind and e['active'] and i >= start]
+        found = f"détecté après {hits[0] - start} mesure(s)" if hits else "NON détecté"
+        print(f"  {sensor + '.' + field:<28} {kind:<6} dès la mesure {start}: {found}")
+    expected = {(sensor, '.'.join(path), kind) for sensor, path, kind, _ in FAULTS}
+    others = [(i, e) for i, e in faults['events'] if e['active'] and (e['sensor'], e['field'], e['type']) not in expected]
+    print(f"  autres alertes : {len(others)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark de l'enregistrement par lots : coût par snapshot (CPU et temps réel)
+et octets écrits selon la taille du lot, comparés à l'enregistrement actuel
+(DataLogger.save_json : un fichier par snapshot, DataLogger.save_csv : aplatissement
+et ouverture du fichier à chaque snapshot)
+
+Les snapshots ont la structure de SmartBus.collect_data, construits à partir
+des pilotes avec le matériel simulé (benchmarks/fake_hardware.py).
+
+Usage:
+    python -m benchmarks.bench_batch [--snapshots 5000] [--sizes 1 10 100 1000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import fake_hardware  # noqa: E402
+
+hardware = fake_hardware.install()
+
+from utils.batch_buffer import PARQUET_AVAILABLE, SnapshotBatch  # noqa: E402
+from utils.data_logger import DataLogger  # noqa: E402
+
+
+def make_snapshots(count: int, seed: int = 1) -> list:
+    """Snapshots au format de SmartBus.collect_data avec des valeurs qui varient"""
+    from sensors import GPSNeo6M, DHT22, MPU9250, Ultrasonic
+    
+    hardware.distances[24] = 100.0
+    hardware.distances[26] = 100.0
+    gps = GPSNeo6M(port='/dev/fake')
+    gps.connect()
+    readings = {
+        'gps': gps.read_data(),
+        'dht22': DHT22(pin=4, max_retries=1).read_data(),
+        'mpu9250': MPU9250().read_data(),
+        'ultrasonic_entry': Ultrasonic(trigger_pin=23, echo_pin=24).read_data(),
+        'ultrasonic_exit': Ultrasonic(trigger_pin=25, echo_pin=26).read_data(),
+    }
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, 6, 0)
+    snapshots = []
+    for i in range(count):
+        sensors = {}
+        for name, data in readings.items():
+            if not data or rng.random() < 0.05:  # lecture manquante de temps en temps
+                continue
+            sensors[name] = {
+                key: (value * rng.uniform(0.9, 1.1) if isinstance(value, float) else value)
+                for key, value in data.items()
+            } if name != 'mpu9250' else {
+                key: ({axis: v * rng.uniform(0.9, 1.1) for axis, v in value.items()} if isinstance(value, dict) else value)
+                for key, value in data.items()
+            }
+        snapshots.append({
+            'timestamp': (start + timedelta(seconds=5 * i)).isoformat(),
+            'sensors': sensors,
+            'passengers': {'count': rng.randint(0, 10), 'max': 10, 'is_full': False},
+            'health': {name: 'ok' for name in readings},
+            'bus_id': 'Bus1',
+        })
+    return snapshots
+
+
+def directory_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+
+
+def run_current(snapshots: list, fmt: str) -> dict:
+    """Enregistrement actuel, un snapshot à la fois"""
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = DataLogger(tmp)
+        cpu, wall = time.process_time(), time.perf_counter()
+        for i, snapshot in enumerate(snapshots):
+            if fmt == 'json':
+                # Noms uniques : en nom horodaté à la seconde, les cycles rapprochés s'écrasent
+                logger.save_json(snapshot, filename=f'sensor_data_{i}.json')
+            else:
+                logger.save_csv(snapshot)
+        return measure(snapshots, cpu, wall, Path(tmp))
+
+
+def run_batched(snapshots: list, fmt: str, size: int) -> dict:
+    """Accumulation dans SnapshotBatch puis écriture par lot"""
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = DataLogger(tmp)
+        batch = SnapshotBatch(size)
+        cpu, wall = time.process_time(), time.perf_counter()
+        for snapshot in snapshots:
+            batch.append(snapshot)
+            if batch.full:
+                logger.save_batch(batch, fmt)
+                batch.clear()
+        logger.save_batch(batch, fmt)
+        logger.close()
+        return measure(snapshots, cpu, wall, Path(tmp))
+
+
+def measure(snapshots: list, cpu: float, wall: float, directory: Path) -> dict:
+    count = len(snapshots)
+    return {
+        'cpu_us': (time.process_time() - cpu) / count * 1e6,
+        'wall_us': (time.perf_counter() - wall) / count * 1e6,
+        'bytes': directory_size(directory) / count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--snapshots', type=int, default=5000)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000])
+    args = parser.parse_args()
+    
+    # Les avertissements des pilotes simulés ne doivent pas noyer les résultats
+    sys.stderr = open(os.devnull, 'w')
+    snapshots = make_snapshots(args.snapshots)
+    formats = ['json', 'csv', 'sqlite'] + (['parquet'] if PARQUET_AVAILABLE else [])
+    print(f"{args.snapshots} snapshots, coût moyen par snapshot"
+          + ('' if PARQUET_AVAILABLE else " (parquet ignoré : pyarrow non installé)"))
+    print(f"{'format':<9}{'lot':>10}{'CPU (µs)':>12}{'réel (µs)':>12}{'octets':>10}")
+    
+    for fmt in formats:
+        if fmt in ('json', 'csv'):
+            result = run_current(snapshots, fmt)
+            print(f"{fmt:<9}{'actuel':>10}{result['cpu_us']:>12.1f}{result['wall_us']:>12.1f}{result['bytes']:>10.0f}")
+        for size in args.sizes:
+            result = run_batched(snapshots, fmt, size)
+            label = f"{'jsonl' if fmt == 'json' else fmt:<9}"
+            print(f"{label}{size:>10}{result['cpu_us']:>12.1f}{result['wall_us']:>12.1f}{result['bytes']:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
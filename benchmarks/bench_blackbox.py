@@ -0,0 +1,210 @@
+"""
+Benchmark de la boîte noire (utils/blackbox.py) : coût d'enregistrement,
+mémoire, déclenchement et fenêtres figées
+
+Flux simulés en temps accéléré (--minutes de conduite) : rafales FIFO de
+l'IMU (200 Hz, vidée toutes les 100 ms), GPS à 1 Hz, deux portes à 20 Hz.
+Un freinage brusque (0,6 g pendant 1 s) toutes les 60 s déclenche une
+fenêtre de --pre secondes avant et --post secondes après.
+
+Modes :
+    tampons    BlackBoxRecorder (tampons circulaires préalloués, numpy)
+    Python     même enregistreur sans numpy (array)
+    deque      référence naïve : deque(maxlen) d'échantillons (t, dict)
+
+Mesures : µs par échantillon enregistré, mémoire des tampons et croissance
+mesurée par tracemalloc pendant l'enregistrement, µs et octets alloués par
+appel à trigger(), durée d'extraction d'une fenêtre, taille du fichier.
+
+Usage:
+    python -m benchmarks.bench_blackbox [--minutes 5] [--pre 10] [--post 5]
+"""
+
+import argparse
+import logging
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+
+from utils import blackbox as blackbox_module  # noqa: E402
+from utils.blackbox import BlackBoxRecorder, IMU_FIELDS, GPS_FIELDS, DOOR_FIELDS, TRIGGER_MANUAL  # noqa: E402
+
+IMU_RATE = 200
+CYCLE = 0.1
+BRAKE_EVERY = 60.0
+
+
+def generate(seconds: float, seed: int = 5) -> list:
+    """Rafales FIFO simulées : (instant de fin, accélérations, rotations) toutes les CYCLE secondes"""
+    rng = np.random.default_rng(seed)
+    per_burst = int(IMU_RATE * CYCLE)
+    bursts = []
+    for k in range(int(seconds / CYCLE)):
+        end = (k + 1) * CYCLE
+        accel = rng.normal(0.0, 0.03, size=(per_burst, 3))
+        accel[:, 2] += 1.0
+        if (end % BRAKE_EVERY) < 1.0 and end > BRAKE_EVERY / 2:
+            accel[:, 0] -= 0.6
+        bursts.append((end, accel, rng.normal(0.0, 0.5, size=(per_burst, 3))))
+    return bursts
+
+
+def run_recorder(bursts: list, directory: Path, pre: float, post: float, vectorized: bool, traced: bool = False) -> dict:
+    """
+    Rejoue les flux dans BlackBoxRecorder ; poll() à chaque cycle comme la boucle principale
+    Avec traced, mesure la mémoire allouée entre la moitié et la fin du parcours (tracemalloc ralentit tout)
+    """
+    blackbox_module.NUMPY_AVAILABLE = vectorized
+    try:
+        recorder = BlackBoxRecorder(
+            directory,
+            {
+                'imu': (IMU_FIELDS, IMU_RATE),
+                'gps': (GPS_FIELDS, 10.0),
+                'ultrasonic_entry': (DOOR_FIELDS, 20.0),
+                'ultrasonic_exit': (DOOR_FIELDS, 20.0),
+            },
+            pre=pre, post=post, accel_threshold=0.35
+        )
+        if not vectorized:
+            bursts = [(end, [tuple(row) for row in accel.tolist()], [tuple(row) for row in gyro.tolist()])
+                      for end, accel, gyro in bursts]
+        door = (120.0,)
+        period = 1.0 / IMU_RATE
+        samples = 0
+        freeze_time = 0.0
+        recorder.start()
+        if traced:
+            tracemalloc.start()
+        base = 0
+        start = time.perf_counter()
+        for k, (end, accel, gyro) in enumerate(bursts):
+            recorder.record_imu_batch(accel, gyro, period, end)
+            for step in range(2):
+                t = end - CYCLE / 2 * (1 - step)
+                recorder.record('ultrasonic_entry', door, t)
+                recorder.record('ultrasonic_exit', door, t)
+            samples += len(accel) + 4
+            if k % 10 == 9:
+                recorder.record('gps', (36.8, 10.18, 30.0, 1.0), end)
+                samples += 1
+            if recorder.armed and end >= recorder._post_until:
+                freeze_start = time.perf_counter()
+                recorder.poll(end)
+                freeze_time += time.perf_counter() - freeze_start
+            if traced and k == len(bursts) // 2:
+                # Tampons remplis, fenêtres précédentes écrites : mémoire de référence
+                while recorder.stats['saved'] + recorder.stats['save_errors'] < recorder.stats['windows']:
+                    time.sleep(0.01)
+                base = tracemalloc.get_traced_memory()[0]
+        elapsed = time.perf_counter() - start - freeze_time
+        recorder.stop()
+        growth = 0
+        if traced:
+            growth = tracemalloc.get_traced_memory()[0] - base
+            tracemalloc.stop()
+        windows = recorder.stats['windows']
+        return {
+            'record': elapsed / samples * 1e6,
+            'memory': recorder.memory_bytes,
+            'growth': growth,
+            'windows': windows,
+            'freeze': freeze_time / windows * 1000 if windows else 0.0,
+            'file': recorder.stats['bytes'] / recorder.stats['saved'] if recorder.stats['saved'] else 0,
+            'trigger': trigger_cost(recorder),
+        }
+    finally:
+        blackbox_module.NUMPY_AVAILABLE = blackbox_module.np is not None
+
+
+def trigger_cost(recorder: BlackBoxRecorder, count: int = 100_000) -> tuple:
+    """µs par déclenchement et pic de mémoire allouée sur `count` appels (fenêtre réarmée entre deux appels)"""
+    post = recorder.post
+    start = time.perf_counter()
+    for _ in range(count):
+        recorder.trigger(TRIGGER_MANUAL, 1.0, 5.0)
+        recorder._armed = False
+    elapsed = (time.perf_counter() - start) / count * 1e6
+    recorder.trigger(TRIGGER_MANUAL, 1.0, 5.0)
+    recorder._armed = False
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(count):
+        recorder.trigger(TRIGGER_MANUAL, 1.0, 5.0)
+        recorder._armed = False
+    # Pic : mémoire allouée au plus fort de la boucle, au-delà de l'état initial
+    allocated = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    recorder.post = post
+    return elapsed, allocated
+
+
+def run_deque(bursts: list, pre: float, post: float) -> dict:
+    """Référence : un dictionnaire par échantillon IMU dans une deque(maxlen)"""
+    window = deque(maxlen=int((pre + post + 5.0) * IMU_RATE))
+    period = 1.0 / IMU_RATE
+    tracemalloc.start()
+    memory = None
+    samples = 0
+    start = time.perf_counter()
+    for k, (end, accel, gyro) in enumerate(bursts):
+        n = len(accel)
+        for i, (a, g) in enumerate(zip(accel.tolist(), gyro.tolist())):
+            window.append((end - (n - 1 - i) * period, {
+                'acceleration': {'x': a[0], 'y': a[1], 'z': a[2]},
+                'gyroscope': {'x': g[0], 'y': g[1], 'z': g[2]},
+            }))
+        samples += n
+        if k == int(BRAKE_EVERY / 2 / CYCLE):
+            memory = tracemalloc.get_traced_memory()[0]
+    elapsed = time.perf_counter() - start
+    # Parcours plus court que le point de mesure : mémoire en fin de parcours
+    if memory is None:
+        memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {'record': elapsed / samples * 1e6, 'memory': memory, 'samples': len(window)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--minutes', type=float, default=5.0)
+    parser.add_argument('--pre', type=float, default=10.0)
+    parser.add_argument('--post', type=float, default=5.0)
+    args = parser.parse_args()
+    
+    logging.disable(logging.WARNING)
+    bursts = generate(args.minutes * 60)
+    print(f"{args.minutes:g} min simulées : {len(bursts)} rafales IMU de {int(IMU_RATE * CYCLE)} échantillons, "
+          f"fenêtres de {args.pre:g} s + {args.post:g} s")
+    workdir = Path(tempfile.mkdtemp(prefix='bench_blackbox_'))
+    try:
+        for label, vectorized in (('tampons', True), ('Python', False)):
+            result = run_recorder(bursts, workdir / label, args.pre, args.post, vectorized)
+            result['growth'] = run_recorder(bursts, workdir / f'{label}-mem', args.pre, args.post, vectorized, traced=True)['growth']
+            trigger_us, trigger_bytes = result['trigger']
+            print(f"\n[{label}]")
+            print(f"  enregistrement  {result['record']:6.2f} µs/échantillon")
+            print(f"  mémoire         {result['memory'] / 1024:8.1f} Ko de tampons, "
+                  f"croissance {result['growth']:+d} octets sur la seconde moitié")
+            print(f"  déclenchement   {trigger_us:6.3f} µs, pic de {trigger_bytes} octets sur 100000 appels")
+            print(f"  fenêtres        {result['windows']} figées, extraction {result['freeze']:.2f} ms, "
+                  f"fichier {result['file'] / 1024:.1f} Ko")
+        
+        reference = run_deque(bursts, args.pre, args.post)
+        print("\n[deque de dictionnaires, IMU seule]")
+        print(f"  enregistrement  {reference['record']:6.2f} µs/échantillon")
+        print(f"  mémoire         {reference['memory'] / 1024:8.1f} Ko pour {reference['samples']} échantillons")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
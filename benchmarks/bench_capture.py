@@ -0,0 +1,168 @@
+"""
+Benchmark de la capture brute (utils/capture.py) : surcoût d'écriture en
+production et vitesse du rejeu
+
+Matériel simulé par benchmarks/fake_hardware.py. Boucle aux cadences de
+production pendant --duration secondes : deux HC-SR04 toutes les 50 ms
+(passagers simulés), FIFO du MPU9250 (200 Hz) vidée toutes les 100 ms, GPS
+chaque seconde, DHT22 toutes les 2 s (20 % d'échecs de lecture).
+
+Mesures :
+    enregistrement   coût d'un appel à CaptureWriter.record (µs)
+    production       CPU de la boucle sans / avec capture, volume capturé
+                     (octets/s, Mo/jour), enregistrements par lecture
+    rejeu            pilotes neufs alimentés par la capture, au plus vite :
+                     lectures/s, facteur par rapport au temps réel,
+                     résultats identiques à ceux de la capture
+
+Usage:
+    python -m benchmarks.bench_capture [--duration 10]
+"""
+
+import argparse
+import logging
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import fake_hardware  # noqa: E402
+
+hardware = fake_hardware.install()
+
+from sensors import GPSNeo6M, DHT22, MPU9250, Ultrasonic  # noqa: E402
+from utils.capture import CaptureWriter, CaptureReplay, KIND_ECHO  # noqa: E402
+
+ENTRY_ECHO, EXIT_ECHO = 24, 26
+# (capteur, période en s)
+SCHEDULE = (('ultrasonic_entry', 0.05), ('ultrasonic_exit', 0.05), ('mpu9250', 0.1), ('gps', 1.0), ('dht22', 2.0))
+
+
+def create_drivers(connect: bool = True) -> dict:
+    gps = GPSNeo6M()
+    if connect:
+        gps.connect()
+    return {
+        'ultrasonic_entry': Ultrasonic(23, ENTRY_ECHO),
+        'ultrasonic_exit': Ultrasonic(25, EXIT_ECHO),
+        'mpu9250': MPU9250(fifo=True, sample_rate=200),
+        'gps': gps,
+        'dht22': DHT22(4, max_retries=2, retry_delay=0.01),
+    }
+
+
+def passenger(period: float, offset: float):
+    """Distance vue par une porte : un passage de 0,4 s toutes les `period` secondes"""
+    def distance():
+        return 35.0 if (time.monotonic() + offset) % period < 0.4 else 120.0
+    return distance
+
+
+def record_cost(directory: Path, count: int = 200_000) -> dict:
+    """Coût d'un enregistrement (tampon mémoire et écritures disque comprises)"""
+    results = {}
+    for label, payload in (('écho (4 o)', bytes(4)), ('FIFO (240 o)', bytes(240))):
+        writer = CaptureWriter(directory / label[:4])
+        start = time.perf_counter()
+        for _ in range(count):
+            writer.record(1, KIND_ECHO, payload)
+        writer.close()
+        results[label] = (time.perf_counter() - start) / count * 1e6
+    return results
+
+
+def production(duration: float, directory: Path = None) -> dict:
+    """Boucle aux cadences de production, avec capture si `directory` est donné"""
+    hardware.i2c = None
+    drivers = create_drivers()
+    writer = None
+    if directory is not None:
+        writer = CaptureWriter(directory)
+        for name, driver in drivers.items():
+            writer.attach(name, driver)
+    outputs = defaultdict(list)
+    due = {name: 0.0 for name, _ in SCHEDULE}
+    cpu_start, start = time.process_time(), time.monotonic()
+    while True:
+        now = time.monotonic() - start
+        if now >= duration:
+            break
+        for name, period in SCHEDULE:
+            if now >= due[name]:
+                outputs[name].append(drivers[name].read_data())
+                due[name] += period
+        time.sleep(max(0.0, min(due.values()) - (time.monotonic() - start)))
+    cpu = time.process_time() - cpu_start
+    if writer:
+        writer.close()
+    return {
+        'cpu': cpu / duration * 100,
+        'reads': sum(len(values) for values in outputs.values()),
+        'outputs': outputs,
+        'writer': writer,
+    }
+
+
+def replay(directory: Path) -> dict:
+    """Rejoue la capture dans des pilotes neufs, au plus vite"""
+    player = CaptureReplay(sorted(directory.glob('*.sbc')))
+    drivers = create_drivers(connect=False)
+    for name, driver in drivers.items():
+        player.attach(name, driver)
+    outputs = defaultdict(list)
+    start = time.perf_counter()
+    for _, name, data in player.run():
+        outputs[name].append(data)
+    return {'elapsed': time.perf_counter() - start, 'outputs': outputs, 'stats': player.stats()}
+
+
+def comparable(data):
+    # Les ultrasons horodatent leurs mesures avec l'heure du rejeu
+    return {key: value for key, value in data.items() if key != 'timestamp'} if data else data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+    
+    logging.disable(logging.WARNING)
+    hardware.distances = {ENTRY_ECHO: passenger(3.0, 0.0), EXIT_ECHO: passenger(5.0, 1.0)}
+    hardware.dht_failure_rate = 0.2
+    workdir = Path(tempfile.mkdtemp(prefix='bench_capture_'))
+    try:
+        print("[enregistrement]")
+        for label, cost in record_cost(workdir / 'micro').items():
+            print(f"  {label:<13} {cost:6.2f} µs")
+        
+        print(f"\n[production, {args.duration:g} s]")
+        baseline = production(args.duration)
+        captured = production(args.duration, workdir / 'capture')
+        writer = captured['writer']
+        size = sum(path.stat().st_size for path in (workdir / 'capture').glob('*.sbc'))
+        print(f"  sans capture  CPU {baseline['cpu']:5.2f} %   {baseline['reads']} lectures")
+        print(f"  avec capture  CPU {captured['cpu']:5.2f} %   {captured['reads']} lectures, "
+              f"{writer.stats['records']} enregistrements ({writer.stats['records'] / captured['reads']:.1f} par lecture)")
+        print(f"  volume        {size / args.duration:8.0f} o/s, {size / args.duration * 86400 / 1e6:6.1f} Mo/jour")
+        
+        print("\n[rejeu]")
+        result = replay(workdir / 'capture')
+        reads = sum(len(values) for values in result['outputs'].values())
+        print(f"  {reads} lectures en {result['elapsed'] * 1000:.1f} ms : {reads / result['elapsed']:.0f} lectures/s, "
+              f"{args.duration / result['elapsed']:.0f} x le temps réel")
+        for name, _ in SCHEDULE:
+            original = [comparable(data) for data in captured['outputs'][name]]
+            replayed = [comparable(data) for data in result['outputs'][name]]
+            stats = result['stats'].get(name, {})
+            print(f"  {name:<17} {len(replayed):4d}/{len(original):4d} lectures  "
+                  f"identiques {'oui' if original == replayed else 'NON'}  désynchronisations {stats.get('errors', 0)}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
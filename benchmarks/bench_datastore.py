@@ -0,0 +1,147 @@
+"""
+Benchmark du stockage local SQLite sur un mois simulé
+
+Un mois de service (16 h par jour, un snapshot toutes les 5 s, montées et
+descentes aux arrêts) est inséré dans SQLiteDatastore pour mesurer le débit
+d'insertion selon la taille des transactions, puis la latence des requêtes
+(totaux du jour pour l'afficheur, événements d'un type sur une journée,
+snapshots d'une heure à renvoyer) et de la purge de rétention. Référence :
+recalcul des totaux du jour en relisant les fichiers JSON d'un snapshot
+(enregistrement actuel).
+
+Usage:
+    python -m benchmarks.bench_datastore [--days 30] [--interval 5]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.datastore import SQLiteDatastore  # noqa: E402
+from utils.data_logger import DataLogger  # noqa: E402
+
+
+def simulate_month(days: int, interval: float, seed: int = 3):
+    """Génère (snapshots, événements) du plus ancien au plus récent, le dernier jour étant aujourd'hui"""
+    rng = random.Random(seed)
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    snapshots, events = [], []
+    for day in range(days):
+        start = today - timedelta(days=days - 1 - day) + timedelta(hours=6)
+        passengers = 0
+        for i in range(int(16 * 3600 / interval)):
+            ts = start + timedelta(seconds=i * interval)
+            if rng.random() < 0.08:  # arrêt avec montées et descentes
+                for _ in range(rng.randint(0, min(3, passengers))):
+                    passengers -= 1
+                    events.append(('alighting', ts, {'count': passengers, 'max': 10, 'is_full': False}))
+                for _ in range(rng.randint(0, 3)):
+                    if passengers < 10:
+                        passengers += 1
+                        events.append(('boarding', ts, {'count': passengers, 'max': 10, 'is_full': passengers >= 10}))
+            snapshots.append({
+                'timestamp': ts.isoformat(),
+                'sensors': {
+                    'gps': {'latitude': 36.8 + rng.random() / 100, 'longitude': 10.18 + rng.random() / 100,
+                            'speed': rng.uniform(0, 50), 'has_fix': True},
+                    'dht22': {'temperature': rng.uniform(18, 30), 'humidity': rng.uniform(30, 70)},
+                    'mpu9250': {'accelerometer': {'x': rng.gauss(0, 0.05), 'y': rng.gauss(0, 0.05), 'z': 1.0}},
+                },
+                'passengers': {'count': passengers, 'max': 10, 'is_full': passengers >= 10},
+                'bus_id': 'Bus1',
+            })
+    return snapshots, events
+
+
+def insert(path: Path, snapshots: list, events: list, batch_size: int) -> float:
+    """Insère snapshots et événements dans l'ordre chronologique ; retourne la durée en secondes"""
+    store = SQLiteDatastore(path, batch_size=batch_size, flush_interval=3600, retention_days=0)
+    event_index = 0
+    start = time.perf_counter()
+    for snapshot in snapshots:
+        while event_index < len(events) and events[event_index][1].isoformat() <= snapshot['timestamp']:
+            kind, ts, data = events[event_index]
+            store.add_event(kind, data, bus_id='Bus1', timestamp=ts)
+            event_index += 1
+        store.add_snapshot(snapshot)
+    store.close()
+    return time.perf_counter() - start
+
+
+def timed(function, repeat: int = 20) -> float:
+    """Latence médiane en ms"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--interval', type=float, default=5.0)
+    args = parser.parse_args()
+    
+    snapshots, events = simulate_month(args.days, args.interval)
+    per_day = len(snapshots) // args.days
+    print(f"{args.days} jours simulés: {len(snapshots)} snapshots, {len(events)} événements")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        
+        print("\nInsertion (enregistrements/s)")
+        # Transactions unitaires : une journée suffit à mesurer le débit
+        day = snapshots[-per_day:]
+        day_events = [e for e in events if e[1].isoformat() >= day[0]['timestamp']]
+        duration = insert(tmp / 'unit.db', day, day_events, batch_size=1)
+        print(f"  lot de 1    {(len(day) + len(day_events)) / duration:10.0f}  (une journée)")
+        for batch_size in (50, 500):
+            path = tmp / f'batch_{batch_size}.db'
+            duration = insert(path, snapshots, events, batch_size)
+            print(f"  lot de {batch_size:<4} {(len(snapshots) + len(events)) / duration:10.0f}  "
+                  f"({duration:.1f} s pour le mois, base {path.stat().st_size / 1e6:.0f} Mo)")
+        
+        store = SQLiteDatastore(tmp / 'batch_500.db', retention_days=0)
+        today = datetime.now()
+        hour_start = today.replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=args.days // 2)
+        print("\nRequêtes (médiane, ms)")
+        print(f"  totaux du jour                {timed(lambda: store.daily_totals(today)):8.2f}")
+        print(f"  montées d'une journée         {timed(lambda: store.events(today - timedelta(days=3), today - timedelta(days=2), 'boarding')):8.2f}")
+        print(f"  snapshots d'une heure         {timed(lambda: store.snapshots(hour_start, hour_start + timedelta(hours=1))):8.2f}")
+        print(f"  événements par type, le mois  {timed(lambda: store.count_events(), repeat=5):8.2f}")
+        print(f"  totaux du jour: {store.daily_totals(today)}")
+        
+        # Référence : un fichier JSON par snapshot, totaux recalculés en relisant la journée
+        logger = DataLogger(tmp / 'files')
+        for i, snapshot in enumerate(day):
+            logger.save_json(snapshot, filename=f'sensor_data_{i}.json')
+        
+        def scan_day():
+            max_passengers = 0
+            for file in (tmp / 'files').glob('sensor_data_*.json'):
+                with open(file, encoding='utf-8') as f:
+                    max_passengers = max(max_passengers, json.load(f)['passengers']['count'])
+            return max_passengers
+        
+        print(f"  référence fichiers JSON, une journée relue: {timed(scan_day, repeat=3):8.0f}")
+        store.close()
+        
+        store = SQLiteDatastore(tmp / 'batch_500.db', retention_days=args.days - 1)
+        start = time.perf_counter()
+        deleted = store.prune()
+        print(f"\nPurge de la journée la plus ancienne: {deleted} lignes en {(time.perf_counter() - start) * 1000:.0f} ms")
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
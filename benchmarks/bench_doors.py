@@ -0,0 +1,158 @@
+"""
+Benchmark de l'échantillonnage des portes déclenché par les détecteurs PIR
+
+Les portes reçoivent des passages espacés (le détecteur PIR passe à l'état
+haut 0,3 s avant que le passager ne soit sous le capteur ultrason, pendant
+0,25 s, puis retombe 1 s plus tard). GPIO simulé par
+benchmarks/fake_hardware.py : une mesure ultrason dure le temps réel de
+l'écho (environ 9 ms en attente active pour une porte dégagée à 150 cm).
+
+Seul le chemin des portes de SmartBus est exercé (lecture via le suivi de
+santé, détection des passagers) :
+    scrutation 1 Hz    les deux portes lues toutes les secondes, sans PIR
+    scrutation 20 Hz   les deux portes lues toutes les 50 ms, sans PIR
+    PIR                boucle d'attente SmartBus._wait : lecture de contrôle
+                       (door_gate.idle_interval), 20 Hz pendant un mouvement
+
+Mesures : CPU consommé (temps CPU du processus / durée), passages comptés,
+délai entre l'arrivée du passager sous le capteur et le comptage.
+
+Usage:
+    python -m benchmarks.bench_doors [--duration 120] [--passages 10]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import fake_hardware  # noqa: E402
+
+hardware = fake_hardware.install()
+
+import main  # noqa: E402
+
+DOORS = {
+    'entry': {'echo': 24, 'pir': 17, 'event': 'boarding'},
+    'exit': {'echo': 26, 'pir': 27, 'event': 'alighting'},
+}
+CLEAR_CM = 150.0
+PRESENT_CM = 2.5
+
+
+def create_bus(tmp: Path, pir: bool) -> 'main.SmartBus':
+    config = {
+        'sensors': {
+            'gps': {'enabled': False}, 'dht22': {'enabled': False}, 'mpu9250': {'enabled': False},
+            'lcd': {'enabled': False},
+            'pir_entry': {'enabled': pir, 'pin': DOORS['entry']['pir']},
+            'pir_exit': {'enabled': pir, 'pin': DOORS['exit']['pir']},
+        },
+        'bus': {'max_passengers': 100},
+        'door_gate': {'active_interval': 0.05, 'idle_interval': 1.0, 'hold': 1.0},
+        'retention': {'enabled': False},
+        'data': {'directory': str(tmp / 'data')},
+        'logging': {'level': 'WARNING', 'file': str(tmp / 'smart_bus.log')},
+    }
+    config_file = tmp / 'config.json'
+    config_file.write_text(json.dumps(config), encoding='utf-8')
+    return main.SmartBus(str(config_file))
+
+
+def passengers(duration: float, count: int, stop: threading.Event, arrivals: list):
+    """Thread du scénario : passages répartis sur la durée, deux montées pour une descente"""
+    present = {door: False for door in DOORS}
+    for door, pins in DOORS.items():
+        hardware.distances[pins['echo']] = lambda door=door: PRESENT_CM if present[door] else CLEAR_CM
+        fake_hardware.set_pin(pins['pir'], 0)
+    
+    start = time.monotonic()
+    for i in range(count):
+        door = 'exit' if i % 3 == 2 else 'entry'
+        if stop.wait(max(0.0, start + (i + 0.5) * duration / count - time.monotonic())):
+            return
+        fake_hardware.set_pin(DOORS[door]['pir'], 1)
+        time.sleep(0.3)
+        present[door] = True
+        arrivals.append((door, time.monotonic()))
+        time.sleep(0.25)
+        present[door] = False
+        time.sleep(1.0)
+        fake_hardware.set_pin(DOORS[door]['pir'], 0)
+
+
+def run(mode: str, duration: float, count: int) -> dict:
+    tmp = Path(tempfile.mkdtemp(prefix='smartbus_doors_'))
+    bus = create_bus(tmp, pir=mode == 'pir')
+    detections = []
+    publish = bus._publish_event
+    
+    def record(event_type, data=None):
+        detections.append((event_type, time.monotonic()))
+        publish(event_type, data)
+    
+    bus._publish_event = record
+    
+    stop = threading.Event()
+    arrivals = []
+    scenario = threading.Thread(target=passengers, args=(duration, count, stop, arrivals), daemon=True)
+    cpu_start, wall_start = time.process_time(), time.monotonic()
+    scenario.start()
+    end = wall_start + duration
+    if mode == 'pir':
+        while time.monotonic() < end:
+            bus._wait(end - time.monotonic())
+    else:
+        interval = 1.0 if mode == 'poll_1hz' else 0.05
+        while time.monotonic() < end:
+            entry = bus._read_sensor('ultrasonic_entry')
+            exit_ = bus._read_sensor('ultrasonic_exit')
+            bus._detect_passengers(entry and entry['distance'], exit_ and exit_['distance'])
+            time.sleep(interval)
+    cpu = time.process_time() - cpu_start
+    wall = time.monotonic() - wall_start
+    stop.set()
+    scenario.join()
+    gate_stats = dict(bus.door_gate.stats) if bus.door_gate else None
+    bus.cleanup()
+    
+    # Chaque passage est associé au premier comptage de sa porte qui le suit
+    latencies = []
+    remaining = list(detections)
+    for door, arrived in arrivals:
+        event = DOORS[door]['event']
+        match = next((d for d in remaining if d[0] == event and d[1] >= arrived), None)
+        if match and match[1] - arrived < 1.0:
+            latencies.append((match[1] - arrived) * 1000)
+            remaining.remove(match)
+    return {'cpu': cpu / wall * 100, 'passages': len(arrivals), 'detected': len(latencies),
+            'latencies': latencies, 'gate': gate_stats}
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=120.0)
+    parser.add_argument('--passages', type=int, default=10)
+    args = parser.parse_args()
+    
+    sys.stderr = open(os.devnull, 'w')
+    print(f"{args.passages} passages en {args.duration:.0f} s")
+    for label, mode in (('scrutation 1 Hz', 'poll_1hz'), ('scrutation 20 Hz', 'poll_20hz'), ('PIR', 'pir')):
+        result = run(mode, args.duration, args.passages)
+        latencies = result['latencies']
+        latency = (f"délai médian {statistics.median(latencies):5.0f} ms, max {max(latencies):5.0f} ms"
+                   if latencies else "aucun passage compté")
+        print(f"  {label:<17} CPU {result['cpu']:5.1f} %, comptés {result['detected']}/{result['passages']}, {latency}")
+        if result['gate']:
+            print(f"    {result['gate']}")
+
+
+if __name__ == '__main__':
+    main_bench()
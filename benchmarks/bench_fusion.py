@@ -0,0 +1,260 @@
+"""
+Benchmark de la fusion GPS / IMU (utils/fusion.py) sur un trajet rejoué
+
+Trajet de bus simulé (rond-point complet au départ, lignes droites, virages,
+arrêts) ; l'IMU est échantillonnée à --imu-rate Hz avec bruit et biais
+(accéléromètre 0,01 g, gyroscope 0,5 °/s), le magnétomètre est faussé
+(fer dur et fer doux), le GPS donne une position par seconde à 3 m près et
+disparaît pendant des tunnels de 10, 30 et 60 s (placés au tiers, à 55 % et
+à 77 % du trajet, --duration de 300 s au moins). L'IMU est fournie par
+rafales de 100 ms, comme la FIFO du MPU9250.
+
+Mesures :
+    débit        échantillons IMU traités par seconde selon la taille des
+                 rafales (numpy ou boucle Python), échantillon par
+                 échantillon, rejeu complet (positions GPS incluses)
+    erreur       écart à la position vraie : GPS brut et fusion quand le GPS
+                 est disponible, fusion et dernière position GPS à la fin
+                 de chaque tunnel ; erreur de cap
+    calibration  instant de la calibration du magnétomètre, relecture du cache
+
+Usage:
+    python -m benchmarks.bench_fusion [--duration 600] [--imu-rate 100]
+"""
+
+import argparse
+import logging
+import math
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils import fusion as fusion_module  # noqa: E402
+from utils.fusion import SensorFusion  # noqa: E402
+from utils.trajectory import EARTH_RADIUS  # noqa: E402
+
+ORIGIN = (36.8065, 10.1815)
+GRAVITY = 9.80665
+# Tunnels (début en fraction du trajet, durée en s) : 200, 330 et 460 s sur 600 s
+OUTAGES = ((1 / 3, 10), (0.55, 30), (0.767, 60))
+MIN_DURATION = 300.0
+BATCH_S = 0.1
+# Champ terrestre (µT) : composante horizontale vers le nord, verticale vers le bas
+FIELD_H, FIELD_V = 28.0, 30.0
+HARD_IRON = (15.0, -22.0, 8.0)
+SOFT_IRON = (1.2, 0.85, 1.0)
+
+
+def to_global(east: float, north: float) -> tuple:
+    lat = ORIGIN[0] + math.degrees(north / EARTH_RADIUS)
+    lon = ORIGIN[1] + math.degrees(east / (EARTH_RADIUS * math.cos(math.radians(ORIGIN[0]))))
+    return lat, lon
+
+
+def to_local(lat: float, lon: float) -> tuple:
+    return (math.radians(lon - ORIGIN[1]) * EARTH_RADIUS * math.cos(math.radians(ORIGIN[0])),
+            math.radians(lat - ORIGIN[0]) * EARTH_RADIUS)
+
+
+def profile(duration: float, rng: random.Random) -> list:
+    """Phases (durée, accélération m/s², vitesse de cap °/s, horaire positif)"""
+    phases = [(8, 1.0, 0), (36, 0, 10)]  # démarrage puis rond-point complet à 8 m/s
+    total = sum(p[0] for p in phases)
+    while total < duration:
+        block = [(rng.uniform(15, 40), 0, 0), (4, 0, rng.choice((-22.5, 22.5))), (rng.uniform(10, 30), 0, 0)]
+        if rng.random() < 0.5:
+            block += [(8, -1.0, 0), (rng.uniform(10, 25), 0, 0), (8, 1.0, 0)]  # arrêt
+        phases += block
+        total += sum(p[0] for p in block)
+    return phases
+
+
+def outages(duration: float) -> tuple:
+    """Tunnels (début en s, durée en s) à l'échelle du trajet"""
+    return tuple((round(duration * start), length) for start, length in OUTAGES)
+
+
+def simulate(duration: float, imu_rate: float, seed: int = 11) -> dict:
+    """Trajet vrai, mesures IMU (rafales) et positions GPS"""
+    rng = random.Random(seed)
+    dt = 1.0 / imu_rate
+    phases = profile(duration, rng)
+    accel_bias, gyro_bias = 0.01, 0.5
+    east = north = speed = 0.0
+    heading = 0.0
+    t = 0.0
+    truth, accel, gyro, mags = [], [], [], []
+    phase, phase_end = 0, phases[0][0]
+    for _ in range(int(duration * imu_rate)):
+        while t >= phase_end and phase + 1 < len(phases):
+            phase += 1
+            phase_end += phases[phase][0]
+        _, acceleration, rate = phases[phase]
+        if speed <= 0 and acceleration < 0:
+            acceleration = 0.0
+        rate = math.radians(rate)
+        speed = max(speed + acceleration * dt, 0.0)
+        heading += rate * dt
+        east += speed * math.sin(heading) * dt
+        north += speed * math.cos(heading) * dt
+        t += dt
+        truth.append((t, east, north, speed, heading))
+        accel.append((acceleration / GRAVITY + accel_bias + rng.gauss(0, 0.01),
+                      -speed * rate / GRAVITY + rng.gauss(0, 0.01), 1.0 + rng.gauss(0, 0.01)))
+        gyro.append((rng.gauss(0, 0.1), rng.gauss(0, 0.1), -math.degrees(rate) + gyro_bias + rng.gauss(0, 0.1)))
+        if len(truth) % int(imu_rate * BATCH_S) == 0:
+            body = (FIELD_H * math.cos(heading), FIELD_H * math.sin(heading), -FIELD_V)
+            distorted = [(b + o) * s + rng.gauss(0, 0.5) for b, o, s in zip(body, HARD_IRON, SOFT_IRON)]
+            # Axes de l'AK8963
+            mags.append({'x': distorted[1], 'y': distorted[0], 'z': -distorted[2]})
+    gps = []
+    tunnels = outages(duration)
+    for second in range(1, int(duration)):
+        if any(start <= second < start + length for start, length in tunnels):
+            continue
+        _, e, n, v, _ = truth[int(second * imu_rate) - 1]
+        lat, lon = to_global(e + rng.gauss(0, 3.0), n + rng.gauss(0, 3.0))
+        gps.append((float(second), lat, lon, max(v * 3.6 + rng.gauss(0, 0.5), 0.0)))
+    return {'truth': truth, 'accel': accel, 'gyro': gyro, 'mags': mags, 'gps': gps, 'dt': dt, 'outages': tunnels}
+
+
+def throughput(data: dict, size: int, use_numpy: bool) -> float:
+    """Échantillons/s pour des rafales de `size` échantillons (tableaux numpy en entrée, comme la FIFO)"""
+    fusion = SensorFusion()
+    fusion.heading = 0.0
+    accel, gyro = data['accel'], data['gyro']
+    batches = [(accel[i:i + size], gyro[i:i + size]) for i in range(0, len(accel) - size + 1, size)]
+    if fusion_module.np is not None:
+        batches = [(fusion_module.np.array(a), fusion_module.np.array(g)) for a, g in batches]
+    fusion_module.NUMPY_AVAILABLE, threshold = use_numpy, fusion_module._NUMPY_MIN_BATCH
+    fusion_module._NUMPY_MIN_BATCH = 0 if use_numpy else threshold
+    try:
+        start = time.perf_counter()
+        for a, g in batches:
+            fusion.update_imu_batch(a, g, data['dt'])
+        return len(batches) * size / (time.perf_counter() - start)
+    finally:
+        fusion_module.NUMPY_AVAILABLE = fusion_module.np is not None
+        fusion_module._NUMPY_MIN_BATCH = threshold
+
+
+def replay(data: dict, per_sample: bool = False, calibration_file=None, magnetometer: bool = True) -> dict:
+    """Rejoue les mesures dans le filtre et compare à la position vraie"""
+    fusion = SensorFusion(calibration_file=calibration_file)
+    truth, dt = data['truth'], data['dt']
+    batch = int(round(BATCH_S / dt))
+    gps = list(data['gps'])
+    errors_gps, errors_raw, heading_errors, outage_end = [], [], [], {}
+    calibrated_at = None
+    elapsed = 0.0
+    for index, start in enumerate(range(0, len(truth), batch)):
+        t_end = truth[min(start + batch, len(truth)) - 1][0]
+        mag = data['mags'][index] if magnetometer and index < len(data['mags']) else None
+        accel, gyro = data['accel'][start:start + batch], data['gyro'][start:start + batch]
+        tick = time.perf_counter()
+        if per_sample:
+            for i, (a, g) in enumerate(zip(accel, gyro)):
+                fusion.update_imu(dict(zip('xyz', a)), dict(zip('xyz', g)),
+                                  mag if i == len(accel) - 1 else None, now=truth[start + i][0])
+        else:
+            fusion.update_imu_batch(accel, gyro, dt, mag)
+        while gps and gps[0][0] <= t_end + 1e-9:
+            second, lat, lon, speed = gps.pop(0)
+            fusion.update_gps(lat, lon, speed, now=second)
+            e, n = to_local(lat, lon)
+            _, te, tn, _, _ = truth[int(second / dt) - 1]
+            errors_raw.append(math.hypot(e - te, n - tn))
+        elapsed += time.perf_counter() - tick
+        
+        if calibrated_at is None and fusion.calibration is not None:
+            calibrated_at = t_end
+        _, te, tn, _, true_heading = truth[min(start + batch, len(truth)) - 1]
+        if fusion.position() is None:
+            continue
+        lat, lon = fusion.position()
+        e, n = to_local(lat, lon)
+        error = math.hypot(e - te, n - tn)
+        outage = [o for o in data['outages'] if o[0] <= t_end < o[0] + o[1]]
+        if outage:
+            outage_end[outage[0]] = error
+        elif t_end > 60:
+            errors_gps.append(error)
+        if fusion.heading is not None and t_end > 60:
+            heading_errors.append(abs(math.degrees(fusion_module._wrap(fusion.heading - true_heading))))
+    
+    # Référence : dernière position GPS reçue avant chaque tunnel
+    hold = {}
+    for start, length in data['outages']:
+        previous = [g for g in data['gps'] if g[0] < start][-1]
+        e, n = to_local(previous[1], previous[2])
+        _, te, tn, _, _ = truth[int((start + length) / dt) - 1]
+        hold[(start, length)] = math.hypot(e - te, n - tn)
+    return {
+        'rate': len(truth) / elapsed,
+        'rms_raw': math.sqrt(statistics.fmean(x * x for x in errors_raw)),
+        'rms_fused': math.sqrt(statistics.fmean(x * x for x in errors_gps)),
+        'outages': outage_end,
+        'hold': hold,
+        'heading': statistics.median(heading_errors),
+        'heading_p95': sorted(heading_errors)[int(0.95 * (len(heading_errors) - 1))],
+        'calibrated_at': calibrated_at,
+        'calibration': fusion.calibration,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=600.0)
+    parser.add_argument('--imu-rate', type=float, default=100.0)
+    args = parser.parse_args()
+    if args.duration < MIN_DURATION:
+        parser.error(f"--duration doit valoir au moins {MIN_DURATION:.0f} s (tunnels de 10, 30 et 60 s)")
+    
+    logging.disable(logging.WARNING)
+    data = simulate(args.duration, args.imu_rate)
+    print(f"Trajet de {args.duration:.0f} s, IMU {args.imu_rate:g} Hz, {len(data['gps'])} positions GPS, "
+          f"tunnels {', '.join(f'{length} s à {start} s' for start, length in data['outages'])}")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        calibration_file = Path(tmp) / 'mag_calibration.json'
+        print("\n[débit] échantillons IMU/s")
+        for size in (10, 50, 200):
+            rates = [f"boucle Python {throughput(data, size, False):9.0f}"]
+            if fusion_module.np is not None:
+                rates.append(f"numpy {throughput(data, size, True):9.0f}")
+            print(f"  rafales de {size:>3} : {', '.join(rates)}")
+        result = replay(data, calibration_file=calibration_file)
+        calibration_file.unlink()
+        per_sample = replay(data, per_sample=True, calibration_file=calibration_file)
+        print(f"  rejeu par rafales de {BATCH_S * 1000:.0f} ms : {result['rate']:9.0f}, "
+              f"échantillon par échantillon : {per_sample['rate']:9.0f}")
+        
+        radii = [FIELD_H * s for s in SOFT_IRON[:2]]
+        expected = {'offset': [round(o * s, 1) for o, s in zip(HARD_IRON[:2], SOFT_IRON[:2])],
+                    'scale': [round(sum(radii) / 2 / r, 3) for r in radii]}
+        calibration = result['calibration'].to_dict()
+        print("\n[calibration du magnétomètre] plan horizontal")
+        print(f"  calculée après {result['calibrated_at']:.0f} s : décalage "
+              f"{[round(v, 1) for v in calibration['offset'][:2]]}, échelles "
+              f"{[round(v, 3) for v in calibration['scale'][:2]]} (attendu {expected})")
+        cached = replay(data, calibration_file=calibration_file)
+        print(f"  relue depuis le cache au démarrage suivant : disponible dès {cached['calibrated_at']:.1f} s")
+        without_mag = replay(data, magnetometer=False)
+        
+        print("\n[erreur de position] m")
+        print(f"  GPS disponible, RMS : GPS brut {result['rms_raw']:.1f}, fusion {result['rms_fused']:.1f}")
+        for outage, error in result['outages'].items():
+            print(f"  fin du tunnel de {outage[1]:>2} s : fusion {error:6.1f}, "
+                  f"fusion sans magnétomètre {without_mag['outages'][outage]:6.1f}, "
+                  f"dernière position GPS {result['hold'][outage]:6.1f}")
+        print(f"\n[cap] erreur médiane {result['heading']:.1f}°, p95 {result['heading_p95']:.1f}° "
+              f"(sans magnétomètre {without_mag['heading']:.1f}° / {without_mag['heading_p95']:.1f}°)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark du bus I2C partagé (utils/i2c_bus.py) : gigue des lectures du
+MPU9250 pendant les rafraîchissements du LCD
+
+Bus simulé par utils.i2c_bus.MockI2CBackend (100 kHz, durée de chaque
+transaction attendue) ; LCD piloté par sensors/lcd.py au-dessus d'un RPLCD
+simulé (benchmarks/fake_hardware.py, mêmes écritures que la bibliothèque :
+environ 160 transactions par rafraîchissement). L'IMU lit un échantillon
+(14 octets) à --imu-rate Hz, le LCD est rafraîchi toutes les
+--lcd-interval secondes.
+
+Modes :
+    séquentiel          IMU et LCD dans la même boucle (comme la boucle principale)
+    threads sans verrou deux threads, aucune coordination (transactions entremêlées)
+    threads + verrou    un verrou, tenu par le LCD pendant tout le rafraîchissement
+    gestionnaire lot=N  I2CBus : IMU prioritaire, écritures du LCD par lots de N
+
+Mesures : retard des lectures IMU sur leur échéance (médiane, p99, max),
+lectures en retard de plus d'une période (les échéances manquées sont
+rattrapées), durée d'un rafraîchissement du LCD,
+transactions simultanées sur le bus, temps de bus par périphérique.
+
+Usage:
+    python -m benchmarks.bench_i2c [--duration 10] [--imu-rate 200] [--lcd-interval 0.25]
+"""
+
+import argparse
+import logging
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import fake_hardware  # noqa: E402
+
+fake_hardware.install(lcd=True)
+
+from sensors.lcd import LCD  # noqa: E402
+from utils.i2c_bus import I2CBus, MockI2CBackend, PRIORITY_IMU, PRIORITY_DISPLAY  # noqa: E402
+
+MPU_ADDRESS = 0x68
+MAX_PASSENGERS = 40
+
+
+def run(mode: str, duration: float, imu_rate: float, lcd_interval: float, batch_size: int = 4) -> dict:
+    backend = MockI2CBackend(clock_hz=100_000)
+    manager = None
+    if mode == 'manager':
+        manager = I2CBus(backend=backend, batch_size=batch_size)
+        imu_bus = manager.device('mpu9250', priority=PRIORITY_IMU)
+        lcd = LCD(bus=manager.device('lcd', priority=PRIORITY_DISPLAY))
+    else:
+        imu_bus = backend
+        lcd = LCD()
+        lcd.lcd.bus = backend
+    lock = threading.Lock() if mode == 'lock' else None
+    
+    redraws = []
+    
+    def redraw(count: int):
+        start = time.perf_counter()
+        if lock:
+            with lock:
+                lcd.display_passenger_count(count, MAX_PASSENGERS)
+        else:
+            lcd.display_passenger_count(count, MAX_PASSENGERS)
+        redraws.append(time.perf_counter() - start)
+    
+    def read_imu():
+        if lock:
+            with lock:
+                imu_bus.read_i2c_block_data(MPU_ADDRESS, 0x3B, 14)
+        else:
+            imu_bus.read_i2c_block_data(MPU_ADDRESS, 0x3B, 14)
+    
+    lateness = []
+    period = 1.0 / imu_rate
+    start = time.perf_counter()
+    end = start + duration
+    stop = threading.Event()
+    
+    def display_loop():
+        count = 0
+        while not stop.wait(lcd_interval):
+            count = (count + 1) % MAX_PASSENGERS
+            redraw(count)
+    
+    display = None
+    if mode != 'sequential':
+        display = threading.Thread(target=display_loop, daemon=True)
+        display.start()
+    
+    deadline, next_redraw, count = start, start + lcd_interval, 0
+    while deadline < end:
+        delay = deadline - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        read_imu()
+        done = time.perf_counter()
+        lateness.append((done - deadline) * 1000)
+        if mode == 'sequential' and done >= next_redraw:
+            count = (count + 1) % MAX_PASSENGERS
+            redraw(count)
+            next_redraw += lcd_interval
+        deadline += period
+    stop.set()
+    if display:
+        display.join()
+    
+    lateness.sort()
+    result = {
+        'samples': len(lateness),
+        'late': sum(1 for value in lateness if value > period * 1000),
+        'p50': statistics.median(lateness),
+        'p99': lateness[int(0.99 * (len(lateness) - 1))],
+        'max': lateness[-1],
+        'redraw': statistics.fmean(redraws) * 1000 if redraws else 0.0,
+        'overlaps': backend.overlaps,
+        'bus': backend.busy_time / (time.perf_counter() - start) * 100,
+        'devices': manager.stats() if manager else None,
+    }
+    if manager:
+        manager.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--imu-rate', type=float, default=200.0)
+    parser.add_argument('--lcd-interval', type=float, default=0.25)
+    args = parser.parse_args()
+    
+    logging.disable(logging.WARNING)
+    print(f"IMU {args.imu_rate:g} Hz, LCD rafraîchi toutes les {args.lcd_interval * 1000:.0f} ms, "
+          f"{args.duration:g} s par mode ; retards en ms")
+    for label, mode, batch_size in (
+        ('séquentiel', 'sequential', None),
+        ('threads sans verrou', 'raw', None),
+        ('threads + verrou', 'lock', None),
+        ('gestionnaire lot=1', 'manager', 1),
+        ('gestionnaire lot=4', 'manager', 4),
+        ('gestionnaire lot=16', 'manager', 16),
+    ):
+        result = run(mode, args.duration, args.imu_rate, args.lcd_interval, batch_size)
+        print(f"  {label:<20} retard médian {result['p50']:6.2f}  p99 {result['p99']:6.2f}  "
+              f"max {result['max']:6.2f}  en retard {result['late']:4d}/{result['samples']}  "
+              f"LCD {result['redraw']:5.1f} ms  simultanées {result['overlaps']:4d}  bus {result['bus']:4.1f} %")
+        if result['devices']:
+            for name, stats in result['devices'].items():
+                print(f"      {name:<8} {stats}")
+
+
+if __name__ == '__main__':
+    main()
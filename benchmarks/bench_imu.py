@@ -0,0 +1,149 @@
+"""
+Benchmark de la lecture du MPU9250 : scrutation registre par registre
+comparée à la FIFO matérielle vidée par rafales
+
+Bus I2C simulé par benchmarks/fake_hardware.py (smbus2) : le modèle du
+MPU9250 remplit sa FIFO à la cadence configurée et compte transactions et
+octets transférés. Un freinage bref (0,4 g pendant 30 ms) est injecté au
+milieu de chaque mesure.
+
+Modes :
+    scrutation     un échantillon par lecture, comme mpu9250_jmdev :
+                   accéléromètre, gyroscope et magnétomètre (3 transactions)
+    FIFO numpy     MPU9250(fifo=True) vidé toutes les --drain secondes
+                   (par défaut 3/4 de la capacité de la FIFO : 31 ms à
+                   1 kHz, 157 ms à 200 Hz), décodage vectorisé
+    FIFO struct    idem, décodage sans numpy
+
+Mesures : transactions/s, octets/s, occupation estimée du bus à 400 kHz
+(9 bits par octet, 20 bits de start/adresse/stop par transaction), CPU
+consommé, échantillons reçus / attendus, pic de freinage vu.
+
+Usage:
+    python -m benchmarks.bench_imu [--duration 5] [--drain 0.1]
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import fake_hardware  # noqa: E402
+
+hardware = fake_hardware.install()
+
+import smbus2  # noqa: E402
+from sensors import mpu9250 as mpu_module  # noqa: E402
+
+RATES = (100, 200, 500, 1000)
+FIFO_FRAMES = 512 // 12
+I2C_HZ = 400_000
+SPIKE_G = 0.4
+SPIKE_S = 0.03
+
+
+def inject_braking(start: float):
+    """Accélération longitudinale : vibrations faibles et un freinage bref"""
+    def acceleration(t):
+        x = SPIKE_G if start <= t < start + SPIKE_S else 0.01
+        return x, 0.0, 1.0
+    hardware.imu_acceleration = acceleration
+
+
+def measure(function, duration: float) -> dict:
+    """Exécute un mode de lecture et relève l'activité du bus simulé"""
+    hardware.i2c = None
+    bus = smbus2.SMBus(1)
+    model = hardware.i2c
+    inject_braking(time.perf_counter() + duration / 2)
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    samples, peak = function(bus, wall_start + duration)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    bits = model.bytes * 9 + model.transactions * 20
+    return {
+        'transactions': model.transactions / wall,
+        'bytes': model.bytes / wall,
+        'bus': bits / I2C_HZ / wall * 100,
+        'cpu': cpu / wall * 100,
+        'samples': samples,
+        'peak': peak,
+        'wall': wall,
+    }
+
+
+def polling(rate: int):
+    def run(bus, end):
+        period, samples, peak = 1.0 / rate, 0, 0.0
+        deadline = time.perf_counter()
+        while deadline < end:
+            accel = bus.read_i2c_block_data(0x68, 0x3B, 6)
+            bus.read_i2c_block_data(0x68, 0x43, 6)
+            bus.read_i2c_block_data(0x0C, 0x03, 7)
+            x = int.from_bytes(bytes(accel[:2]), 'big', signed=True) / 16384.0
+            peak = max(peak, x)
+            samples += 1
+            deadline += period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return samples, peak
+    return run
+
+
+def fifo(rate: int, drain: float, use_numpy: bool, overflows: dict):
+    def run(bus, end):
+        mpu_module.NUMPY_AVAILABLE = use_numpy
+        try:
+            sensor = mpu_module.MPU9250(fifo=True, sample_rate=rate, bus=bus)
+            peak = 0.0
+            while time.perf_counter() < end:
+                time.sleep(drain)
+                data = sensor.read_data()
+                if data and data['samples']:
+                    peak = max(peak, data['peak_acceleration']['x'])
+            overflows['count'] = sensor.fifo_stats['overflows']
+            sensor.cleanup()
+            return sensor.fifo_stats['samples'], peak
+        finally:
+            mpu_module.NUMPY_AVAILABLE = mpu_module.np is not None
+    return run
+
+
+def report(label: str, result: dict, rate: int, extra: str = ''):
+    expected = rate * result['wall']
+    print(f"  {label:<13} {result['transactions']:8.0f} tr/s {result['bytes']:9.0f} o/s "
+          f"bus {result['bus']:5.1f} %  CPU {result['cpu']:5.1f} %  "
+          f"échantillons {result['samples'] / expected * 100:5.1f} %  pic {result['peak']:.2f} g{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--drain', type=float, default=None, help="intervalle de vidage de la FIFO (s)")
+    args = parser.parse_args()
+    
+    logging.disable(logging.WARNING)
+    print(f"{args.duration:g} s par mesure, freinage de {SPIKE_G} g pendant {SPIKE_S * 1000:.0f} ms")
+    for rate in RATES:
+        drain = args.drain or 0.75 * FIFO_FRAMES / rate
+        print(f"\n[{rate} Hz, FIFO vidée toutes les {drain * 1000:.0f} ms]")
+        report('scrutation', measure(polling(rate), args.duration), rate)
+        modes = [('FIFO numpy', True)] if mpu_module.np is not None else []
+        for label, use_numpy in modes + [('FIFO struct', False)]:
+            overflows = {}
+            result = measure(fifo(rate, drain, use_numpy, overflows), args.duration)
+            report(label, result, rate, f"  débordements {overflows['count']}")
+    
+    # Vidage trop lent : 512 octets de FIFO = 42 trames, soit 42 ms à 1 kHz
+    print("\n[1000 Hz, FIFO vidée toutes les 200 ms]")
+    overflows = {}
+    result = measure(fifo(1000, 0.2, mpu_module.np is not None, overflows), args.duration)
+    report('FIFO', result, 1000, f"  débordements {overflows['count']}")
+
+
+if __name__ == '__main__':
+    main()
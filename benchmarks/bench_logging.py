@@ -0,0 +1,108 @@
+"""
+Benchmark du logging : latence de la boucle principale avec le logging
+synchrone d'origine (FileHandler + StreamHandler) et avec le logging asynchrone
+(QueueHandler + rotation + limitation des messages répétés)
+
+Usage:
+    python -m benchmarks.bench_logging [--cycles 2000] [--fsync]
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.log_setup import setup_logging, stop_logging  # noqa: E402
+
+logger = logging.getLogger('smart_bus.bench')
+
+
+def simulate_cycle(cycle: int):
+    """Reproduit les messages émis par une itération de SmartBus.run"""
+    logger.info("Capteurs actifs: dht22, gps, mpu9250, ultrasonic_entry, ultrasonic_exit")
+    logger.info(f"Passagers: {cycle % 10}/10")
+    # Capteur défaillant : un avertissement à chaque cycle
+    logger.warning("Ultrasonic timeout - Echo n'a pas démarré (GPIO 24)")
+    logger.warning("⚠️ Échec de l'envoi des données au serveur")
+
+
+def setup_sync(log_file: str):
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    for handler in (logging.FileHandler(log_file), logging.StreamHandler()):
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+    root.setLevel(logging.INFO)
+
+
+def teardown_sync():
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+
+def measure(cycles: int) -> list:
+    latencies = []
+    for cycle in range(cycles):
+        start = time.perf_counter()
+        simulate_cycle(cycle)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return latencies
+
+
+def report(name: str, latencies: list, log_file: str):
+    latencies = sorted(latencies)
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))]  # noqa: E731
+    size = os.path.getsize(log_file) if os.path.exists(log_file) else 0
+    print(f"{name:<8} moyenne={statistics.mean(latencies):8.1f}us  p50={p(0.5):8.1f}us  "
+          f"p99={p(0.99):8.1f}us  max={latencies[-1]:8.1f}us  fichier={size} octets")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cycles', type=int, default=2000)
+    parser.add_argument('--fsync', action='store_true',
+                        help="Force un fsync après chaque écriture (simule une carte SD lente)")
+    args = parser.parse_args()
+    
+    if args.fsync:
+        original_flush = logging.FileHandler.flush
+        
+        def flush_fsync(self):
+            original_flush(self)
+            if self.stream:
+                os.fsync(self.stream.fileno())
+        
+        logging.FileHandler.flush = flush_fsync
+    
+    # La sortie console est redirigée pour ne mesurer que le coût du logging
+    sys.stderr = open(os.devnull, 'w')
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        sync_file = os.path.join(tmp, 'sync.log')
+        setup_sync(sync_file)
+        sync_latencies = measure(args.cycles)
+        teardown_sync()
+        
+        async_file = os.path.join(tmp, 'async.log')
+        setup_logging(level='INFO', log_file=async_file, rate_limit_interval=60)
+        async_latencies = measure(args.cycles)
+        stop_logging()
+        
+        sys.stderr = sys.__stderr__
+        print(f"{args.cycles} cycles simulés (fsync={'oui' if args.fsync else 'non'})")
+        report('sync', sync_latencies, sync_file)
+        report('async', async_latencies, async_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+"""
+Benchmark du transport MQTT (utils/mqtt_client.py) face au transport HTTP
+(utils/http_client.py) : débit, octets par snapshot et remise des messages
+
+Serveurs locaux : serveur HTTP (réponse 200 immédiate) et broker MQTT
+simulé (benchmarks/fake_broker.py). --snapshots snapshots de la taille de
+ceux de SmartBus.collect_data sont envoyés au plus vite.
+
+Modes :
+    HTTP              HTTPClient.send_data, une requête par snapshot
+    HTTP lots         HTTPClient.send_snapshots, lots de --batch snapshots
+    MQTT              MQTTClient, QoS 1, messages en vol en mémoire
+    MQTT + disque     MQTTClient, QoS 1, messages en vol en base SQLite
+
+Mesures : snapshots/s (jusqu'au dernier acquittement pour MQTT), octets
+applicatifs par snapshot dans chaque sens (requête + en-têtes HTTP,
+paquets MQTT ; hors TCP/IP, HTTP ouvrant une connexion par requête).
+Remise : coupure du broker au milieu de l'envoi, puis arrêt brutal du
+client avec des messages non acquittés et reprise par un nouveau client ;
+snapshots reçus / envoyés et état retenu du bus (testament).
+
+Usage:
+    python -m benchmarks.bench_mqtt [--snapshots 500] [--batch 10]
+"""
+
+import argparse
+import json
+import logging
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_broker import FakeBroker  # noqa: E402
+from utils.http_client import HTTPClient  # noqa: E402
+from utils.mqtt_client import MQTTClient  # noqa: E402
+
+
+def snapshot(i: int) -> dict:
+    """Snapshot de la taille de ceux de SmartBus.collect_data"""
+    return {
+        'timestamp': f'2024-05-01T08:00:{i % 60:02d}.{i:06d}',
+        'sensors': {
+            'gps': {'latitude': 36.8065 + i * 1e-6, 'longitude': 10.1815, 'altitude': 30.0, 'speed': 32.5,
+                    'satellites': 8, 'fix_quality': 1, 'timestamp': '08:00:00'},
+            'dht22': {'temperature': 24.3, 'humidity': 51.0},
+            'mpu9250': {'acceleration': {'x': 0.01, 'y': -0.02, 'z': 0.99},
+                        'gyroscope': {'x': 0.4, 'y': -0.1, 'z': 0.2},
+                        'magnetometer': {'x': 21.0, 'y': -4.5, 'z': 38.2}, 'samples': 20},
+            'ultrasonic_entry': {'distance': 120.0, 'samples': 3},
+            'ultrasonic_exit': {'distance': 95.0, 'samples': 3},
+        },
+        'passengers': {'count': i % 40, 'max': 50, 'is_full': False},
+        'health': {name: {'state': 'ok', 'failures': 0}
+                   for name in ('gps', 'dht22', 'mpu9250', 'ultrasonic_entry', 'ultrasonic_exit')},
+        'bus_id': 'Bus1',
+    }
+
+
+class _Counting:
+    """Fichier de socket qui compte les octets lus et écrits"""
+    
+    def __init__(self, stream, counters: dict, key: str):
+        self._stream, self._counters, self._key = stream, counters, key
+    
+    def read(self, *args):
+        data = self._stream.read(*args)
+        self._counters[self._key] += len(data)
+        return data
+    
+    def readline(self, *args):
+        data = self._stream.readline(*args)
+        self._counters[self._key] += len(data)
+        return data
+    
+    def write(self, data):
+        self._counters[self._key] += len(data)
+        return self._stream.write(data)
+    
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def http_server() -> tuple:
+    """Serveur HTTP local : (serveur, compteurs d'octets reçus / envoyés)"""
+    counters = {'in': 0, 'out': 0}
+    
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        
+        def setup(self):
+            super().setup()
+            self.rfile = _Counting(self.rfile, counters, 'in')
+            self.wfile = _Counting(self.wfile, counters, 'out')
+        
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            body = b'{"status":"ok"}'
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counters
+
+
+def run_http(snapshots: list, batch: int) -> dict:
+    server, counters = http_server()
+    client = HTTPClient(f'http://127.0.0.1:{server.server_address[1]}', retry_count=1)
+    start = time.perf_counter()
+    if batch > 1:
+        for i in range(0, len(snapshots), batch):
+            client.send_snapshots('Bus1', snapshots[i:i + batch])
+    else:
+        for data in snapshots:
+            client.send_data(data)
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+    return {'elapsed': elapsed, 'in': counters['in'], 'out': counters['out']}
+
+
+def wait_acked(client: MQTTClient, timeout: float = 30.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while client.pending() and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return not client.pending()
+
+
+def run_mqtt(snapshots: list, store: Path = None) -> dict:
+    broker = FakeBroker()
+    client = MQTTClient(broker.url, store_path=str(store) if store else None)
+    client.test_connection()
+    wait_acked(client)
+    broker.reset_counters()
+    start = time.perf_counter()
+    for data in snapshots:
+        client.send_data(data)
+    wait_acked(client)
+    elapsed = time.perf_counter() - start
+    result = {'elapsed': elapsed, 'in': broker.bytes_in, 'out': broker.bytes_out, 'messages': len(broker.received)}
+    client.close()
+    broker.close()
+    return result
+
+
+def received_snapshots(broker: FakeBroker) -> set:
+    return {json.loads(payload)['timestamp'] for topic, payload in broker.received if topic.endswith('/state')}
+
+
+def delivery(snapshots: list, directory: Path) -> dict:
+    """Coupure du broker pendant l'envoi, puis arrêt brutal du client et reprise"""
+    broker = FakeBroker()
+    store = directory / 'inflight.db'
+    client = MQTTClient(broker.url, store_path=str(store))
+    client.test_connection()
+    status = {}
+    half = len(snapshots) // 2
+    for i, data in enumerate(snapshots[:half]):
+        if i == half // 2:
+            broker.outage(1.5)
+            time.sleep(0.2)
+            status['coupure'] = broker.retained.get(client.status_topic)
+        client.send_data(data)
+        time.sleep(0.002)
+    wait_acked(client, 10)
+    status['reprise'] = broker.retained.get(client.status_topic)
+    outage = {'expected': half, 'received': len(received_snapshots(broker)), 'connects': client.stats['connects']}
+    
+    # Broker injoignable, messages enregistrés puis processus « tué » (pas de close)
+    broker.outage(2.0)
+    time.sleep(0.2)
+    for data in snapshots[half:]:
+        client.send_data(data)
+    unacked = client.pending()
+    client._disconnect()
+    client._store.close()
+    restarted = MQTTClient(broker.url, store_path=str(store))
+    restarted.test_connection()
+    wait_acked(restarted, 10)
+    restart = {'unacked': unacked, 'replayed': restarted.stats['replayed'],
+               'received': len(received_snapshots(broker)), 'expected': len(snapshots)}
+    restarted.close()
+    status['fermeture'] = broker.retained.get(restarted.status_topic)
+    broker.close()
+    return {'outage': outage, 'restart': restart, 'status': status}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--snapshots', type=int, default=500)
+    parser.add_argument('--batch', type=int, default=10)
+    args = parser.parse_args()
+    
+    logging.disable(logging.WARNING)
+    snapshots = [snapshot(i) for i in range(args.snapshots)]
+    size = len(json.dumps(snapshots[0]))
+    print(f"{args.snapshots} snapshots de {size} octets (JSON)\n")
+    workdir = Path(tempfile.mkdtemp(prefix='bench_mqtt_'))
+    try:
+        results = (
+            ('HTTP', run_http(snapshots, 1)),
+            (f'HTTP lots de {args.batch}', run_http(snapshots, args.batch)),
+            ('MQTT', run_mqtt(snapshots)),
+            ('MQTT + disque', run_mqtt(snapshots, workdir / 'throughput.db')),
+        )
+        print(f"  {'mode':<16} {'snapshots/s':>11} {'octets/snapshot':>16} {'montants':>9} {'descendants':>12}")
+        for label, result in results:
+            count = args.snapshots
+            print(f"  {label:<16} {count / result['elapsed']:11.0f} {(result['in'] + result['out']) / count:16.0f} "
+                  f"{result['in'] / count:9.0f} {result['out'] / count:12.0f}")
+        
+        result = delivery(snapshots, workdir)
+        outage, restart, status = result['outage'], result['restart'], result['status']
+        print("\n[remise]")
+        print(f"  coupure du broker (1,5 s)  {outage['received']}/{outage['expected']} snapshots reçus, "
+              f"{outage['connects']} connexions")
+        print(f"  arrêt brutal du client     {restart['unacked']} messages non acquittés, {restart['replayed']} republiés "
+              f"au redémarrage, {restart['received']}/{restart['expected']} snapshots reçus")
+        print("  état retenu du bus         " + ', '.join(
+            f"{moment}: {value.decode() if value else '-'}" for moment, value in status.items()))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark du pipeline de sortie (utils/fanout.py) : une sortie bloquée ne
+doit pas ralentir les autres
+
+Snapshots publiés à --rate par seconde pendant --duration secondes vers trois
+sorties : fichiers JSON et CSV réels (DataLogger, répertoire temporaire) et
+serveur simulé (2 ms par snapshot). La sortie --stalled se bloque pendant
+--stall secondes à partir du tiers du parcours (carte SD figée, serveur
+muet).
+
+Modes :
+    en ligne        ancien run_cycle : les sorties appelées l'une après l'autre
+    files           OutputPipeline, file de --queue par sortie, drop_oldest
+    files (block)   idem, sortie bloquée en politique block (attente bornée
+                    à 50 ms par publication, puis abandon)
+
+Mesures : durée d'une publication côté boucle principale (p50/p99/max),
+snapshots écrits par seconde et par sortie pendant le blocage et sur tout
+le parcours, snapshots abandonnés, latence maximale publication -> écriture.
+
+Usage:
+    python -m benchmarks.bench_output [--rate 100] [--duration 6] [--stall 2] [--stalled json]
+"""
+
+import argparse
+import logging
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.data_logger import DataLogger  # noqa: E402
+from utils.fanout import OutputPipeline, OVERFLOW_BLOCK  # noqa: E402
+
+SERVER_DELAY = 0.002
+
+
+def snapshot(i: int) -> dict:
+    """Snapshot de la taille de ceux de SmartBus.collect_data"""
+    return {
+        'timestamp': time.time(),
+        'bus_id': 'Bus1',
+        'sensors': {
+            'gps': {'latitude': 36.8 + i * 1e-6, 'longitude': 10.18, 'altitude': 30.0, 'speed': 32.5,
+                    'satellites': 8, 'fix': True},
+            'dht22': {'temperature': 24.3, 'humidity': 51.0},
+            'mpu9250': {'acceleration': {'x': 0.01, 'y': -0.02, 'z': 0.99},
+                        'gyroscope': {'x': 0.4, 'y': -0.1, 'z': 0.2}, 'temperature': 31.2},
+            'ultrasonic_entry': {'distance': 120.0},
+            'ultrasonic_exit': {'distance': 95.0},
+        },
+        'passengers': {'count': i % 40, 'entries': i // 2, 'exits': i // 2 - i % 40},
+    }
+
+
+class Sink:
+    """Sortie instrumentée : instants d'écriture, blocage entre stall_start et stall_end"""
+    
+    def __init__(self, write):
+        self._write = write
+        self.stall_start = self.stall_end = None
+        self.times = []
+    
+    def write(self, data: dict):
+        now = time.monotonic()
+        if self.stall_start is not None and self.stall_start <= now < self.stall_end:
+            time.sleep(self.stall_end - now)
+        result = self._write(data)
+        self.times.append(time.monotonic())
+        return result
+
+
+def create_sinks(directory: Path) -> dict:
+    data_logger = DataLogger(str(directory))
+    return {
+        'json': Sink(data_logger.save_json),
+        'csv': Sink(data_logger.save_csv),
+        'http': Sink(lambda data: time.sleep(SERVER_DELAY)),
+    }
+
+
+def run(mode: str, directory: Path, args) -> dict:
+    """Publie les snapshots à cadence fixe et mesure publication et écritures"""
+    sinks = create_sinks(directory)
+    pipeline = None
+    if mode != 'inline':
+        pipeline = OutputPipeline(queue_size=args.queue)
+        for name, sink in sinks.items():
+            if mode == 'block' and name == args.stalled:
+                pipeline.add_sink(name, sink.write, overflow=OVERFLOW_BLOCK, block_timeout=0.05)
+            else:
+                pipeline.add_sink(name, sink.write)
+    
+    start = time.monotonic()
+    stalled = sinks[args.stalled]
+    stalled.stall_start = start + args.duration / 3
+    stalled.stall_end = stalled.stall_start + args.stall
+    publish = []
+    count = int(args.rate * args.duration)
+    for i in range(count):
+        due = start + i / args.rate
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        data = snapshot(i)
+        t0 = time.perf_counter()
+        if pipeline:
+            pipeline.publish(data)
+        else:
+            for sink in sinks.values():
+                sink.write(data)
+        publish.append(time.perf_counter() - t0)
+    elapsed = time.monotonic() - start
+    
+    stats = pipeline.stop(timeout=args.stall + 5) if pipeline else {}
+    publish.sort()
+    return {
+        'published': count,
+        'elapsed': elapsed,
+        'publish': (publish[len(publish) // 2], publish[int(len(publish) * 0.99)], publish[-1]),
+        'sinks': {
+            name: {
+                'stall_rate': sum(1 for t in sink.times if stalled.stall_start <= t < stalled.stall_end) / args.stall,
+                'rate': sum(1 for t in sink.times if t < start + elapsed) / elapsed,
+                'dropped': stats.get(name, {}).get('dropped', 0),
+                'latency': stats.get(name, {}).get('latency_max'),
+            }
+            for name, sink in sinks.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type=float, default=100.0)
+    parser.add_argument('--duration', type=float, default=6.0)
+    parser.add_argument('--stall', type=float, default=2.0)
+    parser.add_argument('--stalled', choices=('json', 'csv', 'http'), default='json')
+    parser.add_argument('--queue', type=int, default=100)
+    args = parser.parse_args()
+    
+    logging.disable(logging.WARNING)
+    print(f"{args.rate:g} snapshots/s pendant {args.duration:g} s, sortie {args.stalled} bloquée {args.stall:g} s")
+    workdir = Path(tempfile.mkdtemp(prefix='bench_output_'))
+    try:
+        for mode, label in (('inline', 'en ligne'), ('queues', f'files de {args.queue}'), ('block', 'files (block)')):
+            result = run(mode, workdir / mode, args)
+            p50, p99, worst = result['publish']
+            print(f"\n[{label}] {result['published']} snapshots publiés en {result['elapsed']:.2f} s "
+                  f"(cible {args.duration:g} s)")
+            print(f"  publication  p50 {p50 * 1e6:8.1f} µs   p99 {p99 * 1e6:8.1f} µs   max {worst * 1000:8.1f} ms")
+            for name, sink in result['sinks'].items():
+                latency = f"{sink['latency'] * 1000:7.1f} ms" if sink['latency'] is not None else '      -'
+                marker = '  (bloquée)' if name == args.stalled else ''
+                print(f"  {name:<5} pendant le blocage {sink['stall_rate']:6.1f}/s   parcours {sink['rate']:6.1f}/s   "
+                      f"abandonnés {sink['dropped']:4d}   latence max {latency}{marker}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark de la persistance résistante aux coupures
+
+Mesures :
+    écriture     coût par snapshot de DataLogger.save_json : écriture directe
+                 (comportement précédent), écriture atomique, écriture atomique + fsync
+    journal      coût d'un point de reprise du compteur (StateJournal.save) avec et sans fsync
+    récupération durée de recover_directory sur un grand répertoire de données après un
+                 arrêt propre, après une coupure (fichiers récents vérifiés) et en
+                 vérifiant tous les fichiers ; relecture d'un journal de 1000 enregistrements
+
+Des artefacts de coupure (fichier temporaire orphelin, ligne JSON Lines
+tronquée, fichier JSON incomplet) sont ajoutés pour vérifier la réparation.
+
+Usage:
+    python -m benchmarks.bench_persistence [--files 50000] [--writes 2000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.data_logger import DataLogger  # noqa: E402
+from utils.persistence import StateJournal, recover_directory  # noqa: E402
+
+SNAPSHOT = {
+    'timestamp': '2024-01-01T12:00:00',
+    'sensors': {
+        'gps': {'latitude': 36.8065, 'longitude': 10.1815, 'speed': 32.5, 'has_fix': True},
+        'dht22': {'temperature': 24.3, 'humidity': 51.0},
+        'mpu9250': {'accelerometer': {'x': 0.01, 'y': -0.02, 'z': 1.0}},
+        'ultrasonic_entry': {'distance': 120.4, 'unit': 'cm'},
+    },
+    'passengers': {'count': 4, 'max': 10, 'is_full': False},
+    'bus_id': 'Bus1',
+}
+
+
+def direct_write(directory: Path, i: int):
+    """Écriture de DataLogger.save_json avant l'écriture atomique"""
+    with open(directory / f'sensor_data_{i}.json', 'w', encoding='utf-8') as f:
+        json.dump(SNAPSHOT, f, indent=2, ensure_ascii=False)
+
+
+def per_write_us(function, count: int) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        function(i)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=50000)
+    parser.add_argument('--writes', type=int, default=2000)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        print(f"[écriture] {args.writes} snapshots, µs par snapshot")
+        for label, fsync in (('directe (précédent)', None), ('atomique', False), ('atomique + fsync', True)):
+            directory = tmp / f'write_{label[:4]}_{fsync}'
+            directory.mkdir()
+            if fsync is None:
+                cost = per_write_us(lambda i: direct_write(directory, i), args.writes)
+            else:
+                logger = DataLogger(directory, fsync=fsync)
+                cost = per_write_us(lambda i: logger.save_json(SNAPSHOT, filename=f'sensor_data_{i}.json'), args.writes)
+            print(f"  {label:<20} {cost:8.1f}")
+        
+        print("\n[journal] µs par point de reprise")
+        for fsync in (False, True):
+            journal = StateJournal(tmp / f'state_{fsync}.journal', fsync=fsync)
+            cost = per_write_us(lambda i: journal.save({'passenger_count': i % 10}), 1000)
+            journal.close()
+            print(f"  fsync={fsync!s:<5} {cost:8.1f}")
+        start = time.perf_counter()
+        StateJournal(tmp / 'state_True.journal').load()
+        print(f"  relecture de 1000 enregistrements: {(time.perf_counter() - start) * 1000:.2f} ms")
+        
+        # Grand répertoire : fichiers anciens, puis une minute de fichiers récents avant la coupure
+        data_dir = tmp / 'data'
+        data_dir.mkdir()
+        content = json.dumps(SNAPSHOT, indent=2).encode()
+        old = time.time() - 30 * 86400
+        for i in range(args.files):
+            path = data_dir / f'sensor_data_{i}.json'
+            path.write_bytes(content)
+            os.utime(path, (old, old))
+        checkpoint = time.time() - 60
+        for i in range(12):
+            (data_dir / f'recent_{i}.json').write_bytes(content)
+        (data_dir / 'sensor_data_20240101.jsonl').write_bytes(b'{"a": 1}\n' * 1000 + b'{"a": ')
+        (data_dir / 'recent_truncated.json').write_bytes(content[:100])
+        (data_dir / '.sensor_data_x.json.tmp').write_bytes(content[:50])
+        
+        print(f"\n[récupération] {args.files + 15} fichiers")
+        for label, since in (('arrêt propre', None), ('après coupure', checkpoint), ('vérification complète', 0.0)):
+            stats = recover_directory(data_dir, since=since)
+            print(f"  {label:<22} {stats['duration_ms']:8.1f} ms  {stats}")
+        tail = (data_dir / 'sensor_data_20240101.jsonl').read_bytes()[-20:]
+        print(f"  fin du JSON Lines réparé: {tail!r}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""
+Benchmark de bout en bout du pipeline SmartBus avec matériel simulé et serveur local
+
+Chaque scénario est exécuté dans un processus séparé (RSS maximal isolé) et
+mesure : latence par cycle (p50/p95/p99/max), snapshots par seconde, octets
+écrits (wchar de /proc/self/io), occupation disque finale, octets envoyés au
+serveur et RSS maximal. Les références sont propres à la machine : les
+enregistrer sur la Raspberry Pi avec --save-baseline.
+
+Scénarios :
+    normal      capteurs sains, serveur disponible
+    server_down serveur injoignable (connexion refusée)
+    flapping    DHT22, ultrasons et GPS défaillants par intermittence
+    dead_sensors DHT22, ultrasons et GPS débranchés
+    high_rate   cycles enchaînés sans attente, sauvegarde JSON + CSV
+
+Usage:
+    python -m benchmarks.bench_pipeline                      # tous les scénarios + comparaison
+    python -m benchmarks.bench_pipeline --scenario normal    # un seul scénario
+    python -m benchmarks.bench_pipeline --save-baseline      # enregistre les résultats comme référence
+"""
+
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE_FILE = Path(__file__).resolve().parent / 'baselines' / 'pipeline.json'
+
+SCENARIOS = {
+    'normal': {'cycles': 200, 'interval': 0.0, 'format': 'json'},
+    'server_down': {'cycles': 200, 'interval': 0.0, 'format': 'json', 'server_down': True},
+    'flapping': {'cycles': 40, 'interval': 0.0, 'format': 'json',
+                 'dht_failure_rate': 0.5, 'echo_loss_rate': 0.3, 'gps_flapping': True},
+    'dead_sensors': {'cycles': 200, 'interval': 0.0, 'format': 'json',
+                     'dht_failure_rate': 1.0, 'echo_loss_rate': 1.0, 'gps_connected': False},
+    'high_rate': {'cycles': 1000, 'interval': 0.0, 'format': 'both'},
+}
+
+# Métriques comparées : (clé, sens favorable, libellé)
+METRICS = [
+    ('latency_p50_ms', 'lower', 'latence p50 (ms)'),
+    ('latency_p95_ms', 'lower', 'latence p95 (ms)'),
+    ('latency_p99_ms', 'lower', 'latence p99 (ms)'),
+    ('snapshots_per_s', 'higher', 'snapshots/s'),
+    ('bytes_written', 'lower', 'octets écrits'),
+    ('disk_usage', 'lower', 'occupation disque'),
+    ('bytes_sent', 'lower', 'octets envoyés'),
+    ('peak_rss_kb', 'lower', 'RSS max (ko)'),
+]
+
+
+class StubServer:
+    """Serveur FastAPI simulé qui compte les requêtes et les octets reçus"""
+    
+    def __init__(self):
+        self.bytes_received = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+            
+            def do_GET(self):
+                self.send_response(200)
+                self.end_headers()
+            
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                self.rfile.read(length)
+                with stub._lock:
+                    stub.requests += 1
+                    stub.bytes_received += length
+                self.send_response(202)
+                self.end_headers()
+        
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+    
+    def close(self):
+        self.httpd.shutdown()
+
+
+def _closed_port_url() -> str:
+    """URL d'un port local sans serveur (connexion refusée immédiatement)"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+def _directory_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+
+
+def _bytes_written() -> int:
+    """Octets passés à write() par le processus (Linux), 0 si indisponible"""
+    try:
+        with open('/proc/self/io', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_scenario(name: str) -> dict:
+    """Exécute un scénario dans le processus courant et retourne ses métriques"""
+    settings = SCENARIOS[name]
+    sys.path.insert(0, str(ROOT))
+    from benchmarks import fake_hardware
+    hardware = fake_hardware.install()
+    
+    # Passages réguliers devant les portes (distance < seuil de 3 cm)
+    cycle = {'n': 0}
+    hardware.distances[24] = lambda: 2.5 if cycle['n'] % 7 == 0 else 80.0
+    hardware.distances[26] = lambda: 2.5 if cycle['n'] % 11 == 0 else 120.0
+    hardware.dht_failure_rate = settings.get('dht_failure_rate', 0.0)
+    hardware.echo_loss_rate = settings.get('echo_loss_rate', 0.0)
+    hardware.gps_connected = settings.get('gps_connected', True)
+    
+    server = None if settings.get('server_down') else StubServer()
+    tmp = Path(tempfile.mkdtemp(prefix='smartbus_bench_'))
+    config = {
+        'data': {'save_interval': settings['interval'], 'format': settings['format'],
+                 'directory': str(tmp / 'data')},
+        'server': {'enabled': True, 'url': server.url if server else _closed_port_url(),
+                   'timeout': 2, 'retry_count': 1, 'bus_id': 'BenchBus'},
+        'logging': {'level': 'INFO', 'file': str(tmp / 'logs' / 'smart_bus.log')},
+    }
+    config_file = tmp / 'config.json'
+    config_file.write_text(json.dumps(config), encoding='utf-8')
+    
+    from main import SmartBus
+    bus = SmartBus(str(config_file))
+    
+    latencies = []
+    written_before = _bytes_written()
+    start = time.perf_counter()
+    for i in range(settings['cycles']):
+        cycle['n'] = i
+        if settings.get('gps_flapping'):
+            hardware.gps_connected = (i // 5) % 2 == 0
+        t0 = time.perf_counter()
+        bus.run_cycle()
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if settings['interval']:
+            time.sleep(settings['interval'])
+    elapsed = time.perf_counter() - start
+    
+    # Laisser l'uplink vider sa file avant de compter les octets envoyés
+    deadline = time.monotonic() + 10
+    while server and bus.uplink and any(bus.uplink.pending().values()) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    bus.cleanup()
+    written = _bytes_written() - written_before
+    if server:
+        server.close()
+    
+    return {
+        'scenario': name,
+        'cycles': settings['cycles'],
+        'latency_p50_ms': round(_percentile(latencies, 0.50), 3),
+        'latency_p95_ms': round(_percentile(latencies, 0.95), 3),
+        'latency_p99_ms': round(_percentile(latencies, 0.99), 3),
+        'latency_max_ms': round(max(latencies), 3),
+        'snapshots_per_s': round(settings['cycles'] / elapsed, 1),
+        'bytes_written': written or _directory_size(tmp),
+        'disk_usage': _directory_size(tmp),
+        'bytes_sent': server.bytes_received if server else 0,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def run_isolated(name: str) -> dict:
+    """Exécute un scénario dans un sous-processus"""
+    result = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_pipeline', '--scenario', name, '--json'],
+        cwd=str(ROOT), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """Affiche la comparaison avec la référence ; retourne False en cas de régression"""
+    ok = True
+    for name, result in results.items():
+        print(f"\n[{name}]")
+        reference = baseline.get(name, {})
+        for key, direction, label in METRICS:
+            value = result[key]
+            ref = reference.get(key)
+            if not ref:
+                print(f"  {label:<18} {value:>14}")
+                continue
+            delta = (value - ref) / ref
+            worse = delta > threshold if direction == 'lower' else delta < -threshold
+            flag = '  RÉGRESSION' if worse else ''
+            ok = ok and not worse
+            print(f"  {label:<18} {value:>14}  (référence {ref}, {delta:+.1%}){flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append')
+    parser.add_argument('--json', action='store_true', help="Exécute dans ce processus et affiche le JSON")
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--baseline', default=str(BASELINE_FILE))
+    parser.add_argument('--threshold', type=float, default=0.10, help="Écart toléré avant régression (0.10 = 10%%)")
+    args = parser.parse_args()
+    
+    names = args.scenario or list(SCENARIOS)
+    
+    if args.json:
+        # Les logs de la console ne doivent pas polluer la sortie JSON
+        sys.stderr = open(os.devnull, 'w')
+        print(json.dumps(run_scenario(names[0])))
+        return
+    
+    results = {name: run_isolated(name) for name in names}
+    
+    baseline_file = Path(args.baseline)
+    if args.save_baseline:
+        baseline = json.loads(baseline_file.read_text(encoding='utf-8')) if baseline_file.exists() else {}
+        baseline.update(results)
+        baseline_file.parent.mkdir(parents=True, exist_ok=True)
+        baseline_file.write_text(json.dumps(baseline, indent=2), encoding='utf-8')
+        print(f"Référence enregistrée: {baseline_file}")
+    
+    baseline = json.loads(baseline_file.read_text(encoding='utf-8')) if baseline_file.exists() else {}
+    ok = compare(results, {} if args.save_baseline else baseline, args.threshold)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
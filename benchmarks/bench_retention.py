@@ -0,0 +1,204 @@
+"""
+Benchmark du gestionnaire de rétention
+
+Un répertoire de données est rempli avec plusieurs jours de snapshots JSON
+(un fichier par snapshot, comme DataLogger.save_json) et de segments de
+trajet. Mesures :
+    compactage   débit (fichiers/s, Mo/s), taux de compression, durée maximale d'une étape
+    boucle       retard d'une boucle principale simulée (attente de 10 ms) pendant le
+                 compactage en arrière-plan, comparé au retard sans compactage
+    quota        suppression jusqu'au quota : ordre (données reçues par le serveur
+                 d'abord) et durée
+    ordre        vérification : quota nul, un fichier supprimé par étape ; ordre attendu
+                 (archives reçues, autres données, sauvegardes des logs) et fichiers
+                 vivants intacts (bases SQLite et -wal/-shm, capture en cours, fichier
+                 récent, log courant) ; code de sortie 1 en cas d'écart
+
+Usage:
+    python -m benchmarks.bench_retention [--days 7] [--per-day 2000]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.retention import RetentionManager  # noqa: E402
+
+
+def populate(directory: Path, days: int, per_day: int, seed: int = 4) -> int:
+    """Crée les fichiers des jours passés (dates de modification réalistes) ; retourne la taille totale"""
+    rng = random.Random(seed)
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    total = 0
+    for day in range(days, 0, -1):
+        start = today - timedelta(days=day) + timedelta(hours=6)
+        for i in range(per_day):
+            ts = start + timedelta(seconds=i * 16 * 3600 / per_day)
+            snapshot = {
+                'timestamp': ts.isoformat(),
+                'sensors': {
+                    'gps': {'latitude': 36.8 + rng.random() / 100, 'longitude': 10.18 + rng.random() / 100,
+                            'speed': rng.uniform(0, 50), 'has_fix': True},
+                    'dht22': {'temperature': rng.uniform(18, 30), 'humidity': rng.uniform(30, 70)},
+                    'mpu9250': {'accelerometer': {'x': rng.gauss(0, 0.05), 'y': rng.gauss(0, 0.05), 'z': 1.0},
+                                'gyroscope': {'x': rng.gauss(0, 1), 'y': rng.gauss(0, 1), 'z': rng.gauss(0, 1)}},
+                    'ultrasonic_entry': {'distance': rng.uniform(50, 200), 'unit': 'cm'},
+                },
+                'passengers': {'count': rng.randint(0, 10), 'max': 10, 'is_full': False},
+                'bus_id': 'Bus1',
+            }
+            name = f"sensor_data_{ts:%Y%m%d_%H%M%S}_{i}.json" if i % 50 else f"track_{ts:%Y%m%d_%H%M%S}.json"
+            path = directory / name
+            path.write_text(json.dumps(snapshot, indent=2), encoding='utf-8')
+            os.utime(path, (ts.timestamp(), ts.timestamp()))
+            total += path.stat().st_size
+    return total
+
+
+def check_deletion_order(directory: Path) -> list:
+    """Supprime tout ce qui peut l'être, fichier par fichier ; retourne les écarts constatés"""
+    data_dir, log_dir = directory / 'data', directory / 'logs'
+    (data_dir / 'archive').mkdir(parents=True)
+    (data_dir / 'capture').mkdir()
+    log_dir.mkdir()
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    now = (today + timedelta(hours=12)).timestamp()
+    
+    def create(path: Path, age: float) -> Path:
+        path.write_bytes(os.urandom(4096))
+        os.utime(path, (now - age, now - age))
+        return path
+    
+    archives = [create(data_dir / 'archive' / f"{today - timedelta(days=day):%Y%m%d}.jsonl.gz", (day - 1) * 86400)
+                for day in range(5, 0, -1)]
+    # J-3 contient des snapshots perdus par l'uplink : supprimée avec les données non reçues
+    expected = [archives[0], archives[1], archives[3], archives[2], archives[4]] + [
+        create(data_dir / 'blackbox_door.json', 3600),
+        create(log_dir / 'smart_bus.log.1', 3600),
+    ]
+    capture = create(data_dir / 'capture' / 'capture-20240501-080000.sbc', 7200)
+    live = [capture, create(data_dir / 'sensor_data_recent.json', 10), create(log_dir / 'smart_bus.log', 7200)]
+    live += [create(data_dir / name, 7200) for name in (
+        'smart_bus.db', 'smart_bus.db-wal', 'smart_bus.db-shm', 'sensor_data.db',
+        'mqtt_inflight.db', 'mqtt_inflight.db-wal', 'mqtt_inflight.db-shm')]
+    
+    manager = RetentionManager(data_dir, log_dir=log_dir, max_bytes=0, min_free_bytes=0, keep_days=0,
+                               interval=60, step_files=1)
+    manager.protect(lambda: [capture])
+    # Reçues par le serveur : J-5 et J-4 sans trou, puis J-2 (plage commencée après la perte)
+    manager.acknowledge((today - timedelta(days=5)).timestamp(), (today - timedelta(days=2, hours=18)).timestamp())
+    manager.acknowledge((today - timedelta(days=2, hours=6)).timestamp(), (today - timedelta(days=1)).timestamp())
+    deleted = []
+    remaining = set(expected)
+    while manager.enforce_step(now):
+        gone = [path for path in remaining if not path.exists()]
+        deleted.extend(gone)
+        remaining.difference_update(gone)
+    
+    errors = []
+    if deleted != expected:
+        errors.append(f"ordre {[p.name for p in deleted]} au lieu de {[p.name for p in expected]}")
+    errors.extend(f"{path.name} supprimé" for path in live if not path.exists())
+    return errors
+
+
+def loop_delay(duration: float, stop: threading.Event = None) -> list:
+    """Retards (ms) d'une boucle qui attend 10 ms à chaque itération"""
+    delays = []
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end and not (stop and stop.is_set()):
+        start = time.perf_counter()
+        time.sleep(0.01)
+        delays.append((time.perf_counter() - start - 0.01) * 1000)
+    return delays
+
+
+def p99(values: list) -> float:
+    return sorted(values)[int(0.99 * (len(values) - 1))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--per-day', type=int, default=2000)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / 'data'
+        data_dir.mkdir()
+        original = populate(data_dir, args.days, args.per_day)
+        files = args.days * args.per_day
+        print(f"{files} fichiers sur {args.days} jours, {original / 1e6:.1f} Mo")
+        
+        baseline = loop_delay(2.0)
+        
+        manager = RetentionManager(data_dir, max_bytes=1 << 40, min_free_bytes=0, keep_days=0)
+        step_times = []
+        done = threading.Event()
+        
+        def compact():
+            now = time.time()
+            while True:
+                start = time.perf_counter()
+                more = manager.compact_step(now)
+                step_times.append((time.perf_counter() - start) * 1000)
+                if not more:
+                    break
+                time.sleep(0.05)  # pause entre deux étapes, comme le thread du gestionnaire
+            done.set()
+        
+        start = time.perf_counter()
+        worker = threading.Thread(target=compact)
+        worker.start()
+        during = loop_delay(600, stop=done)
+        worker.join()
+        elapsed = time.perf_counter() - start
+        busy = sum(step_times) / 1000
+        archived = manager.usage()
+        
+        print("\n[compactage]")
+        print(f"  {manager.stats['files_compacted']} fichiers en {elapsed:.1f} s ({busy:.1f} s de travail hors pauses): "
+              f"{files / busy:.0f} fichiers/s, {original / 1e6 / busy:.1f} Mo/s")
+        print(f"  occupation {original / 1e6:.1f} Mo → {archived / 1e6:.2f} Mo (×{original / archived:.0f})")
+        print(f"  étape: médiane {statistics.median(step_times):.0f} ms, max {max(step_times):.0f} ms")
+        print("\n[boucle principale, retard de l'attente de 10 ms]")
+        print(f"  sans compactage  p50 {statistics.median(baseline):.2f} ms, p99 {p99(baseline):.2f} ms")
+        print(f"  avec compactage  p50 {statistics.median(during):.2f} ms, p99 {p99(during):.2f} ms, max {max(during):.1f} ms")
+        
+        # Quota à la moitié de l'occupation, données reçues par le serveur jusqu'à l'avant-dernier jour
+        manager.max_bytes = archived // 2
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        manager.acknowledge(0.0, (today - timedelta(days=2)).timestamp())
+        before = sorted(p.name for p in (data_dir / 'archive').iterdir())
+        start = time.perf_counter()
+        while manager.enforce_step(time.time()):
+            pass
+        after = sorted(p.name for p in (data_dir / 'archive').iterdir())
+        deleted = [name for name in before if name not in after]
+        print("\n[quota]")
+        print(f"  quota {manager.max_bytes / 1e6:.2f} Mo: {len(deleted)} archive(s) supprimée(s) en "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms: {', '.join(deleted)}")
+        print(f"  conservées: {', '.join(after)} ({manager.usage() / 1e6:.2f} Mo)")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        errors = check_deletion_order(Path(tmp))
+    print("\n[ordre]")
+    if errors:
+        for error in errors:
+            print(f"  ÉCART: {error}")
+        sys.exit(1)
+    print("  archives reçues, autres données puis sauvegardes des logs ; bases, capture et fichiers récents conservés")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark du démarrage : délai entre le lancement et le premier comptage aux
+portes, initialisation séquentielle (startup.parallel = false) comparée au
+démarrage par étapes (pilotes en parallèle, test serveur en arrière-plan)
+
+Les durées d'initialisation des pilotes sont simulées en ajoutant une attente
+au constructeur des pilotes (matériel simulé par benchmarks/fake_hardware.py).
+
+Scénarios :
+    nominal     durées typiques (GPS 50 ms, DHT22 300 ms, MPU9250 400 ms, LCD 300 ms)
+    slow_i2c    MPU9250 et LCD lents (3 s et 2 s)
+    server_down serveur qui accepte la connexion sans répondre (timeout 3 s)
+
+Usage:
+    python -m benchmarks.bench_startup [--scenario nominal]
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import fake_hardware  # noqa: E402
+
+hardware = fake_hardware.install()
+hardware.distances[24] = 80.0
+hardware.distances[26] = 80.0
+
+import main  # noqa: E402
+
+NOMINAL = {'GPSNeo6M': 0.05, 'DHT22': 0.3, 'MPU9250': 0.4, 'LCD': 0.3, 'Ultrasonic': 0.01}
+SCENARIOS = {
+    'nominal': {'delays': NOMINAL},
+    'slow_i2c': {'delays': {**NOMINAL, 'MPU9250': 3.0, 'LCD': 2.0}},
+    'server_down': {'delays': NOMINAL, 'server_down': True},
+}
+
+
+def slow(cls, delay: float):
+    """Sous-classe du pilote dont l'initialisation dure `delay` secondes de plus"""
+    class Slow(cls):
+        def __init__(self, *args, **kwargs):
+            time.sleep(delay)
+            super().__init__(*args, **kwargs)
+    Slow.__name__ = cls.__name__
+    return Slow
+
+
+def silent_server():
+    """Port local qui accepte les connexions sans jamais répondre"""
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(16)
+    return sock, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+def run(scenario: str, parallel: bool) -> dict:
+    settings = SCENARIOS[scenario]
+    originals = {name: getattr(main, name) for name in settings['delays']}
+    for name, delay in settings['delays'].items():
+        setattr(main, name, slow(originals[name], delay))
+    
+    server = None
+    tmp = Path(tempfile.mkdtemp(prefix='smartbus_startup_'))
+    config = {
+        'startup': {'parallel': parallel},
+        'server': {'enabled': True, 'url': 'http://127.0.0.1:9', 'timeout': 3, 'retry_count': 1},
+        'data': {'directory': str(tmp / 'data')},
+        'logging': {'level': 'WARNING', 'file': str(tmp / 'smart_bus.log')},
+    }
+    if settings.get('server_down'):
+        server, config['server']['url'] = silent_server()
+    config_file = tmp / 'config.json'
+    config_file.write_text(json.dumps(config), encoding='utf-8')
+    
+    try:
+        start = time.perf_counter()
+        bus = main.SmartBus(str(config_file))
+        init_ms = (time.perf_counter() - start) * 1000
+        
+        first_count_ms = None
+        deadline = time.perf_counter() + 15
+        while time.perf_counter() < deadline:
+            data = bus.collect_data()
+            if first_count_ms is None and 'ultrasonic_entry' in data['sensors']:
+                first_count_ms = (time.perf_counter() - start) * 1000
+            if first_count_ms is not None and 'all_drivers' in bus.startup.phases:
+                break
+            time.sleep(0.02)
+        all_ms = bus.startup.phases.get('all_drivers')
+        report = bus.startup.format_report()
+        bus.cleanup()
+    finally:
+        for name, cls in originals.items():
+            setattr(main, name, cls)
+        if server:
+            server.close()
+    
+    return {'init_ms': init_ms, 'first_count_ms': first_count_ms, 'all_drivers_ms': all_ms, 'report': report}
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append')
+    args = parser.parse_args()
+    
+    # Les logs des pilotes ne doivent pas noyer les résultats
+    sys.stderr = open(os.devnull, 'w')
+    for scenario in args.scenario or list(SCENARIOS):
+        print(f"\n[{scenario}]")
+        for label, parallel in (('séquentiel', False), ('par étapes', True)):
+            result = run(scenario, parallel)
+            print(f"  {label:<11} init {result['init_ms']:7.0f} ms, premier comptage {result['first_count_ms']:7.0f} ms, "
+                  f"tous les pilotes {result['all_drivers_ms'] or float('nan'):7.0f} ms")
+            if parallel:
+                print(f"    {result['report']}")
+
+
+if __name__ == '__main__':
+    main_bench()
@@ -0,0 +1,91 @@
+"""
+Benchmark de la détection d'arrêts : temps de recherche d'une position dans
+l'index spatial (grille) comparé à un parcours linéaire de tous les arrêts,
+pour des fichiers de plusieurs milliers d'arrêts
+
+Usage:
+    python -m benchmarks.bench_stops [--stops 1000 5000 20000] [--lookups 200000]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.stops import StopIndex, StopDetector  # noqa: E402
+
+
+def generate_stops(count: int, seed: int = 7) -> list:
+    """Arrêts répartis sur une agglomération d'environ 30 km x 30 km"""
+    rng = random.Random(seed)
+    return [
+        {'id': i, 'name': f'Arret {i}', 'lat': 36.7 + rng.uniform(0, 0.27),
+         'lon': 10.05 + rng.uniform(0, 0.33), 'radius': rng.choice((20, 30, 40))}
+        for i in range(count)
+    ]
+
+
+def linear_lookup(index: StopIndex, lat: float, lon: float):
+    best, best_distance = None, None
+    for stop in index.stops:
+        distance = index.distance(stop, lat, lon)
+        if distance <= stop['radius'] and (best is None or distance < best_distance):
+            best, best_distance = stop, distance
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--stops', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--lookups', type=int, default=200000)
+    args = parser.parse_args()
+    
+    rng = random.Random(3)
+    for count in args.stops:
+        stops = generate_stops(count)
+        start = time.perf_counter()
+        index = StopIndex(stops)
+        build_ms = (time.perf_counter() - start) * 1000
+        
+        # Moitié des positions près d'un arrêt, moitié au hasard
+        points = []
+        for i in range(args.lookups):
+            if i % 2:
+                stop = rng.choice(stops)
+                points.append((stop['lat'] + rng.gauss(0, 0.0002), stop['lon'] + rng.gauss(0, 0.0002)))
+            else:
+                points.append((36.7 + rng.uniform(0, 0.27), 10.05 + rng.uniform(0, 0.33)))
+        
+        start = time.perf_counter()
+        hits = sum(1 for lat, lon in points if index.lookup(lat, lon))
+        grid_us = (time.perf_counter() - start) / len(points) * 1e6
+        
+        sample = points[:2000]
+        start = time.perf_counter()
+        linear_hits = [linear_lookup(index, lat, lon) for lat, lon in sample]
+        linear_us = (time.perf_counter() - start) / len(sample) * 1e6
+        assert [s and s['id'] for s in linear_hits] == [(s and s['id']) for s in (index.lookup(*p) for p in sample)]
+        
+        print(f"{count:6d} arrêts  construction={build_ms:7.1f} ms  grille={grid_us:6.2f} us/position  "
+              f"linéaire={linear_us:9.1f} us/position  ({hits / len(points):.0%} dans un arrêt)")
+    
+    # Visites et temps d'arrêt sur une trace simulée
+    index = StopIndex(generate_stops(2000))
+    detector = StopDetector(index)
+    stop = index.stops[0]
+    visits = []
+    for t in range(120):
+        offset = (t - 60) * 0.00002 if abs(t - 60) > 20 else 0.0
+        speed = 0.0 if offset == 0.0 else 20.0
+        if t == 55:
+            detector.record_boarding()
+        visits.extend(e['visit'] for e in detector.update(stop['lat'] + offset, stop['lon'], speed, 1000.0 + t)
+                      if e['type'] == 'departure')
+    print(f"visite simulée : {visits}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark de la compression de trajectoire : points traités par seconde et
+taux de compression sur des trames NMEA rejouées
+
+Sans fichier, une journée de service est générée (trajet urbain avec arrêts,
+bruit de position et points aberrants) sous forme de trames $GPRMC.
+
+Usage:
+    python -m benchmarks.bench_trajectory [--nmea fichier.nmea] [--epsilon 10]
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pynmea2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.trajectory import TrajectoryCompressor, decode_polyline  # noqa: E402
+
+
+def _nmea_coord(value: float, is_lat: bool) -> tuple:
+    hemi = ('N' if value >= 0 else 'S') if is_lat else ('E' if value >= 0 else 'W')
+    value = abs(value)
+    degrees = int(value)
+    minutes = (value - degrees) * 60
+    fmt = f"{degrees:02d}{minutes:07.4f}" if is_lat else f"{degrees:03d}{minutes:07.4f}"
+    return fmt, hemi
+
+
+def generate_nmea(hours: float = 12.0, seed: int = 1) -> list:
+    """Génère des trames $GPRMC à 1 Hz pour un bus en service"""
+    rng = random.Random(seed)
+    lat, lon, heading = 36.8065, 10.1815, rng.uniform(0, 360)
+    t = datetime(2026, 1, 5, 6, 0, 0)
+    lines = []
+    stop_left = 0
+    
+    for _ in range(int(hours * 3600)):
+        if stop_left > 0:
+            stop_left -= 1
+            speed = 0.0
+        else:
+            speed = max(0.0, rng.gauss(30, 8))
+            if rng.random() < 0.004:
+                stop_left = rng.randint(15, 60)  # arrêt de bus
+            if rng.random() < 0.01:
+                heading += rng.choice((-90, 90))  # intersection
+            heading += rng.gauss(0, 1.5)
+        step = speed / 3.6
+        lat += step * math.cos(math.radians(heading)) / 111320
+        lon += step * math.sin(math.radians(heading)) / (111320 * math.cos(math.radians(lat)))
+        
+        noisy_lat = lat + rng.gauss(0, 2.5) / 111320
+        noisy_lon = lon + rng.gauss(0, 2.5) / 111320
+        if rng.random() < 0.002:
+            noisy_lat += rng.uniform(-0.01, 0.01)  # point aberrant (multi-trajet)
+        
+        lat_s, lat_h = _nmea_coord(noisy_lat, True)
+        lon_s, lon_h = _nmea_coord(noisy_lon, False)
+        msg = pynmea2.RMC('GP', 'RMC', (
+            t.strftime('%H%M%S.00'), 'A', lat_s, lat_h, lon_s, lon_h,
+            f"{speed / 1.852:.1f}", f"{heading % 360:.1f}", t.strftime('%d%m%y'), '', ''
+        ))
+        lines.append(str(msg))
+        t += timedelta(seconds=1)
+    
+    return lines
+
+
+def parse_fixes(lines: list) -> list:
+    """Décode les trames comme GPSNeo6M.read_data"""
+    fixes = []
+    for line in lines:
+        if not line.startswith('$GPRMC'):
+            continue
+        try:
+            msg = pynmea2.parse(line)
+        except pynmea2.ParseError:
+            continue
+        if msg.status != 'A' or not msg.latitude:
+            continue
+        speed = float(msg.spd_over_grnd) * 1.852 if msg.spd_over_grnd else 0.0
+        timestamp = datetime.combine(msg.datestamp, msg.timestamp).timestamp()
+        fixes.append((float(msg.latitude), float(msg.longitude), speed, timestamp))
+    return fixes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--nmea', help="Fichier de trames NMEA enregistrées")
+    parser.add_argument('--hours', type=float, default=12.0)
+    parser.add_argument('--epsilon', type=float, default=10.0)
+    args = parser.parse_args()
+    
+    if args.nmea:
+        lines = Path(args.nmea).read_text(encoding='utf-8', errors='ignore').splitlines()
+    else:
+        lines = generate_nmea(args.hours)
+    fixes = parse_fixes(lines)
+    
+    compressor = TrajectoryCompressor(epsilon=args.epsilon)
+    segments = []
+    start = time.perf_counter()
+    for lat, lon, speed, timestamp in fixes:
+        segments.extend(compressor.add_fix(lat, lon, speed, timestamp))
+    last = compressor.flush()
+    if last:
+        segments.append(last)
+    elapsed = time.perf_counter() - start
+    
+    # Taille d'origine : position GPS telle qu'envoyée dans chaque snapshot
+    raw_bytes = sum(len(json.dumps({
+        'latitude': lat, 'longitude': lon, 'altitude': None, 'speed': speed,
+        'timestamp': '12:00:00', 'has_fix': True
+    })) for lat, lon, speed, _ in fixes)
+    compressed_bytes = sum(len(json.dumps(segment)) for segment in segments)
+    kept = sum(len(decode_polyline(segment['polyline'])) for segment in segments)
+    
+    print(f"{len(fixes)} positions, {len(segments)} segment(s), epsilon={args.epsilon} m")
+    print(f"débit         : {len(fixes) / elapsed:,.0f} points/s ({elapsed * 1000:.1f} ms au total)")
+    print(f"points        : {len(fixes)} → {kept} ({len(fixes) / max(kept, 1):.1f}x), "
+          f"{compressor.stats['rejected']} rejeté(s)")
+    print(f"octets (JSON) : {raw_bytes} → {compressed_bytes} ({raw_bytes / max(compressed_bytes, 1):.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark de la remontée des événements : latence de bout en bout entre la
+détection (front capteur) et la réception par un serveur local, via le canal
+d'événements prioritaire ou via le snapshot périodique suivant
+
+Le serveur local répond lentement sur /api/data pour simuler un envoi de
+snapshot bloqué (réseau cellulaire dégradé).
+
+Usage:
+    python -m benchmarks.bench_uplink [--events 200] [--interval 1.0] [--snapshot-delay 0.8]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.http_client import HTTPClient  # noqa: E402
+from utils.uplink import Uplink, EVENT_BOARDING  # noqa: E402
+
+
+class StubServer:
+    """Serveur FastAPI simulé qui enregistre l'heure de réception de chaque événement"""
+    
+    def __init__(self, snapshot_delay: float):
+        self.snapshot_delay = snapshot_delay
+        self.latencies = []
+        self.requests = {'events': 0, 'data': 0}
+        self._lock = threading.Lock()
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+            
+            def do_GET(self):
+                self.send_response(200)
+                self.end_headers()
+            
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                received = time.monotonic()
+                if self.path == '/api/data':
+                    time.sleep(stub.snapshot_delay)
+                    events = body.get('events', [])
+                    received = time.monotonic()
+                    kind = 'data'
+                else:
+                    events = body['events']
+                    kind = 'events'
+                with stub._lock:
+                    stub.requests[kind] += 1
+                    for event in events:
+                        stub.latencies.append(received - event['data']['edge'])
+                self.send_response(202)
+                self.end_headers()
+        
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+    
+    def close(self):
+        self.httpd.shutdown()
+
+
+def edge_schedule(count: int, seed: int = 42) -> list:
+    """Génère des instants de détection par rafales (montée de plusieurs passagers)"""
+    rng = random.Random(seed)
+    times, t = [], 0.0
+    while len(times) < count:
+        t += rng.uniform(0.2, 1.5)
+        for _ in range(rng.randint(1, 4)):
+            times.append(t)
+            t += rng.uniform(0.05, 0.3)
+    return times[:count]
+
+
+def run_mode(mode: str, events: int, interval: float, snapshot_delay: float) -> StubServer:
+    server = StubServer(snapshot_delay)
+    uplink = Uplink(HTTPClient(server.url, timeout=5, retry_count=1), latency_budget=0.5)
+    uplink.start()
+    
+    schedule = edge_schedule(events)
+    pending = []
+    start = time.monotonic()
+    next_snapshot = start + interval
+    
+    for offset in schedule:
+        target = start + offset
+        # Snapshots périodiques émis pendant l'attente du prochain front
+        while next_snapshot <= target:
+            time.sleep(max(0.0, next_snapshot - time.monotonic()))
+            uplink.send_snapshot({'bus_id': 'Bench', 'events': pending})
+            pending = []
+            next_snapshot += interval
+        time.sleep(max(0.0, target - time.monotonic()))
+        
+        edge = {'edge': time.monotonic()}
+        if mode == 'event':
+            uplink.publish_event(EVENT_BOARDING, edge)
+        else:
+            pending.append({'type': EVENT_BOARDING, 'data': edge})
+    
+    uplink.send_snapshot({'bus_id': 'Bench', 'events': pending})
+    deadline = time.monotonic() + 30
+    while len(server.latencies) < events and time.monotonic() < deadline:
+        time.sleep(0.05)
+    uplink.stop(timeout=1)
+    server.close()
+    return server
+
+
+def report(name: str, server: StubServer):
+    latencies = sorted(l * 1000 for l in server.latencies)
+    if not latencies:
+        print(f"{name:<10} aucun événement reçu")
+        return
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))]  # noqa: E731
+    print(f"{name:<10} reçus={len(latencies):4d}  p50={p(0.5):8.1f} ms  p95={p(0.95):8.1f} ms  "
+          f"max={latencies[-1]:8.1f} ms  moyenne={statistics.mean(latencies):8.1f} ms  "
+          f"requêtes={server.requests}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--interval', type=float, default=1.0, help="Intervalle des snapshots (s)")
+    parser.add_argument('--snapshot-delay', type=float, default=0.8,
+                        help="Temps de réponse du serveur sur /api/data (s)")
+    args = parser.parse_args()
+    
+    print(f"{args.events} événements, snapshots toutes les {args.interval}s, "
+          f"réponse /api/data en {args.snapshot_delay}s")
+    report('snapshot', run_mode('snapshot', args.events, args.interval, args.snapshot_delay))
+    report('événement', run_mode('event', args.events, args.interval, args.snapshot_delay))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+Broker MQTT simulé pour les benchmarks (MQTT 3.1.1, sous-ensemble)
+CONNECT / CONNACK (session présente si le client est déjà venu sans
+clean session), PUBLISH QoS 0 et 1 / PUBACK, messages retenus, testament
+publié si une connexion se ferme sans DISCONNECT, PINGREQ / PINGRESP.
+Pas d'abonnements : les messages reçus sont comptés et conservés dans
+`received` (topic, charge utile), les retenus dans `retained`.
+
+`outage(seconds)` coupe toutes les connexions et refuse les nouvelles
+pendant `seconds` (panne réseau ou redémarrage du broker).
+"""
+
+import socket
+import struct
+import threading
+import time
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+
+def _read_exact(sock: socket.socket, size: int) -> bytes:
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('connexion fermée')
+        data += chunk
+    return data
+
+
+def _read_packet(sock: socket.socket):
+    """Paquet suivant : (type, drapeaux, corps, taille totale sur le réseau)"""
+    header = _read_exact(sock, 1)[0]
+    length, multiplier, size = 0, 1, 1
+    while True:
+        byte = _read_exact(sock, 1)[0]
+        size += 1
+        length += (byte & 0x7F) * multiplier
+        multiplier *= 128
+        if not byte & 0x80:
+            break
+    return header >> 4, header & 0x0F, _read_exact(sock, length), size + length
+
+
+def _string(body: bytes, offset: int):
+    size = struct.unpack_from('!H', body, offset)[0]
+    return body[offset + 2:offset + 2 + size], offset + 2 + size
+
+
+class FakeBroker:
+    """Broker MQTT local sur un port libre (127.0.0.1)"""
+    
+    def __init__(self):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(('127.0.0.1', 0))
+        self._server.listen(16)
+        self.port = self._server.getsockname()[1]
+        self._lock = threading.Lock()
+        self._connections = set()
+        self._sessions = set()
+        self._offline_until = 0.0
+        self._running = True
+        self.received = []
+        self.retained = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.connects = 0
+        threading.Thread(target=self._accept_loop, name='fake-broker', daemon=True).start()
+    
+    @property
+    def url(self) -> str:
+        return f'mqtt://127.0.0.1:{self.port}'
+    
+    def reset_counters(self):
+        with self._lock:
+            self.received = []
+            self.bytes_in = self.bytes_out = 0
+    
+    def outage(self, seconds: float):
+        """Coupe les connexions en cours (sans testament côté client) et refuse les nouvelles"""
+        self._offline_until = time.monotonic() + seconds
+        with self._lock:
+            connections = list(self._connections)
+        for conn in connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+    
+    def close(self):
+        self._running = False
+        self.outage(0)
+        self._server.close()
+    
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            if time.monotonic() < self._offline_until:
+                conn.close()
+                continue
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                self._connections.add(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+    
+    def _send(self, conn: socket.socket, packet: bytes):
+        conn.sendall(packet)
+        with self._lock:
+            self.bytes_out += len(packet)
+    
+    def _serve(self, conn: socket.socket):
+        will = None
+        try:
+            while True:
+                kind, flags, body, size = _read_packet(conn)
+                with self._lock:
+                    self.bytes_in += size
+                if kind == CONNECT:
+                    will = self._connect(conn, body)
+                elif kind == PUBLISH:
+                    qos = (flags >> 1) & 0x03
+                    topic, offset = _string(body, 0)
+                    if qos:
+                        mid = body[offset:offset + 2]
+                        offset += 2
+                    self._deliver(topic.decode(), body[offset:], bool(flags & 0x01))
+                    if qos:
+                        self._send(conn, bytes((PUBACK << 4, 2)) + mid)
+                elif kind == PINGREQ:
+                    self._send(conn, bytes((PINGRESP << 4, 0)))
+                elif kind == DISCONNECT:
+                    will = None
+                    return
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with self._lock:
+                self._connections.discard(conn)
+            conn.close()
+            if will:
+                self._deliver(*will)
+    
+    def _connect(self, conn: socket.socket, body: bytes):
+        """Répond au CONNECT et retourne le testament éventuel (topic, message, retenu)"""
+        _, offset = _string(body, 0)
+        flags = body[offset + 1]
+        offset += 4
+        client_id, offset = _string(body, offset)
+        will = None
+        if flags & 0x04:
+            topic, offset = _string(body, offset)
+            message, offset = _string(body, offset)
+            will = (topic.decode(), message, bool(flags & 0x20))
+        clean = bool(flags & 0x02)
+        with self._lock:
+            present = not clean and client_id in self._sessions
+            if clean:
+                self._sessions.discard(client_id)
+            else:
+                self._sessions.add(client_id)
+            self.connects += 1
+        self._send(conn, bytes((CONNACK << 4, 2, int(present), 0)))
+        return will
+    
+    def _deliver(self, topic: str, payload: bytes, retain: bool):
+        with self._lock:
+            self.received.append((topic, payload))
+            if retain:
+                self.retained[topic] = payload
@@ -0,0 +1,471 @@
+"""
+Matériel simulé pour les benchmarks
+Remplace les bibliothèques matérielles (RPi.GPIO, board, adafruit_dht, serial,
+smbus2) par des modules simulés dont le comportement est piloté par `state` :
+distances des capteurs ultrason, échecs du DHT22, déconnexion du GPS,
+accélération vue par le MPU9250...
+
+`install()` doit être appelé avant d'importer `sensors` ou `main`.
+Les distances peuvent aussi être fixées par la variable d'environnement
+FAKE_HARDWARE_DISTANCES (JSON {broche echo: cm}) : elle est héritée par les
+processus d'acquisition (forkserver / spawn), qui réinstallent le matériel simulé.
+"""
+
+import json
+import math
+import os
+import random
+import struct
+import sys
+import time
+import types
+from datetime import datetime, timezone
+
+
+class HardwareState:
+    """État partagé du matériel simulé"""
+    
+    def __init__(self):
+        self.rng = random.Random(1234)
+        # Distance (cm) retournée par broche echo, ou fonction sans argument ; None = pas d'écho
+        self.distances = {}
+        self.echo_loss_rate = 0.0
+        self.echo_delay = 0.0001
+        self.dht_failure_rate = 0.0
+        self.gps_connected = True
+        self.gps_fix = True
+        self.gps_position = [36.8065, 10.1815]
+        self.gps_speed_knots = 15.0
+        self.pins = {}
+        self.event_callbacks = {}
+        # Accélération (g) vue par le MPU9250 en fonction du temps (horloge perf_counter)
+        self.imu_acceleration = lambda t: (0.01 * math.sin(7 * t), 0.01 * math.cos(5 * t), 1.0)
+        self.i2c = None
+        self._last_trigger = 0.0
+    
+    def distance_for(self, echo_pin: int):
+        value = self.distances.get(echo_pin, 100.0)
+        return value() if callable(value) else value
+
+
+state = HardwareState()
+
+# Distances des échos (JSON {broche: cm}) appliquées par install(), processus enfants compris
+DISTANCES_ENV = 'FAKE_HARDWARE_DISTANCES'
+
+
+# ============================================
+# RPi.GPIO
+# ============================================
+
+def _gpio_module() -> types.ModuleType:
+    gpio = types.ModuleType('RPi.GPIO')
+    gpio.BCM, gpio.BOARD = 11, 10
+    gpio.OUT, gpio.IN = 0, 1
+    gpio.LOW, gpio.HIGH = 0, 1
+    gpio.PUD_OFF, gpio.PUD_DOWN, gpio.PUD_UP = 20, 21, 22
+    gpio.RISING, gpio.FALLING, gpio.BOTH = 31, 32, 33
+    
+    echo_state = {}
+    
+    def setmode(mode):
+        pass
+    
+    def setwarnings(flag):
+        pass
+    
+    def setup(pin, direction, pull_up_down=None, initial=None):
+        state.pins[pin] = 0
+    
+    def output(pin, value):
+        previous = state.pins.get(pin, 0)
+        state.pins[pin] = 1 if value else 0
+        if previous and not value:
+            # Front descendant du trigger : une mesure ultrason commence
+            state._last_trigger = time.perf_counter()
+            echo_state.clear()
+    
+    def input(pin):
+        if pin not in state.distances:
+            return state.pins.get(pin, 0)
+        if pin not in echo_state:
+            distance = state.distance_for(pin)
+            if distance is None or state.rng.random() < state.echo_loss_rate:
+                echo_state[pin] = None
+            else:
+                echo_state[pin] = distance * 2 / 34300
+        pulse = echo_state[pin]
+        if pulse is None:
+            return 0
+        elapsed = time.perf_counter() - state._last_trigger - state.echo_delay
+        return 1 if 0 <= elapsed < pulse else 0
+    
+    def cleanup(pins=None):
+        pass
+    
+    def add_event_detect(pin, edge, callback=None, bouncetime=None):
+        state.event_callbacks[pin] = callback
+    
+    def remove_event_detect(pin):
+        state.event_callbacks.pop(pin, None)
+    
+    for func in (setmode, setwarnings, setup, output, input, cleanup, add_event_detect, remove_event_detect):
+        setattr(gpio, func.__name__, func)
+    return gpio
+
+
+def set_pin(pin: int, value: int):
+    """Change le niveau d'une entrée et déclenche les callbacks d'événements"""
+    previous = state.pins.get(pin, 0)
+    state.pins[pin] = value
+    callback = state.event_callbacks.get(pin)
+    if callback and previous != value:
+        callback(pin)
+
+
+# ============================================
+# board / adafruit_dht
+# ============================================
+
+def _board_module() -> types.ModuleType:
+    board = types.ModuleType('board')
+    for pin in range(28):
+        setattr(board, f'D{pin}', pin)
+    return board
+
+
+def _dht_module() -> types.ModuleType:
+    module = types.ModuleType('adafruit_dht')
+    
+    class DHT22:
+        def __init__(self, pin, use_pulseio=True):
+            self.pin = pin
+        
+        def _read(self, value):
+            # Une lecture réelle prend environ 5 ms
+            time.sleep(0.005)
+            if state.rng.random() < state.dht_failure_rate:
+                raise RuntimeError("Checksum did not validate. Try again.")
+            return value
+        
+        @property
+        def temperature(self):
+            return self._read(22.0 + state.rng.uniform(-0.5, 0.5))
+        
+        @property
+        def humidity(self):
+            return self._read(45.0 + state.rng.uniform(-2, 2))
+        
+        def exit(self):
+            pass
+    
+    module.DHT22 = DHT22
+    return module
+
+
+# ============================================
+# serial (GPS Neo-6M)
+# ============================================
+
+def _nmea_checksum(body: str) -> str:
+    checksum = 0
+    for char in body:
+        checksum ^= ord(char)
+    return f"${body}*{checksum:02X}"
+
+
+def nmea_sentences() -> list:
+    """Trames GPRMC et GPGGA pour la position simulée courante"""
+    lat, lon = state.gps_position
+    now = datetime.now(timezone.utc)
+    lat_s = f"{int(abs(lat)):02d}{(abs(lat) % 1) * 60:07.4f}"
+    lon_s = f"{int(abs(lon)):03d}{(abs(lon) % 1) * 60:07.4f}"
+    ns, ew = ('N' if lat >= 0 else 'S'), ('E' if lon >= 0 else 'W')
+    status = 'A' if state.gps_fix else 'V'
+    quality = 1 if state.gps_fix else 0
+    return [
+        _nmea_checksum(f"GPRMC,{now:%H%M%S}.00,{status},{lat_s},{ns},{lon_s},{ew},"
+                       f"{state.gps_speed_knots:.1f},90.0,{now:%d%m%y},,"),
+        _nmea_checksum(f"GPGGA,{now:%H%M%S}.00,{lat_s},{ns},{lon_s},{ew},{quality},08,1.0,35.0,M,0.0,M,,"),
+    ]
+
+
+def _serial_module() -> types.ModuleType:
+    module = types.ModuleType('serial')
+    
+    class SerialException(IOError):
+        pass
+    
+    class Serial:
+        def __init__(self, port=None, baudrate=9600, timeout=None):
+            if not state.gps_connected:
+                raise SerialException(f"could not open port {port}: [Errno 2] No such file or directory")
+            self.port = port
+            self.is_open = True
+            self._buffer = []
+            self._next_fix = 0.0
+        
+        @property
+        def in_waiting(self):
+            if not state.gps_connected:
+                raise SerialException("device reports readiness to read but returned no data")
+            now = time.monotonic()
+            if not self._buffer and now >= self._next_fix:
+                # Une position par seconde ; le bus avance d'environ 7 m
+                self._next_fix = now + 1.0
+                state.gps_position[1] += 0.00008
+                self._buffer = [line.encode() + b'\r\n' for line in nmea_sentences()]
+            return sum(len(line) for line in self._buffer)
+        
+        def readline(self):
+            return self._buffer.pop(0) if self._buffer else b''
+        
+        def close(self):
+            self.is_open = False
+    
+    module.Serial = Serial
+    module.SerialException = SerialException
+    return module
+
+
+# ============================================
+# smbus2 (MPU9250 et AK8963 sur I2C)
+# ============================================
+
+class IMUModel:
+    """Registres simulés du MPU9250 (FIFO comprise) et du magnétomètre AK8963, compteurs du bus"""
+    
+    FIFO_SIZE = 512
+    FRAME = 12
+    
+    def __init__(self):
+        self.registers = {}
+        self.fifo = bytearray()
+        self.transactions = 0
+        self.bytes = 0
+        self.dropped = 0
+        self._fifo_start = None
+        self._generated = 0
+    
+    @property
+    def rate(self) -> float:
+        """Fréquence d'échantillonnage (base 1 kHz avec filtre, 8 kHz sans)"""
+        base = 1000.0 if self.registers.get((0x68, 0x1A), 0) & 0x07 else 8000.0
+        return base / (1 + self.registers.get((0x68, 0x19), 0))
+    
+    def frame(self, t: float) -> bytes:
+        accel = state.imu_acceleration(t)
+        gyro = (0.5 * math.sin(3 * t), 0.2, -0.1)
+        return struct.pack('>6h', *(max(-32768, min(32767, int(round(a * 16384)))) for a in accel),
+                           *(int(round(g * 131)) for g in gyro))
+    
+    def _fill(self):
+        if self._fifo_start is None:
+            return
+        rate = self.rate
+        due = int((time.perf_counter() - self._fifo_start) * rate)
+        # Au-delà de la capacité, seul le nombre d'échantillons perdus compte
+        capacity = (self.FIFO_SIZE - len(self.fifo)) // self.FRAME
+        if due - self._generated > capacity + 1:
+            self.dropped += due - self._generated - capacity
+            self._generated = due - capacity
+        while self._generated < due:
+            t = self._fifo_start + self._generated / rate
+            self._generated += 1
+            if len(self.fifo) + self.FRAME > self.FIFO_SIZE:
+                self.dropped += 1  # FIFO pleine, mode sans écrasement
+                continue
+            self.fifo += self.frame(t)
+    
+    def write(self, address: int, register: int, value: int):
+        self._fill()
+        self.registers[(address, register)] = value
+        if address == 0x68 and register == 0x6A:
+            if value & 0x04:
+                self.fifo.clear()
+                self._fifo_start = None
+            if value & 0x40 and self._fifo_start is None:
+                self._fifo_start = time.perf_counter()
+                self._generated = 0
+            elif not value & 0x40:
+                self._fifo_start = None
+    
+    def read(self, address: int, register: int, length: int) -> bytes:
+        self._fill()
+        if address == 0x68 and register == 0x72:
+            data = bytes([len(self.fifo) >> 8, len(self.fifo) & 0xFF])
+        elif address == 0x68 and register == 0x74:
+            data = bytes(self.fifo[:length])
+            del self.fifo[:length]
+        elif address == 0x68 and register == 0x3B:
+            frame = self.frame(time.perf_counter())
+            data = frame[:6] + b'\x00\x00' + frame[6:]
+        elif address == 0x68 and register in (0x43, 0x49):
+            frame = self.frame(time.perf_counter())
+            data = frame[6:] if register == 0x43 else frame[:6] + b'\x00'
+        elif address == 0x0C and register == 0x03:
+            data = struct.pack('<3hB', 120, -80, 300, 0)
+        else:
+            data = bytes(self.registers.get((address, register + i), 0) for i in range(length))
+        return data[:length].ljust(length, b'\x00')
+
+
+def _smbus2_module() -> types.ModuleType:
+    module = types.ModuleType('smbus2')
+    
+    class i2c_msg:
+        def __init__(self, address, data, read):
+            self.addr = address
+            self.buf = bytearray(data)
+            self.len = len(self.buf)
+            self.is_read = read
+        
+        @classmethod
+        def write(cls, address, data):
+            return cls(address, data, False)
+        
+        @classmethod
+        def read(cls, address, length):
+            return cls(address, bytes(length), True)
+        
+        def __iter__(self):
+            return iter(self.buf)
+        
+        def __bytes__(self):
+            return bytes(self.buf)
+        
+        def __len__(self):
+            return self.len
+    
+    class SMBus:
+        def __init__(self, bus=1):
+            if state.i2c is None:
+                state.i2c = IMUModel()
+            self.model = state.i2c
+        
+        def _count(self, length: int):
+            self.model.transactions += 1
+            self.model.bytes += length
+        
+        def write_byte_data(self, address, register, value):
+            self._count(2)
+            self.model.write(address, register, value)
+        
+        def read_byte_data(self, address, register):
+            self._count(2)
+            return self.model.read(address, register, 1)[0]
+        
+        def write_byte(self, address, value):
+            self._count(1)
+        
+        def read_byte(self, address):
+            self._count(1)
+            return 0
+        
+        def read_i2c_block_data(self, address, register, length):
+            if length > 32:
+                raise ValueError("Desired block length over 32 bytes")
+            self._count(1 + length)
+            return list(self.model.read(address, register, length))
+        
+        def i2c_rdwr(self, *messages):
+            # Transaction combinée (start répété) : écriture du registre puis lecture
+            register = None
+            for message in messages:
+                if message.is_read:
+                    message.buf[:] = self.model.read(message.addr, register, message.len)
+                else:
+                    register = message.buf[0]
+            self._count(sum(m.len for m in messages))
+        
+        def close(self):
+            pass
+    
+    module.SMBus = SMBus
+    module.i2c_msg = i2c_msg
+    return module
+
+
+# ============================================
+# RPLCD (LCD HD44780 derrière un PCF8574)
+# ============================================
+
+def _rplcd_modules() -> tuple:
+    package = types.ModuleType('RPLCD')
+    module = types.ModuleType('RPLCD.i2c')
+    enable, backlight = 0x04, 0x08
+    
+    class CharLCD:
+        """Mêmes écritures que RPLCD : 3 octets par quartet, impulsion E suivie de 100 µs"""
+        
+        def __init__(self, i2c_expander='PCF8574', address=0x27, port=1, cols=16, rows=2, **kwargs):
+            self._address = address
+            self.cols, self.rows = cols, rows
+            self.bus = sys.modules['smbus2'].SMBus(port)
+            self._cursor_pos = (0, 0)
+        
+        def _write4bits(self, value):
+            self.bus.write_byte(self._address, value | backlight)
+            self.bus.write_byte(self._address, value | backlight | enable)
+            time.sleep(0.000001)
+            self.bus.write_byte(self._address, (value | backlight) & ~enable)
+            time.sleep(0.0001)
+        
+        def _send(self, value, mode):
+            self._write4bits(mode | (value & 0xF0))
+            self._write4bits(mode | ((value << 4) & 0xF0))
+        
+        def command(self, value):
+            self._send(value, 0x00)
+        
+        def clear(self):
+            self.command(0x01)
+            self._cursor_pos = (0, 0)
+            time.sleep(0.002)
+        
+        @property
+        def cursor_pos(self):
+            return self._cursor_pos
+        
+        @cursor_pos.setter
+        def cursor_pos(self, value):
+            row, col = value
+            self.command(0x80 | (col + (0x00, 0x40, 0x14, 0x54)[row]))
+            self._cursor_pos = value
+        
+        def write_string(self, text):
+            for char in text:
+                self._send(ord(char) & 0xFF, 0x01)
+        
+        def close(self, clear=False):
+            if clear:
+                self.clear()
+            self.bus.close()
+    
+    module.CharLCD = CharLCD
+    package.i2c = module
+    return package, module
+
+
+def install(lcd: bool = False):
+    """
+    Enregistre les modules simulés dans sys.modules
+    
+    Args:
+        lcd: Simuler aussi RPLCD (sinon le LCD reste en mode simulation, sans bus)
+    """
+    gpio = _gpio_module()
+    rpi = types.ModuleType('RPi')
+    rpi.GPIO = gpio
+    sys.modules['RPi'] = rpi
+    sys.modules['RPi.GPIO'] = gpio
+    sys.modules['board'] = _board_module()
+    sys.modules['adafruit_dht'] = _dht_module()
+    sys.modules['serial'] = _serial_module()
+    sys.modules['smbus2'] = _smbus2_module()
+    distances = os.environ.get(DISTANCES_ENV)
+    if distances:
+        state.distances.update({int(pin): value for pin, value in json.loads(distances).items()})
+    if lcd:
+        sys.modules['RPLCD'], sys.modules['RPLCD.i2c'] = _rplcd_modules()
+    return state
@@ -3,28 +3,41 @@ Programme principal du Smart Bus IoT
 Rassemble les données de tous les capteurs et les enregistre
 """
 
+import math
 import time
+import signal
+import threading
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Callable, List, Optional, Tuple
 
-from sensors import GPSNeo6M, DHT22, MPU9250, Ultrasonic, LCD
-from utils import DataLogger, ConfigLoader, HTTPClient
-
-# Configuration du logging
-Path('logs').mkdir(exist_ok=True)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/smart_bus.log'),
-        logging.StreamHandler()
-    ]
+from sensors import GPSNeo6M, DHT22, MPU9250, Ultrasonic, LCD, PIR, SensorHealth
+from utils import (
+    DataLogger, ConfigLoader, ConfigChange, HTTPClient, MQTTClient, Uplink, TrajectoryCompressor,
+    StopIndex, StopDetector, AcquisitionSupervisor, MotionStateEstimator, AdaptiveSampler,
+    HardwareInitializer, BatchWriter, OutputPipeline, RetentionManager, StateJournal, recover_directory, DoorGate,
+    I2CBus, PRIORITY_IMU, PRIORITY_DISPLAY, SensorFusion, StreamAligner, CaptureWriter, BlackBoxRecorder,
+    AnomalyDetector, setup_logging, stop_logging
+)
+from utils.alignment import wall_to_monotonic, monotonic_to_wall, nmea_to_monotonic
+from utils.blackbox import IMU_FIELDS, GPS_FIELDS, DOOR_FIELDS, TRIGGER_DOOR, TRIGGER_MANUAL
+from utils.anomaly import DEFAULT_EXCLUDE, DEFAULT_SPIKE_EXCLUDE
+from utils.uplink import (
+    EVENT_BOARDING, EVENT_ALIGHTING, EVENT_BUS_FULL, EVENT_HARSH_BRAKING,
+    EVENT_GPS_FIX_LOST, EVENT_GPS_FIX_REGAINED, EVENT_STOP_ARRIVAL, EVENT_STOP_DEPARTURE, EVENT_BLACKBOX,
+    EVENT_ANOMALY
 )
 
 logger = logging.getLogger(__name__)
 
+# Formats des sorties fichiers (data.format = 'both' : json et csv)
+_FILE_FORMATS = ('json', 'csv', 'sqlite', 'parquet')
+
+# Paramètres du détecteur d'anomalies modifiables à chaud (la fenêtre et les exclusions
+# fixent les champs suivis)
+_ANOMALY_LIVE_KEYS = ('spike_threshold', 'stuck_count', 'stuck_factor', 'drift_threshold', 'ewma_alpha', 'baseline', 'warmup')
+
 
 class SmartBus:
     """Classe principale pour gérer le Smart Bus"""
@@ -36,80 +49,601 @@ class SmartBus:
         Args:
             config_file: Chemin vers le fichier de configuration
         """
+        start = time.perf_counter()
         self.config = ConfigLoader(config_file)
+        
+        # Démarrage par étapes : pilotes initialisés en parallèle, comptage dès que les portes sont prêtes
+        self.startup = HardwareInitializer(parallel=self.config.get('startup.parallel', True), origin=start)
+        self.startup.mark('config')
+        
+        # Configuration du logging (file asynchrone, rotation et limitation des répétitions)
+        setup_logging(
+            level=self.config.get('logging.level', 'INFO'),
+            log_file=self.config.get('logging.file', 'logs/smart_bus.log'),
+            max_bytes=self.config.get('logging.max_bytes', 1024 * 1024),
+            backup_count=self.config.get('logging.backup_count', 5),
+            rate_limit_interval=self.config.get('logging.rate_limit_interval', 60)
+        )
+        self.startup.mark('logging')
+        
         self.data_logger = DataLogger(
-            self.config.get('data.directory', 'data')
+            self.config.get('data.directory', 'data'),
+            fsync=self.config.get('persistence.fsync', False)
         )
         
+        # Reprise après une coupure : dernier état du compteur et réparation des fichiers
+        # écrits depuis (seulement si l'arrêt précédent n'a pas été propre)
+        self.journal = StateJournal(self.data_logger.data_dir / 'state.journal')
+        last_state = self.journal.load()
+        crashed = last_state is not None and not last_state.get('clean')
+        recovery = recover_directory(self.data_logger.data_dir, since=last_state['time'] - 2 if crashed else None)
+        self._last_checkpoint = 0.0
+        self.startup.mark('recovery')
+        if crashed:
+            logger.warning(f"Arrêt précédent non propre - récupération en {recovery.get('duration_ms', 0):.0f} ms")
+        
+        # Stockage local en base SQLite (data.backend = "sqlite") à la place des fichiers
+        if self.config.get('data.backend', 'files') == 'sqlite':
+            try:
+                self.data_logger.open_store(
+                    batch_size=self.config.get('datastore.batch_size', 50),
+                    flush_interval=self.config.get('datastore.flush_interval', 5.0),
+                    retention_days=self.config.get('datastore.retention_days', 30)
+                )
+            except Exception as e:
+                logger.error(f"Erreur ouverture de la base SQLite, enregistrement en fichiers: {e}")
+        
+        # Compactage et suppression des données anciennes selon l'espace disque
+        self.retention = None
+        if self.config.get('retention.enabled', True):
+            self.retention = RetentionManager(
+                self.config.get('data.directory', 'data'),
+                log_dir=str(Path(self.config.get('logging.file', 'logs/smart_bus.log')).parent),
+                max_bytes=self.config.get('retention.max_mb', 500) * 1024 * 1024,
+                min_free_bytes=self.config.get('retention.min_free_mb', 200) * 1024 * 1024,
+                keep_days=self.config.get('retention.keep_days', 90),
+                compact_after_days=self.config.get('retention.compact_after_days', 1),
+                interval=self.config.get('retention.interval', 300)
+            )
+            self.retention.start()
+        # Plage de snapshots reçus sans trou par le serveur (voir _on_uplink_sent)
+        self._ack_lock = threading.Lock()
+        self._ack_start: Optional[float] = None
+        self._ack_lost: List[float] = []
+        
+        # Diffusion des snapshots vers les sorties (fichiers, base, serveur), chacune avec
+        # sa file et son thread : une sortie lente ne retarde pas les autres
+        self.output = None
+        self._create_output()
+        
         # Initialisation du client HTTP pour envoyer les données au serveur FastAPI
+        # (le test de connexion tourne en arrière-plan)
         self.http_client = None
+        self.uplink = None
         if self.config.get('server.enabled', False):
-            server_url = self.config.get('server.url', 'http://192.168.1.100:8000')
-            timeout = self.config.get('server.timeout', 5)
-            retry_count = self.config.get('server.retry_count', 3)
-            self.http_client = HTTPClient(server_url, timeout=timeout, retry_count=retry_count)
-            
-            # Test de connexion au démarrage
-            if self.http_client.test_connection():
-                logger.info("✅ Connexion au serveur FastAPI réussie")
-            else:
-                logger.warning("⚠️ Impossible de se connecter au serveur FastAPI - Les données seront uniquement sauvegardées localement")
+            self._create_http_client()
+        self.startup.mark('server')
+        
+        # Capture brute des échanges pilotes / matériel (rejouable, utils/capture.py)
+        self.capture = None
+        if self.config.get('capture.enabled', False):
+            self.capture = CaptureWriter(
+                self.data_logger.data_dir / 'capture',
+                max_bytes=self.config.get('capture.file_mb', 50) * 1024 * 1024,
+                flush_interval=self.config.get('capture.flush_interval', 5.0)
+            )
+            # Le fichier en cours change à chaque rotation : jamais supprimé par la rétention
+            if self.retention:
+                self.retention.protect(lambda: [self.capture.path] if self.capture else [])
         
         # Initialisation des capteurs
         self.sensors = {}
+        self.health = {}
+        self.lcd = None
+        driver_timeout = self.config.get('startup.driver_timeout', 5.0)
         
         if self.config.get('sensors.gps.enabled', True):
-            self.sensors['gps'] = GPSNeo6M(
-                port=self.config.get('sensors.gps.port', '/dev/serial0'),
-                baudrate=self.config.get('sensors.gps.baudrate', 9600)
-            )
-            self.sensors['gps'].connect()
+            self.startup.submit('gps', self._create_gps, driver_timeout)
         
         if self.config.get('sensors.dht22.enabled', True):
-            self.sensors['dht22'] = DHT22(
-                pin=self.config.get('sensors.dht22.pin', 4)
+            # Une seule tentative par cycle : le suivi de santé gère les échecs répétés
+            self.startup.submit('dht22', lambda: DHT22(
+                pin=self.config.get('sensors.dht22.pin', 4),
+                max_retries=self.config.get('sensors.dht22.max_retries', 1)
+            ), driver_timeout)
+        
+        # Mode multiprocessus : ultrasons et MPU9250 lus à cadence élevée dans des processus dédiés
+        self.acquisition = None
+        if self.config.get('runtime.mode', 'single') == 'multiprocess':
+            self.acquisition = AcquisitionSupervisor(
+                capacity=self.config.get('runtime.ring_capacity', 1024),
+                cpu_affinity=self.config.get('runtime.cpu_affinity', True),
+                log_level=self.config.get('logging.level', 'INFO')
+            )
+        
+        # Bus I2C partagé par le LCD et le MPU9250 (transactions sérialisées, IMU prioritaire)
+        self.i2c_bus = None
+        if self.config.get('i2c.enabled', False):
+            self.i2c_bus = I2CBus(
+                bus=self.config.get('i2c.bus', 1),
+                batch_size=self.config.get('i2c.batch_size', 4)
             )
         
         if self.config.get('sensors.mpu9250.enabled', True):
-            self.sensors['mpu9250'] = MPU9250()
+            # Mode FIFO : échantillons accumulés par la puce et lus par rafales
+            mpu_params = {
+                'fifo': self.config.get('sensors.mpu9250.fifo', False),
+                'sample_rate': self.config.get('sensors.mpu9250.sample_rate', 200)
+            }
+            # Seul le mode FIFO accède directement aux registres (mpu9250_jmdev ouvre son propre bus)
+            if self.i2c_bus and mpu_params['fifo'] and not self.acquisition:
+                mpu_params['bus'] = self.i2c_bus.device('mpu9250', priority=PRIORITY_IMU)
+            if self.acquisition:
+                self._attach_sensors({'mpu9250': self.acquisition.add(
+                    'mpu9250', 'mpu9250', mpu_params, rate=self.config.get('runtime.imu_rate', 100.0)
+                )})
+            else:
+                self.startup.submit('mpu9250', lambda: MPU9250(**mpu_params), driver_timeout)
         
-        # Capteur ultrason pour la porte d'entrée
-        if self.config.get('sensors.ultrasonic_entry.enabled', True):
-            self.sensors['ultrasonic_entry'] = Ultrasonic(
-                trigger_pin=self.config.get('sensors.ultrasonic_entry.trigger_pin', 23),
-                echo_pin=self.config.get('sensors.ultrasonic_entry.echo_pin', 24)
-            )
+        # Capteurs ultrason pour la porte d'entrée et la porte de sortie
+        door_sensors = []
+        for name, default_pins in (('ultrasonic_entry', (23, 24)), ('ultrasonic_exit', (25, 26))):
+            if not self.config.get(f'sensors.{name}.enabled', True):
+                continue
+            pins = {
+                'trigger_pin': self.config.get(f'sensors.{name}.trigger_pin', default_pins[0]),
+                'echo_pin': self.config.get(f'sensors.{name}.echo_pin', default_pins[1])
+            }
+            if self.acquisition:
+                self._attach_sensors({name: self.acquisition.add(
+                    name, 'ultrasonic', pins, rate=self.config.get('runtime.ultrasonic_rate', 20.0)
+                )})
+            else:
+                self.startup.submit(name, lambda pins=pins: Ultrasonic(**pins), driver_timeout)
+                door_sensors.append(name)
         
-        # Capteur ultrason pour la porte de sortie
-        if self.config.get('sensors.ultrasonic_exit.enabled', True):
-            self.sensors['ultrasonic_exit'] = Ultrasonic(
-                trigger_pin=self.config.get('sensors.ultrasonic_exit.trigger_pin', 25),
-                echo_pin=self.config.get('sensors.ultrasonic_exit.echo_pin', 26)
+        if self.acquisition:
+            self.acquisition.start()
+        
+        # Détecteurs PIR aux portes : les ultrasons ne sont lus à cadence élevée que pendant un mouvement
+        self.door_gate = None
+        pirs = {}
+        for door, name, default_pin in (('ultrasonic_entry', 'pir_entry', 17), ('ultrasonic_exit', 'pir_exit', 27)):
+            if not self.config.get(f'sensors.{name}.enabled', False):
+                continue
+            if door not in door_sensors:
+                logger.warning(f"{name} ignoré: capteur {door} désactivé ou lu par un processus dédié")
+                continue
+            pirs[door] = PIR(pin=self.config.get(f'sensors.{name}.pin', default_pin))
+        if pirs:
+            self.door_gate = DoorGate(
+                pirs,
+                active_interval=self.config.get('door_gate.active_interval', 0.05),
+                idle_interval=self.config.get('door_gate.idle_interval', 1.0),
+                hold=self.config.get('door_gate.hold', 1.0),
+                bouncetime=self.config.get('door_gate.bouncetime', 50)
             )
+            self.door_gate.start()
         
         # Afficheur LCD
         if self.config.get('sensors.lcd.enabled', True):
-            i2c_addr = self.config.get('sensors.lcd.i2c_address', '0x27')
-            # Convertir l'adresse hexadécimale en entier
-            if isinstance(i2c_addr, str):
-                i2c_addr = int(i2c_addr, 16)
-            self.lcd = LCD(
-                i2c_address=i2c_addr,
-                cols=self.config.get('sensors.lcd.cols', 16),
-                rows=self.config.get('sensors.lcd.rows', 2)
-            )
-        else:
-            self.lcd = None
+            self.startup.submit('lcd', self._create_lcd, driver_timeout)
+        
+        # Seuls les capteurs de porte sont attendus, les autres sont rattachés à chaque cycle dès qu'ils sont prêts
+        self._attach_sensors(self.startup.wait(door_sensors, timeout=self.config.get('startup.door_timeout', 2.0)))
+        self.startup.mark('doors_ready')
+        self._attach_sensors(self.startup.poll())
         
         # Compteur de passagers
         self.passenger_count = 0
         self.max_passengers = self.config.get('bus.max_passengers', 10)
+        self._restore_state(last_state)
         self.detection_threshold = self.config.get('bus.detection_threshold', 3.0)  # 3cm
         self.entry_detected = False  # Évite les détections multiples
         self.exit_detected = False
         
+        # États utilisés pour détecter les événements remontés en priorité
+        self.harsh_braking_threshold = self.config.get('bus.harsh_braking_threshold', 0.35)  # en g
+        self.harsh_braking = False
+        self.gps_has_fix = None
+        
+        # Compression de la trajectoire GPS en segments par trajet
+        self.trajectory = None
+        if self.config.get('sensors.gps.enabled', True) and self.config.get('trajectory.enabled', True):
+            self.trajectory = TrajectoryCompressor(
+                epsilon=self.config.get('trajectory.epsilon', 10.0),
+                max_speed=self.config.get('trajectory.max_speed', 130.0),
+                trip_gap=self.config.get('trajectory.trip_gap', 300.0)
+            )
+        
+        # Fusion GPS / IMU : position, vitesse et cap à la cadence de l'IMU, y compris pendant les coupures GPS
+        self.fusion = None
+        if self.config.get('sensors.gps.enabled', True) and self.config.get('fusion.enabled', False):
+            self.fusion = SensorFusion(
+                calibration_file=self.data_logger.data_dir / 'mag_calibration.json',
+                declination=self.config.get('fusion.declination', 0.0),
+                heading_tau=self.config.get('fusion.heading_tau', 5.0),
+                gps_sigma=self.config.get('fusion.gps_sigma', 5.0)
+            )
+        
+        # Alignement des mesures sur des instants communs (horloge monotone)
+        self.aligner = None
+        self.alignment_delay = self.config.get('alignment.delay', 0.0)
+        if self.config.get('alignment.enabled', False):
+            self.aligner = StreamAligner(
+                capacity=self.config.get('alignment.capacity', 256),
+                method=self.config.get('alignment.method', 'linear'),
+                max_gap=self.config.get('alignment.max_gap', 5.0)
+            )
+        
+        # Boîte noire : dernières secondes des flux rapides, figées autour d'un incident
+        self.blackbox = None
+        self.blackbox_door_trigger = self.config.get('blackbox.door_trigger', False)
+        self.blackbox_upload = self.config.get('blackbox.upload', True)
+        if self.config.get('blackbox.enabled', False):
+            self._create_blackbox()
+        
+        # Détection d'anomalies (valeurs figées, pics, dérives) : seuls les événements remontent
+        self.anomaly = None
+        if self.config.get('anomaly.enabled', False):
+            self.anomaly = AnomalyDetector(
+                window=self.config.get('anomaly.window', 31),
+                spike_threshold=self.config.get('anomaly.spike_threshold', 6.0),
+                stuck_count=self.config.get('anomaly.stuck_count', 30),
+                stuck_factor=self.config.get('anomaly.stuck_factor', 3.0),
+                drift_threshold=self.config.get('anomaly.drift_threshold', 6.0),
+                ewma_alpha=self.config.get('anomaly.ewma_alpha', 0.05),
+                baseline=self.config.get('anomaly.baseline', 1000),
+                warmup=self.config.get('anomaly.warmup', 50),
+                exclude=self.config.get('anomaly.exclude', DEFAULT_EXCLUDE),
+                spike_exclude=self.config.get('anomaly.spike_exclude', DEFAULT_SPIKE_EXCLUDE)
+            )
+        
+        # Détection des arrêts et temps d'arrêt (nécessite un fichier d'arrêts)
+        self.stop_detector = None
+        if self.config.get('sensors.gps.enabled', True) and self.config.get('stops.enabled', False):
+            try:
+                index = StopIndex.from_file(
+                    self.config.get('stops.file', 'config/stops.json'),
+                    default_radius=self.config.get('stops.default_radius', 30.0)
+                )
+                self.stop_detector = StopDetector(
+                    index,
+                    stopped_speed=self.config.get('stops.stopped_speed', 3.0)
+                )
+            except Exception as e:
+                logger.error(f"Erreur chargement des arrêts: {e}")
+        
+        # Échantillonnage adaptatif : cadences des capteurs, snapshots et envois selon l'état de mouvement
+        self.adaptive = None
+        self._last_readings = {}
+        self._displayed_count = None
+        if self.config.get('adaptive.enabled', False):
+            self.adaptive = AdaptiveSampler(
+                MotionStateEstimator(
+                    moving_speed=self.config.get('adaptive.moving_speed', 5.0),
+                    vibration_threshold=self.config.get('adaptive.vibration_threshold', 0.02),
+                    parked_after=self.config.get('adaptive.parked_after', 300.0),
+                    door_hold=self.config.get('adaptive.door_hold', 10.0),
+                    min_dwell=self.config.get('adaptive.min_dwell', 10.0)
+                ),
+                profiles=self.config.get('adaptive.profiles')
+            )
+            self._apply_motion_profile()
+        
+        # Accesseurs précompilés pour les valeurs lues à chaque cycle (suivent les rechargements)
+        self.save_interval = self.config.accessor('data.save_interval', 5, float)
+        self.checkpoint_interval = self.config.accessor('persistence.checkpoint_interval', 60, float)
+        self.bus_id = self.config.accessor('server.bus_id', 'Bus1', str)
+        
+        # Rechargement à chaud de la configuration sans réinitialiser les capteurs
+        # (modifications notées par le thread de surveillance, appliquées par la boucle principale)
+        self._config_changes: List[ConfigChange] = []
+        self._config_lock = threading.Lock()
+        self.config.subscribe(self._on_config_change)
+        self.config.start_watching(self.config.get('config.poll_interval', 2.0))
+        
+        self.startup.mark('ready')
         logger.info(f"Smart Bus initialisé avec {len(self.sensors)} capteur(s)")
         logger.info(f"Capacité maximale: {self.max_passengers} passagers")
+        if self.startup.pending():
+            logger.info(f"Démarrage - {self.startup.format_report()} | en cours: {', '.join(self.startup.pending())}")
+        self._attach_sensors(self.startup.poll())
+    
+    def _create_gps(self) -> GPSNeo6M:
+        """Crée le pilote GPS et ouvre le port série"""
+        gps = GPSNeo6M(
+            port=self.config.get('sensors.gps.port', '/dev/serial0'),
+            baudrate=self.config.get('sensors.gps.baudrate', 9600)
+        )
+        gps.connect()
+        return gps
+    
+    def _create_lcd(self) -> LCD:
+        """Crée le pilote de l'afficheur LCD"""
+        i2c_addr = self.config.get('sensors.lcd.i2c_address', '0x27')
+        # Convertir l'adresse hexadécimale en entier
+        if isinstance(i2c_addr, str):
+            i2c_addr = int(i2c_addr, 16)
+        return LCD(
+            i2c_address=i2c_addr,
+            cols=self.config.get('sensors.lcd.cols', 16),
+            rows=self.config.get('sensors.lcd.rows', 2),
+            bus=self.i2c_bus.device('lcd', priority=PRIORITY_DISPLAY) if self.i2c_bus else None
+        )
+    
+    def _attach_sensors(self, drivers: dict):
+        """
+        Rattache des pilotes prêts et crée leur suivi de santé
+        
+        Args:
+            drivers: Pilotes par nom ('lcd' pour l'afficheur)
+        """
+        for name, driver in drivers.items():
+            if name == 'lcd':
+                self.lcd = driver
+                continue
+            self.sensors[name] = driver
+            if self.capture and not self.capture.attach(name, driver):
+                logger.info(f"Capture brute indisponible pour {name} (mock ou multiprocessus)")
+            # Suivi de santé par capteur : un capteur en panne n'est plus lu qu'à intervalles croissants
+            # Les portes doivent reprendre vite le comptage : délai maximal plus court
+            max_backoff_key = 'health.door_max_backoff' if name.startswith('ultrasonic') else 'health.max_backoff'
+            self.health[name] = SensorHealth(
+                name,
+                failure_threshold=self.config.get('health.failure_threshold', 3),
+                base_backoff=self.config.get('health.base_backoff', 1.0),
+                max_backoff=self.config.get(max_backoff_key, 5.0 if name.startswith('ultrasonic') else 300.0)
+            )
+        
+        if 'ready' in self.startup.phases and 'all_drivers' not in self.startup.phases and not self.startup.pending():
+            self.startup.mark('all_drivers')
+            logger.info(f"Tous les pilotes sont prêts - {self.startup.format_report()}")
+    
+    def _create_blackbox(self):
+        """Crée l'enregistreur d'incidents, tampons dimensionnés sur la cadence de chaque flux"""
+        # Sans FIFO, le MPU9250 n'est lu qu'une fois par itération
+        imu_rate = self.config.get('sensors.mpu9250.sample_rate', 200) if self.config.get('sensors.mpu9250.fifo', False) else 20.0
+        door_rate = 1.0 / self.config.get('door_gate.active_interval', 0.05)
+        self.blackbox = BlackBoxRecorder(
+            self.data_logger.data_dir / 'blackbox',
+            {
+                'imu': (IMU_FIELDS, imu_rate),
+                'gps': (GPS_FIELDS, 10.0),
+                'ultrasonic_entry': (DOOR_FIELDS, door_rate),
+                'ultrasonic_exit': (DOOR_FIELDS, door_rate),
+            },
+            pre=self.config.get('blackbox.pre', 10.0),
+            post=self.config.get('blackbox.post', 5.0),
+            accel_threshold=self.config.get('blackbox.accel_threshold', 0.35),
+            on_saved=self._on_blackbox_saved
+        )
+        self.blackbox.start()
+        # Déclenchement manuel : kill -USR1 <pid> (trigger() n'alloue rien, sûr dans un gestionnaire de signal)
+        if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.blackbox.trigger(TRIGGER_MANUAL))
+    
+    def _on_blackbox_saved(self, path: Path, window: dict):
+        """Remonte une fenêtre de la boîte noire en priorité (thread d'écriture de l'enregistreur)"""
+        if self.uplink and self.blackbox_upload:
+            self.uplink.send_blackbox(window)
+        self._publish_event(EVENT_BLACKBOX, {
+            'reason': window['reason'],
+            'timestamp': window['timestamp'],
+            'value': window['value'],
+            'file': path.name
+        })
+    
+    def _create_http_client(self):
+        """
+        Crée le client de transport (HTTP, ou MQTT si server.transport = "mqtt") à partir de
+        la configuration et teste la connexion
+        """
+        server_url = self.config.get('server.url', 'http://192.168.1.100:8000')
+        timeout = self.config.get('server.timeout', 5)
+        retry_count = self.config.get('server.retry_count', 3)
+        self.http_client = None
+        if self.config.get('server.transport', 'http') == 'mqtt':
+            try:
+                self.http_client = MQTTClient(
+                    server_url,
+                    bus_id=self.config.get('server.bus_id', 'Bus1'),
+                    store_path=self.data_logger.data_dir / 'mqtt_inflight.db',
+                    timeout=timeout,
+                    retry_count=retry_count,
+                    topic_prefix=self.config.get('mqtt.topic_prefix', 'smartbus'),
+                    keepalive=self.config.get('mqtt.keepalive', 30),
+                    qos=self.config.get('mqtt.qos', 1),
+                    retain=self.config.get('mqtt.retain', True),
+                    max_stored=self.config.get('mqtt.max_stored', 10000),
+                    max_inflight=self.config.get('mqtt.max_inflight', 100)
+                )
+            except ImportError as e:
+                logger.error(f"Transport MQTT indisponible, envoi en HTTP: {e}")
+        if self.http_client is None:
+            self.http_client = HTTPClient(server_url, timeout=timeout, retry_count=retry_count)
+        
+        # Test de connexion en arrière-plan : un serveur absent ne retarde pas le démarrage
+        if self.startup.parallel:
+            threading.Thread(target=self._check_server, args=(self.http_client,), name='server-check', daemon=True).start()
+        else:
+            self._check_server(self.http_client)
+        
+        # Canal de remontée : snapshots en arrière-plan, événements en priorité
+        self.uplink = Uplink(
+            self.http_client,
+            bus_id=self.config.get('server.bus_id', 'Bus1'),
+            latency_budget=self.config.get('server.event_latency_budget', 0.5),
+            coalesce_window=self.config.get('server.event_coalesce_window', 0.05),
+            snapshot_queue_size=self.config.get('server.snapshot_queue_size', 100),
+            on_sent=self._on_uplink_sent,
+            on_lost=self._on_uplink_lost
+        )
+        self.uplink.start()
+    
+    def _on_uplink_sent(self, kind: str, payloads: List[dict]):
+        """
+        Note les snapshots reçus par le serveur : ils seront supprimés en priorité
+        La plage reçue ne s'étend que sur des snapshots consécutifs : un snapshot abandonné
+        par l'uplink la termine. Segments et fenêtres de la boîte noire ne disent rien des
+        snapshots (non envoyés, ou encore en file)
+        """
+        if not self.retention or kind != 'snapshot':
+            return
+        stamps = [datetime.fromisoformat(p['timestamp']).timestamp() for p in payloads if p.get('timestamp')]
+        if not stamps:
+            return
+        first, last = min(stamps), max(stamps)
+        with self._ack_lock:
+            gap = [t for t in self._ack_lost if t < first]
+            if self._ack_start is None or any(t > self._ack_start for t in gap):
+                self._ack_start = first
+            self._ack_lost = [t for t in self._ack_lost if t >= first]
+            start = self._ack_start
+        self.retention.acknowledge(start, last)
+    
+    def _on_uplink_lost(self, kind: str, payloads: List[dict]):
+        """Note les snapshots abandonnés par l'uplink : la plage reçue s'arrête avant eux"""
+        if not self.retention or kind != 'snapshot':
+            return
+        with self._ack_lock:
+            self._ack_lost.extend(datetime.fromisoformat(p['timestamp']).timestamp() for p in payloads if p.get('timestamp'))
+    
+    def _stop_uplink(self):
+        """Arrête l'envoi au serveur et ferme le client de transport"""
+        if self.uplink:
+            self.uplink.stop()
+            self.uplink = None
+            # Snapshots restés en file perdus : le prochain envoi commence une nouvelle plage
+            with self._ack_lock:
+                self._ack_start = None
+        if self.http_client:
+            self.http_client.close()
+            self.http_client = None
+    
+    def _check_server(self, http_client: HTTPClient):
+        """Teste la connexion au serveur et note la durée dans le rapport de démarrage"""
+        if http_client.test_connection():
+            logger.info("✅ Connexion au serveur FastAPI réussie")
+        else:
+            logger.warning("⚠️ Impossible de se connecter au serveur FastAPI - Les données seront uniquement sauvegardées localement")
+        self.startup.mark('server_check')
+    
+    def _publish_event(self, event_type: str, data: Optional[dict] = None):
+        """
+        Publie un événement vers le serveur sans attendre le prochain snapshot
+        (et l'enregistre dans la base locale si elle est utilisée)
+        
+        Args:
+            event_type: Type d'événement (voir utils.uplink)
+            data: Informations complémentaires
+        """
+        if self.uplink:
+            self.uplink.publish_event(event_type, data)
+        if self.data_logger.store:
+            self.data_logger.save_event(event_type, data, bus_id=self.bus_id.value)
+    
+    def _on_config_change(self, changes: List[ConfigChange]):
+        """
+        Note les modifications de configuration (appelé dans le thread de surveillance du fichier)
+        Elles sont appliquées au début de l'itération suivante par la boucle principale, seule
+        à utiliser le client de transport et le pipeline de sortie qu'elles peuvent remplacer
+        
+        Args:
+            changes: Liste des modifications détectées lors du rechargement
+        """
+        with self._config_lock:
+            self._config_changes.extend(changes)
+    
+    def _apply_config_changes(self):
+        """
+        Applique à chaud les modifications de configuration en attente
+        Les capteurs ne sont pas réouverts : leurs paramètres nécessitent un redémarrage
+        """
+        with self._config_lock:
+            changes, self._config_changes = self._config_changes, []
+        if not changes:
+            return
+        
+        rebuild_output = False
+        rebuild_uplink = False
+        for change in changes:
+            key, value = change.key, change.new
+            
+            if key == 'bus.max_passengers' and value is not None:
+                self.max_passengers = value
+            elif key == 'bus.detection_threshold' and value is not None:
+                self.detection_threshold = value
+            elif key == 'bus.harsh_braking_threshold' and value is not None:
+                self.harsh_braking_threshold = value
+            elif key == 'server.enabled':
+                if value and not self.http_client:
+                    self._create_http_client()
+                    if self.adaptive:
+                        self._apply_motion_profile()
+                elif not value and self.uplink:
+                    self._stop_uplink()
+            elif (key == 'server.transport' or key.startswith('mqtt.')) and self.http_client:
+                rebuild_uplink = True
+            elif key.startswith('trajectory.') and self.trajectory and value is not None and key != 'trajectory.enabled':
+                setattr(self.trajectory, key.split('.', 1)[1], value)
+            elif key == 'server.bus_id' and self.uplink and value:
+                self.uplink.bus_id = value
+                # Testament et identifiant client MQTT fixés à la connexion
+                rebuild_uplink = isinstance(self.http_client, MQTTClient)
+            elif key == 'server.event_latency_budget' and self.uplink and value is not None:
+                self.uplink.latency_budget = value
+            elif key == 'server.url' and self.http_client and value:
+                self.http_client.set_server_url(value)
+            elif key == 'server.timeout' and self.http_client and value is not None:
+                self.http_client.timeout = value
+            elif key == 'server.retry_count' and self.http_client and value is not None:
+                self.http_client.retry_count = value
+            elif key.startswith('adaptive.profiles.') and self.adaptive:
+                self.adaptive.set_profiles(self.config.get('adaptive.profiles'))
+                self._apply_motion_profile()
+            elif key.startswith('adaptive.') and key != 'adaptive.enabled' and self.adaptive and value is not None:
+                setattr(self.adaptive.estimator, key.split('.', 1)[1], value)
+            elif key in ('data.format', 'data.batch_size', 'data.flush_interval') or key.startswith('output.'):
+                rebuild_output = True
+            elif key.startswith('retention.') and key != 'retention.enabled' and self.retention and value is not None:
+                name = key.split('.', 1)[1]
+                if name.endswith('_mb'):
+                    setattr(self.retention, name[:-3] + '_bytes', value * 1024 * 1024)
+                else:
+                    setattr(self.retention, name, value)
+            elif key.startswith('fusion.') and key != 'fusion.enabled' and self.fusion and value is not None:
+                setattr(self.fusion, key.split('.', 1)[1], value)
+            elif key.startswith('door_gate.') and key != 'door_gate.bouncetime' and self.door_gate and value is not None:
+                setattr(self.door_gate, key.split('.', 1)[1], value)
+            elif key == 'alignment.delay' and value is not None:
+                self.alignment_delay = value
+            elif key == 'logging.level' and value:
+                logging.getLogger().setLevel(getattr(logging, str(value).upper(), logging.INFO))
+            elif key == 'blackbox.door_trigger':
+                self.blackbox_door_trigger = bool(value)
+            elif key == 'blackbox.upload':
+                self.blackbox_upload = bool(value)
+            elif key == 'blackbox.accel_threshold' and self.blackbox and value is not None:
+                self.blackbox.accel_threshold = value
+            elif key.startswith('anomaly.') and key.split('.', 1)[1] in _ANOMALY_LIVE_KEYS and self.anomaly and value is not None:
+                setattr(self.anomaly, key.split('.', 1)[1], value)
+            elif key.startswith(('sensors.', 'logging.', 'runtime.', 'adaptive.', 'alignment.', 'capture.', 'blackbox.', 'anomaly.')) \
+                    or key == 'data.directory':
+                logger.warning(f"Modification de {key} prise en compte au prochain redémarrage")
+            else:
+                continue
+            logger.info(f"Configuration appliquée: {key} = {value}")
+        
+        # Sorties recréées une seule fois par rechargement (files vidées, lots écrits)
+        if rebuild_output:
+            self._create_output()
+        # Changement de transport : messages en attente envoyés (ou conservés pour MQTT) avant la bascule
+        if rebuild_uplink:
+            self._stop_uplink()
+            self._create_http_client()
+            if self.adaptive:
+                self._apply_motion_profile()
     
     def collect_data(self) -> dict:
         """
@@ -118,51 +652,90 @@ class SmartBus:
         Returns:
             Dictionnaire contenant toutes les données des capteurs
         """
+        # Pilotes dont l'initialisation s'est terminée depuis le cycle précédent
+        if 'all_drivers' not in self.startup.phases:
+            self._attach_sensors(self.startup.poll())
+        
         data = {
             'timestamp': datetime.now().isoformat(),
             'sensors': {}
         }
         
+        gps_data = None
+        mpu_data = None
+        
         # Collecte des données GPS
         if 'gps' in self.sensors:
-            gps_data = self.sensors['gps'].read_data()
+            gps_data = self._read_sensor('gps')
             # Toujours inclure les données GPS même sans fix pour voir le statut
             if gps_data:
                 data['sensors']['gps'] = gps_data
+                self._detect_gps_fix_change(gps_data)
+                if self.trajectory and gps_data.get('has_fix'):
+                    for segment in self.trajectory.add_fix(gps_data['latitude'], gps_data['longitude'], gps_data.get('speed')):
+                        self._save_track_segment(segment)
+                if self.stop_detector and gps_data.get('has_fix'):
+                    self._update_stop(gps_data)
         
         # Collecte des données DHT22
         if 'dht22' in self.sensors:
-            dht22_data = self.sensors['dht22'].read_data()
+            dht22_data = self._read_sensor('dht22')
             if dht22_data:
                 data['sensors']['dht22'] = dht22_data
         
         # Collecte des données MPU9250
         if 'mpu9250' in self.sensors:
-            mpu_data = self.sensors['mpu9250'].read_data()
+            mpu_data = self._read_sensor('mpu9250')
             if mpu_data:
                 data['sensors']['mpu9250'] = mpu_data
+                self._detect_harsh_braking(mpu_data)
+        
+        if self.fusion:
+            self._update_fusion(gps_data, mpu_data)
+            if self.fusion.origin:
+                data['fusion'] = self.fusion.state()
         
         # Collecte des données Ultrasonic - Porte d'entrée
         entry_distance = None
         if 'ultrasonic_entry' in self.sensors:
-            ultrasonic_entry_data = self.sensors['ultrasonic_entry'].read_data()
+            ultrasonic_entry_data = self._read_sensor('ultrasonic_entry')
             if ultrasonic_entry_data:
                 ultrasonic_entry_data['door_type'] = 'entree'
-                entry_distance = ultrasonic_entry_data.get('distance')
+                # En mode multiprocessus, la distance minimale de la fenêtre ne rate aucun passage
+                entry_distance = ultrasonic_entry_data.get('min_distance', ultrasonic_entry_data.get('distance'))
                 data['sensors']['ultrasonic_entry'] = ultrasonic_entry_data
         
         # Collecte des données Ultrasonic - Porte de sortie
         exit_distance = None
         if 'ultrasonic_exit' in self.sensors:
-            ultrasonic_exit_data = self.sensors['ultrasonic_exit'].read_data()
+            ultrasonic_exit_data = self._read_sensor('ultrasonic_exit')
             if ultrasonic_exit_data:
                 ultrasonic_exit_data['door_type'] = 'sortie'
-                exit_distance = ultrasonic_exit_data.get('distance')
+                exit_distance = ultrasonic_exit_data.get('min_distance', ultrasonic_exit_data.get('distance'))
                 data['sensors']['ultrasonic_exit'] = ultrasonic_exit_data
         
+        # Instantané aligné : toutes les mesures ramenées au même instant, avec leur âge
+        if self.aligner:
+            tick = time.monotonic() - self.alignment_delay
+            data['aligned'] = {
+                'timestamp': datetime.fromtimestamp(monotonic_to_wall(tick)).isoformat(),
+                'sensors': self.aligner.snapshot(tick)
+            }
+        
         # Détection et comptage des passagers
         self._detect_passengers(entry_distance, exit_distance)
         
+        if self.adaptive:
+            door_active = any(
+                d is not None and d <= self.detection_threshold for d in (entry_distance, exit_distance)
+            )
+            self._update_motion_state(gps_data, mpu_data, door_active)
+            # Les capteurs non relus à cette itération reprennent leur dernière mesure valide
+            for name, reading in self._last_readings.items():
+                if self.health[name].state == 'ok':
+                    data['sensors'].setdefault(name, reading)
+            data['motion_state'] = self.adaptive.state
+        
         # Ajouter le nombre de passagers aux données
         data['passengers'] = {
             'count': self.passenger_count,
@@ -170,16 +743,193 @@ class SmartBus:
             'is_full': self.passenger_count >= self.max_passengers
         }
         
+        # État de santé des capteurs (métriques détaillées pour ceux qui ne sont pas sains)
+        data['health'] = {
+            name: health.state if health.state == 'ok' else health.to_dict()
+            for name, health in self.health.items()
+        }
+        
+        # Arrêt en cours (visite ouverte) si la détection des arrêts est active
+        if self.stop_detector:
+            data['stop'] = self.stop_detector.current_stop()
+        
         # Ajouter bus_id si configuré
-        bus_id = self.config.get('server.bus_id', 'Bus1')
-        data['bus_id'] = bus_id
+        data['bus_id'] = self.bus_id.value
         
-        # Affichage sur LCD si disponible
-        if self.lcd:
+        # Affichage sur LCD si disponible (en mode adaptatif, seulement quand le compteur change)
+        if self.lcd and (not self.adaptive or self.passenger_count != self._displayed_count):
             self.lcd.display_passenger_count(self.passenger_count, self.max_passengers)
+            self._displayed_count = self.passenger_count
+        
+        return data
+    
+    def _read_sensor(self, name: str) -> Optional[dict]:
+        """
+        Lit un capteur en passant par son suivi de santé
+        
+        Args:
+            name: Nom du capteur dans self.sensors
         
+        Returns:
+            Données du capteur ou None (échec, capteur suspendu ou lecture non prévue à cette itération)
+        """
+        if self.door_gate and name in self.door_gate.doors:
+            # Porte surveillée par PIR : cadence décidée par le détecteur de mouvement
+            if not self.door_gate.due(name):
+                return None
+        elif self.adaptive and not self.adaptive.sensor_due(name):
+            return None
+        data = self.health[name].read(self.sensors[name])
+        if self.adaptive and data is not None:
+            self._last_readings[name] = data
+        if self.aligner and data is not None:
+            self._align_reading(name, data)
+        if self.blackbox and data is not None:
+            self._record_blackbox(name, data)
+        if self.anomaly and data is not None:
+            self._check_anomalies(name, data)
         return data
     
+    def _align_reading(self, name: str, data: dict):
+        """
+        Ajoute une mesure à l'aligneur, horodatée sur l'horloge monotone
+        
+        Args:
+            name: Nom du capteur
+            data: Données du capteur ('timestamp' : heure NMEA du fix pour le GPS,
+                time.time() pour les autres ; instant de lecture à défaut)
+        """
+        now = time.monotonic()
+        stamp = data.get('timestamp')
+        if isinstance(stamp, str):
+            timestamp = nmea_to_monotonic(stamp)
+        elif isinstance(stamp, (int, float)) and not isinstance(stamp, bool):
+            timestamp = wall_to_monotonic(stamp)
+        else:
+            timestamp = None
+        # Horloge système non synchronisée (pas de NTP) : l'heure GPS ne peut pas être rapportée
+        if timestamp is None or not now - self.aligner.max_gap <= timestamp <= now:
+            timestamp = now
+        self.aligner.push(name, data, timestamp)
+    
+    def _record_blackbox(self, name: str, data: dict):
+        """
+        Ajoute une mesure aux tampons de la boîte noire
+        
+        Args:
+            name: Nom du capteur
+            data: Données du capteur
+        """
+        if name == 'mpu9250':
+            driver = self.sensors['mpu9250']
+            burst = getattr(driver, 'burst', None)
+            if burst is not None and data.get('samples'):
+                # Mode FIFO : chaque échantillon de la rafale, seuil testé sur chacun
+                self.blackbox.record_imu_batch(burst[0], burst[1], 1.0 / driver.sample_rate)
+                return
+            accel = data.get('peak_acceleration') or data.get('acceleration') or {}
+            gyro = data.get('gyroscope') or {}
+            self.blackbox.record_imu(
+                [accel.get(axis) or 0.0 for axis in 'xyz'], [gyro.get(axis) or 0.0 for axis in 'xyz']
+            )
+        elif name == 'gps':
+            if data.get('has_fix'):
+                speed = data.get('speed')
+                self.blackbox.record('gps', (data['latitude'], data['longitude'], math.nan if speed is None else speed, 1.0))
+            else:
+                self.blackbox.record('gps', (math.nan, math.nan, math.nan, 0.0))
+        elif name in self.blackbox.rings:
+            distance = data.get('min_distance', data.get('distance'))
+            self.blackbox.record(name, (math.nan if distance is None else distance,))
+        self.blackbox.poll()
+    
+    def _check_anomalies(self, name: str, data: dict):
+        """
+        Passe une mesure au détecteur d'anomalies et publie les changements d'état
+        
+        Args:
+            name: Nom du capteur
+            data: Données du capteur
+        """
+        for event in self.anomaly.update(name, data):
+            if event['active']:
+                logger.warning(
+                    f"Anomalie {event['type']} sur {name}.{event['field']}: "
+                    f"{event['value']} (score {event['score']})"
+                )
+            else:
+                logger.info(f"Fin de l'anomalie {event['type']} sur {name}.{event['field']}")
+            self._publish_event(EVENT_ANOMALY, event)
+    
+    def _update_fusion(self, gps_data: Optional[dict], mpu_data: Optional[dict]):
+        """
+        Propage la fusion GPS / IMU avec les mesures de l'itération
+        
+        Args:
+            gps_data: Données GPS lues à cette itération (None si non lues)
+            mpu_data: Données du MPU9250 lues à cette itération (None si non lues)
+        """
+        if mpu_data:
+            driver = self.sensors['mpu9250']
+            burst = getattr(driver, 'burst', None)
+            if burst is not None and mpu_data.get('samples'):
+                # Mode FIFO : tous les échantillons depuis la lecture précédente
+                self.fusion.update_imu_batch(burst[0], burst[1], 1.0 / driver.sample_rate, mpu_data.get('magnetometer'))
+            else:
+                self.fusion.update_imu(mpu_data['acceleration'], mpu_data['gyroscope'], mpu_data.get('magnetometer'))
+        if gps_data and gps_data.get('has_fix'):
+            self.fusion.update_gps(gps_data['latitude'], gps_data['longitude'], gps_data.get('speed'))
+    
+    def _update_motion_state(self, gps_data: Optional[dict], mpu_data: Optional[dict], door_active: bool):
+        """
+        Met à jour l'état de mouvement et applique le profil correspondant s'il change
+        
+        Args:
+            gps_data: Données GPS lues à cette itération (None si non lues)
+            mpu_data: Données du MPU9250 lues à cette itération (None si non lues)
+            door_active: Un passage a été détecté à une porte
+        """
+        speed = gps_data.get('speed') if gps_data and gps_data.get('has_fix') else None
+        acceleration = mpu_data.get('acceleration') if mpu_data else None
+        if self.adaptive.update(speed, acceleration, door_active):
+            self._apply_motion_profile()
+    
+    def _apply_motion_profile(self):
+        """Applique la taille des lots d'envoi du profil courant"""
+        if self.uplink:
+            self.uplink.set_snapshot_batch_size(self.adaptive.profile['upload_batch'])
+    
+    def _restore_state(self, record: Optional[dict]):
+        """
+        Reprend le compteur de passagers enregistré avant l'arrêt
+        
+        Args:
+            record: Dernier enregistrement du journal d'état (None au premier démarrage)
+        """
+        if not record:
+            return
+        age = time.time() - record['time']
+        # Après un long arrêt (bus remisé), les passagers sont descendus : le compteur repart de zéro
+        if age > self.config.get('persistence.max_state_age', 1800):
+            logger.info(f"État enregistré trop ancien ({age / 60:.0f} min) - compteur remis à zéro")
+            return
+        count = record.get('state', {}).get('passenger_count', 0)
+        self.passenger_count = max(0, min(int(count), self.max_passengers))
+        logger.info(f"Compteur de passagers repris: {self.passenger_count} (enregistré il y a {age:.0f}s)")
+    
+    def _checkpoint(self, clean: bool = False):
+        """
+        Enregistre l'état du compteur dans le journal
+        
+        Args:
+            clean: Arrêt propre
+        """
+        try:
+            self.journal.save({'passenger_count': self.passenger_count}, clean=clean)
+            self._last_checkpoint = time.monotonic()
+        except OSError as e:
+            logger.error(f"Erreur enregistrement de l'état: {e}")
+    
     def _detect_passengers(self, entry_distance: Optional[float], exit_distance: Optional[float]):
         """
         Détecte les passagers aux portes et met à jour le compteur
@@ -188,27 +938,51 @@ class SmartBus:
             entry_distance: Distance mesurée à la porte d'entrée (cm)
             exit_distance: Distance mesurée à la porte de sortie (cm)
         """
-        # Détection à la porte d'entrée (passager entre)
+        self._detect_entry(entry_distance)
+        self._detect_exit(exit_distance)
+    
+    def _detect_entry(self, entry_distance: Optional[float]):
+        """Détection à la porte d'entrée (passager entre)"""
         if entry_distance is not None and entry_distance <= self.detection_threshold:
+            if self.door_gate:
+                self.door_gate.keep_active('ultrasonic_entry')
             if not self.entry_detected:
                 # Nouveau passager détecté
                 if self.passenger_count < self.max_passengers:
                     self.passenger_count += 1
                     logger.info(f"Passager entré! Total: {self.passenger_count}/{self.max_passengers}")
+                    self._checkpoint()
+                    self._publish_event(EVENT_BOARDING, self._passenger_event_data())
+                    if self.blackbox and self.blackbox_door_trigger:
+                        self.blackbox.trigger(TRIGGER_DOOR, entry_distance)
+                    if self.stop_detector:
+                        self.stop_detector.record_boarding()
+                    if self.passenger_count >= self.max_passengers:
+                        self._publish_event(EVENT_BUS_FULL, self._passenger_event_data())
                 else:
                     logger.warning(f"Bus plein! Impossible d'ajouter un passager")
+                    self._publish_event(EVENT_BUS_FULL, self._passenger_event_data())
                 self.entry_detected = True
         else:
             # Plus de passager détecté, réinitialiser le flag
             self.entry_detected = False
-        
-        # Détection à la porte de sortie (passager sort)
+    
+    def _detect_exit(self, exit_distance: Optional[float]):
+        """Détection à la porte de sortie (passager sort)"""
         if exit_distance is not None and exit_distance <= self.detection_threshold:
+            if self.door_gate:
+                self.door_gate.keep_active('ultrasonic_exit')
             if not self.exit_detected:
                 # Passager sorti
                 if self.passenger_count > 0:
                     self.passenger_count -= 1
                     logger.info(f"Passager sorti! Total: {self.passenger_count}/{self.max_passengers}")
+                    self._checkpoint()
+                    self._publish_event(EVENT_ALIGHTING, self._passenger_event_data())
+                    if self.blackbox and self.blackbox_door_trigger:
+                        self.blackbox.trigger(TRIGGER_DOOR, exit_distance)
+                    if self.stop_detector:
+                        self.stop_detector.record_alighting()
                 else:
                     logger.warning(f"Bus vide! Impossible de retirer un passager")
                 self.exit_detected = True
@@ -216,50 +990,229 @@ class SmartBus:
             # Plus de passager détecté, réinitialiser le flag
             self.exit_detected = False
     
-    def run(self, interval: int = 5):
+    def _sample_doors(self):
+        """Lit les portes surveillées par PIR entre deux itérations et compte les passagers"""
+        for name, detect in (('ultrasonic_entry', self._detect_entry), ('ultrasonic_exit', self._detect_exit)):
+            if name not in self.door_gate.doors or name not in self.sensors or not self.door_gate.due(name):
+                continue
+            data = self.health[name].read(self.sensors[name])
+            if self.blackbox and data is not None:
+                self._record_blackbox(name, data)
+            if self.anomaly and data is not None:
+                self._check_anomalies(name, data)
+            detect(data.get('distance') if data else None)
+    
+    def _passenger_event_data(self) -> dict:
+        """Retourne l'état du compteur joint aux événements de passagers"""
+        return {
+            'count': self.passenger_count,
+            'max': self.max_passengers,
+            'is_full': self.passenger_count >= self.max_passengers
+        }
+    
+    def _detect_harsh_braking(self, mpu_data: dict):
+        """
+        Détecte un freinage brusque (accélération horizontale au-delà du seuil)
+        
+        Args:
+            mpu_data: Données du MPU9250 (accélération en g)
+        """
+        # Pic de la fenêtre en mode multiprocessus, dernière mesure sinon
+        accel = mpu_data.get('peak_acceleration') or mpu_data.get('acceleration') or {}
+        horizontal = ((accel.get('x') or 0.0) ** 2 + (accel.get('y') or 0.0) ** 2) ** 0.5
+        
+        if horizontal >= self.harsh_braking_threshold:
+            if not self.harsh_braking:
+                logger.warning(f"Freinage brusque détecté: {horizontal:.2f} g")
+                self._publish_event(EVENT_HARSH_BRAKING, {'acceleration': accel, 'magnitude': round(horizontal, 3)})
+            self.harsh_braking = True
+        else:
+            self.harsh_braking = False
+    
+    def _save_track_segment(self, segment: dict):
+        """
+        Enregistre un segment de trajectoire terminé et le transmet au serveur
+        
+        Args:
+            segment: Segment produit par TrajectoryCompressor
+        """
+        start = datetime.fromtimestamp(segment['start']).strftime('%Y%m%d_%H%M%S')
+        self.data_logger.save_json(segment, filename=f'track_{start}.json')
+        if self.uplink:
+            self.uplink.send_track(segment)
+        logger.info(f"Segment de trajet: {segment['points_received']} positions → {segment['points_kept']} points")
+    
+    def _update_stop(self, gps_data: dict):
+        """
+        Met à jour la visite d'arrêt en cours à partir de la position GPS
+        
+        Args:
+            gps_data: Données du GPS (avec fix)
+        """
+        events = self.stop_detector.update(
+            gps_data['latitude'], gps_data['longitude'], gps_data.get('speed'), time.time()
+        )
+        for event in events:
+            visit = event['visit']
+            if event['type'] == 'arrival':
+                logger.info(f"Arrivée à l'arrêt {visit['stop_name'] or visit['stop_id']}")
+                self._publish_event(EVENT_STOP_ARRIVAL, visit)
+            else:
+                logger.info(
+                    f"Départ de l'arrêt {visit['stop_name'] or visit['stop_id']}: "
+                    f"arrêt {visit['dwell']}s, {visit['boardings']} montée(s), {visit['alightings']} descente(s)"
+                )
+                self._publish_event(EVENT_STOP_DEPARTURE, visit)
+    
+    def _detect_gps_fix_change(self, gps_data: dict):
+        """
+        Détecte la perte et la reprise du fix GPS
+        
+        Args:
+            gps_data: Données du GPS
+        """
+        has_fix = bool(gps_data.get('has_fix'))
+        if self.gps_has_fix is not None and has_fix != self.gps_has_fix:
+            position = {'latitude': gps_data.get('latitude'), 'longitude': gps_data.get('longitude')}
+            if has_fix:
+                logger.info("Fix GPS retrouvé")
+                self._publish_event(EVENT_GPS_FIX_REGAINED, position)
+            else:
+                logger.warning("Fix GPS perdu")
+                self._publish_event(EVENT_GPS_FIX_LOST, position)
+        self.gps_has_fix = has_fix
+    
+    def run_cycle(self) -> dict:
+        """
+        Exécute une itération : collecte, sauvegarde locale et envoi au serveur
+        
+        Returns:
+            Données collectées pendant l'itération
+        """
+        # Modifications de configuration reçues depuis l'itération précédente
+        self._apply_config_changes()
+        
+        # Collecte des données
+        data = self.collect_data()
+        
+        # Point de reprise périodique : l'âge de l'état enregistré reflète la dernière activité
+        if time.monotonic() - self._last_checkpoint >= self.checkpoint_interval.value:
+            self._checkpoint()
+        
+        # En mode adaptatif, les itérations sans snapshot prévu s'arrêtent à la collecte
+        if self.adaptive and not self.adaptive.snapshot_due():
+            return data
+        
+        # Affichage des capteurs actifs
+        active_sensors = data['sensors'].keys()
+        if active_sensors:
+            sensors_str = ', '.join(sorted(active_sensors))
+        else:
+            sensors_str = 'aucun capteur actif'
+        logger.info(f"Capteurs actifs: {sensors_str}")
+        
+        # Sauvegarde locale et envoi au serveur, en arrière-plan dans les threads des sorties
+        self.output.publish(data)
+        
+        return data
+    
+    def _create_output(self):
+        """
+        Crée le pipeline de sortie des snapshots (remplace le précédent, arrêté ensuite après avoir vidé ses files)
+        Sorties de `output.sinks` (nom ou {"type", "queue_size", "overflow", "block_timeout"}),
+        par défaut la base SQLite ou les fichiers de `data.format`, puis le serveur
+        """
+        # En pause tant que l'ancien pipeline écrit encore dans les mêmes fichiers
+        output = OutputPipeline(
+            queue_size=self.config.get('output.queue_size', 100),
+            overflow=self.config.get('output.overflow', 'drop_oldest'),
+            block_timeout=self.config.get('output.block_timeout', 0.1),
+            paused=self.output is not None
+        )
+        sinks = self.config.get('output.sinks')
+        if not sinks:
+            save_format = self.config.get('data.format', 'json')
+            if self.data_logger.store:
+                sinks = ['store']
+            elif save_format in _FILE_FORMATS:
+                sinks = [save_format]
+            else:
+                sinks = ['json', 'csv']
+            sinks.append('http')
+        for spec in sinks:
+            options = dict(spec) if isinstance(spec, dict) else {'type': spec}
+            kind = options.pop('type', None)
+            name = options.pop('name', kind)
+            try:
+                write, flush = self._create_sink(kind)
+                output.add_sink(name, write, flush, **options)
+            except (ValueError, TypeError) as e:
+                logger.error(f"Sortie {spec} ignorée: {e}")
+        
+        # Nouveau pipeline en place avant l'arrêt de l'ancien : aucun publish ne tombe entre les deux ;
+        # il n'écrit qu'une fois les files de l'ancien vidées et ses lots écrits (lignes dans l'ordre)
+        previous, self.output = self.output, output
+        if previous:
+            stats = previous.stop()
+            dropped = sum(counts['dropped'] for counts in stats.values())
+            logger.info(f"Ancien pipeline de sortie arrêté ({dropped} snapshot(s) abandonné(s))")
+            output.resume()
+    
+    def _create_sink(self, kind: str) -> Tuple[Callable[[dict], object], Optional[Callable[[], object]]]:
+        """
+        Fonctions d'écriture et de vidage d'une sortie
+        
+        Args:
+            kind: 'json', 'csv', 'sqlite', 'parquet' (fichiers, par lots de `data.batch_size`),
+                'store' (base de `data.backend` = "sqlite") ou 'http' (serveur)
+        
+        Returns:
+            (write, flush) pour OutputPipeline.add_sink
+        """
+        if kind == 'http':
+            return self._send_snapshot, None
+        if kind == 'store':
+            if not self.data_logger.store:
+                raise ValueError("base SQLite non ouverte (data.backend)")
+            return self.data_logger.save_snapshot, None
+        if kind not in _FILE_FORMATS:
+            raise ValueError(f"type inconnu: {kind}")
+        batch_size = self.config.get('data.batch_size', 1)
+        if batch_size <= 1 and kind == 'json':
+            return self.data_logger.save_json, None
+        if batch_size <= 1 and kind == 'csv':
+            return self.data_logger.save_csv, None
+        # Lots : un fichier JSON Lines par jour, une écriture par lot
+        writer = BatchWriter(self.data_logger, kind, batch_size, self.config.get('data.flush_interval', 60))
+        return writer.write, writer.flush
+    
+    def _send_snapshot(self, data: dict) -> bool:
+        """Place un snapshot dans la file d'envoi au serveur FastAPI (sortie 'http')"""
+        uplink = self.uplink
+        if not uplink:
+            logger.warning("⚠️ HTTP Client non initialisé - Les données ne sont pas envoyées au serveur")
+            return False
+        uplink.send_snapshot(data)
+        return True
+    
+    def run(self, interval: Optional[float] = None):
         """
         Lance la boucle principale de collecte de données
         
         Args:
             interval: Intervalle entre les collectes en secondes
+                (par défaut `data.save_interval`, modifiable à chaud, ou la cadence
+                du profil courant en mode adaptatif)
         """
-        logger.info(f"Démarrage de la collecte de données (intervalle: {interval}s)")
+        logger.info(f"Démarrage de la collecte de données (intervalle: {interval or self._cycle_interval()}s)")
         
         try:
             while True:
-                # Collecte des données
-                data = self.collect_data()
-                
-                # Affichage des capteurs actifs
-                active_sensors = data['sensors'].keys()
-                if active_sensors:
-                    sensors_str = ', '.join(sorted(active_sensors))
-                else:
-                    sensors_str = 'aucun capteur actif'
-                logger.info(f"Capteurs actifs: {sensors_str}")
-                
-                # Sauvegarde locale des données
-                save_format = self.config.get('data.format', 'json')
-                if save_format == 'json':
-                    self.data_logger.save_json(data)
-                elif save_format == 'csv':
-                    self.data_logger.save_csv(data)
-                else:
-                    self.data_logger.save_json(data)
-                    self.data_logger.save_csv(data)
-                
-                # Envoi des données au serveur FastAPI si activé
-                if self.http_client:
-                    if self.http_client.send_data(data):
-                        logger.info("✅ Données envoyées au serveur FastAPI")
-                    else:
-                        logger.warning("⚠️ Échec de l'envoi des données au serveur")
-                else:
-                    logger.warning("⚠️ HTTP Client non initialisé - Les données ne sont pas envoyées au serveur")
+                self.run_cycle()
                 
                 # Attente avant la prochaine collecte
-                time.sleep(interval)
-                
+                self._wait(interval or self._cycle_interval())
+        
         except KeyboardInterrupt:
             logger.info("Arrêt demandé par l'utilisateur")
         except Exception as e:
@@ -267,13 +1220,75 @@ class SmartBus:
         finally:
             self.cleanup()
     
+    def _wait(self, duration: float):
+        """
+        Attend la prochaine itération ; avec les détecteurs PIR, un mouvement
+        réveille la boucle et les portes actives sont lues pendant l'attente
+        
+        Args:
+            duration: Durée de l'attente en secondes
+        """
+        if not self.door_gate:
+            time.sleep(duration)
+            return
+        deadline = time.monotonic() + duration
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self.door_gate.wait(min(remaining, self.door_gate.poll_interval))
+            self._sample_doors()
+    
+    def _cycle_interval(self) -> float:
+        """Intervalle entre deux itérations de la boucle principale"""
+        return self.adaptive.tick if self.adaptive else self.save_interval.value
+    
     def cleanup(self):
         """Nettoie les ressources et ferme les connexions"""
         logger.info("Nettoyage des ressources...")
         
+        self.config.stop_watching()
+        
+        if self.trajectory:
+            segment = self.trajectory.flush()
+            if segment:
+                self._save_track_segment(segment)
+        
+        # Snapshots en attente écrits et lots vidés avant la fermeture des fichiers
+        stats = self.output.stop()
+        logger.info("Sorties: " + ', '.join(
+            f"{name} {counts['written']} écrit(s), {counts['dropped']} abandonné(s), {counts['failed']} échec(s)"
+            for name, counts in stats.items()
+        ))
+        self.data_logger.close()
+        self._checkpoint(clean=True)
+        self.journal.close()
+        
+        if self.retention:
+            self.retention.stop()
+        
+        # Fenêtre en cours enregistrée (tronquée) avant l'arrêt de l'envoi
+        if self.blackbox:
+            self.blackbox.stop()
+        
+        self._stop_uplink()
+        
+        # Les pilotes prêts pendant l'arrêt sont rattachés pour être nettoyés
+        self._attach_sensors(self.startup.poll())
+        self.startup.shutdown()
+        
+        if self.acquisition:
+            self.acquisition.stop()
+        
         if 'gps' in self.sensors:
             self.sensors['gps'].disconnect()
         
+        if self.door_gate:
+            self.door_gate.stop()
+        
+        if 'mpu9250' in self.sensors:
+            self.sensors['mpu9250'].cleanup()
+        
         if 'ultrasonic_entry' in self.sensors:
             self.sensors['ultrasonic_entry'].cleanup()
         
@@ -283,15 +1298,22 @@ class SmartBus:
         if self.lcd:
             self.lcd.cleanup()
         
+        if self.i2c_bus:
+            logger.info(f"Temps de bus I2C par périphérique: {self.i2c_bus.stats()}")
+            self.i2c_bus.close()
+        
+        if self.capture:
+            self.capture.close()
+        
         logger.info("Nettoyage terminé")
+        stop_logging()
 
 
 def main():
     """Point d'entrée principal"""
     try:
         smart_bus = SmartBus()
-        interval = smart_bus.config.get('data.save_interval', 5)
-        smart_bus.run(interval=interval)
+        smart_bus.run()
     except Exception as e:
         logger.error(f"Erreur fatale: {e}")
         raise
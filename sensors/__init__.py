@@ -7,7 +7,9 @@ from .dht22 import DHT22
 from .mpu9250 import MPU9250
 from .ultrasonic import Ultrasonic
 from .lcd import LCD
+from .pir import PIR
+from .health import SensorHealth
 
-__all__ = ['GPSNeo6M', 'DHT22', 'MPU9250', 'Ultrasonic', 'LCD']
+__all__ = ['GPSNeo6M', 'DHT22', 'MPU9250', 'Ultrasonic', 'LCD', 'PIR', 'SensorHealth']
 
 
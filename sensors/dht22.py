@@ -33,17 +33,22 @@ PIN_MAPPING = {
 class DHT22:
     """Classe pour gérer le capteur DHT22"""
     
-    def __init__(self, pin: int = 4):
+    def __init__(self, pin: int = 4, max_retries: int = 3, retry_delay: float = 0.5):
         """
         Initialise le capteur DHT22
         
         Args:
             pin: Numéro de la broche GPIO (par défaut GPIO 4)
+            max_retries: Nombre de tentatives par lecture
+            retry_delay: Attente en secondes entre deux tentatives
         """
         self.pin = pin
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
         self.temperature = None
         self.humidity = None
         self.dht = None
+        self.last_error = None
         
         try:
             # Convertir le pin GPIO en pin board
@@ -66,11 +71,12 @@ class DHT22:
         """
         if not self.dht:
             logger.error("DHT22 non initialisé")
+            self.last_error = "non initialisé"
             return None
         
         try:
             # La nouvelle bibliothèque peut nécessiter plusieurs tentatives
-            max_retries = 3
+            max_retries = self.max_retries
             for attempt in range(max_retries):
                 try:
                     temperature = self.dht.temperature
@@ -79,6 +85,7 @@ class DHT22:
                     if temperature is not None and humidity is not None:
                         self.temperature = temperature
                         self.humidity = humidity
+                        self.last_error = None
                         
                         return {
                             'temperature': round(temperature, 2),
@@ -88,17 +95,20 @@ class DHT22:
                 except RuntimeError as e:
                     # Erreur de lecture, réessayer
                     if attempt < max_retries - 1:
-                        time.sleep(0.5)
+                        time.sleep(self.retry_delay)
                         continue
                     else:
                         logger.warning(f"Impossible de lire les données du DHT22 après {max_retries} tentatives: {e}")
+                        self.last_error = str(e)
                         return None
             
             logger.warning("Impossible de lire les données du DHT22")
+            self.last_error = "aucune donnée"
             return None
                 
         except Exception as e:
             logger.error(f"Erreur lecture DHT22: {e}")
+            self.last_error = str(e)
             return None
     
     def get_temperature(self) -> Optional[float]:
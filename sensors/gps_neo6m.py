@@ -29,7 +29,10 @@ class GPSNeo6M:
         self.altitude = None
         self.speed = None
         self.timestamp = None
-        
+        self.last_error = None
+        # Fonction appliquée à chaque connexion série ouverte (capture brute, utils/capture.py)
+        self.serial_wrapper = None
+    
     def connect(self) -> bool:
         """Établit la connexion série avec le module GPS"""
         try:
@@ -38,10 +41,14 @@ class GPSNeo6M:
                 self.baudrate,
                 timeout=1
             )
+            if self.serial_wrapper:
+                self.serial_connection = self.serial_wrapper(self.serial_connection)
             logger.info(f"GPS connecté sur {self.port}")
+            self.last_error = None
             return True
         except Exception as e:
             logger.error(f"Erreur de connexion GPS: {e}")
+            self.last_error = f"connexion: {e}"
             return False
     
     def disconnect(self):
@@ -70,7 +77,7 @@ class GPSNeo6M:
             for _ in range(max_attempts):
                 if self.serial_connection.in_waiting == 0:
                     break
-                    
+                
                 line = self.serial_connection.readline().decode('utf-8', errors='ignore').strip()
                 
                 if not line or len(line) < 10:
@@ -107,6 +114,8 @@ class GPSNeo6M:
                         logger.debug(f"Erreur parsing GPGGA: {e}")
                         continue
             
+            self.last_error = None
+            
             # Retourner les données si on a trouvé quelque chose, ou les dernières données connues
             if data_found or (self.latitude is not None and self.longitude is not None):
                 return {
@@ -128,9 +137,15 @@ class GPSNeo6M:
                     'has_fix': False,
                     'status': 'En attente de fix satellite...'
                 }
-                
+        
         except Exception as e:
             logger.error(f"Erreur lecture GPS: {e}")
+            self.last_error = str(e)
+            # Port probablement perdu (module débranché) : forcer une reconnexion au prochain essai
+            try:
+                self.serial_connection.close()
+            except Exception:
+                pass
             return None
     
     def get_position(self) -> Optional[Dict]:
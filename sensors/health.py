@@ -0,0 +1,125 @@
+"""
+Module de suivi de l'état de santé des capteurs
+Disjoncteur par capteur : après plusieurs échecs consécutifs, le capteur n'est
+plus lu que lors de sondages espacés avec un délai exponentiel, pour qu'un
+capteur débranché ne coûte presque rien à chaque cycle
+"""
+
+import time
+from typing import Any, Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATE_OK = 'ok'
+STATE_DEGRADED = 'degraded'
+STATE_FAILED = 'failed'
+STATE_PROBING = 'probing'
+
+
+class SensorHealth:
+    """Classe pour suivre la santé d'un capteur et espacer les lectures en cas de panne"""
+    
+    def __init__(self, name: str, failure_threshold: int = 3,
+                 base_backoff: float = 1.0, max_backoff: float = 300.0):
+        """
+        Initialise le suivi de santé
+        
+        Args:
+            name: Nom du capteur (ex: 'gps', 'ultrasonic_entry')
+            failure_threshold: Nombre d'échecs consécutifs avant de suspendre les lectures
+            base_backoff: Premier délai en secondes avant un sondage de récupération
+            max_backoff: Délai maximal en secondes entre deux sondages
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        
+        self.state = STATE_OK
+        self.consecutive_failures = 0
+        self.backoff = 0.0
+        self.next_probe = 0.0
+        self.last_error: Optional[str] = None
+        self.reads = 0
+        self.failures = 0
+        self.skipped = 0
+        self.read_time = 0.0
+    
+    def read(self, sensor: Any, read_fn: Optional[Callable[[], Optional[Dict]]] = None) -> Optional[Dict]:
+        """
+        Lit le capteur si son état le permet
+        
+        Un résultat None n'est compté comme échec que si le pilote signale une
+        erreur via son attribut `last_error` (une distance hors plage n'est pas une panne).
+        
+        Args:
+            sensor: Pilote du capteur
+            read_fn: Fonction de lecture (par défaut sensor.read_data)
+        
+        Returns:
+            Données lues ou None (échec ou lecture suspendue)
+        """
+        now = time.monotonic()
+        if self.state == STATE_FAILED:
+            if now < self.next_probe:
+                self.skipped += 1
+                return None
+            self.state = STATE_PROBING
+        
+        start = time.perf_counter()
+        try:
+            data = (read_fn or sensor.read_data)()
+            error = getattr(sensor, 'last_error', None) if data is None else None
+        except Exception as e:
+            data, error = None, str(e)
+        self.read_time += time.perf_counter() - start
+        self.reads += 1
+        
+        if error:
+            self._record_failure(error, now)
+        else:
+            self._record_success()
+        return data
+    
+    def _record_success(self):
+        """Referme le disjoncteur après une lecture réussie"""
+        if self.state in (STATE_PROBING, STATE_FAILED):
+            logger.info(f"Capteur {self.name} rétabli après {self.consecutive_failures} échec(s)")
+        self.state = STATE_OK
+        self.consecutive_failures = 0
+        self.backoff = 0.0
+    
+    def _record_failure(self, error: str, now: float):
+        """Compte un échec et suspend les lectures au-delà du seuil"""
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = error
+        
+        if self.state == STATE_PROBING:
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+        elif self.consecutive_failures >= self.failure_threshold:
+            self.backoff = self.base_backoff
+            logger.warning(
+                f"Capteur {self.name} en panne ({error}) - lectures suspendues, "
+                f"prochain essai dans {self.backoff:.0f}s"
+            )
+        else:
+            self.state = STATE_DEGRADED
+            return
+        
+        self.state = STATE_FAILED
+        self.next_probe = now + self.backoff
+    
+    def to_dict(self) -> Dict:
+        """Retourne l'état et les métriques du capteur"""
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'backoff': round(self.backoff, 1),
+            'last_error': self.last_error,
+            'reads': self.reads,
+            'failures': self.failures,
+            'skipped': self.skipped,
+            'avg_read_ms': round(self.read_time / self.reads * 1000, 2) if self.reads else None
+        }
@@ -4,6 +4,7 @@ Support pour les afficheurs LCD 16x2 ou 20x4 via I2C
 """
 
 import time
+from contextlib import nullcontext
 from typing import Optional
 import logging
 
@@ -12,6 +13,9 @@ logger = logging.getLogger(__name__)
 LCD_AVAILABLE = False
 LCD_DRIVER_MODE = False
 
+# Durée d'exécution de la commande d'effacement du HD44780 (1,52 ms)
+_CLEAR_DELAY = 0.002
+
 try:
     from RPLCD.i2c import CharLCD
     LCD_AVAILABLE = True
@@ -28,7 +32,7 @@ except ImportError:
 class LCD:
     """Classe pour gérer l'afficheur LCD via I2C"""
     
-    def __init__(self, i2c_address: int = 0x27, cols: int = 16, rows: int = 2):
+    def __init__(self, i2c_address: int = 0x27, cols: int = 16, rows: int = 2, bus=None):
         """
         Initialise l'afficheur LCD
         
@@ -36,11 +40,13 @@ class LCD:
             i2c_address: Adresse I2C du LCD (par défaut 0x27)
             cols: Nombre de colonnes (par défaut 16)
             rows: Nombre de lignes (par défaut 2)
+            bus: Accès au bus I2C partagé (utils.i2c_bus.I2CDevice), bus propre à RPLCD sinon
         """
         self.i2c_address = i2c_address
         self.cols = cols
         self.rows = rows
         self.lcd = None
+        self.bus = None
         
         if not LCD_AVAILABLE:
             logger.warning("LCD non disponible - mode simulation")
@@ -60,6 +66,10 @@ class LCD:
                     rows=rows
                 )
                 logger.info(f"LCD initialisé - Adresse I2C: {hex(i2c_address)}, {cols}x{rows}")
+                if bus is not None:
+                    # Les écritures de RPLCD passent ensuite par le bus partagé
+                    own_bus, self.lcd.bus, self.bus = self.lcd.bus, bus, bus
+                    own_bus.close()
         except Exception as e:
             logger.error(f"Erreur initialisation LCD: {e}")
             self.lcd = None
@@ -87,26 +97,39 @@ class LCD:
             return
         
         try:
-            self.clear()
-            
-            if self.rows >= 1 and line1:
-                self.lcd.write_string(line1[:self.cols])
-            
-            if self.rows >= 2 and line2:
-                self.lcd.cursor_pos = (1, 0)
-                self.lcd.write_string(line2[:self.cols])
-            
-            if self.rows >= 3 and line3:
-                self.lcd.cursor_pos = (2, 0)
-                self.lcd.write_string(line3[:self.cols])
+            with self._batch():
+                self.clear()
+            if self.bus is not None:
+                # Écritures regroupées : l'effacement n'est exécuté qu'à l'envoi du lot
+                time.sleep(_CLEAR_DELAY)
             
-            if self.rows >= 4 and line4:
-                self.lcd.cursor_pos = (3, 0)
-                self.lcd.write_string(line4[:self.cols])
-                
+            with self._batch():
+                self._write_lines(line1, line2, line3, line4)
+        
         except Exception as e:
             logger.error(f"Erreur affichage LCD: {e}")
     
+    def _batch(self):
+        """Lot d'écritures sur le bus partagé (sans effet avec le bus propre à RPLCD)"""
+        return self.bus.batch() if self.bus is not None else nullcontext()
+    
+    def _write_lines(self, line1: str, line2: str, line3: str, line4: str):
+        """Écrit les lignes à partir du coin supérieur gauche"""
+        if self.rows >= 1 and line1:
+            self.lcd.write_string(line1[:self.cols])
+        
+        if self.rows >= 2 and line2:
+            self.lcd.cursor_pos = (1, 0)
+            self.lcd.write_string(line2[:self.cols])
+        
+        if self.rows >= 3 and line3:
+            self.lcd.cursor_pos = (2, 0)
+            self.lcd.write_string(line3[:self.cols])
+        
+        if self.rows >= 4 and line4:
+            self.lcd.cursor_pos = (3, 0)
+            self.lcd.write_string(line4[:self.cols])
+    
     def display_door_status(self, entry_distance: Optional[float], exit_distance: Optional[float]):
         """
         Affiche le statut des portes (entrée et sortie)
@@ -135,7 +158,7 @@ class LCD:
                 line2 += f" {exit_distance:.1f}cm"
             
             self.display(line1, line2)
-            
+        
         except Exception as e:
             logger.error(f"Erreur affichage statut portes: {e}")
     
@@ -170,7 +193,7 @@ class LCD:
                 line2 = f"{percentage}% occupe"
             
             self.display(line1, line2)
-            
+        
         except Exception as e:
             logger.error(f"Erreur affichage nombre passagers: {e}")
     
@@ -215,7 +238,7 @@ class LCD:
                 lines[2] if len(lines) > 2 else "",
                 lines[3] if len(lines) > 3 else ""
             )
-            
+        
         except Exception as e:
             logger.error(f"Erreur affichage données capteurs: {e}")
     
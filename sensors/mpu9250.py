@@ -1,11 +1,28 @@
 """
 Module MPU9250 pour la mesure d'accélération, gyroscope et magnétomètre
+Mode FIFO : la puce échantillonne accéléromètre et gyroscope à cadence fixe
+dans sa FIFO interne, vidée en une seule lecture I2C par rafale
 """
 
+import struct
 import time
 from typing import Optional, Dict
 import logging
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+try:
+    from smbus2 import SMBus, i2c_msg
+    SMBUS2_AVAILABLE = True
+except ImportError:
+    SMBus = i2c_msg = None
+    SMBUS2_AVAILABLE = False
+
 try:
     from mpu9250_jmdev import registers
     try:
@@ -23,16 +40,76 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Registres du MPU9250 utilisés en mode FIFO
+MPU_ADDRESS = 0x68
+AK8963_ADDRESS = 0x0C
+_REG_SMPLRT_DIV = 0x19
+_REG_CONFIG = 0x1A
+_REG_GYRO_CONFIG = 0x1B
+_REG_ACCEL_CONFIG = 0x1C
+_REG_ACCEL_CONFIG2 = 0x1D
+_REG_FIFO_EN = 0x23
+_REG_INT_PIN_CFG = 0x37
+_REG_ACCEL_XOUT_H = 0x3B
+_REG_USER_CTRL = 0x6A
+_REG_PWR_MGMT_1 = 0x6B
+_REG_FIFO_COUNTH = 0x72
+_REG_FIFO_R_W = 0x74
+_AK_REG_HXL = 0x03
+_AK_REG_CNTL1 = 0x0A
+
+_FIFO_SIZE = 512
+_FIFO_FRAME = 12  # accéléromètre puis gyroscope, 3 x int16 big-endian chacun
+_FIFO_EN_ACCEL_GYRO = 0x78
+_CONFIG_FIFO_NO_OVERWRITE = 0x40  # FIFO pleine : nouvelles trames ignorées, trames alignées
+_USER_CTRL_FIFO_EN = 0x40
+_USER_CTRL_FIFO_RST = 0x04
+_SMBUS_BLOCK_MAX = 32
+
+# Sensibilités pour ±2 g, ±250 °/s et magnétomètre 16 bits (µT)
+_ACCEL_SCALE = 1 / 16384.0
+_GYRO_SCALE = 1 / 131.0
+_MAG_SCALE = 4912.0 / 32760.0
+
 
 class MPU9250:
     """Classe pour gérer le capteur MPU9250"""
     
-    def __init__(self):
-        """Initialise le capteur MPU9250"""
+    def __init__(self, fifo: bool = False, sample_rate: int = 200, i2c_bus: int = 1, bus=None):
+        """
+        Initialise le capteur MPU9250
+        
+        Args:
+            fifo: Lire par rafales dans la FIFO matérielle au lieu d'un échantillon par lecture
+            sample_rate: Cadence d'échantillonnage de la FIFO en Hz (4 à 1000)
+            i2c_bus: Numéro du bus I2C
+            bus: Bus I2C déjà ouvert (interface smbus2), ouvert automatiquement sinon
+        """
         self.mpu = None
         self.acceleration = None
         self.gyroscope = None
         self.magnetometer = None
+        self.last_error = None
+        
+        # Mode FIFO : accès direct aux registres, sans la bibliothèque mpu9250_jmdev
+        self.bus = None
+        self.sample_rate = None
+        self.fifo_stats = {'bursts': 0, 'samples': 0, 'overflows': 0, 'transactions': 0}
+        # Échantillons de la dernière rafale : (accélérations en g, rotations en °/s), N x 3
+        self.burst = None
+        if fifo:
+            if bus is None and SMBUS2_AVAILABLE:
+                bus = SMBus(i2c_bus)
+            if bus is None:
+                logger.warning("smbus2 non disponible (pip install smbus2), MPU9250 lu sans FIFO")
+            else:
+                try:
+                    self._configure_fifo(bus, sample_rate)
+                    self.bus = bus
+                    logger.info(f"MPU9250 initialisé en mode FIFO ({self.sample_rate:g} Hz)")
+                    return
+                except Exception as e:
+                    logger.error(f"Erreur configuration FIFO MPU9250: {e}")
         
         if MPU9250_AVAILABLE and callable(_MPU9250_CLASS):
             try:
@@ -81,8 +158,13 @@ class MPU9250:
         
         Returns:
             Dictionnaire contenant accélération, gyroscope et magnétomètre
+            (en mode FIFO : dernier échantillon, pic d'accélération horizontale
+            et nombre d'échantillons de la rafale)
         """
-        if not MPU9250_AVAILABLE or not self.mpu:
+        if self.bus is not None:
+            return self._read_fifo()
+        
+        if not self.mpu:
             # Mode mock pour développement
             return {
                 'acceleration': {'x': 0.0, 'y': 0.0, 'z': 0.0},
@@ -114,6 +196,7 @@ class MPU9250:
                 'z': round(mag[2], 3)
             }
             
+            self.last_error = None
             return {
                 'acceleration': self.acceleration,
                 'gyroscope': self.gyroscope,
@@ -122,8 +205,124 @@ class MPU9250:
             
         except Exception as e:
             logger.error(f"Erreur lecture MPU9250: {e}")
+            self.last_error = str(e)
+            return None
+    
+    def _configure_fifo(self, bus, sample_rate: int):
+        """Configure filtre, diviseur de fréquence et FIFO (accéléromètre + gyroscope)"""
+        divider = min(255, max(0, round(1000 / sample_rate) - 1))
+        bus.write_byte_data(MPU_ADDRESS, _REG_PWR_MGMT_1, 0x01)  # horloge PLL du gyroscope
+        time.sleep(0.01)
+        bus.write_byte_data(MPU_ADDRESS, _REG_CONFIG, _CONFIG_FIFO_NO_OVERWRITE | 0x01)  # filtre 184 Hz, base 1 kHz
+        bus.write_byte_data(MPU_ADDRESS, _REG_SMPLRT_DIV, divider)
+        bus.write_byte_data(MPU_ADDRESS, _REG_GYRO_CONFIG, 0x00)  # ±250 °/s
+        bus.write_byte_data(MPU_ADDRESS, _REG_ACCEL_CONFIG, 0x00)  # ±2 g
+        bus.write_byte_data(MPU_ADDRESS, _REG_ACCEL_CONFIG2, 0x01)  # filtre 184 Hz
+        # Accès direct au magnétomètre AK8963 (bypass), mesure continue 100 Hz en 16 bits
+        bus.write_byte_data(MPU_ADDRESS, _REG_INT_PIN_CFG, 0x02)
+        bus.write_byte_data(AK8963_ADDRESS, _AK_REG_CNTL1, 0x16)
+        bus.write_byte_data(MPU_ADDRESS, _REG_FIFO_EN, _FIFO_EN_ACCEL_GYRO)
+        bus.write_byte_data(MPU_ADDRESS, _REG_USER_CTRL, _USER_CTRL_FIFO_RST)
+        bus.write_byte_data(MPU_ADDRESS, _REG_USER_CTRL, _USER_CTRL_FIFO_EN)
+        self.sample_rate = 1000.0 / (1 + divider)
+    
+    def _read_fifo(self) -> Optional[Dict]:
+        """Vide la FIFO en une rafale et décode tous les échantillons reçus"""
+        try:
+            high, low = self._read_block(MPU_ADDRESS, _REG_FIFO_COUNTH, 2)
+            count = ((high & 0x1F) << 8) | low
+            frames = count // _FIFO_FRAME
+            if frames:
+                raw = self._read_burst(MPU_ADDRESS, _REG_FIFO_R_W, frames * _FIFO_FRAME)
+            else:
+                # FIFO vide (lecture plus rapide que l'échantillonnage) : registres de mesure
+                block = self._read_block(MPU_ADDRESS, _REG_ACCEL_XOUT_H, 14)
+                raw = bytes(block[:6] + block[8:])  # sans la température
+            
+            # FIFO pleine : des échantillons ont été perdus et une trame peut être incomplète
+            if count > _FIFO_SIZE - _FIFO_FRAME:
+                self.fifo_stats['overflows'] += 1
+                logger.debug(f"FIFO MPU9250 pleine ({count} octets), réinitialisation")
+                self.bus.write_byte_data(MPU_ADDRESS, _REG_USER_CTRL, _USER_CTRL_FIFO_EN | _USER_CTRL_FIFO_RST)
+                self.fifo_stats['transactions'] += 1
+            
+            accel, gyro, peak, self.burst = self._decode_frames(raw)
+            if not frames:
+                self.burst = None
+            mag = struct.unpack('<3h', bytes(self._read_block(AK8963_ADDRESS, _AK_REG_HXL, 7)[:6]))
+            
+            self.acceleration = accel
+            self.gyroscope = gyro
+            self.magnetometer = {axis: round(value * _MAG_SCALE, 3) for axis, value in zip('xyz', mag)}
+            self.fifo_stats['bursts'] += 1
+            self.fifo_stats['samples'] += frames
+            self.last_error = None
+            return {
+                'acceleration': self.acceleration,
+                'gyroscope': self.gyroscope,
+                'magnetometer': self.magnetometer,
+                'peak_acceleration': peak,
+                'samples': frames
+            }
+        
+        except Exception as e:
+            logger.error(f"Erreur lecture FIFO MPU9250: {e}")
+            self.last_error = str(e)
             return None
     
+    @staticmethod
+    def _decode_frames(raw: bytes):
+        """
+        Décode des trames accéléromètre + gyroscope (int16 big-endian)
+        
+        Returns:
+            (dernière accélération, dernier gyroscope, accélération au pic horizontal,
+            (toutes les accélérations, toutes les rotations))
+        """
+        if NUMPY_AVAILABLE:
+            samples = np.frombuffer(raw, dtype='>i2').reshape(-1, 6)
+            accel = samples[:, :3] * _ACCEL_SCALE
+            gyro = samples[:, 3:] * _GYRO_SCALE
+            peak = accel[int(np.argmax(accel[:, 0] ** 2 + accel[:, 1] ** 2))]
+        else:
+            values = struct.unpack(f'>{len(raw) // 2}h', raw)
+            frames = [values[i:i + 6] for i in range(0, len(values), 6)]
+            accel = [tuple(v * _ACCEL_SCALE for v in f[:3]) for f in frames]
+            gyro = [tuple(v * _GYRO_SCALE for v in f[3:]) for f in frames]
+            peak = max(accel, key=lambda a: a[0] * a[0] + a[1] * a[1])
+        last = tuple({axis: round(float(v), 3) for axis, v in zip('xyz', vector)}
+                     for vector in (accel[-1], gyro[-1], peak))
+        return last + ((accel, gyro),)
+    
+    def _read_block(self, address: int, register: int, length: int) -> list:
+        """Lecture de registres consécutifs (une transaction SMBus, 32 octets au plus)"""
+        self.fifo_stats['transactions'] += 1
+        return self.bus.read_i2c_block_data(address, register, length)
+    
+    def _read_burst(self, address: int, register: int, length: int) -> bytes:
+        """Lecture d'un registre en rafale : une transaction I2C combinée quelle que soit la longueur"""
+        if i2c_msg is not None and hasattr(self.bus, 'i2c_rdwr'):
+            write, read = i2c_msg.write(address, [register]), i2c_msg.read(address, length)
+            self.bus.i2c_rdwr(write, read)
+            self.fifo_stats['transactions'] += 1
+            return bytes(read)
+        # Sans i2c_rdwr : lectures SMBus de 32 octets (le registre FIFO_R_W ne s'incrémente pas)
+        data = bytearray()
+        while len(data) < length:
+            data += bytes(self._read_block(address, register, min(_SMBUS_BLOCK_MAX, length - len(data))))
+        return bytes(data)
+    
+    def cleanup(self):
+        """Désactive la FIFO et ferme le bus I2C"""
+        if self.bus is None:
+            return
+        try:
+            self.bus.write_byte_data(MPU_ADDRESS, _REG_USER_CTRL, 0x00)
+            self.bus.close()
+        except Exception as e:
+            logger.error(f"Erreur nettoyage MPU9250: {e}")
+        self.bus = None
+    
     def get_acceleration(self) -> Optional[Dict]:
         """Retourne les valeurs d'accélération"""
         data = self.read_data()
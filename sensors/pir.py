@@ -3,7 +3,7 @@ Module PIR (Passive Infrared) pour la détection de mouvement
 """
 
 import RPi.GPIO as GPIO
-from typing import Optional, Dict
+from typing import Callable, Optional, Dict
 import logging
 import time
 
@@ -23,6 +23,7 @@ class PIR:
         self.pin = pin
         self.motion_detected = False
         self.last_motion_time = None
+        self._watching = False
         
         try:
             GPIO.setmode(GPIO.BCM)
@@ -60,8 +61,45 @@ class PIR:
         data = self.read_data()
         return data['motion_detected'] if data else False
     
+    def watch(self, callback: Callable[[bool], None], bouncetime: int = 50) -> bool:
+        """
+        Surveille les fronts montants et descendants par interruption au lieu de lire la broche
+        
+        Args:
+            callback: Fonction appelée avec l'état du mouvement à chaque changement
+                (thread d'interruption de RPi.GPIO : doit rester très courte)
+            bouncetime: Durée d'anti-rebond en ms
+        
+        Returns:
+            True si la détection de fronts est active
+        """
+        def on_edge(channel):
+            self.motion_detected = bool(GPIO.input(self.pin))
+            if self.motion_detected:
+                self.last_motion_time = time.time()
+            callback(self.motion_detected)
+        
+        try:
+            GPIO.add_event_detect(self.pin, GPIO.BOTH, callback=on_edge, bouncetime=bouncetime)
+            self._watching = True
+            return True
+        except Exception as e:
+            logger.error(f"Erreur détection de fronts PIR (GPIO {self.pin}): {e}")
+            return False
+    
+    def unwatch(self):
+        """Arrête la surveillance par interruption"""
+        if not self._watching:
+            return
+        try:
+            GPIO.remove_event_detect(self.pin)
+        except Exception as e:
+            logger.error(f"Erreur arrêt détection de fronts PIR: {e}")
+        self._watching = False
+    
     def cleanup(self):
         """Nettoie les ressources GPIO"""
+        self.unwatch()
         try:
             GPIO.cleanup(self.pin)
             logger.info("PIR nettoyé")
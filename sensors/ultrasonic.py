@@ -4,7 +4,7 @@ Module Ultrasonic (HC-SR04) pour la mesure de distance
 
 import RPi.GPIO as GPIO
 import time
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,6 +24,9 @@ class Ultrasonic:
         self.trigger_pin = trigger_pin
         self.echo_pin = echo_pin
         self.distance = None
+        self.last_error = None
+        # Mesure de l'écho, remplacée pour la capture brute et le rejeu (utils/capture.py)
+        self.echo = self._measure_echo
         
         try:
             GPIO.setmode(GPIO.BCM)
@@ -41,39 +44,15 @@ class Ultrasonic:
             Dictionnaire contenant la distance en cm
         """
         try:
-            # Envoi d'une impulsion
-            GPIO.output(self.trigger_pin, False)
-            time.sleep(0.000002)
-            GPIO.output(self.trigger_pin, True)
-            time.sleep(0.00001)
-            GPIO.output(self.trigger_pin, False)
-            
-            # Attente de la réponse - Attendre que echo passe à HIGH
-            timeout_start = time.time()
-            pulse_start = None
-            
-            # Attendre que l'echo passe à HIGH (début du signal)
-            while GPIO.input(self.echo_pin) == 0:
-                if time.time() - timeout_start > 0.1:  # Timeout après 100ms
-                    logger.warning(f"Ultrasonic timeout - Echo n'a pas démarré (GPIO {self.echo_pin})")
-                    return None
-            pulse_start = time.time()
-            
-            # Attendre que l'echo repasse à LOW (fin du signal)
-            timeout_start = time.time()
-            while GPIO.input(self.echo_pin) == 1:
-                pulse_end = time.time()
-                if time.time() - timeout_start > 0.1:  # Timeout après 100ms
-                    logger.warning(f"Ultrasonic timeout - Echo n'a pas fini (GPIO {self.echo_pin})")
-                    return None
-            
-            # Calcul de la distance
-            if pulse_start is None:
+            pulse_duration, error = self.echo()
+            if pulse_duration is None:
+                self.last_error = error
                 return None
-                
-            pulse_duration = pulse_end - pulse_start
             distance = (pulse_duration * 34300) / 2  # Vitesse du son = 343 m/s
             
+            # Le capteur répond : une distance hors plage n'est pas une panne
+            self.last_error = None
+            
             # Limitation de la plage de mesure (2-400 cm)
             if distance < 2 or distance > 400:
                 logger.debug(f"Ultrasonic distance hors plage: {distance} cm (GPIO {self.echo_pin})")
@@ -86,11 +65,44 @@ class Ultrasonic:
                 'unit': 'cm',
                 'timestamp': time.time()
             }
-            
+        
         except Exception as e:
             logger.error(f"Erreur lecture Ultrasonic (GPIO {self.echo_pin}): {e}")
+            self.last_error = str(e)
             return None
     
+    def _measure_echo(self) -> Tuple[Optional[float], Optional[str]]:
+        """
+        Envoie une impulsion et mesure la durée de l'écho
+        
+        Returns:
+            (durée de l'écho en secondes, None) ou (None, erreur) en cas de timeout
+        """
+        # Envoi d'une impulsion
+        GPIO.output(self.trigger_pin, False)
+        time.sleep(0.000002)
+        GPIO.output(self.trigger_pin, True)
+        time.sleep(0.00001)
+        GPIO.output(self.trigger_pin, False)
+        
+        # Attendre que l'echo passe à HIGH (début du signal)
+        timeout_start = time.time()
+        while GPIO.input(self.echo_pin) == 0:
+            if time.time() - timeout_start > 0.1:  # Timeout après 100ms
+                logger.warning(f"Ultrasonic timeout - Echo n'a pas démarré (GPIO {self.echo_pin})")
+                return None, "timeout echo (début)"
+        pulse_start = time.time()
+        
+        # Attendre que l'echo repasse à LOW (fin du signal)
+        pulse_end = pulse_start
+        timeout_start = time.time()
+        while GPIO.input(self.echo_pin) == 1:
+            pulse_end = time.time()
+            if time.time() - timeout_start > 0.1:  # Timeout après 100ms
+                logger.warning(f"Ultrasonic timeout - Echo n'a pas fini (GPIO {self.echo_pin})")
+                return None, "timeout echo (fin)"
+        return pulse_end - pulse_start, None
+    
     def get_distance(self) -> Optional[float]:
         """Retourne la distance mesurée"""
         data = self.read_data()
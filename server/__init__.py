@@ -0,0 +1,7 @@
+"""
+Module server - Traitements côté serveur (PC)
+"""
+
+from .aggregation import FleetAggregator
+
+__all__ = ['FleetAggregator']
@@ -0,0 +1,390 @@
+"""
+Module d'agrégation incrémentale côté serveur
+Chaque snapshot ou événement reçu met à jour, à l'ingestion, des agrégats
+horaires glissants par bus et pour toute la flotte (histogramme d'occupation,
+température moyenne, montées/descentes par heure, profil de vitesse). Les
+totaux de la fenêtre sont tenus à jour par ajout/retrait de tranches horaires :
+une requête du dashboard lit un résultat précalculé au lieu de relire les
+documents bruts. L'état est sauvegardé périodiquement pour survivre à un
+redémarrage du serveur.
+"""
+
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+
+from utils.persistence import atomic_write
+
+logger = logging.getLogger(__name__)
+
+FLEET = '__fleet__'
+
+# Occupation par tranches de 10 % (0 %, 10 %, ..., 100 %), vitesse par tranches de 10 km/h
+OCCUPANCY_BINS = 11
+SPEED_BIN_KMH = 10
+SPEED_BINS = 13
+
+
+class _Bucket:
+    """Compteurs d'une tranche horaire (ou totaux de la fenêtre)"""
+    
+    __slots__ = ('snapshots', 'occupancy', 'occupancy_sum', 'temperature_sum', 'temperature_n',
+                 'speed', 'speed_sum', 'speed_n', 'boardings', 'alightings')
+    
+    def __init__(self):
+        self.snapshots = 0
+        self.occupancy = [0] * OCCUPANCY_BINS
+        self.occupancy_sum = 0.0
+        self.temperature_sum = 0.0
+        self.temperature_n = 0
+        self.speed = [0] * SPEED_BINS
+        self.speed_sum = 0.0
+        self.speed_n = 0
+        self.boardings = 0
+        self.alightings = 0
+    
+    def merge(self, other: '_Bucket', sign: int = 1):
+        """Ajoute (sign=1) ou retire (sign=-1) les compteurs d'une autre tranche"""
+        self.snapshots += sign * other.snapshots
+        for i, value in enumerate(other.occupancy):
+            self.occupancy[i] += sign * value
+        self.occupancy_sum += sign * other.occupancy_sum
+        self.temperature_sum += sign * other.temperature_sum
+        self.temperature_n += sign * other.temperature_n
+        for i, value in enumerate(other.speed):
+            self.speed[i] += sign * value
+        self.speed_sum += sign * other.speed_sum
+        self.speed_n += sign * other.speed_n
+        self.boardings += sign * other.boardings
+        self.alightings += sign * other.alightings
+    
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> '_Bucket':
+        bucket = cls()
+        for name in cls.__slots__:
+            if name in data:
+                setattr(bucket, name, data[name])
+        return bucket
+
+
+class _Rollup:
+    """Tranches horaires d'un bus (ou de la flotte) et totaux de la fenêtre glissante"""
+    
+    __slots__ = ('hours', 'totals', 'version', 'cached', 'cached_version')
+    
+    def __init__(self):
+        self.hours: Dict[int, _Bucket] = {}
+        self.totals = _Bucket()
+        self.version = 0
+        self.cached: Optional[Dict] = None
+        self.cached_version = -1
+    
+    def bucket(self, hour: int) -> _Bucket:
+        bucket = self.hours.get(hour)
+        if bucket is None:
+            bucket = self.hours[hour] = _Bucket()
+        return bucket
+    
+    def expire(self, oldest: int):
+        """Retire des totaux les tranches antérieures à l'heure `oldest`"""
+        expired = [hour for hour in self.hours if hour < oldest]
+        for hour in expired:
+            self.totals.merge(self.hours.pop(hour), sign=-1)
+        if expired:
+            self.version += 1
+
+
+class FleetAggregator:
+    """Classe pour maintenir les agrégats d'occupation et de trajet de la flotte à l'ingestion"""
+    
+    def __init__(self, window_hours: int = 24, state_file: Optional[str] = None,
+                 persist_interval: float = 60.0):
+        """
+        Initialise le moteur d'agrégation
+        
+        Args:
+            window_hours: Durée de la fenêtre glissante en heures
+            state_file: Fichier de sauvegarde des agrégats (None = pas de sauvegarde)
+            persist_interval: Intervalle en secondes entre deux sauvegardes
+        """
+        self.window_hours = window_hours
+        self.state_file = Path(state_file) if state_file else None
+        self.persist_interval = persist_interval
+        self.latest_hour = 0
+        self.stats = {'snapshots': 0, 'events': 0, 'rejected': 0, 'saves': 0}
+        
+        self._rollups: Dict[str, _Rollup] = {FLEET: _Rollup()}
+        self._hour_cache: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if self.state_file:
+            self.load()
+    
+    def start(self):
+        """Démarre la sauvegarde périodique"""
+        if self._thread or not self.state_file:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='aggregation', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 5.0):
+        """Arrête la sauvegarde périodique et enregistre l'état"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        if self.state_file:
+            self.save()
+    
+    def ingest_snapshot(self, snapshot: Dict, bus_id: Optional[str] = None) -> bool:
+        """
+        Intègre un snapshot (format de SmartBus.collect_data) aux agrégats
+        
+        Args:
+            snapshot: Snapshot reçu
+            bus_id: Identifiant du bus (par défaut snapshot['bus_id'])
+        
+        Returns:
+            True si le snapshot a été pris en compte, False s'il est hors fenêtre ou invalide
+        """
+        hour = self._hour(snapshot.get('timestamp'))
+        if hour is None:
+            self.stats['rejected'] += 1
+            return False
+        
+        bus_id = bus_id or snapshot.get('bus_id', 'Bus1')
+        passengers = snapshot.get('passengers') or {}
+        sensors = snapshot.get('sensors') or {}
+        count, capacity = passengers.get('count'), passengers.get('max')
+        occupancy = min(count / capacity, 1.0) if count is not None and capacity else None
+        temperature = (sensors.get('dht22') or {}).get('temperature')
+        gps = sensors.get('gps') or {}
+        speed = gps.get('speed') if gps.get('has_fix', True) else None
+        
+        with self._lock:
+            if not self._advance(hour):
+                self.stats['rejected'] += 1
+                return False
+            for key in (bus_id, FLEET):
+                rollup = self._rollup(key)
+                for bucket in (rollup.bucket(hour), rollup.totals):
+                    bucket.snapshots += 1
+                    if occupancy is not None:
+                        bucket.occupancy[int(occupancy * 10)] += 1
+                        bucket.occupancy_sum += occupancy
+                    if temperature is not None:
+                        bucket.temperature_sum += temperature
+                        bucket.temperature_n += 1
+                    if speed is not None:
+                        bucket.speed[min(int(speed / SPEED_BIN_KMH), SPEED_BINS - 1)] += 1
+                        bucket.speed_sum += speed
+                        bucket.speed_n += 1
+                rollup.version += 1
+            self.stats['snapshots'] += 1
+        return True
+    
+    def ingest_snapshots(self, bus_id: str, snapshots: List[Dict]) -> int:
+        """
+        Intègre un lot de snapshots (POST /api/data/batch)
+        
+        Returns:
+            Nombre de snapshots pris en compte
+        """
+        return sum(self.ingest_snapshot(snapshot, bus_id) for snapshot in snapshots)
+    
+    def ingest_events(self, bus_id: str, events: List[Dict]) -> int:
+        """
+        Intègre un lot d'événements (POST /api/events) : montées et descentes
+        
+        Args:
+            bus_id: Identifiant du bus
+            events: Événements {'type', 'timestamp', 'data'} publiés par Uplink
+        
+        Returns:
+            Nombre d'événements pris en compte
+        """
+        accepted = 0
+        with self._lock:
+            for event in events:
+                kind = event.get('type')
+                if kind not in ('boarding', 'alighting'):
+                    continue
+                hour = self._hour(event.get('timestamp'))
+                if hour is None or not self._advance(hour):
+                    self.stats['rejected'] += 1
+                    continue
+                for key in (bus_id, FLEET):
+                    rollup = self._rollup(key)
+                    for bucket in (rollup.bucket(hour), rollup.totals):
+                        if kind == 'boarding':
+                            bucket.boardings += 1
+                        else:
+                            bucket.alightings += 1
+                    rollup.version += 1
+                accepted += 1
+            self.stats['events'] += accepted
+        return accepted
+    
+    def bus_summary(self, bus_id: str) -> Optional[Dict]:
+        """
+        Agrégats d'un bus sur la fenêtre glissante
+        
+        Returns:
+            Résumé précalculé, None si le bus est inconnu
+        """
+        with self._lock:
+            rollup = self._rollups.get(bus_id)
+            if rollup is None or bus_id == FLEET:
+                return None
+            return self._summary(bus_id, rollup)
+    
+    def fleet_summary(self) -> Dict:
+        """Agrégats de toute la flotte sur la fenêtre glissante"""
+        with self._lock:
+            summary = self._summary(FLEET, self._rollups[FLEET])
+            summary['buses'] = len(self._rollups) - 1
+            return summary
+    
+    def buses(self) -> List[str]:
+        """Identifiants des bus présents dans la fenêtre"""
+        with self._lock:
+            return [key for key in self._rollups if key != FLEET]
+    
+    def save(self):
+        """Sauvegarde les agrégats (écriture atomique)"""
+        with self._lock:
+            state = {
+                'window_hours': self.window_hours,
+                'latest_hour': self.latest_hour,
+                'rollups': {
+                    key: {str(hour): bucket.to_dict() for hour, bucket in rollup.hours.items()}
+                    for key, rollup in self._rollups.items()
+                },
+            }
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.state_file, json.dumps(state, separators=(',', ':')).encode('utf-8'))
+        self.stats['saves'] += 1
+    
+    def load(self) -> bool:
+        """
+        Recharge les agrégats sauvegardés (les totaux sont recalculés depuis les tranches)
+        
+        Returns:
+            True si un état a été rechargé
+        """
+        try:
+            state = json.loads(self.state_file.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(f"Agrégats sauvegardés illisibles, reconstruction à partir de zéro: {e}")
+            return False
+        
+        with self._lock:
+            self.latest_hour = state.get('latest_hour', 0)
+            self._rollups = {FLEET: _Rollup()}
+            for key, hours in state.get('rollups', {}).items():
+                rollup = self._rollup(key)
+                for hour, data in hours.items():
+                    bucket = _Bucket.from_dict(data)
+                    rollup.hours[int(hour)] = bucket
+                    rollup.totals.merge(bucket)
+            self._expire()
+        logger.info(f"Agrégats rechargés: {len(self._rollups) - 1} bus")
+        return True
+    
+    def _rollup(self, key: str) -> _Rollup:
+        rollup = self._rollups.get(key)
+        if rollup is None:
+            rollup = self._rollups[key] = _Rollup()
+        return rollup
+    
+    def _hour(self, timestamp) -> Optional[int]:
+        """Numéro d'heure (epoch // 3600) d'un horodatage ISO, avec cache par préfixe 'AAAA-MM-JJTHH'"""
+        if not isinstance(timestamp, str) or len(timestamp) < 13:
+            return None
+        prefix = timestamp[:13]
+        hour = self._hour_cache.get(prefix)
+        if hour is None:
+            try:
+                hour = int(datetime.strptime(prefix, '%Y-%m-%dT%H').timestamp()) // 3600
+            except ValueError:
+                return None
+            if len(self._hour_cache) > 10000:
+                self._hour_cache.clear()
+            self._hour_cache[prefix] = hour
+        return hour
+    
+    def _advance(self, hour: int) -> bool:
+        """Fait glisser la fenêtre si besoin ; retourne False si l'heure est déjà sortie de la fenêtre"""
+        if hour > self.latest_hour:
+            self.latest_hour = hour
+            self._expire()
+        return hour > self.latest_hour - self.window_hours
+    
+    def _expire(self):
+        """Retire les tranches sorties de la fenêtre et oublie les bus sans donnée récente"""
+        oldest = self.latest_hour - self.window_hours + 1
+        for key in list(self._rollups):
+            rollup = self._rollups[key]
+            rollup.expire(oldest)
+            if key != FLEET and not rollup.hours:
+                del self._rollups[key]
+    
+    def _summary(self, key: str, rollup: _Rollup) -> Dict:
+        """Résumé d'un agrégat, recalculé uniquement s'il a changé depuis la dernière requête"""
+        if rollup.cached_version == rollup.version:
+            return dict(rollup.cached)
+        
+        totals = rollup.totals
+        hourly = []
+        for hour in sorted(rollup.hours):
+            bucket = rollup.hours[hour]
+            hourly.append({
+                'hour': datetime.fromtimestamp(hour * 3600).isoformat(),
+                'snapshots': bucket.snapshots,
+                'boardings': bucket.boardings,
+                'alightings': bucket.alightings,
+                'mean_occupancy': bucket.occupancy_sum / sum(bucket.occupancy) if any(bucket.occupancy) else None,
+                'mean_speed': bucket.speed_sum / bucket.speed_n if bucket.speed_n else None,
+            })
+        occupied = sum(totals.occupancy)
+        summary = {
+            'bus_id': None if key == FLEET else key,
+            'window_hours': self.window_hours,
+            'snapshots': totals.snapshots,
+            'occupancy': {
+                'histogram': list(totals.occupancy),
+                'mean': totals.occupancy_sum / occupied if occupied else None,
+            },
+            'temperature': {
+                'mean': totals.temperature_sum / totals.temperature_n if totals.temperature_n else None,
+            },
+            'speed': {
+                'histogram': list(totals.speed),
+                'bin_kmh': SPEED_BIN_KMH,
+                'mean': totals.speed_sum / totals.speed_n if totals.speed_n else None,
+            },
+            'boardings': totals.boardings,
+            'alightings': totals.alightings,
+            'hourly': hourly,
+        }
+        rollup.cached = summary
+        rollup.cached_version = rollup.version
+        return dict(summary)
+    
+    def _loop(self):
+        """Thread de sauvegarde périodique"""
+        while not self._stop.wait(self.persist_interval):
+            try:
+                self.save()
+            except Exception as e:
+                logger.error(f"Erreur lors de la sauvegarde des agrégats: {e}")
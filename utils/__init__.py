@@ -2,11 +2,32 @@
 Module utils - Utilitaires pour le projet
 """
 
-from .data_logger import DataLogger
-from .config_loader import ConfigLoader
+from .data_logger import DataLogger, BatchWriter
+from .config_loader import ConfigLoader, ConfigAccessor, ConfigChange
 from .http_client import HTTPClient
-
-__all__ = ['DataLogger', 'ConfigLoader', 'HTTPClient']
+from .mqtt_client import MQTTClient
+from .uplink import Uplink
+from .trajectory import TrajectoryCompressor
+from .stops import StopIndex, StopDetector
+from .log_setup import setup_logging, stop_logging, RateLimitFilter
+from .shm_ring import SharedRingBuffer
+from .acquisition import AcquisitionSupervisor, SharedMemorySensor
+from .adaptive import MotionStateEstimator, AdaptiveSampler
+from .startup import HardwareInitializer
+from .batch_buffer import SnapshotBatch
+from .datastore import SQLiteDatastore
+from .retention import RetentionManager
+from .persistence import StateJournal, atomic_write, recover_directory
+from .door_gate import DoorGate
+from .i2c_bus import I2CBus, MockI2CBackend, PRIORITY_IMU, PRIORITY_DISPLAY
+from .fusion import SensorFusion, MagnetometerCalibration
+from .alignment import StreamAligner
+from .capture import CaptureWriter, CaptureReader, CaptureReplay
+from .blackbox import BlackBoxRecorder
+from .anomaly import AnomalyDetector
+from .fanout import OutputPipeline
+
+__all__ = ['DataLogger', 'BatchWriter', 'ConfigLoader', 'ConfigAccessor', 'ConfigChange', 'HTTPClient', 'MQTTClient', 'Uplink', 'TrajectoryCompressor', 'StopIndex', 'StopDetector', 'setup_logging', 'stop_logging', 'RateLimitFilter', 'SharedRingBuffer', 'AcquisitionSupervisor', 'SharedMemorySensor', 'MotionStateEstimator', 'AdaptiveSampler', 'HardwareInitializer', 'SnapshotBatch', 'SQLiteDatastore', 'RetentionManager', 'StateJournal', 'atomic_write', 'recover_directory', 'DoorGate', 'I2CBus', 'MockI2CBackend', 'PRIORITY_IMU', 'PRIORITY_DISPLAY', 'SensorFusion', 'MagnetometerCalibration', 'StreamAligner', 'CaptureWriter', 'CaptureReader', 'CaptureReplay', 'BlackBoxRecorder', 'AnomalyDetector', 'OutputPipeline']
 
 
 
@@ -0,0 +1,355 @@
+"""
+Module d'acquisition multiprocessus
+Les capteurs à cadence élevée (ultrasons des portes, MPU9250) sont lus dans des
+processus dédiés, épinglés sur un cœur, qui écrivent leurs échantillons dans un
+tampon circulaire en mémoire partagée. Le processus principal lit ces tampons
+via des capteurs mandataires ayant la même interface que les pilotes, et un
+superviseur redémarre les processus qui s'arrêtent.
+"""
+
+import math
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+from .shm_ring import SharedRingBuffer
+
+logger = logging.getLogger(__name__)
+
+# Format des enregistrements : horodatage, statut, valeurs
+RECORD_FORMATS = {
+    'ultrasonic': 'dBd',
+    'mpu9250': 'dB9d',
+}
+
+STATUS_OK = 0
+STATUS_NO_VALUE = 1  # le capteur répond mais sans valeur exploitable (distance hors plage)
+STATUS_ERROR = 2
+
+_AXES = ('x', 'y', 'z')
+
+
+def create_sensor(kind: str, params: Dict[str, Any]):
+    """
+    Crée le pilote d'un capteur (appelé dans le processus d'acquisition)
+    
+    Args:
+        kind: Type de capteur ('ultrasonic' ou 'mpu9250')
+        params: Arguments du constructeur du pilote
+    
+    Returns:
+        Pilote du capteur
+    """
+    if kind == 'ultrasonic':
+        from sensors.ultrasonic import Ultrasonic
+        return Ultrasonic(**params)
+    if kind == 'mpu9250':
+        from sensors.mpu9250 import MPU9250
+        return MPU9250(**params)
+    raise ValueError(f"Type de capteur non supporté: {kind}")
+
+
+def pack_sample(kind: str, data: Dict) -> Tuple:
+    """Convertit les données d'un pilote en valeurs d'enregistrement"""
+    if kind == 'ultrasonic':
+        return (data['distance'],)
+    return tuple(data[group][axis] for group in ('acceleration', 'gyroscope', 'magnetometer') for axis in _AXES)
+
+
+def acquisition_loop(kind: str, sensor: Any, ring: SharedRingBuffer, rate: float,
+                     stop_event) -> None:
+    """
+    Lit le capteur à cadence fixe et écrit chaque échantillon dans le tampon
+    
+    Les échéances sont calculées depuis le début de la boucle pour que la
+    durée d'une lecture ne décale pas les suivantes.
+    
+    Args:
+        kind: Type de capteur
+        sensor: Pilote du capteur
+        ring: Tampon de sortie
+        rate: Cadence d'échantillonnage en Hz
+        stop_event: Événement (threading ou multiprocessing) demandant l'arrêt
+    """
+    period = 1.0 / rate
+    empty = (math.nan,) * (1 if kind == 'ultrasonic' else 9)
+    next_time = time.monotonic()
+    
+    while not stop_event.is_set():
+        data = sensor.read_data()
+        if data is not None:
+            ring.push(time.time(), STATUS_OK, *pack_sample(kind, data))
+        else:
+            status = STATUS_ERROR if getattr(sensor, 'last_error', None) else STATUS_NO_VALUE
+            ring.push(time.time(), status, *empty)
+        
+        next_time += period
+        delay = next_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            # En retard d'une période ou plus : repartir de maintenant plutôt que rattraper en rafale
+            next_time = time.monotonic()
+
+
+def _worker_main(name: str, kind: str, params: Dict[str, Any], ring_name: str, capacity: int,
+                 rate: float, core: Optional[int], log_level: str, stop_event):
+    """Point d'entrée d'un processus d'acquisition"""
+    # L'arrêt est piloté par le processus principal (Ctrl+C y est traité)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    
+    # La file de logs du processus principal n'est pas partagée : logs sur la sortie d'erreur
+    from .log_setup import setup_logging
+    setup_logging(level=log_level, log_file=None)
+    
+    if core is not None and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, {core})
+        except OSError as e:
+            logger.warning(f"Impossible d'épingler {name} sur le cœur {core}: {e}")
+    
+    ring = SharedRingBuffer(RECORD_FORMATS[kind], capacity, name=ring_name, create=False)
+    sensor = create_sensor(kind, params)
+    logger.info(f"Acquisition {name} démarrée (pid {os.getpid()}, {rate:g} Hz, cœur {core})")
+    try:
+        acquisition_loop(kind, sensor, ring, rate, stop_event)
+    finally:
+        if hasattr(sensor, 'cleanup'):
+            sensor.cleanup()
+        ring.close()
+
+
+class SharedMemorySensor:
+    """Capteur mandataire : expose les échantillons d'un processus d'acquisition comme un pilote"""
+    
+    def __init__(self, name: str, kind: str, ring: SharedRingBuffer, stale_after: float):
+        """
+        Initialise le mandataire
+        
+        Args:
+            name: Nom du capteur
+            kind: Type de capteur ('ultrasonic' ou 'mpu9250')
+            ring: Tampon partagé alimenté par le processus d'acquisition
+            stale_after: Âge maximal en secondes du dernier échantillon avant de signaler une panne
+        """
+        self.name = name
+        self.kind = kind
+        self.ring = ring
+        self.stale_after = stale_after
+        self.last_error = None
+    
+    def read_data(self) -> Optional[Dict]:
+        """
+        Résume les échantillons reçus depuis la lecture précédente
+        
+        Returns:
+            Dictionnaire au format du pilote, complété par le nombre d'échantillons
+            et les extrêmes de la fenêtre (distance minimale, pic d'accélération)
+        """
+        records = self.ring.read_new()
+        if not records:
+            latest = self.ring.latest()
+            if latest is None or time.time() - latest[0] > self.stale_after:
+                self.last_error = "processus d'acquisition inactif"
+                return None
+            records = [latest]
+        
+        valid = [r for r in records if r[1] == STATUS_OK]
+        if not valid:
+            self.last_error = "erreur de lecture" if records[-1][1] == STATUS_ERROR else None
+            return None
+        
+        self.last_error = None
+        if self.kind == 'ultrasonic':
+            return {
+                'distance': round(valid[-1][2], 2),
+                'unit': 'cm',
+                'timestamp': valid[-1][0],
+                'min_distance': round(min(r[2] for r in valid), 2),
+                'samples': len(records)
+            }
+        
+        last = valid[-1]
+        peak = max(valid, key=lambda r: r[2] * r[2] + r[3] * r[3])
+        return {
+            'acceleration': self._vector(last, 2),
+            'gyroscope': self._vector(last, 5),
+            'magnetometer': self._vector(last, 8),
+            'peak_acceleration': self._vector(peak, 2),
+            'samples': len(records)
+        }
+    
+    @staticmethod
+    def _vector(record: Tuple, offset: int) -> Dict:
+        return {axis: round(record[offset + i], 3) for i, axis in enumerate(_AXES)}
+    
+    def cleanup(self):
+        """Les broches sont libérées par le processus d'acquisition"""
+        pass
+
+
+class AcquisitionSupervisor:
+    """Classe pour lancer, surveiller et redémarrer les processus d'acquisition"""
+    
+    def __init__(self, capacity: int = 1024, cpu_affinity: bool = True,
+                 base_backoff: float = 1.0, max_backoff: float = 30.0,
+                 check_interval: float = 0.5, log_level: str = 'INFO'):
+        """
+        Initialise le superviseur
+        
+        Args:
+            capacity: Nombre d'échantillons conservés par tampon
+            cpu_affinity: Épingler chaque processus sur un cœur (le cœur 0 reste au processus principal)
+            base_backoff: Délai en secondes avant de redémarrer un processus arrêté
+            max_backoff: Délai maximal entre deux redémarrages d'un processus instable
+            check_interval: Intervalle en secondes entre deux vérifications des processus
+            log_level: Niveau de log des processus d'acquisition
+        """
+        self.capacity = capacity
+        self.cpu_affinity = cpu_affinity
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.check_interval = check_interval
+        self.log_level = log_level
+        
+        # Pas de fork : le processus principal a déjà des threads (logs, démarrage, envoi, surveillance)
+        # dont les verrous seraient copiés dans l'état où ils sont ; les paramètres sont sérialisables
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        self._stop_event = self._context.Event()
+        self._workers: Dict[str, Dict] = {}
+        self._monitor: Optional[threading.Thread] = None
+        self._running = False
+    
+    def add(self, name: str, kind: str, params: Dict[str, Any], rate: float) -> SharedMemorySensor:
+        """
+        Déclare un capteur acquis dans un processus dédié
+        
+        Args:
+            name: Nom du capteur (ex: 'ultrasonic_entry')
+            kind: Type de capteur ('ultrasonic' ou 'mpu9250')
+            params: Arguments du constructeur du pilote
+            rate: Cadence d'échantillonnage en Hz
+        
+        Returns:
+            Capteur mandataire à lire depuis le processus principal
+        """
+        ring = SharedRingBuffer(RECORD_FORMATS[kind], self.capacity)
+        self._workers[name] = {
+            'kind': kind,
+            'params': params,
+            'rate': rate,
+            'ring': ring,
+            'core': self._core_for(len(self._workers)),
+            'process': None,
+            'started': 0.0,
+            'backoff': self.base_backoff,
+            'next_start': 0.0,
+            'restarts': 0
+        }
+        # Sans nouvel échantillon pendant 5 périodes (1 s au moins), le processus est considéré arrêté
+        return SharedMemorySensor(name, kind, ring, stale_after=max(1.0, 5.0 / rate))
+    
+    def start(self):
+        """Lance les processus et le thread de surveillance"""
+        if self._running:
+            return
+        self._running = True
+        self._stop_event.clear()
+        for name in self._workers:
+            self._spawn(name)
+        self._monitor = threading.Thread(target=self._monitor_loop, name='acquisition-supervisor', daemon=True)
+        self._monitor.start()
+    
+    def stop(self, timeout: float = 2.0):
+        """
+        Arrête les processus et libère la mémoire partagée
+        
+        Args:
+            timeout: Attente maximale en secondes par processus avant de le terminer
+        """
+        self._running = False
+        self._stop_event.set()
+        if self._monitor:
+            self._monitor.join(timeout=self.check_interval + 1)
+            self._monitor = None
+        
+        for name, worker in self._workers.items():
+            process = worker['process']
+            if process is not None:
+                process.join(timeout)
+                if process.is_alive():
+                    logger.warning(f"Processus d'acquisition {name} arrêté de force")
+                    process.terminate()
+                    process.join(timeout)
+                worker['process'] = None
+            worker['ring'].close()
+            worker['ring'].unlink()
+        logger.info("Acquisition multiprocessus arrêtée")
+    
+    def stats(self) -> Dict[str, Dict]:
+        """Retourne, par capteur, le pid, l'état du processus, les redémarrages et les échantillons perdus"""
+        return {
+            name: {
+                'pid': worker['process'].pid if worker['process'] else None,
+                'alive': bool(worker['process'] and worker['process'].is_alive()),
+                'core': worker['core'],
+                'restarts': worker['restarts'],
+                'dropped': worker['ring'].dropped
+            }
+            for name, worker in self._workers.items()
+        }
+    
+    def _core_for(self, index: int) -> Optional[int]:
+        """Cœur attribué au n-ième processus (None si l'épinglage est désactivé ou impossible)"""
+        if not self.cpu_affinity or not hasattr(os, 'sched_getaffinity'):
+            return None
+        cores = sorted(os.sched_getaffinity(0))
+        if len(cores) < 2:
+            return None
+        available = cores[1:]
+        return available[index % len(available)]
+    
+    def _spawn(self, name: str):
+        """Lance (ou relance) le processus d'un capteur"""
+        worker = self._workers[name]
+        process = self._context.Process(
+            target=_worker_main,
+            args=(name, worker['kind'], worker['params'], worker['ring'].name, self.capacity,
+                  worker['rate'], worker['core'], self.log_level, self._stop_event),
+            name=f'acquisition-{name}',
+            daemon=True
+        )
+        process.start()
+        worker['process'] = process
+        worker['started'] = time.monotonic()
+    
+    def _monitor_loop(self):
+        """Redémarre les processus arrêtés, avec un délai croissant s'ils s'arrêtent en boucle"""
+        while not self._stop_event.wait(self.check_interval):
+            now = time.monotonic()
+            for name, worker in self._workers.items():
+                process = worker['process']
+                if process is None or process.is_alive():
+                    continue
+                
+                if not worker['next_start']:
+                    # Un processus stable pendant 10 délais repart avec le délai de base
+                    if now - worker['started'] > 10 * worker['backoff']:
+                        worker['backoff'] = self.base_backoff
+                    else:
+                        worker['backoff'] = min(worker['backoff'] * 2, self.max_backoff)
+                    worker['next_start'] = now + worker['backoff']
+                    logger.warning(
+                        f"Processus d'acquisition {name} arrêté (code {process.exitcode}) - "
+                        f"redémarrage dans {worker['backoff']:.0f}s"
+                    )
+                
+                if now >= worker['next_start'] and self._running:
+                    worker['next_start'] = 0.0
+                    worker['restarts'] += 1
+                    self._spawn(name)
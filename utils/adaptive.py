@@ -0,0 +1,249 @@
+"""
+Module d'échantillonnage adaptatif
+L'état de mouvement du bus (stationné, à l'arrêt moteur tournant, en
+mouvement, portes actives) est déduit de la vitesse GPS et des vibrations
+mesurées par le MPU9250 ; chaque état a un profil qui fixe l'intervalle de
+lecture de chaque capteur, la fréquence des snapshots et la taille des lots
+envoyés au serveur
+"""
+
+import copy
+import math
+import time
+from typing import Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATE_PARKED = 'parked'
+STATE_IDLING = 'idling'
+STATE_MOVING = 'moving'
+STATE_DOORS_ACTIVE = 'doors_active'
+
+# Priorité d'échantillonnage : passer à un état plus prioritaire est immédiat,
+# revenir à un état moins prioritaire attend `min_dwell` secondes
+_PRIORITY = {STATE_PARKED: 0, STATE_MOVING: 1, STATE_IDLING: 2, STATE_DOORS_ACTIVE: 3}
+
+# Intervalles en secondes ; `upload_batch` = nombre de snapshots par envoi.
+# Un passage à une porte dure moins d'une seconde : les ultrasons (dont la
+# lecture coûte quelques ms de CPU en attente active) ne sont lus rapidement
+# qu'à l'arrêt, quand les portes peuvent s'ouvrir. Au ralenti, ils gardent la
+# cadence des portes actives : un passager qui monte juste après l'arrêt serait
+# manqué avant que l'état passe à STATE_DOORS_ACTIVE ; le gain en CPU est réservé
+# au stationnement et au mouvement
+DEFAULT_PROFILES: Dict[str, Dict] = {
+    STATE_PARKED: {
+        'snapshot_interval': 300.0,
+        'upload_batch': 6,
+        'sensors': {'gps': 60.0, 'dht22': 300.0, 'mpu9250': 5.0,
+                    'ultrasonic_entry': 10.0, 'ultrasonic_exit': 10.0}
+    },
+    STATE_IDLING: {
+        'snapshot_interval': 15.0,
+        'upload_batch': 2,
+        'sensors': {'gps': 2.0, 'dht22': 120.0, 'mpu9250': 1.0,
+                    'ultrasonic_entry': 0.5, 'ultrasonic_exit': 0.5}
+    },
+    STATE_MOVING: {
+        'snapshot_interval': 5.0,
+        'upload_batch': 1,
+        'sensors': {'gps': 1.0, 'dht22': 60.0, 'mpu9250': 1.0,
+                    'ultrasonic_entry': 10.0, 'ultrasonic_exit': 10.0}
+    },
+    STATE_DOORS_ACTIVE: {
+        'snapshot_interval': 5.0,
+        'upload_batch': 1,
+        'sensors': {'gps': 2.0, 'dht22': 120.0, 'mpu9250': 1.0,
+                    'ultrasonic_entry': 0.5, 'ultrasonic_exit': 0.5}
+    },
+}
+
+
+class MotionStateEstimator:
+    """Classe pour déduire l'état de mouvement du bus"""
+    
+    def __init__(self, moving_speed: float = 5.0, vibration_threshold: float = 0.02,
+                 parked_after: float = 300.0, door_hold: float = 10.0,
+                 min_dwell: float = 10.0, smoothing: float = 0.2):
+        """
+        Initialise l'estimateur
+        
+        Args:
+            moving_speed: Vitesse en km/h à partir de laquelle le bus est en mouvement
+            vibration_threshold: Vibration (écart moyen de la norme d'accélération, en g) indiquant un moteur tournant
+            parked_after: Durée en secondes sans vitesse ni vibration avant de considérer le bus stationné
+            door_hold: Durée en secondes pendant laquelle les portes restent actives après une détection
+            min_dwell: Durée en secondes pendant laquelle un état moins prioritaire doit se confirmer
+            smoothing: Coefficient de la moyenne glissante exponentielle des vibrations (0-1)
+        """
+        self.moving_speed = moving_speed
+        self.vibration_threshold = vibration_threshold
+        self.parked_after = parked_after
+        self.door_hold = door_hold
+        self.min_dwell = min_dwell
+        self.smoothing = smoothing
+        
+        self.state = STATE_IDLING
+        self.speed: Optional[float] = None
+        self.vibration = 0.0
+        self._mean_magnitude: Optional[float] = None
+        self._last_door: Optional[float] = None
+        self._still_since: Optional[float] = None
+        self._candidate: Optional[str] = None
+        self._candidate_since = 0.0
+    
+    def update(self, speed: Optional[float], acceleration: Optional[Dict],
+               door_active: bool, now: float) -> str:
+        """
+        Intègre de nouvelles mesures
+        
+        Args:
+            speed: Vitesse GPS en km/h (None si pas de nouvelle mesure : la précédente est conservée)
+            acceleration: Accélération {'x', 'y', 'z'} en g (None si pas de nouvelle mesure)
+            door_active: Un passage a été détecté à une porte
+            now: Instant courant en secondes (horloge monotone)
+        
+        Returns:
+            État de mouvement courant
+        """
+        if speed is not None:
+            self.speed = speed
+        if acceleration is not None:
+            self._update_vibration(acceleration)
+        if door_active:
+            self._last_door = now
+        
+        candidate = self._classify(now)
+        if candidate == self.state:
+            self._candidate = None
+        elif _PRIORITY[candidate] > _PRIORITY[self.state]:
+            self._set_state(candidate)
+        elif candidate != self._candidate:
+            self._candidate, self._candidate_since = candidate, now
+        elif now - self._candidate_since >= self.min_dwell:
+            self._set_state(candidate)
+        return self.state
+    
+    def _update_vibration(self, acceleration: Dict):
+        """Met à jour la moyenne glissante de l'écart de la norme d'accélération"""
+        magnitude = math.sqrt(sum((acceleration.get(axis) or 0.0) ** 2 for axis in ('x', 'y', 'z')))
+        if self._mean_magnitude is None:
+            self._mean_magnitude = magnitude
+            return
+        deviation = abs(magnitude - self._mean_magnitude)
+        self._mean_magnitude += self.smoothing * (magnitude - self._mean_magnitude)
+        self.vibration += self.smoothing * (deviation - self.vibration)
+    
+    def _classify(self, now: float) -> str:
+        """État correspondant aux dernières mesures, sans hystérésis"""
+        if self._last_door is not None and now - self._last_door <= self.door_hold:
+            self._still_since = None
+            return STATE_DOORS_ACTIVE
+        
+        vibrating = self.vibration >= self.vibration_threshold
+        if self.speed is not None and self.speed >= self.moving_speed:
+            moving = True
+        else:
+            # Sans vitesse GPS, des vibrations suffisent à supposer le bus en mouvement
+            moving = self.speed is None and vibrating
+        if moving or vibrating:
+            self._still_since = None
+            return STATE_MOVING if moving else STATE_IDLING
+        
+        if self._still_since is None:
+            self._still_since = now
+        return STATE_PARKED if now - self._still_since >= self.parked_after else STATE_IDLING
+    
+    def _set_state(self, state: str):
+        logger.info(f"État de mouvement: {self.state} → {state}")
+        self.state = state
+        self._candidate = None
+
+
+class AdaptiveSampler:
+    """Classe pour décider, selon l'état de mouvement, quels capteurs lire et quand enregistrer"""
+    
+    def __init__(self, estimator: MotionStateEstimator, profiles: Optional[Dict] = None):
+        """
+        Initialise l'échantillonneur
+        
+        Args:
+            estimator: Estimateur de l'état de mouvement
+            profiles: Profils par état, fusionnés avec DEFAULT_PROFILES
+        """
+        self.estimator = estimator
+        self.set_profiles(profiles)
+        self._last_read: Dict[str, float] = {}
+        self._last_snapshot: Optional[float] = None
+    
+    def set_profiles(self, profiles: Optional[Dict]):
+        """
+        Remplace les profils (utilisé lors du rechargement de la configuration)
+        
+        Args:
+            profiles: Profils par état ; les valeurs absentes reprennent DEFAULT_PROFILES
+        """
+        merged = copy.deepcopy(DEFAULT_PROFILES)
+        for state, profile in (profiles or {}).items():
+            if state not in merged or not isinstance(profile, dict):
+                logger.warning(f"Profil d'échantillonnage inconnu ignoré: {state}")
+                continue
+            merged[state]['sensors'].update(profile.get('sensors') or {})
+            merged[state].update({k: v for k, v in profile.items() if k != 'sensors'})
+        for profile in merged.values():
+            # La boucle principale tourne à la cadence de l'intervalle le plus court du profil
+            profile['tick'] = min(list(profile['sensors'].values()) + [profile['snapshot_interval']])
+        self.profiles = merged
+    
+    @property
+    def state(self) -> str:
+        """État de mouvement courant"""
+        return self.estimator.state
+    
+    @property
+    def profile(self) -> Dict:
+        """Profil de l'état courant"""
+        return self.profiles[self.estimator.state]
+    
+    @property
+    def tick(self) -> float:
+        """Intervalle en secondes entre deux itérations de la boucle principale"""
+        return self.profile['tick']
+    
+    def update(self, speed: Optional[float], acceleration: Optional[Dict],
+               door_active: bool, now: Optional[float] = None) -> Optional[str]:
+        """
+        Met à jour l'état de mouvement
+        
+        Returns:
+            Nouvel état s'il a changé, None sinon
+        """
+        previous = self.estimator.state
+        state = self.estimator.update(speed, acceleration, door_active, time.monotonic() if now is None else now)
+        return state if state != previous else None
+    
+    def sensor_due(self, name: str, now: Optional[float] = None) -> bool:
+        """
+        Indique si un capteur doit être lu à cette itération (et note la lecture)
+        
+        Args:
+            name: Nom du capteur
+            now: Instant courant (horloge monotone)
+        """
+        return self._due(name, self.profile['sensors'].get(name, self.tick), now)
+    
+    def snapshot_due(self, now: Optional[float] = None) -> bool:
+        """Indique si un snapshot doit être enregistré à cette itération (et le note)"""
+        return self._due(None, self.profile['snapshot_interval'], now)
+    
+    def _due(self, name: Optional[str], interval: float, now: Optional[float]) -> bool:
+        now = time.monotonic() if now is None else now
+        last = self._last_snapshot if name is None else self._last_read.get(name)
+        # Tolérance d'une demi-itération pour absorber l'imprécision de l'attente
+        if last is not None and now - last < interval - self.tick / 2:
+            return False
+        if name is None:
+            self._last_snapshot = now
+        else:
+            self._last_read[name] = now
+        return True
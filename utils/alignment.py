@@ -0,0 +1,321 @@
+"""
+Module d'alignement des flux de capteurs
+Chaque pilote horodate ses mesures à sa manière : time.time() pour les
+ultrasons, le PIR et les capteurs lus en multiprocessus, heure UTC NMEA du
+fix pour le GPS, rien pour le DHT22 et le MPU9250 ; collect_data horodate
+l'instantané avec datetime.now(). Les valeurs d'un même instantané ont donc
+été mesurées à des instants différents. Le module ramène chaque mesure sur
+l'horloge monotone, la conserve dans un tampon par capteur et produit des
+instantanés à des instants exacts, par interpolation linéaire (vectorisée
+avec numpy) ou maintien de la dernière valeur, avec l'âge de chaque valeur.
+"""
+
+import bisect
+import math
+import time
+from datetime import datetime, time as dt_time, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+METHOD_LINEAR = 'linear'
+METHOD_HOLD = 'hold'
+_METHODS = (METHOD_LINEAR, METHOD_HOLD)
+
+
+def wall_to_monotonic(timestamp: float) -> float:
+    """Convertit un horodatage time.time() en temps de l'horloge monotone"""
+    return timestamp + (time.monotonic() - time.time())
+
+
+def monotonic_to_wall(timestamp: float) -> float:
+    """Convertit un temps de l'horloge monotone en horodatage time.time()"""
+    return timestamp + (time.time() - time.monotonic())
+
+
+def nmea_to_monotonic(value) -> Optional[float]:
+    """
+    Convertit l'heure UTC d'une trame NMEA (sans date) en temps de l'horloge monotone
+    
+    Args:
+        value: Heure ('HH:MM:SS[.ffffff]' ou datetime.time) ; le jour retenu est
+            celui qui la rapproche le plus de l'heure courante (passage de minuit)
+    
+    Returns:
+        Temps monotone, ou None si l'heure n'est pas lisible
+    """
+    if isinstance(value, str):
+        try:
+            value = dt_time.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, dt_time):
+        return None
+    now = datetime.now(timezone.utc)
+    stamp = datetime.combine(now.date(), value.replace(tzinfo=None), tzinfo=timezone.utc)
+    if stamp - now > timedelta(hours=12):
+        stamp -= timedelta(days=1)
+    elif now - stamp > timedelta(hours=12):
+        stamp += timedelta(days=1)
+    return wall_to_monotonic(stamp.timestamp())
+
+
+def _flatten(values: Dict, prefix: str = '') -> Dict[str, float]:
+    """Champs numériques d'une mesure, dictionnaires imbriqués aplatis ('acceleration.x')"""
+    flat = {}
+    for key, value in values.items():
+        if key == 'timestamp' and not prefix:
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + '.'))
+        elif value is None:
+            flat[name] = math.nan
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+class _Stream:
+    """Tampon d'un capteur : instants croissants et valeurs des champs"""
+    
+    def __init__(self, fields: Sequence[str], capacity: int, method: str, max_gap: float):
+        self.fields = list(fields)
+        self.paths = [field.split('.') for field in self.fields]
+        self.capacity = capacity
+        self.method = method
+        self.max_gap = max_gap
+        self.pushed = 0
+        self.dropped = 0
+        self.vectorized = NUMPY_AVAILABLE
+        if self.vectorized:
+            # Deux fois la capacité : la fenêtre n'est recopiée en tête qu'une fois le tampon plein
+            self.times = np.empty(2 * capacity)
+            self.values = np.empty((2 * capacity, len(self.fields)))
+        else:
+            self.times = []
+            self.values = []
+        self.start = 0
+        self.end = 0
+    
+    def __len__(self) -> int:
+        return self.end - self.start if self.vectorized else min(len(self.times), self.capacity)
+    
+    def last_time(self) -> Optional[float]:
+        if not len(self):
+            return None
+        return float(self.times[self.end - 1]) if self.vectorized else self.times[-1]
+    
+    def extend(self, timestamps: Sequence[float], rows: Sequence[Sequence[float]]):
+        """Ajoute des mesures ; celles antérieures à la dernière conservée sont ignorées"""
+        last = self.last_time()
+        if self.vectorized:
+            timestamps = np.asarray(timestamps, dtype=float)
+            rows = np.asarray(rows, dtype=float).reshape(len(timestamps), len(self.fields))
+            self.pushed += len(timestamps)
+            if last is not None and len(timestamps) and timestamps[0] < last:
+                keep = timestamps >= last
+                self.dropped += int(len(keep) - keep.sum())
+                timestamps, rows = timestamps[keep], rows[keep]
+            n = min(len(timestamps), self.capacity)
+            if not n:
+                return
+            timestamps, rows = timestamps[-n:], rows[-n:]
+            if self.end + n > len(self.times):
+                kept = min(self.end - self.start, self.capacity - n)
+                self.times[:kept] = self.times[self.end - kept:self.end]
+                self.values[:kept] = self.values[self.end - kept:self.end]
+                self.start, self.end = 0, kept
+            self.times[self.end:self.end + n] = timestamps
+            self.values[self.end:self.end + n] = rows
+            self.end += n
+            self.start = max(self.start, self.end - self.capacity)
+            return
+        
+        for timestamp, row in zip(timestamps, rows):
+            self.pushed += 1
+            if last is not None and timestamp < last:
+                self.dropped += 1
+                continue
+            self.times.append(float(timestamp))
+            self.values.append([float(value) for value in row])
+            last = timestamp
+        if len(self.times) > 2 * self.capacity:
+            del self.times[:-self.capacity]
+            del self.values[:-self.capacity]
+    
+    def resample(self, ticks) -> Tuple:
+        """Valeurs (une ligne par instant) et âges aux instants demandés (NaN avant la première mesure)"""
+        if not self.vectorized:
+            rows, ages = [], []
+            for tick in ticks:
+                row, age = self.sample(tick)
+                rows.append(row if row is not None else [math.nan] * len(self.fields))
+                ages.append(age)
+            return rows, ages
+        ticks = np.asarray(ticks, dtype=float)
+        n = self.end - self.start
+        if not n:
+            return np.full((len(ticks), len(self.fields)), np.nan), np.full(len(ticks), np.nan)
+        times = self.times[self.start:self.end]
+        samples = self.values[self.start:self.end]
+        after = times.searchsorted(ticks, side='right')
+        before = np.maximum(after - 1, 0)
+        values = samples[before]
+        ages = ticks - times[before]
+        if self.method == METHOD_LINEAR:
+            following = np.minimum(after, n - 1)
+            span = times[following] - times[before]
+            # Pas d'interpolation à travers une interruption du capteur
+            inside = (after > 0) & (after < n) & (span <= self.max_gap)
+            weight = np.where(inside, ages / np.where(inside, span, 1.0), 0.0)
+            blend = values + weight[:, None] * (samples[following] - values)
+            values = np.where(np.isnan(blend), values, blend)
+            ages = np.where(inside, np.minimum(ages, times[following] - ticks), ages)
+        missing = after == 0
+        if missing.any():
+            values[missing] = np.nan
+            ages[missing] = np.nan
+        return values, ages
+    
+    def sample(self, tick: float) -> Tuple[Optional[List[float]], float]:
+        """Valeurs et âge à un seul instant, sans passer par numpy (instantané de chaque cycle)"""
+        if self.vectorized:
+            start, end = self.start, self.end
+        else:
+            # Les listes ne sont raccourcies qu'au double de la capacité
+            start, end = max(0, len(self.times) - self.capacity), len(self.times)
+        after = bisect.bisect_right(self.times, tick, start, end)
+        if after == start:
+            return None, math.nan
+        before = after - 1
+        row = list(self.values[before])
+        age = tick - float(self.times[before])
+        if self.method == METHOD_LINEAR and after < end:
+            span = float(self.times[after] - self.times[before])
+            if span <= self.max_gap:
+                weight = age / span
+                row = [a if math.isnan(a + b) else a + weight * (b - a) for a, b in zip(row, self.values[after])]
+                age = min(age, span - age)
+        return [float(value) for value in row], age
+
+
+class StreamAligner:
+    """Classe pour aligner des flux de capteurs à cadences différentes sur des instants communs"""
+    
+    def __init__(self, capacity: int = 256, method: str = METHOD_LINEAR, max_gap: float = 5.0):
+        """
+        Initialise l'aligneur
+        
+        Args:
+            capacity: Nombre de mesures conservées par capteur
+            method: 'linear' (interpolation entre les mesures encadrant l'instant)
+                ou 'hold' (dernière mesure antérieure)
+            max_gap: Écart maximal (s) entre deux mesures pour interpoler ; au-delà,
+                la dernière valeur est maintenue
+        """
+        if method not in _METHODS:
+            raise ValueError(f"Méthode d'alignement inconnue: {method}")
+        self.capacity = capacity
+        self.method = method
+        self.max_gap = max_gap
+        self.streams: Dict[str, _Stream] = {}
+    
+    def add_stream(self, name: str, fields: Sequence[str], method: Optional[str] = None) -> _Stream:
+        """
+        Déclare un flux et ses champs
+        
+        Args:
+            name: Nom du capteur
+            fields: Noms des champs numériques ('acceleration.x' pour un champ imbriqué)
+            method: Méthode propre au flux (par défaut celle de l'aligneur)
+        """
+        method = method or self.method
+        if method not in _METHODS:
+            raise ValueError(f"Méthode d'alignement inconnue: {method}")
+        self.streams[name] = _Stream(fields, self.capacity, method, self.max_gap)
+        return self.streams[name]
+    
+    def push(self, name: str, values: Dict, timestamp: Optional[float] = None):
+        """
+        Ajoute une mesure
+        
+        Args:
+            name: Nom du capteur
+            values: Données du capteur ; les champs numériques sont conservés
+                (ceux de la première mesure définissent le flux, sauf add_stream)
+            timestamp: Instant de la mesure sur l'horloge monotone (par défaut maintenant)
+        """
+        flat = _flatten(values)
+        stream = self.streams.get(name)
+        if stream is None:
+            stream = self.add_stream(name, list(flat))
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        stream.extend([timestamp], [[flat.get(field, math.nan) for field in stream.fields]])
+    
+    def push_many(self, name: str, timestamps: Sequence[float], values):
+        """
+        Ajoute une rafale de mesures d'un flux déclaré par add_stream
+        
+        Args:
+            name: Nom du capteur
+            timestamps: Instants croissants sur l'horloge monotone
+            values: Une ligne par mesure, champs dans l'ordre de add_stream
+        """
+        self.streams[name].extend(timestamps, values)
+    
+    def resample(self, name: str, ticks: Sequence[float]) -> Tuple:
+        """
+        Rééchantillonne un flux
+        
+        Args:
+            name: Nom du capteur
+            ticks: Instants demandés (horloge monotone, croissants ou non)
+        
+        Returns:
+            (valeurs, âges) : une ligne de champs et un âge (s) par instant, NaN
+            avant la première mesure ; l'âge est l'écart à la mesure utilisée la plus proche
+        """
+        return self.streams[name].resample(ticks)
+    
+    def snapshot(self, tick: Optional[float] = None) -> Dict[str, Dict]:
+        """
+        Instantané de tous les capteurs au même instant
+        
+        Args:
+            tick: Instant sur l'horloge monotone (par défaut maintenant)
+        
+        Returns:
+            Dictionnaire par capteur : champs (imbriqués comme dans la mesure
+            d'origine, None si inconnus) et 'age' en secondes
+        """
+        tick = time.monotonic() if tick is None else tick
+        snapshot = {}
+        for name, stream in self.streams.items():
+            row, age = stream.sample(tick)
+            if row is None:
+                continue
+            reading = {}
+            for path, value in zip(stream.paths, row):
+                node = reading
+                for key in path[:-1]:
+                    node = node.setdefault(key, {})
+                node[path[-1]] = None if math.isnan(value) else round(value, 6)
+            reading['age'] = round(age, 3)
+            snapshot[name] = reading
+        return snapshot
+    
+    def stats(self) -> Dict[str, Dict]:
+        """Mesures reçues, conservées et ignorées (hors d'ordre) par capteur"""
+        return {
+            name: {'pushed': stream.pushed, 'buffered': len(stream), 'dropped': stream.dropped}
+            for name, stream in self.streams.items()
+        }
@@ -0,0 +1,279 @@
+"""
+Module de détection d'anomalies sur les mesures des capteurs
+SmartBus transmet chaque mesure telle quelle : un DHT22 défaillant ou un
+ultrason qui dérive ne se repère qu'en parcourant les données du serveur.
+Le détecteur suit chaque champ numérique de chaque capteur avec des
+statistiques en ligne, en mémoire constante par champ :
+- médiane et MAD sur une fenêtre glissante (pics, robustes aux pics eux-mêmes),
+- moyenne mobile exponentielle (EWMA, niveau récent), moyenne de Welford
+  (niveau de référence, à oubli lent une fois `baseline` mesures reçues) et
+  variance de Welford du bruit autour de la EWMA : une dérive écarte la EWMA
+  de la référence de plusieurs fois le bruit, une évolution lente (cycle
+  jour / nuit de la température) non,
+- répétitions exactes de la dernière valeur (valeur figée), comparées à la
+  plus longue série de répétitions déjà observée sur le champ : un
+  capteur quantifié (DHT22 au dixième de degré) répète longuement sa valeur
+  quand la mesure est stable.
+Seuls les changements d'état produisent un événement : début d'un pic,
+début et fin d'une valeur figée ou d'une dérive.
+"""
+
+import bisect
+import math
+from typing import Dict, List, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+ANOMALY_SPIKE = 'spike'
+ANOMALY_STUCK = 'stuck'
+ANOMALY_DRIFT = 'drift'
+
+# Champs non surveillés par défaut : position et vitesse varient avec le trajet,
+# nombre d'échantillons par lecture (FIFO, multiprocessus)
+DEFAULT_EXCLUDE = (
+    'gps.latitude', 'gps.longitude', 'gps.altitude', 'gps.speed',
+    'mpu9250.samples', 'ultrasonic_entry.samples', 'ultrasonic_exit.samples',
+)
+# Pics normaux : passagers aux portes, chocs de la route
+DEFAULT_SPIKE_EXCLUDE = ('ultrasonic_entry', 'ultrasonic_exit', 'mpu9250')
+
+# MAD -> écart-type pour une loi normale
+_MAD_SCALE = 1.4826
+# Échelle minimale relative à la médiane : une fenêtre de valeurs identiques (MAD nulle)
+# ne fait pas d'un simple pas de quantification un pic
+_RELATIVE_FLOOR = 1e-3
+
+
+class _FieldMonitor:
+    """Statistiques en ligne d'un champ : fenêtre glissante, référence de Welford, EWMA, répétitions"""
+    
+    __slots__ = ('ring', 'ordered', 'position', 'mad', 'mad_age', 'count', 'mean', 'noise',
+                 'ewma', 'last', 'repeats', 'run_max', 'spike', 'stuck', 'drift', 'varied')
+    
+    def __init__(self, window: int):
+        self.ring = [0.0] * window
+        self.ordered: List[float] = []
+        self.position = 0
+        self.mad = 0.0
+        self.mad_age = 0
+        self.count = 0
+        self.mean = 0.0
+        self.noise = 0.0
+        self.ewma = 0.0
+        self.last = math.nan
+        self.repeats = 0
+        self.run_max = 0
+        self.spike = False
+        self.stuck = False
+        self.drift = False
+        self.varied = False
+    
+    def median(self) -> float:
+        return self.ordered[len(self.ordered) // 2]
+    
+    def push(self, value: float):
+        """Remplace la plus ancienne valeur de la fenêtre (liste triée tenue à jour par bisection)"""
+        window = len(self.ring)
+        if len(self.ordered) == window:
+            del self.ordered[bisect.bisect_left(self.ordered, self.ring[self.position])]
+        bisect.insort(self.ordered, value)
+        self.ring[self.position] = value
+        self.position = (self.position + 1) % window
+    
+    def refresh_mad(self):
+        median = self.median()
+        deviations = sorted(abs(value - median) for value in self.ordered)
+        self.mad = deviations[len(deviations) // 2]
+        self.mad_age = 0
+
+
+class AnomalyDetector:
+    """Classe pour détecter les valeurs figées, les pics et les dérives des capteurs, champ par champ"""
+    
+    def __init__(self, window: int = 31, spike_threshold: float = 6.0, stuck_count: int = 30,
+                 stuck_factor: float = 3.0, drift_threshold: float = 6.0, ewma_alpha: float = 0.05,
+                 baseline: int = 1000, warmup: int = 50, exclude: Sequence[str] = DEFAULT_EXCLUDE,
+                 spike_exclude: Sequence[str] = DEFAULT_SPIKE_EXCLUDE):
+        """
+        Initialise le détecteur
+        
+        Args:
+            window: Nombre de mesures de la fenêtre glissante (médiane, MAD)
+            spike_threshold: Écart à la médiane, en écarts-types robustes (1,4826 x MAD), au-delà duquel
+                une mesure est un pic
+            stuck_count: Nombre minimal de mesures identiques consécutives d'un champ qui varie
+                d'habitude au-delà duquel la valeur est considérée figée
+            stuck_factor: Multiple de la plus longue série de mesures identiques déjà terminée du
+                champ requis pour une valeur figée (seuil = max(stuck_count, stuck_factor x série))
+            drift_threshold: Écart entre la EWMA et la moyenne de référence, en écarts-types du
+                bruit, au-delà duquel le champ dérive (fin de la dérive sous la moitié)
+            ewma_alpha: Poids d'une nouvelle mesure dans la EWMA
+            baseline: Nombre de mesures de Welford exact ; au-delà, référence et bruit oublient
+                lentement (poids 1/baseline par mesure) : une évolution plus lente n'est pas une dérive
+            warmup: Nombre de mesures avant toute détection
+            exclude: Capteurs ('gps') ou champs ('gps.latitude') non surveillés
+            spike_exclude: Capteurs ou champs dont les pics sont normaux (passages aux portes...)
+        """
+        self.window = max(3, window)
+        self.spike_threshold = spike_threshold
+        self.stuck_count = stuck_count
+        self.stuck_factor = stuck_factor
+        self.drift_threshold = drift_threshold
+        self.ewma_alpha = ewma_alpha
+        self.baseline = baseline
+        self.warmup = warmup
+        self.exclude = set(exclude)
+        self.spike_exclude = set(spike_exclude)
+        
+        # Par capteur : nombre de clés de la dernière mesure et champs suivis (chemin, moniteur, pics testés)
+        self._fields: Dict[str, Tuple[int, List[Tuple[Tuple[str, ...], str, _FieldMonitor, bool]]]] = {}
+        self._monitors: Dict[str, _FieldMonitor] = {}
+        self.stats = {'samples': 0, ANOMALY_SPIKE: 0, ANOMALY_STUCK: 0, ANOMALY_DRIFT: 0}
+    
+    def update(self, sensor: str, data: Dict) -> List[Dict]:
+        """
+        Ajoute une mesure d'un capteur
+        
+        Args:
+            sensor: Nom du capteur
+            data: Données du capteur (champs numériques, éventuellement imbriqués)
+        
+        Returns:
+            Événements d'anomalie (vide en fonctionnement normal) : capteur, champ, type,
+            'active' (début ou fin), valeur et score
+        """
+        known = self._fields.get(sensor)
+        if known is None or known[0] != len(data):
+            known = (len(data), self._discover(sensor, data))
+            self._fields[sensor] = known
+        events = []
+        for path, name, monitor, spikes in known[1]:
+            value = data
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            if value is None or isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            value = float(value)
+            if math.isnan(value):
+                continue
+            self.stats['samples'] += 1
+            self._check(sensor, name, monitor, value, spikes, events)
+        return events
+    
+    def active(self) -> Dict[str, List[str]]:
+        """Anomalies durables en cours par champ ('dht22.temperature': ['stuck'])"""
+        current = {}
+        for name, monitor in self._monitors.items():
+            kinds = [kind for kind, flag in ((ANOMALY_STUCK, monitor.stuck), (ANOMALY_DRIFT, monitor.drift)) if flag]
+            if kinds:
+                current[name] = kinds
+        return current
+    
+    def monitored(self) -> List[str]:
+        """Champs suivis ('dht22.temperature', 'mpu9250.gyroscope.z'...)"""
+        return list(self._monitors)
+    
+    def memory_per_field(self) -> int:
+        """Nombre de valeurs conservées par champ (fixe)"""
+        return 2 * self.window + len(_FieldMonitor.__slots__)
+    
+    def _discover(self, sensor: str, data: Dict, prefix: Tuple[str, ...] = ()) -> list:
+        """Champs numériques (ou absents) d'une mesure, hors exclusions"""
+        fields = []
+        for key, value in data.items():
+            if key == 'timestamp' and not prefix:
+                continue
+            path = prefix + (key,)
+            if isinstance(value, dict):
+                fields.extend(self._discover(sensor, value, path))
+                continue
+            if isinstance(value, bool) or not (value is None or isinstance(value, (int, float))):
+                continue
+            name = '.'.join((sensor,) + path)
+            if sensor in self.exclude or name in self.exclude:
+                continue
+            monitor = self._monitors.get(name)
+            if monitor is None:
+                monitor = self._monitors[name] = _FieldMonitor(self.window)
+            spikes = sensor not in self.spike_exclude and name not in self.spike_exclude
+            fields.append((path, name, monitor, spikes))
+        return fields
+    
+    def _check(self, sensor: str, name: str, monitor: _FieldMonitor, value: float, spikes: bool, events: list):
+        """Met à jour les statistiques d'un champ et ajoute les changements d'état à `events`"""
+        # Valeur figée : répétitions exactes d'un champ qui a déjà varié, bien plus longues
+        # que les séries observées jusque-là
+        if value == monitor.last:
+            monitor.repeats += 1
+            limit = max(self.stuck_count, self.stuck_factor * monitor.run_max)
+            if not monitor.stuck and monitor.varied and monitor.count >= self.warmup and monitor.repeats + 1 >= limit:
+                monitor.stuck = True
+                self._emit(events, sensor, name, ANOMALY_STUCK, True, value, monitor.repeats + 1)
+        else:
+            if monitor.stuck:
+                monitor.stuck = False
+                self._emit(events, sensor, name, ANOMALY_STUCK, False, value, monitor.repeats + 1)
+            if monitor.count:
+                # Toute série terminée relève le seuil, y compris une valeur figée qui a fini par
+                # changer : seule une série bien plus longue que les précédentes est signalée
+                monitor.run_max = max(monitor.run_max, monitor.repeats + 1)
+                monitor.varied = True
+            monitor.repeats = 0
+            monitor.last = value
+        
+        # Pic : écart robuste à la médiane de la fenêtre (MAD recalculée une fois par fenêtre,
+        # ou pour confirmer un pic) ; le bruit de référence borne l'échelle quand la MAD est nulle
+        spike = False
+        if spikes and len(monitor.ordered) == self.window and monitor.count >= self.warmup:
+            median = monitor.median()
+            deviation = abs(value - median)
+            floor = max(math.sqrt(monitor.noise), _RELATIVE_FLOOR * max(abs(median), 1.0))
+            if deviation > self.spike_threshold * max(_MAD_SCALE * monitor.mad, floor):
+                monitor.refresh_mad()
+                scale = max(_MAD_SCALE * monitor.mad, floor)
+                spike = deviation > self.spike_threshold * scale
+                if spike and not monitor.spike:
+                    self._emit(events, sensor, name, ANOMALY_SPIKE, True, value, deviation / scale)
+        monitor.spike = spike
+        monitor.push(value)
+        monitor.mad_age += 1
+        if monitor.mad_age >= self.window:
+            monitor.refresh_mad()
+        if spike or monitor.stuck:
+            # Ni pic ni valeur figée dans la référence
+            return
+        
+        # Welford (oubli lent au-delà de `baseline` mesures) : niveau de référence et bruit autour de la EWMA
+        monitor.count += 1
+        if monitor.count == 1:
+            monitor.mean = monitor.ewma = value
+            return
+        weight = min(monitor.count, self.baseline)
+        monitor.mean += (value - monitor.mean) / weight
+        residual = value - monitor.ewma
+        monitor.noise += (residual * residual - monitor.noise) / weight
+        monitor.ewma += self.ewma_alpha * residual
+        
+        std = math.sqrt(monitor.noise)
+        if monitor.count < self.warmup or std <= 0.0:
+            return
+        score = abs(monitor.ewma - monitor.mean) / std
+        if not monitor.drift and score > self.drift_threshold:
+            monitor.drift = True
+            self._emit(events, sensor, name, ANOMALY_DRIFT, True, monitor.ewma, score)
+        elif monitor.drift and score < self.drift_threshold / 2:
+            monitor.drift = False
+            self._emit(events, sensor, name, ANOMALY_DRIFT, False, monitor.ewma, score)
+    
+    def _emit(self, events: list, sensor: str, name: str, kind: str, active: bool, value: float, score: float):
+        if active:
+            self.stats[kind] += 1
+        events.append({
+            'sensor': sensor,
+            'field': name.split('.', 1)[1],
+            'type': kind,
+            'active': active,
+            'value': round(value, 4),
+            'score': round(score, 2),
+        })
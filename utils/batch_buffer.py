@@ -0,0 +1,293 @@
+"""
+Module d'accumulation des snapshots par lots
+Les snapshots sont aplatis directement dans des colonnes typées préallouées
+(module array, masque des valeurs absentes), puis un lot complet est écrit en
+une seule opération vers un support : CSV, JSON Lines, SQLite ou Parquet
+"""
+
+import csv
+import json
+import sqlite3
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+import logging
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Types de colonne : réel, entier, booléen (stocké en octet) ou objet (liste Python)
+_FLOAT, _INT, _BOOL, _OBJECT = 'd', 'q', 'b', 'O'
+_SQL_TYPES = {_FLOAT: 'REAL', _INT: 'INTEGER', _BOOL: 'INTEGER', _OBJECT: 'TEXT'}
+
+
+def _typecode(value: Any) -> str:
+    """Type de colonne adapté à une valeur"""
+    if isinstance(value, bool):
+        return _BOOL
+    if isinstance(value, int) and -(1 << 63) <= value < (1 << 63):
+        return _INT
+    if isinstance(value, float):
+        return _FLOAT
+    return _OBJECT
+
+
+class _Column:
+    """Colonne préallouée et son masque (1 = valeur présente)"""
+    
+    __slots__ = ('typecode', 'values', 'mask')
+    
+    def __init__(self, typecode: str, capacity: int):
+        self.typecode = typecode
+        self.values = [None] * capacity if typecode == _OBJECT else array(typecode, [0]) * capacity
+        self.mask = bytearray(capacity)
+    
+    def set(self, row: int, value: Any):
+        if self.typecode != _OBJECT:
+            kind = _typecode(value)
+            if kind != self.typecode and not (kind == _INT and self.typecode == _FLOAT):
+                self._promote(_FLOAT if kind == _FLOAT and self.typecode == _INT else _OBJECT)
+        self.values[row] = value
+        self.mask[row] = 1
+    
+    def _promote(self, typecode: str):
+        """Change le type de la colonne (entier → réel, sinon → objet)"""
+        if typecode == _FLOAT:
+            self.values = array(_FLOAT, self.values)
+        else:
+            self.values = [bool(v) if self.typecode == _BOOL else v for v in self.values]
+        self.typecode = typecode
+    
+    def get(self, size: int) -> List[Any]:
+        """Valeurs des `size` premières lignes, None pour les absentes"""
+        values = self.values[:size]
+        if self.typecode == _BOOL:
+            values = map(bool, values)
+        return [value if present else None for value, present in zip(values, self.mask)]
+    
+    def reset(self):
+        self.mask[:] = bytes(len(self.mask))
+
+
+class SnapshotBatch:
+    """Classe pour accumuler des snapshots dans des colonnes typées"""
+    
+    def __init__(self, capacity: int = 100, sep: str = '_'):
+        """
+        Initialise le lot
+        
+        Args:
+            capacity: Nombre de snapshots du lot
+            sep: Séparateur des clés imbriquées (comme DataLogger._flatten_dict)
+        """
+        self.capacity = capacity
+        self.sep = sep
+        self.size = 0
+        self._columns: Dict[str, _Column] = {}
+        # Préfixe et clé -> nom de colonne, pour ne pas reconstruire les noms à chaque snapshot
+        self._names: Dict[str, Dict[str, str]] = {}
+    
+    @property
+    def full(self) -> bool:
+        """Le lot a atteint sa capacité"""
+        return self.size >= self.capacity
+    
+    @property
+    def columns(self) -> List[str]:
+        """Noms des colonnes dans l'ordre d'apparition"""
+        return list(self._columns)
+    
+    def append(self, snapshot: Dict) -> bool:
+        """
+        Ajoute un snapshot au lot
+        
+        Args:
+            snapshot: Données collectées (dictionnaire imbriqué)
+        
+        Returns:
+            True si ajouté, False si le lot est plein
+        """
+        if self.size >= self.capacity:
+            return False
+        row = self.size
+        stack = [('', snapshot)]
+        while stack:
+            prefix, node = stack.pop()
+            names = self._names.get(prefix)
+            if names is None:
+                names = self._names[prefix] = {}
+            for key, value in node.items():
+                name = names.get(key)
+                if name is None:
+                    name = names[key] = f"{prefix}{self.sep}{key}" if prefix else key
+                if isinstance(value, dict):
+                    stack.append((name, value))
+                elif value is not None:
+                    column = self._columns.get(name)
+                    if column is None:
+                        column = self._columns[name] = _Column(_typecode(value), self.capacity)
+                    column.set(row, value)
+        self.size += 1
+        return True
+    
+    def column(self, name: str) -> List[Any]:
+        """
+        Retourne les valeurs d'une colonne
+        
+        Args:
+            name: Nom de la colonne (clés aplaties, ex: 'sensors_gps_latitude')
+        
+        Returns:
+            Une valeur par snapshot, None si absente
+        """
+        column = self._columns.get(name)
+        return column.get(self.size) if column else [None] * self.size
+    
+    def column_type(self, name: str) -> str:
+        """Type de la colonne : 'd' (réel), 'q' (entier), 'b' (booléen) ou 'O' (objet)"""
+        return self._columns[name].typecode
+    
+    def mask(self, name: str) -> bytes:
+        """Masque de la colonne (1 = valeur présente) pour les snapshots du lot"""
+        return bytes(self._columns[name].mask[:self.size])
+    
+    def rows(self, columns: Optional[List[str]] = None) -> Iterator[tuple]:
+        """Lignes du lot (tuples de valeurs dans l'ordre des colonnes)"""
+        return zip(*[self.column(name) for name in (columns or self.columns)])
+    
+    def clear(self):
+        """Vide le lot (les colonnes restent allouées)"""
+        for column in self._columns.values():
+            column.reset()
+        self.size = 0
+
+
+class CSVSink:
+    """Écriture d'un lot en ajout à un fichier CSV"""
+    
+    def __init__(self, path: str):
+        self.base = Path(path)
+        self.path = self.base
+        self._header: Optional[List[str]] = None
+    
+    def write(self, batch: SnapshotBatch) -> int:
+        """
+        Ajoute les snapshots du lot au fichier
+        
+        Args:
+            batch: Lot à écrire
+        
+        Returns:
+            Nombre de snapshots écrits
+        """
+        header = self._current_header()
+        if header is not None and not set(batch.columns) <= set(header):
+            # Nouvelles colonnes : un nouveau fichier plutôt que des lignes décalées
+            self.path = self.base.with_name(f"{self.base.stem}_{datetime.now():%Y%m%d_%H%M%S}{self.base.suffix}")
+            self._header = header = None
+            logger.info(f"Colonnes modifiées, nouveau fichier CSV: {self.path}")
+        
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if header is None:
+                header = batch.columns
+                writer.writerow(header)
+            writer.writerows(batch.rows(header))
+        self._header = header
+        return batch.size
+    
+    def _current_header(self) -> Optional[List[str]]:
+        """En-tête du fichier existant (lu une seule fois)"""
+        if self._header is None and self.path.exists() and self.path.stat().st_size:
+            with open(self.path, newline='', encoding='utf-8') as f:
+                self._header = next(csv.reader(f), None)
+        return self._header
+
+
+class JSONLSink:
+    """Écriture d'un lot en ajout à un fichier JSON Lines (une ligne aplatie par snapshot)"""
+    
+    def __init__(self, path: str):
+        self.path = Path(path)
+    
+    def write(self, batch: SnapshotBatch) -> int:
+        """Ajoute les snapshots du lot au fichier (valeurs absentes omises)"""
+        columns = batch.columns
+        lines = [
+            json.dumps({name: value for name, value in zip(columns, row) if value is not None}, ensure_ascii=False)
+            for row in batch.rows(columns)
+        ]
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        return batch.size
+
+
+class SQLiteSink:
+    """Écriture d'un lot dans une table SQLite (colonnes ajoutées au besoin, une transaction par lot)"""
+    
+    def __init__(self, path: str, table: str = 'snapshots'):
+        self.path = Path(path)
+        self.table = table
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._known = {row[1] for row in self._conn.execute(f'PRAGMA table_info("{table}")')}
+    
+    def write(self, batch: SnapshotBatch) -> int:
+        """Insère les snapshots du lot (listes et objets enregistrés en JSON)"""
+        columns = batch.columns
+        object_columns = {i for i, name in enumerate(columns) if batch.column_type(name) == _OBJECT}
+        rows = batch.rows(columns)
+        if object_columns:
+            rows = ([json.dumps(v, ensure_ascii=False) if i in object_columns and isinstance(v, (list, dict)) else v
+                     for i, v in enumerate(row)] for row in rows)
+        
+        with self._conn:
+            definitions = [f'"{name}" {_SQL_TYPES[batch.column_type(name)]}' for name in columns if name not in self._known]
+            if not self._known:
+                self._conn.execute(f'CREATE TABLE IF NOT EXISTS "{self.table}" ({", ".join(definitions)})')
+            else:
+                for definition in definitions:
+                    self._conn.execute(f'ALTER TABLE "{self.table}" ADD COLUMN {definition}')
+            self._known.update(columns)
+            names = ', '.join(f'"{name}"' for name in columns)
+            placeholders = ', '.join('?' * len(columns))
+            self._conn.executemany(f'INSERT INTO "{self.table}" ({names}) VALUES ({placeholders})', rows)
+        return batch.size
+    
+    def close(self):
+        """Ferme la base"""
+        self._conn.close()
+
+
+class ParquetSink:
+    """Écriture de chaque lot dans un fichier Parquet (nécessite pyarrow)"""
+    
+    def __init__(self, directory: str, prefix: str = 'sensor_data'):
+        if not PARQUET_AVAILABLE:
+            raise ImportError("pyarrow non disponible. Installation: pip install pyarrow")
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self._count = 0
+    
+    def write(self, batch: SnapshotBatch) -> int:
+        """Écrit le lot dans un nouveau fichier Parquet"""
+        arrays, names = [], []
+        for name in batch.columns:
+            values = batch.column(name)
+            if batch.column_type(name) == _OBJECT:
+                values = [json.dumps(v, ensure_ascii=False) if isinstance(v, (list, dict)) else v for v in values]
+                if any(v is not None and not isinstance(v, str) for v in values):
+                    values = [None if v is None else str(v) for v in values]
+            arrays.append(pyarrow.array(values))
+            names.append(name)
+        
+        self._count += 1
+        path = self.directory / f"{self.prefix}_{datetime.now():%Y%m%d_%H%M%S}_{self._count}.parquet"
+        pyarrow.parquet.write_table(pyarrow.table(arrays, names=names), str(path))
+        return batch.size
@@ -0,0 +1,435 @@
+"""
+Module d'enregistreur d'incidents (boîte noire)
+collect_data ne garde qu'un instantané par cycle : un freinage brusque ou un
+choc survenu entre deux cycles est perdu. L'enregistreur conserve les
+dernières secondes des flux rapides (IMU à la cadence de la FIFO, GPS,
+portes) dans des tampons circulaires préalloués, de taille fixe. Un
+déclenchement (seuil d'accélération, événement de porte, demande manuelle)
+fige une fenêtre autour de son instant : `pre` secondes avant, `post`
+secondes après. La fenêtre est extraite une fois complète, puis écrite sur
+disque et remise pour l'envoi prioritaire par un thread dédié.
+"""
+
+import gzip
+import json
+import math
+import threading
+import time
+from array import array
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence, Tuple
+import logging
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from .alignment import monotonic_to_wall
+from .persistence import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Origines d'un déclenchement
+TRIGGER_ACCELERATION = 'acceleration'
+TRIGGER_DOOR = 'door'
+TRIGGER_MANUAL = 'manual'
+
+# Champs des flux enregistrés par SmartBus
+IMU_FIELDS = ('ax', 'ay', 'az', 'gx', 'gy', 'gz')
+GPS_FIELDS = ('latitude', 'longitude', 'speed', 'has_fix')
+DOOR_FIELDS = ('distance',)
+
+# Taille des tampons de travail du test de seuil sur une rafale FIFO
+_SCRATCH = 256
+
+
+class _Ring:
+    """Tampon circulaire préalloué : un instant et des valeurs de taille fixe par échantillon"""
+    
+    def __init__(self, fields: Sequence[str], capacity: int):
+        self.fields = tuple(fields)
+        self.width = len(self.fields)
+        self.capacity = capacity
+        self.written = 0
+        self.vectorized = NUMPY_AVAILABLE
+        if self.vectorized:
+            self.times = np.zeros(capacity)
+            self.values = np.zeros((capacity, self.width))
+            # Rangs 0..capacity-1 : instants d'une rafale calculés sans allocation
+            self.steps = np.arange(capacity, dtype=float)
+        else:
+            self.times = array('d', bytes(8 * capacity))
+            self.values = array('d', bytes(8 * capacity * self.width))
+    
+    @property
+    def nbytes(self) -> int:
+        extra = self.capacity if self.vectorized else 0
+        return 8 * (self.capacity * (1 + self.width) + extra)
+    
+    def append(self, timestamp: float, values: Sequence[float]):
+        """Écrit un échantillon à la place du plus ancien"""
+        index = self.written % self.capacity
+        self.times[index] = timestamp
+        if self.vectorized:
+            self.values[index] = values
+        else:
+            base = index * self.width
+            for offset in range(self.width):
+                self.values[base + offset] = values[offset]
+        self.written += 1
+    
+    def extend(self, end_time: float, period: float, *blocks):
+        """
+        Écrit une rafale d'échantillons régulièrement espacés (numpy uniquement)
+        
+        Args:
+            end_time: Instant du dernier échantillon
+            period: Écart entre deux échantillons
+            blocks: Tableaux (n, k) dont les colonnes, mises bout à bout, forment les champs
+        """
+        n = len(blocks[0])
+        # Rafale plus longue que le tampon : seuls les derniers échantillons sont gardés
+        skip = max(0, n - self.capacity)
+        first_time = end_time - (n - 1 - skip) * period
+        done = 0
+        while done < n - skip:
+            index = (self.written + done) % self.capacity
+            count = min(n - skip - done, self.capacity - index)
+            times = self.times[index:index + count]
+            np.multiply(self.steps[done:done + count], period, out=times)
+            times += first_time
+            column = 0
+            for block in blocks:
+                width = block.shape[1]
+                self.values[index:index + count, column:column + width] = block[skip + done:skip + done + count]
+                column += width
+            done += count
+        self.written += n - skip
+    
+    def window(self, start: float, end: float) -> Tuple[list, list, bool]:
+        """
+        Copie les échantillons compris entre deux instants, du plus ancien au plus récent
+        
+        Returns:
+            (instants, lignes de valeurs, fenêtre tronquée par le début du tampon) ;
+            tableaux numpy ou listes selon le tampon
+        """
+        size = min(self.written, self.capacity)
+        head = self.written % self.capacity if self.written > self.capacity else 0
+        if self.vectorized:
+            times = np.concatenate((self.times[head:size], self.times[:head]))
+            rows = np.concatenate((self.values[head:size], self.values[:head]))
+            keep = (times >= start) & (times <= end)
+            truncated = self.written > self.capacity and float(times[0]) > start
+            return times[keep], rows[keep], truncated
+        times, rows = [], []
+        for i in range(size):
+            index = (head + i) % self.capacity
+            timestamp = self.times[index]
+            if start <= timestamp <= end:
+                times.append(timestamp)
+                rows.append(list(self.values[index * self.width:(index + 1) * self.width]))
+        truncated = self.written > self.capacity and self.times[head] > start
+        return times, rows, truncated
+
+
+class BlackBoxRecorder:
+    """Classe pour conserver les derniers instants des flux rapides et figer une fenêtre autour d'un incident"""
+    
+    def __init__(self, directory, streams: Dict[str, Tuple[Sequence[str], float]],
+                 pre: float = 10.0, post: float = 5.0, margin: float = 5.0,
+                 accel_threshold: Optional[float] = None,
+                 on_saved: Optional[Callable[[Path, Dict], None]] = None):
+        """
+        Initialise l'enregistreur (toute la mémoire des tampons est allouée ici)
+        
+        Args:
+            directory: Répertoire des fenêtres enregistrées (blackbox-*.json.gz)
+            streams: Flux par nom : (champs, cadence maximale en Hz)
+            pre: Durée conservée avant le déclenchement (s)
+            post: Durée enregistrée après le déclenchement (s)
+            margin: Durée supplémentaire des tampons, le temps que poll() extraie
+                une fenêtre complète (au moins un cycle de la boucle principale)
+            accel_threshold: Accélération horizontale (g) qui déclenche un
+                enregistrement dans record_imu ; None pour désactiver
+            on_saved: Fonction appelée avec le chemin et le contenu de chaque
+                fenêtre enregistrée (thread d'écriture)
+        """
+        self.directory = Path(directory)
+        self.pre = pre
+        self.post = post
+        self.accel_threshold = accel_threshold
+        self.on_saved = on_saved
+        self.rings = {
+            name: _Ring(fields, int(math.ceil((pre + post + margin) * rate)) + 1)
+            for name, (fields, rate) in streams.items()
+        }
+        if NUMPY_AVAILABLE:
+            self._scratch = np.empty(_SCRATCH)
+            self._scratch_y = np.empty(_SCRATCH)
+        
+        # État du déclenchement : valeurs scalaires modifiées en place
+        self._armed = False
+        self._above = False
+        self._trigger_time = 0.0
+        self._trigger_reason = ''
+        self._trigger_value = math.nan
+        self._post_until = 0.0
+        self._merged = 0
+        
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        
+        self.stats = {
+            'triggers': 0,
+            'merged': 0,
+            'windows': 0,
+            'truncated': 0,
+            'saved': 0,
+            'save_errors': 0,
+            'bytes': 0,
+        }
+        logger.info(f"Boîte noire: {pre:g} s avant / {post:g} s après, {self.memory_bytes / 1024:.0f} Ko de tampons")
+    
+    @property
+    def memory_bytes(self) -> int:
+        """Mémoire occupée par les tampons (fixe)"""
+        return sum(ring.nbytes for ring in self.rings.values())
+    
+    @property
+    def armed(self) -> bool:
+        """Une fenêtre est en cours d'enregistrement"""
+        return self._armed
+    
+    def start(self):
+        """Démarre le thread d'écriture"""
+        if self._running:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._running = True
+        self._thread = threading.Thread(target=self._write_loop, name='blackbox', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 5.0):
+        """
+        Enregistre la fenêtre en cours (tronquée) et les fenêtres en attente, puis arrête le thread
+        
+        Args:
+            timeout: Temps maximal d'attente du thread en secondes
+        """
+        if self._armed:
+            self._freeze(time.monotonic())
+        if not self._running:
+            return
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+    
+    def record(self, name: str, values: Sequence[float], timestamp: Optional[float] = None):
+        """
+        Ajoute un échantillon à un flux
+        
+        Args:
+            name: Nom du flux
+            values: Valeurs dans l'ordre des champs du flux
+            timestamp: Instant sur l'horloge monotone (par défaut maintenant)
+        """
+        self.rings[name].append(time.monotonic() if timestamp is None else timestamp, values)
+    
+    def record_imu(self, accel: Sequence[float], gyro: Sequence[float],
+                   timestamp: Optional[float] = None, name: str = 'imu'):
+        """
+        Ajoute un échantillon IMU et teste le seuil d'accélération horizontale
+        
+        Args:
+            accel: Accélération (x, y, z) en g
+            gyro: Rotation (x, y, z) en °/s
+            timestamp: Instant sur l'horloge monotone (par défaut maintenant)
+            name: Nom du flux
+        """
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        ring = self.rings[name]
+        ring.append(timestamp, (accel[0], accel[1], accel[2], gyro[0], gyro[1], gyro[2]))
+        if self.accel_threshold is not None:
+            self._check_threshold(accel[0] * accel[0] + accel[1] * accel[1], timestamp)
+    
+    def record_imu_batch(self, accel, gyro, period: float,
+                         end_time: Optional[float] = None, name: str = 'imu'):
+        """
+        Ajoute une rafale FIFO et teste le seuil sur chacun de ses échantillons
+        
+        Args:
+            accel: Accélérations (n x 3) en g, de la plus ancienne à la plus récente
+            gyro: Rotations (n x 3) en °/s
+            period: Écart entre deux échantillons (s)
+            end_time: Instant du dernier échantillon (par défaut maintenant)
+            name: Nom du flux
+        """
+        end_time = time.monotonic() if end_time is None else end_time
+        ring = self.rings[name]
+        if not ring.vectorized:
+            n = len(accel)
+            for i in range(n):
+                self.record_imu(accel[i], gyro[i], end_time - (n - 1 - i) * period, name)
+            return
+        ring.extend(end_time, period, accel, gyro)
+        if self.accel_threshold is None:
+            return
+        n = len(accel)
+        for start in range(0, n, _SCRATCH):
+            count = min(_SCRATCH, n - start)
+            squared, square_y = self._scratch[:count], self._scratch_y[:count]
+            np.multiply(accel[start:start + count, 0], accel[start:start + count, 0], out=squared)
+            np.multiply(accel[start:start + count, 1], accel[start:start + count, 1], out=square_y)
+            squared += square_y
+            if not self._above and squared.max() < self.accel_threshold ** 2:
+                continue
+            for i in range(count):
+                self._check_threshold(float(squared[i]), end_time - (n - 1 - start - i) * period)
+    
+    def trigger(self, reason: str = TRIGGER_MANUAL, value: float = math.nan, timestamp: Optional[float] = None):
+        """
+        Déclenche l'enregistrement d'une fenêtre (sans allocation : appelable depuis un gestionnaire de signal)
+        Un déclenchement pendant une fenêtre en cours y est rattaché
+        
+        Args:
+            reason: Origine (TRIGGER_ACCELERATION, TRIGGER_DOOR, TRIGGER_MANUAL)
+            value: Valeur associée (accélération en g, distance...)
+            timestamp: Instant sur l'horloge monotone (par défaut maintenant)
+        """
+        if self._armed:
+            self._merged += 1
+            return
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        self._trigger_time = timestamp
+        self._trigger_reason = reason
+        self._trigger_value = value
+        self._post_until = timestamp + self.post
+        self._merged = 0
+        self._armed = True
+    
+    def poll(self, now: Optional[float] = None) -> bool:
+        """
+        Extrait la fenêtre en cours une fois la durée `post` écoulée (boucle principale)
+        
+        Args:
+            now: Instant sur l'horloge monotone (par défaut maintenant)
+        
+        Returns:
+            True si une fenêtre a été figée
+        """
+        now = time.monotonic() if now is None else now
+        if not self._armed or now < self._post_until:
+            return False
+        self._freeze(self._post_until)
+        return True
+    
+    def pending(self) -> int:
+        """Nombre de fenêtres en attente d'écriture"""
+        return len(self._pending)
+    
+    def _check_threshold(self, horizontal_squared: float, timestamp: float):
+        """Déclenche au franchissement du seuil (front montant uniquement)"""
+        above = horizontal_squared >= self.accel_threshold * self.accel_threshold
+        if above and not self._above:
+            self.trigger(TRIGGER_ACCELERATION, math.sqrt(horizontal_squared), timestamp)
+        self._above = above
+    
+    def _freeze(self, end: float):
+        """Copie la fenêtre des tampons et la confie au thread d'écriture (mise en forme comprise)"""
+        origin = self._trigger_time
+        window = {
+            'reason': self._trigger_reason,
+            'timestamp': datetime.fromtimestamp(monotonic_to_wall(origin)).isoformat(),
+            'value': None if math.isnan(self._trigger_value) else round(self._trigger_value, 4),
+            'merged': self._merged,
+            'pre': self.pre,
+            'post': round(end - origin, 3),
+        }
+        frozen = {}
+        truncated = False
+        for name, ring in self.rings.items():
+            times, rows, cut = ring.window(origin - self.pre, end)
+            frozen[name] = (ring.fields, times, rows)
+            truncated = truncated or cut
+        window['truncated'] = truncated
+        self._armed = False
+        
+        self.stats['triggers'] += 1
+        self.stats['merged'] += self._merged
+        self.stats['windows'] += 1
+        self.stats['truncated'] += int(truncated)
+        logger.warning(
+            f"Boîte noire: fenêtre figée ({window['reason']}, "
+            f"{sum(len(times) for _, times, _ in frozen.values())} échantillons)"
+        )
+        with self._cond:
+            self._pending.append((origin, window, frozen))
+            self._cond.notify()
+        if not self._running:
+            self._flush_pending()
+    
+    def _write_loop(self):
+        """Écrit les fenêtres figées dans l'ordre"""
+        while True:
+            with self._cond:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+            self._flush_pending()
+    
+    def _flush_pending(self):
+        while True:
+            with self._cond:
+                if not self._pending:
+                    return
+                origin, window, frozen = self._pending.popleft()
+            window['streams'] = {
+                name: self._format(origin, fields, times, rows) for name, (fields, times, rows) in frozen.items()
+            }
+            self._save(window)
+    
+    @staticmethod
+    def _format(origin: float, fields: Sequence[str], times, rows) -> Dict[str, list]:
+        """Colonnes d'un flux : instants relatifs au déclenchement puis un tableau par champ"""
+        if NUMPY_AVAILABLE and not isinstance(times, list):
+            columns = [np.round(times - origin, 4).tolist()] + np.round(rows, 5).T.tolist()
+        else:
+            columns = [[round(t - origin, 4) for t in times]]
+            columns += [[round(row[index], 5) for row in rows] for index in range(len(fields))]
+        stream = {'t': columns[0]}
+        for field, column in zip(fields, columns[1:]):
+            # NaN (valeur inconnue) n'existe pas en JSON
+            stream[field] = [None if value != value else value for value in column]
+        return stream
+    
+    def _save(self, window: Dict):
+        """Écrit une fenêtre (JSON compressé) et la transmet à on_saved"""
+        stamp = window['timestamp'].replace('-', '').replace(':', '').replace('T', '-')[:15]
+        path = self.directory / f"blackbox-{stamp}-{window['reason']}.json.gz"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            payload = gzip.compress(json.dumps(window, ensure_ascii=False).encode('utf-8'), compresslevel=6)
+            atomic_write(path, payload, fsync=True)
+        except OSError as e:
+            self.stats['save_errors'] += 1
+            logger.error(f"Erreur écriture boîte noire {path.name}: {e}")
+            return
+        self.stats['saved'] += 1
+        self.stats['bytes'] += len(payload)
+        logger.info(f"Boîte noire enregistrée: {path.name} ({len(payload) / 1024:.0f} Ko)")
+        if self.on_saved:
+            try:
+                self.on_saved(path, window)
+            except Exception as e:
+                logger.error(f"Erreur notification boîte noire: {e}")
@@ -0,0 +1,570 @@
+"""
+Module de capture brute des capteurs et de rejeu déterministe
+La capture enregistre ce que chaque pilote reçoit du matériel, avant tout
+traitement : lignes NMEA et octets en attente du port série du GPS, durées
+d'écho des HC-SR04, lectures du DHT22 (et leurs erreurs), lectures I2C du
+MPU9250 (FIFO et magnétomètre) ou vecteurs de mpu9250_jmdev. Le rejeu
+réinstalle ces réponses dans des pilotes neufs : le code des pilotes
+s'exécute à l'identique, plus vite que le temps réel.
+
+Format (.sbc, petit-boutiste) : en-tête MAGIC + heure de début (double,
+time.time()), puis des enregistrements de 8 octets d'en-tête (écart en µs
+depuis l'enregistrement précédent, type, flux, longueur) suivis des données.
+Les définitions de flux (JSON) sont répétées en tête de chaque fichier.
+"""
+
+import builtins
+import ctypes
+import gzip
+import heapq
+import json
+import struct
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence, Tuple, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'SBCAP1\n\x00'
+_START = struct.Struct('<d')
+_RECORD = struct.Struct('<IBBH')
+_CLOCK = struct.Struct('<Q')
+_WAITING = struct.Struct('<I')
+_FLOAT = struct.Struct('<f')
+_VECTOR = struct.Struct('<3f')
+
+# Types d'enregistrements
+KIND_STREAM = 0
+KIND_CLOCK = 1
+KIND_ERROR = 2
+KIND_SERIAL_WAITING = 10
+KIND_SERIAL_LINE = 11
+KIND_ECHO = 20
+KIND_ECHO_TIMEOUT = 21
+KIND_DHT_TEMPERATURE = 30
+KIND_DHT_HUMIDITY = 31
+KIND_I2C_READ = 40
+KIND_I2C_BURST = 41
+KIND_IMU_ACCEL = 50
+KIND_IMU_GYRO = 51
+KIND_IMU_MAG = 52
+
+_MAX_DELTA = 0xFFFFFFFF
+
+
+class ReplayError(Exception):
+    """Le pilote ne demande pas ce qui a été capturé (capture et pilote désynchronisés)"""
+
+
+class ReplayExhausted(ReplayError):
+    """Plus aucun enregistrement pour ce flux"""
+
+
+# ============================================
+# Capture
+# ============================================
+
+class _CaptureProxy:
+    """Base des accès matériels enregistrés : attributs non capturés transmis tels quels"""
+    
+    def __init__(self, target, writer: 'CaptureWriter', stream: int):
+        self._target = target
+        self._writer = writer
+        self._stream = stream
+    
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+    
+    def _call(self, kind: int, function, *args, encode=bytes):
+        try:
+            result = function(*args)
+        except Exception as e:
+            self._writer.record(self._stream, KIND_ERROR, f"{type(e).__name__}\0{e}".encode('utf-8', 'replace'))
+            raise
+        self._writer.record(self._stream, kind, encode(result))
+        return result
+
+
+class CaptureSerial(_CaptureProxy):
+    """Port série du GPS : octets en attente et lignes lues"""
+    
+    @property
+    def in_waiting(self) -> int:
+        return self._call(KIND_SERIAL_WAITING, lambda: self._target.in_waiting,
+                          encode=lambda n: _WAITING.pack(min(n, _MAX_DELTA)))
+    
+    def readline(self) -> bytes:
+        return self._call(KIND_SERIAL_LINE, self._target.readline)
+
+
+class CaptureEcho(_CaptureProxy):
+    """Mesure d'écho du HC-SR04 : durée, ou erreur de timeout"""
+    
+    def __call__(self):
+        duration, error = self._target()
+        if duration is None:
+            self._writer.record(self._stream, KIND_ECHO_TIMEOUT, str(error).encode())
+        else:
+            self._writer.record(self._stream, KIND_ECHO, _FLOAT.pack(duration))
+        return duration, error
+
+
+class CaptureDHT(_CaptureProxy):
+    """Capteur adafruit_dht : chaque accès à la température ou à l'humidité"""
+    
+    @property
+    def temperature(self):
+        return self._call(KIND_DHT_TEMPERATURE, lambda: self._target.temperature, encode=_encode_optional)
+    
+    @property
+    def humidity(self):
+        return self._call(KIND_DHT_HUMIDITY, lambda: self._target.humidity, encode=_encode_optional)
+
+
+class CaptureI2C(_CaptureProxy):
+    """Bus I2C du MPU9250 en mode FIFO : lectures uniquement (les écritures ne changent pas le rejeu)"""
+    
+    def read_i2c_block_data(self, address: int, register: int, length: int) -> list:
+        return self._call(KIND_I2C_READ, self._target.read_i2c_block_data, address, register, length)
+    
+    def i2c_rdwr(self, *messages):
+        self._call(KIND_I2C_BURST, self._target.i2c_rdwr, *messages,
+                   encode=lambda _: b''.join(bytes(m) for m in messages if _is_read(m)))
+
+
+class CaptureIMU(_CaptureProxy):
+    """Objet mpu9250_jmdev : vecteurs accéléromètre, gyroscope et magnétomètre"""
+    
+    def readAccelerometerMaster(self):
+        return self._call(KIND_IMU_ACCEL, self._target.readAccelerometerMaster, encode=_encode_vector)
+    
+    def readGyroscopeMaster(self):
+        return self._call(KIND_IMU_GYRO, self._target.readGyroscopeMaster, encode=_encode_vector)
+    
+    def readMagnetometerMaster(self):
+        return self._call(KIND_IMU_MAG, self._target.readMagnetometerMaster, encode=_encode_vector)
+
+
+def _encode_optional(value) -> bytes:
+    return _FLOAT.pack(float('nan') if value is None else value)
+
+
+def _encode_vector(value) -> bytes:
+    return _VECTOR.pack(*value[:3])
+
+
+def _is_read(message) -> bool:
+    # smbus2 : drapeau I2C_M_RD (0x0001) ; messages simulés : attribut is_read
+    return bool(getattr(message, 'is_read', getattr(message, 'flags', 0) & 0x0001))
+
+
+class CaptureWriter:
+    """Classe pour enregistrer les échanges bruts entre les pilotes et le matériel"""
+    
+    def __init__(self, directory: Union[str, Path], max_bytes: int = 50 * 1024 * 1024,
+                 buffer_size: int = 64 * 1024, flush_interval: float = 5.0):
+        """
+        Initialise la capture
+        
+        Args:
+            directory: Répertoire des fichiers de capture (capture-AAAAMMJJ-HHMMSS.sbc)
+            max_bytes: Taille d'un fichier avant passage au suivant
+            buffer_size: Taille du tampon mémoire écrit en une fois sur disque
+            flush_interval: Durée maximale (s) entre deux écritures sur disque
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.path: Optional[Path] = None
+        self.stats = {'records': 0, 'bytes': 0, 'files': 0, 'write_errors': 0}
+        self._streams: Dict[str, Tuple[int, dict]] = {}
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        self._file = None
+        self._open()
+    
+    def _open(self):
+        """Ouvre un nouveau fichier et y réécrit les définitions de flux"""
+        name = f"capture-{datetime.now():%Y%m%d-%H%M%S}"
+        path = self.directory / f"{name}.sbc"
+        index = 1
+        while path.exists():
+            path = self.directory / f"{name}-{index}.sbc"
+            index += 1
+        self._file = open(path, 'wb')
+        self.path = path
+        self._size = 0
+        self._start = time.monotonic()
+        self._elapsed_us = 0
+        self._flushed = self._start
+        self._buffer += MAGIC + _START.pack(time.time())
+        for stream, definition in self._streams.values():
+            self._append(stream, KIND_STREAM, json.dumps(definition).encode(), self._start)
+        self.stats['files'] += 1
+        logger.info(f"Capture brute des capteurs: {path}")
+    
+    def attach(self, name: str, driver) -> bool:
+        """
+        Enregistre les échanges d'un pilote avec son matériel
+        
+        Args:
+            name: Nom du capteur (ex: 'gps', 'ultrasonic_entry')
+            driver: Pilote (GPSNeo6M, Ultrasonic, DHT22 ou MPU9250)
+        
+        Returns:
+            False si le pilote n'a pas d'accès matériel capturable (mock, multiprocessus)
+        """
+        if hasattr(driver, 'serial_wrapper'):
+            stream = self._stream(name, 'gps')
+            driver.serial_wrapper = lambda connection: CaptureSerial(connection, self, stream)
+            if driver.serial_connection is not None:
+                driver.serial_connection = CaptureSerial(driver.serial_connection, self, stream)
+        elif hasattr(driver, 'echo'):
+            driver.echo = CaptureEcho(driver.echo, self, self._stream(name, 'ultrasonic'))
+        elif getattr(driver, 'dht', None) is not None:
+            driver.dht = CaptureDHT(driver.dht, self, self._stream(name, 'dht22'))
+        elif getattr(driver, 'bus', None) is not None:
+            driver.bus = CaptureI2C(driver.bus, self, self._stream(name, 'mpu9250', sample_rate=driver.sample_rate))
+        elif getattr(driver, 'mpu', None) is not None:
+            driver.mpu = CaptureIMU(driver.mpu, self, self._stream(name, 'mpu9250'))
+        else:
+            return False
+        return True
+    
+    def _stream(self, name: str, kind: str, **meta) -> int:
+        """Déclare un flux (un octet d'identifiant, 255 flux au plus)"""
+        with self._lock:
+            if name not in self._streams:
+                definition = {'name': name, 'kind': kind, **meta}
+                self._streams[name] = (len(self._streams) + 1, definition)
+                self._append(self._streams[name][0], KIND_STREAM, json.dumps(definition).encode(), time.monotonic())
+            return self._streams[name][0]
+    
+    def record(self, stream: int, kind: int, payload: bytes = b''):
+        """
+        Ajoute un enregistrement horodaté
+        
+        Args:
+            stream: Identifiant du flux
+            kind: Type d'enregistrement (KIND_*)
+            payload: Données brutes (64 Kio au plus)
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._file is None:
+                return
+            self._append(stream, kind, payload, now)
+            self.stats['records'] += 1
+            if len(self._buffer) >= self.buffer_size or now - self._flushed >= self.flush_interval:
+                self._flush(now)
+    
+    def _append(self, stream: int, kind: int, payload: bytes, now: float):
+        elapsed = int((now - self._start) * 1e6)
+        delta = max(0, elapsed - self._elapsed_us)
+        if delta > _MAX_DELTA:
+            self._buffer += _RECORD.pack(0, KIND_CLOCK, 0, _CLOCK.size) + _CLOCK.pack(delta)
+            delta = 0
+        self._elapsed_us += delta
+        self._buffer += _RECORD.pack(delta, kind, stream, len(payload))
+        self._buffer += payload
+    
+    def _flush(self, now: float):
+        """Écrit le tampon sur disque (appelé avec le verrou)"""
+        self._flushed = now
+        if not self._buffer:
+            return
+        try:
+            self._file.write(self._buffer)
+            self._file.flush()
+        except OSError as e:
+            self.stats['write_errors'] += 1
+            logger.error(f"Erreur écriture capture {self.path}: {e}")
+        self._size += len(self._buffer)
+        self.stats['bytes'] += len(self._buffer)
+        self._buffer.clear()
+        if self._size >= self.max_bytes:
+            self._file.close()
+            self._open()
+    
+    def flush(self):
+        """Écrit les enregistrements en attente"""
+        with self._lock:
+            if self._file is not None:
+                self._flush(time.monotonic())
+    
+    def close(self):
+        """Écrit les enregistrements en attente et ferme le fichier"""
+        with self._lock:
+            if self._file is None:
+                return
+            self.max_bytes = float('inf')
+            self._flush(time.monotonic())
+            self._file.close()
+            self._file = None
+        logger.info(f"Capture fermée: {self.stats}")
+
+
+# ============================================
+# Lecture et rejeu
+# ============================================
+
+class CaptureReader:
+    """Classe pour lire un fichier de capture (éventuellement compressé en .gz)"""
+    
+    def __init__(self, path: Union[str, Path]):
+        """
+        Ouvre un fichier de capture
+        
+        Args:
+            path: Fichier .sbc ou .sbc.gz
+        """
+        self.path = Path(path)
+        opener = gzip.open if self.path.suffix == '.gz' else open
+        with opener(self.path, 'rb') as f:
+            self._data = f.read()
+        if not self._data.startswith(MAGIC):
+            raise ValueError(f"Format de capture inconnu: {self.path}")
+        self.start_time = _START.unpack_from(self._data, len(MAGIC))[0]
+        self.streams: Dict[int, dict] = {}
+        self.truncated = False
+    
+    def __iter__(self) -> Iterator[Tuple[float, dict, int, bytes]]:
+        """Enregistrements : (heure time.time(), définition du flux, type, données)"""
+        data = self._data
+        offset = len(MAGIC) + _START.size
+        elapsed_us = 0
+        while offset + _RECORD.size <= len(data):
+            delta, kind, stream, length = _RECORD.unpack_from(data, offset)
+            offset += _RECORD.size
+            if offset + length > len(data):
+                # Fichier interrompu pendant l'écriture (coupure de courant)
+                self.truncated = True
+                return
+            payload = data[offset:offset + length]
+            offset += length
+            elapsed_us += delta
+            if kind == KIND_CLOCK:
+                elapsed_us += _CLOCK.unpack(payload)[0]
+            elif kind == KIND_STREAM:
+                self.streams[stream] = json.loads(payload)
+            elif stream in self.streams:
+                yield self.start_time + elapsed_us / 1e6, self.streams[stream], kind, payload
+        if offset != len(data):
+            self.truncated = True
+
+
+class _ReplayStream:
+    """Enregistrements d'un flux servis dans l'ordre aux accès matériels du pilote"""
+    
+    def __init__(self, definition: dict):
+        self.definition = definition
+        self.records: deque = deque()
+        self.driver = None
+        self.consumed = 0
+        self.reads = 0
+        self.errors = 0
+    
+    def next(self, *kinds: int) -> Tuple[int, bytes]:
+        if not self.records:
+            raise ReplayExhausted(f"capture terminée ({self.definition['name']})")
+        _, kind, payload = self.records.popleft()
+        self.consumed += 1
+        if kind == KIND_ERROR:
+            # Exception levée par le matériel pendant la capture
+            name, _, message = payload.decode('utf-8', 'replace').partition('\0')
+            error = getattr(builtins, name, None)
+            if not (isinstance(error, type) and issubclass(error, Exception)):
+                error = RuntimeError
+            raise error(message)
+        if kind not in kinds:
+            self.errors += 1
+            raise ReplayError(f"{self.definition['name']}: type {kind} capturé, {kinds} demandé")
+        return kind, payload
+
+
+class _ReplayHandle:
+    def __init__(self, stream: _ReplayStream):
+        self._stream = stream
+    
+    def close(self):
+        pass
+
+
+class ReplaySerial(_ReplayHandle):
+    is_open = True
+    
+    @property
+    def in_waiting(self) -> int:
+        return _WAITING.unpack(self._stream.next(KIND_SERIAL_WAITING)[1])[0]
+    
+    def readline(self) -> bytes:
+        return self._stream.next(KIND_SERIAL_LINE)[1]
+
+
+class ReplayEcho(_ReplayHandle):
+    def __call__(self):
+        kind, payload = self._stream.next(KIND_ECHO, KIND_ECHO_TIMEOUT)
+        if kind == KIND_ECHO_TIMEOUT:
+            return None, payload.decode()
+        return _FLOAT.unpack(payload)[0], None
+
+
+class ReplayDHT(_ReplayHandle):
+    @property
+    def temperature(self):
+        return _decode_optional(self._stream.next(KIND_DHT_TEMPERATURE)[1])
+    
+    @property
+    def humidity(self):
+        return _decode_optional(self._stream.next(KIND_DHT_HUMIDITY)[1])
+    
+    def exit(self):
+        pass
+
+
+class ReplayI2C(_ReplayHandle):
+    def read_i2c_block_data(self, address: int, register: int, length: int) -> list:
+        return list(self._stream.next(KIND_I2C_READ)[1])
+    
+    def i2c_rdwr(self, *messages):
+        payload = self._stream.next(KIND_I2C_BURST)[1]
+        offset = 0
+        for message in messages:
+            if not _is_read(message):
+                continue
+            chunk = payload[offset:offset + len(message)]
+            offset += len(message)
+            if isinstance(message.buf, bytearray):
+                message.buf[:] = chunk
+            else:
+                ctypes.memmove(message.buf, chunk, len(chunk))
+    
+    def write_byte_data(self, address: int, register: int, value: int):
+        pass
+
+
+class ReplayIMU(_ReplayHandle):
+    def readAccelerometerMaster(self):
+        return list(_VECTOR.unpack(self._stream.next(KIND_IMU_ACCEL)[1]))
+    
+    def readGyroscopeMaster(self):
+        return list(_VECTOR.unpack(self._stream.next(KIND_IMU_GYRO)[1]))
+    
+    def readMagnetometerMaster(self):
+        return list(_VECTOR.unpack(self._stream.next(KIND_IMU_MAG)[1]))
+
+
+def _decode_optional(payload: bytes) -> Optional[float]:
+    value = _FLOAT.unpack(payload)[0]
+    return None if value != value else value
+
+
+class CaptureReplay:
+    """Classe pour rejouer une capture dans des pilotes, au rythme capturé ou au plus vite"""
+    
+    def __init__(self, paths: Union[str, Path, Sequence[Union[str, Path]]]):
+        """
+        Charge une capture
+        
+        Args:
+            paths: Fichier(s) de capture, dans l'ordre chronologique
+        """
+        if isinstance(paths, (str, Path)):
+            paths = [paths]
+        self.streams: Dict[str, _ReplayStream] = {}
+        for path in paths:
+            reader = CaptureReader(path)
+            for timestamp, definition, kind, payload in reader:
+                stream = self.streams.get(definition['name'])
+                if stream is None:
+                    stream = self.streams[definition['name']] = _ReplayStream(definition)
+                stream.records.append((timestamp, kind, payload))
+            if reader.truncated:
+                logger.warning(f"Capture tronquée: {path}")
+    
+    def attach(self, name: str, driver) -> bool:
+        """
+        Remplace l'accès matériel d'un pilote par les enregistrements du flux
+        
+        Args:
+            name: Nom du flux capturé
+            driver: Pilote neuf du même type (GPSNeo6M, Ultrasonic, DHT22, MPU9250)
+        
+        Returns:
+            False si la capture ne contient pas ce flux
+        """
+        stream = self.streams.get(name)
+        if stream is None or not stream.records:
+            return False
+        kind = stream.definition['kind']
+        first = stream.records[0][1]
+        if kind == 'gps':
+            driver.serial_connection = ReplaySerial(stream)
+        elif kind == 'ultrasonic':
+            driver.echo = ReplayEcho(stream)
+        elif kind == 'dht22':
+            driver.dht = ReplayDHT(stream)
+            # Les tentatives échouées sont rejouées sans attente
+            driver.retry_delay = 0.0
+        elif first in (KIND_IMU_ACCEL, KIND_IMU_GYRO, KIND_IMU_MAG):
+            driver.bus = None
+            driver.mpu = ReplayIMU(stream)
+        else:
+            driver.bus = ReplayI2C(stream)
+            driver.sample_rate = stream.definition.get('sample_rate') or driver.sample_rate
+        stream.driver = driver
+        return True
+    
+    def run(self, speed: Optional[float] = None) -> Iterator[Tuple[float, str, Optional[Dict]]]:
+        """
+        Rejoue les lectures des pilotes rattachés dans l'ordre chronologique
+        
+        Chaque appel de read_data() consomme les échanges matériels d'une
+        lecture capturée ; les horodatages produits par les pilotes eux-mêmes
+        (time.time() des ultrasons) sont ceux du rejeu.
+        
+        Args:
+            speed: Facteur de vitesse (1.0 = temps réel) ; None = au plus vite
+        
+        Yields:
+            (heure capturée de la lecture, nom du capteur, données du pilote)
+        """
+        heap = [(s.records[0][0], name) for name, s in self.streams.items() if s.driver is not None and s.records]
+        heapq.heapify(heap)
+        origin = heap[0][0] if heap else 0.0
+        started = time.perf_counter()
+        while heap:
+            timestamp, name = heapq.heappop(heap)
+            stream = self.streams[name]
+            if speed:
+                delay = (timestamp - origin) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            consumed = stream.consumed
+            data = stream.driver.read_data()
+            stream.reads += 1
+            if stream.consumed == consumed:
+                # Lecture sans accès matériel : le pilote ne suit plus la capture
+                logger.warning(f"Rejeu de {name} interrompu: lecture sans échange capturé")
+                continue
+            yield timestamp, name, data
+            if stream.records:
+                heapq.heappush(heap, (stream.records[0][0], name))
+    
+    def stats(self) -> Dict[str, Dict]:
+        """Lectures rejouées, enregistrements consommés et restants, désynchronisations par flux"""
+        return {
+            name: {
+                'reads': stream.reads,
+                'consumed': stream.consumed,
+                'remaining': len(stream.records),
+                'errors': stream.errors
+            }
+            for name, stream in self.streams.items()
+        }
@@ -1,14 +1,195 @@
 """
 Module pour charger la configuration du projet
+La configuration est validée une seule fois au chargement, exposée via des
+accesseurs précompilés et rechargée à chaud quand le fichier change
 """
 
 import json
+import threading
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Callable, List, NamedTuple, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+_NUMBER = (int, float)
+
+# Schéma de validation : clé -> (types acceptés, valeur minimale)
+CONFIG_SCHEMA: Dict[str, Tuple[tuple, Optional[float]]] = {
+    'sensors.gps.port': ((str,), None),
+    'sensors.gps.baudrate': ((int,), 1),
+    'sensors.gps.enabled': ((bool,), None),
+    'sensors.dht22.pin': ((int,), 0),
+    'sensors.dht22.enabled': ((bool,), None),
+    'sensors.dht22.max_retries': ((int,), 1),
+    'sensors.mpu9250.enabled': ((bool,), None),
+    'sensors.mpu9250.fifo': ((bool,), None),
+    'sensors.mpu9250.sample_rate': ((int,), 4),
+    'sensors.ultrasonic_entry.trigger_pin': ((int,), 0),
+    'sensors.ultrasonic_entry.echo_pin': ((int,), 0),
+    'sensors.ultrasonic_entry.enabled': ((bool,), None),
+    'sensors.ultrasonic_exit.trigger_pin': ((int,), 0),
+    'sensors.ultrasonic_exit.echo_pin': ((int,), 0),
+    'sensors.ultrasonic_exit.enabled': ((bool,), None),
+    'sensors.pir_entry.pin': ((int,), 0),
+    'sensors.pir_entry.enabled': ((bool,), None),
+    'sensors.pir_exit.pin': ((int,), 0),
+    'sensors.pir_exit.enabled': ((bool,), None),
+    'sensors.lcd.i2c_address': ((str, int), None),
+    'sensors.lcd.cols': ((int,), 1),
+    'sensors.lcd.rows': ((int,), 1),
+    'sensors.lcd.enabled': ((bool,), None),
+    'bus.max_passengers': ((int,), 1),
+    'bus.detection_threshold': (_NUMBER, 0),
+    'bus.harsh_braking_threshold': (_NUMBER, 0),
+    'data.save_interval': (_NUMBER, 0.1),
+    'data.format': ((str,), None),
+    'data.directory': ((str,), None),
+    'data.batch_size': ((int,), 1),
+    'data.flush_interval': (_NUMBER, 0),
+    'data.backend': ((str,), None),
+    'datastore.batch_size': ((int,), 1),
+    'datastore.flush_interval': (_NUMBER, 0),
+    'datastore.retention_days': (_NUMBER, 0),
+    'output.sinks': ((list,), None),
+    'output.queue_size': ((int,), 1),
+    'output.overflow': ((str,), None),
+    'output.block_timeout': (_NUMBER, 0),
+    'persistence.fsync': ((bool,), None),
+    'persistence.checkpoint_interval': (_NUMBER, 1),
+    'persistence.max_state_age': (_NUMBER, 0),
+    'retention.enabled': ((bool,), None),
+    'retention.max_mb': (_NUMBER, 1),
+    'retention.min_free_mb': (_NUMBER, 0),
+    'retention.keep_days': (_NUMBER, 0),
+    'retention.compact_after_days': ((int,), 0),
+    'retention.interval': (_NUMBER, 1),
+    'server.enabled': ((bool,), None),
+    'server.url': ((str,), None),
+    'server.timeout': (_NUMBER, 0.1),
+    'server.retry_count': ((int,), 1),
+    'server.bus_id': ((str,), None),
+    'server.event_latency_budget': (_NUMBER, 0.01),
+    'server.event_coalesce_window': (_NUMBER, 0),
+    'server.snapshot_queue_size': ((int,), 1),
+    'server.transport': ((str,), None),
+    'mqtt.topic_prefix': ((str,), None),
+    'mqtt.keepalive': ((int,), 5),
+    'mqtt.qos': ((int,), 0),
+    'mqtt.retain': ((bool,), None),
+    'mqtt.max_stored': ((int,), 1),
+    'mqtt.max_inflight': ((int,), 1),
+    'trajectory.enabled': ((bool,), None),
+    'trajectory.epsilon': (_NUMBER, 0),
+    'trajectory.max_speed': (_NUMBER, 1),
+    'trajectory.trip_gap': (_NUMBER, 1),
+    'stops.enabled': ((bool,), None),
+    'stops.file': ((str,), None),
+    'stops.default_radius': (_NUMBER, 1),
+    'stops.stopped_speed': (_NUMBER, 0),
+    'health.failure_threshold': ((int,), 1),
+    'health.base_backoff': (_NUMBER, 0),
+    'health.max_backoff': (_NUMBER, 0),
+    'health.door_max_backoff': (_NUMBER, 0),
+    'door_gate.active_interval': (_NUMBER, 0.01),
+    'door_gate.idle_interval': (_NUMBER, 0.01),
+    'door_gate.hold': (_NUMBER, 0),
+    'door_gate.bouncetime': ((int,), 0),
+    'i2c.enabled': ((bool,), None),
+    'i2c.bus': ((int,), 0),
+    'i2c.batch_size': ((int,), 1),
+    'capture.enabled': ((bool,), None),
+    'capture.file_mb': (_NUMBER, 1),
+    'capture.flush_interval': (_NUMBER, 0),
+    'blackbox.enabled': ((bool,), None),
+    'blackbox.pre': (_NUMBER, 0),
+    'blackbox.post': (_NUMBER, 0),
+    'blackbox.accel_threshold': (_NUMBER, 0),
+    'blackbox.door_trigger': ((bool,), None),
+    'blackbox.upload': ((bool,), None),
+    'anomaly.enabled': ((bool,), None),
+    'anomaly.window': ((int,), 3),
+    'anomaly.spike_threshold': (_NUMBER, 0),
+    'anomaly.stuck_count': ((int,), 2),
+    'anomaly.stuck_factor': (_NUMBER, 1),
+    'anomaly.drift_threshold': (_NUMBER, 0),
+    'anomaly.ewma_alpha': (_NUMBER, 0),
+    'anomaly.baseline': ((int,), 1),
+    'anomaly.warmup': ((int,), 0),
+    'anomaly.exclude': ((list,), None),
+    'anomaly.spike_exclude': ((list,), None),
+    'alignment.enabled': ((bool,), None),
+    'alignment.method': ((str,), None),
+    'alignment.delay': (_NUMBER, 0),
+    'alignment.capacity': ((int,), 2),
+    'alignment.max_gap': (_NUMBER, 0),
+    'fusion.enabled': ((bool,), None),
+    'fusion.declination': (_NUMBER, None),
+    'fusion.heading_tau': (_NUMBER, 0.1),
+    'fusion.gps_sigma': (_NUMBER, 0.1),
+    'adaptive.enabled': ((bool,), None),
+    'adaptive.moving_speed': (_NUMBER, 0),
+    'adaptive.vibration_threshold': (_NUMBER, 0),
+    'adaptive.parked_after': (_NUMBER, 0),
+    'adaptive.door_hold': (_NUMBER, 0),
+    'adaptive.min_dwell': (_NUMBER, 0),
+    'startup.parallel': ((bool,), None),
+    'startup.driver_timeout': (_NUMBER, 0.1),
+    'startup.door_timeout': (_NUMBER, 0),
+    'runtime.mode': ((str,), None),
+    'runtime.ultrasonic_rate': (_NUMBER, 0.1),
+    'runtime.imu_rate': (_NUMBER, 0.1),
+    'runtime.cpu_affinity': ((bool,), None),
+    'runtime.ring_capacity': ((int,), 16),
+    'config.poll_interval': (_NUMBER, 0.1),
+    'logging.level': ((str,), None),
+    'logging.file': ((str,), None),
+    'logging.max_bytes': ((int,), 1024),
+    'logging.backup_count': ((int,), 0),
+    'logging.rate_limit_interval': (_NUMBER, 0),
+}
+
+_MISSING = object()
+
+
+class ConfigChange(NamedTuple):
+    """Modification d'une valeur de configuration lors d'un rechargement"""
+    key: str
+    old: Any
+    new: Any
+
+
+class ConfigAccessor:
+    """
+    Accesseur précompilé vers une clé de configuration
+    
+    La valeur est résolue et convertie au chargement (et à chaque rechargement),
+    la lecture de `value` est donc une simple lecture d'attribut.
+    """
+    
+    __slots__ = ('key', 'default', 'cast', 'value')
+    
+    def __init__(self, key: str, default: Any = None, cast: Optional[Callable] = None):
+        self.key = key
+        self.default = default
+        self.cast = cast
+        self.value = default
+    
+    def resolve(self, flat: Dict[str, Any]):
+        """Met à jour la valeur depuis la configuration aplatie"""
+        value = flat.get(self.key, _MISSING)
+        if value is _MISSING or value is None:
+            self.value = self.default
+            return
+        
+        if self.cast:
+            try:
+                value = self.cast(value)
+            except (TypeError, ValueError) as e:
+                logger.error(f"Valeur invalide pour {self.key}: {value!r} ({e})")
+                value = self.default
+        self.value = value
+
 
 class ConfigLoader:
     """Classe pour charger et gérer la configuration"""
@@ -22,6 +203,13 @@ class ConfigLoader:
         """
         self.config_file = Path(config_file)
         self.config = {}
+        self._flat: Dict[str, Any] = {}
+        self._accessors: Dict[Tuple[str, Any, Optional[Callable]], ConfigAccessor] = {}
+        self._subscribers: List[Tuple[str, Callable[[List[ConfigChange]], None]]] = []
+        self._lock = threading.RLock()
+        self._mtime = None
+        self._watch_thread = None
+        self._watch_stop = threading.Event()
         self.load_config()
     
     def load_config(self) -> Dict[str, Any]:
@@ -33,17 +221,22 @@ class ConfigLoader:
         """
         try:
             if self.config_file.exists():
+                self._mtime = self._get_mtime()
                 with open(self.config_file, 'r', encoding='utf-8') as f:
-                    self.config = json.load(f)
+                    config = json.load(f)
                 logger.info(f"Configuration chargée: {self.config_file}")
             else:
                 logger.warning(f"Fichier de configuration non trouvé: {self.config_file}")
-                self.config = self._get_default_config()
+                config = self._get_default_config()
+                self._apply(config)
                 self.save_config()
+                self._mtime = self._get_mtime()
+                return self.config
         except Exception as e:
             logger.error(f"Erreur chargement configuration: {e}")
-            self.config = self._get_default_config()
+            config = self._get_default_config()
         
+        self._apply(config)
         return self.config
     
     def save_config(self):
@@ -67,16 +260,186 @@ class ConfigLoader:
         Returns:
             Valeur de configuration ou valeur par défaut
         """
-        keys = key.split('.')
-        value = self.config
+        return self._flat.get(key, default)
+    
+    def accessor(self, key: str, default: Any = None, cast: Optional[Callable] = None) -> ConfigAccessor:
+        """
+        Retourne un accesseur précompilé pour une clé, à utiliser dans les boucles
+        (ex: `fmt = config.accessor('data.format', 'json', str)` puis `fmt.value`)
+        
+        Args:
+            key: Clé de configuration (notation pointée)
+            default: Valeur par défaut si la clé n'existe pas
+            cast: Conversion appliquée à la valeur (ex: int, float, str)
+        
+        Returns:
+            Accesseur dont l'attribut `value` suit les rechargements
+        """
+        with self._lock:
+            # repr : valeurs par défaut non hashables (listes, dictionnaires)
+            cache_key = (key, repr(default), cast)
+            accessor = self._accessors.get(cache_key)
+            if accessor is None:
+                accessor = ConfigAccessor(key, default, cast)
+                accessor.resolve(self._flat)
+                self._accessors[cache_key] = accessor
+            return accessor
+    
+    def subscribe(self, callback: Callable[[List[ConfigChange]], None], prefix: str = ''):
+        """
+        Abonne une fonction aux modifications de configuration
+        
+        Args:
+            callback: Fonction appelée avec la liste des ConfigChange à chaque rechargement
+            prefix: Ne notifier que les clés commençant par ce préfixe (ex: 'server.')
+        """
+        with self._lock:
+            self._subscribers.append((prefix, callback))
+    
+    def unsubscribe(self, callback: Callable[[List[ConfigChange]], None]):
+        """Désabonne une fonction des modifications de configuration"""
+        with self._lock:
+            self._subscribers = [(p, cb) for p, cb in self._subscribers if cb is not callback]
+    
+    def reload(self) -> List[ConfigChange]:
+        """
+        Recharge le fichier de configuration et notifie les abonnés
+        Un fichier illisible ou invalide est ignoré et la configuration courante conservée
+        
+        Returns:
+            Liste des modifications appliquées
+        """
+        try:
+            self._mtime = self._get_mtime()
+            with open(self.config_file, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except Exception as e:
+            logger.error(f"Rechargement configuration impossible, configuration conservée: {e}")
+            return []
+        
+        with self._lock:
+            old_flat = self._flat
+            self._apply(config)
+            new_flat = self._flat
+            changes = [
+                ConfigChange(key, old_flat.get(key), new_flat.get(key))
+                for key in sorted(set(old_flat) | set(new_flat))
+                if not isinstance(new_flat.get(key), dict) and not isinstance(old_flat.get(key), dict)
+                and old_flat.get(key) != new_flat.get(key)
+            ]
+            subscribers = list(self._subscribers)
+        
+        if not changes:
+            return changes
+        
+        logger.info(f"Configuration rechargée: {', '.join(c.key for c in changes)}")
+        for prefix, callback in subscribers:
+            selected = [c for c in changes if c.key.startswith(prefix)]
+            if not selected:
+                continue
+            try:
+                callback(selected)
+            except Exception as e:
+                logger.error(f"Erreur abonné configuration: {e}")
+        return changes
+    
+    def check_for_changes(self) -> List[ConfigChange]:
+        """
+        Recharge la configuration si le fichier a été modifié (comparaison du mtime)
+        
+        Returns:
+            Liste des modifications appliquées (vide si le fichier n'a pas changé)
+        """
+        mtime = self._get_mtime()
+        if mtime is None or mtime == self._mtime:
+            return []
+        return self.reload()
+    
+    def start_watching(self, poll_interval: float = 2.0):
+        """
+        Surveille le fichier de configuration dans un thread dédié
         
-        for k in keys:
-            if isinstance(value, dict) and k in value:
-                value = value[k]
+        Args:
+            poll_interval: Intervalle en secondes entre deux vérifications du fichier
+        """
+        if self._watch_thread and self._watch_thread.is_alive():
+            return
+        
+        self._watch_stop.clear()
+        self._watch_thread = threading.Thread(
+            target=self._watch_loop,
+            args=(poll_interval,),
+            name='config-watcher',
+            daemon=True
+        )
+        self._watch_thread.start()
+        logger.info(f"Surveillance de la configuration: {self.config_file} (toutes les {poll_interval}s)")
+    
+    def stop_watching(self):
+        """Arrête la surveillance du fichier de configuration"""
+        self._watch_stop.set()
+        if self._watch_thread:
+            self._watch_thread.join(timeout=5)
+            self._watch_thread = None
+    
+    def _watch_loop(self, poll_interval: float):
+        """Boucle de surveillance du fichier de configuration"""
+        while not self._watch_stop.wait(poll_interval):
+            try:
+                self.check_for_changes()
+            except Exception as e:
+                logger.error(f"Erreur surveillance configuration: {e}")
+    
+    def _get_mtime(self) -> Optional[int]:
+        """Retourne la date de modification du fichier (None s'il n'existe pas)"""
+        try:
+            return self.config_file.stat().st_mtime_ns
+        except OSError:
+            return None
+    
+    def _apply(self, config: Dict[str, Any]):
+        """Valide la configuration, reconstruit le cache aplati et met à jour les accesseurs"""
+        flat: Dict[str, Any] = {}
+        self._flatten(config, '', flat)
+        
+        # Une valeur invalide est ignorée : la précédente valeur valide est conservée
+        for key, error in self._validate(flat):
+            logger.error(f"Configuration invalide - {key}: {error} (valeur ignorée)")
+            if key in self._flat:
+                flat[key] = self._flat[key]
             else:
-                return default
+                flat.pop(key, None)
         
-        return value
+        with self._lock:
+            self.config = config
+            self._flat = flat
+            for accessor in self._accessors.values():
+                accessor.resolve(flat)
+    
+    @staticmethod
+    def _validate(flat: Dict[str, Any]) -> List[Tuple[str, str]]:
+        """Vérifie les valeurs présentes par rapport au schéma"""
+        errors = []
+        for key, (types, minimum) in CONFIG_SCHEMA.items():
+            value = flat.get(key, _MISSING)
+            if value is _MISSING or value is None:
+                continue
+            # bool est une sous-classe de int : ne l'accepter que si attendu
+            if (isinstance(value, bool) and bool not in types) or not isinstance(value, types):
+                expected = '/'.join(t.__name__ for t in types)
+                errors.append((key, f"type {type(value).__name__} au lieu de {expected}"))
+            elif minimum is not None and value < minimum:
+                errors.append((key, f"{value} inférieur au minimum {minimum}"))
+        return errors
+    
+    @classmethod
+    def _flatten(cls, d: Dict[str, Any], parent_key: str, out: Dict[str, Any]):
+        """Aplatit la configuration en clés pointées (les nœuds intermédiaires sont conservés)"""
+        for k, v in d.items():
+            key = f"{parent_key}.{k}" if parent_key else k
+            out[key] = v
+            if isinstance(v, dict):
+                cls._flatten(v, key, out)
     
     def _get_default_config(self) -> Dict[str, Any]:
         """Retourne la configuration par défaut"""
@@ -89,9 +452,12 @@ class ConfigLoader:
                 },
                 "dht22": {
                     "pin": 4,
+                    "max_retries": 1,
                     "enabled": True
                 },
                 "mpu9250": {
+                    "fifo": False,
+                    "sample_rate": 200,
                     "enabled": True
                 },
                 "ultrasonic_entry": {
@@ -106,6 +472,14 @@ class ConfigLoader:
                     "enabled": True,
                     "door_type": "sortie"
                 },
+                "pir_entry": {
+                    "pin": 17,
+                    "enabled": False
+                },
+                "pir_exit": {
+                    "pin": 27,
+                    "enabled": False
+                },
                 "lcd": {
                     "i2c_address": "0x27",
                     "cols": 16,
@@ -115,16 +489,141 @@ class ConfigLoader:
             },
             "bus": {
                 "max_passengers": 10,
-                "detection_threshold": 3.0
+                "detection_threshold": 3.0,
+                "harsh_braking_threshold": 0.35
             },
             "data": {
                 "save_interval": 5,
                 "format": "json",
-                "directory": "data"
+                "directory": "data",
+                "batch_size": 1,
+                "flush_interval": 60,
+                "backend": "files"
+            },
+            "datastore": {
+                "batch_size": 50,
+                "flush_interval": 5.0,
+                "retention_days": 30
+            },
+            "output": {
+                "sinks": [],
+                "queue_size": 100,
+                "overflow": "drop_oldest",
+                "block_timeout": 0.1
+            },
+            "persistence": {
+                "fsync": False,
+                "checkpoint_interval": 60,
+                "max_state_age": 1800
+            },
+            "retention": {
+                "enabled": True,
+                "max_mb": 500,
+                "min_free_mb": 200,
+                "keep_days": 90,
+                "compact_after_days": 1,
+                "interval": 300
+            },
+            "trajectory": {
+                "enabled": True,
+                "epsilon": 10.0,
+                "max_speed": 130.0,
+                "trip_gap": 300.0
+            },
+            "stops": {
+                "enabled": False,
+                "file": "config/stops.json",
+                "default_radius": 30.0,
+                "stopped_speed": 3.0
+            },
+            "health": {
+                "failure_threshold": 3,
+                "base_backoff": 1.0,
+                "max_backoff": 300.0,
+                "door_max_backoff": 5.0
+            },
+            "door_gate": {
+                "active_interval": 0.05,
+                "idle_interval": 1.0,
+                "hold": 1.0,
+                "bouncetime": 50
+            },
+            "i2c": {
+                "enabled": False,
+                "bus": 1,
+                "batch_size": 4
+            },
+            "capture": {
+                "enabled": False,
+                "file_mb": 50,
+                "flush_interval": 5.0
+            },
+            "blackbox": {
+                "enabled": False,
+                "pre": 10.0,
+                "post": 5.0,
+                "accel_threshold": 0.35,
+                "door_trigger": False,
+                "upload": True
+            },
+            "anomaly": {
+                "enabled": False,
+                "window": 31,
+                "spike_threshold": 6.0,
+                "stuck_count": 30,
+                "stuck_factor": 3.0,
+                "drift_threshold": 6.0,
+                "ewma_alpha": 0.05,
+                "baseline": 1000,
+                "warmup": 50,
+                "exclude": [
+                    "gps.latitude", "gps.longitude", "gps.altitude", "gps.speed",
+                    "mpu9250.samples", "ultrasonic_entry.samples", "ultrasonic_exit.samples"
+                ],
+                "spike_exclude": ["ultrasonic_entry", "ultrasonic_exit", "mpu9250"]
+            },
+            "alignment": {
+                "enabled": False,
+                "method": "linear",
+                "delay": 0.0,
+                "capacity": 256,
+                "max_gap": 5.0
+            },
+            "fusion": {
+                "enabled": False,
+                "declination": 0.0,
+                "heading_tau": 5.0,
+                "gps_sigma": 5.0
+            },
+            "startup": {
+                "parallel": True,
+                "driver_timeout": 5.0,
+                "door_timeout": 2.0
+            },
+            "adaptive": {
+                "enabled": False,
+                "moving_speed": 5.0,
+                "vibration_threshold": 0.02,
+                "parked_after": 300.0,
+                "door_hold": 10.0,
+                "min_dwell": 10.0
+            },
+            "runtime": {
+                "mode": "single",
+                "ultrasonic_rate": 20.0,
+                "imu_rate": 100.0,
+                "cpu_affinity": True,
+                "ring_capacity": 1024
+            },
+            "config": {
+                "poll_interval": 2.0
             },
             "logging": {
                 "level": "INFO",
-                "file": "logs/smart_bus.log"
+                "file": "logs/smart_bus.log",
+                "max_bytes": 1048576,
+                "backup_count": 5,
+                "rate_limit_interval": 60
             }
         }
 
@@ -4,27 +4,53 @@ Module pour l'enregistrement des données des capteurs
 
 import json
 import csv
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Optional
 import logging
 
+from .batch_buffer import SnapshotBatch, CSVSink, JSONLSink, SQLiteSink, ParquetSink
+from .datastore import SQLiteDatastore
+from .persistence import atomic_write
+
 logger = logging.getLogger(__name__)
 
 
 class DataLogger:
     """Classe pour enregistrer les données des capteurs"""
     
-    def __init__(self, data_dir: str = 'data'):
+    def __init__(self, data_dir: str = 'data', fsync: bool = False):
         """
         Initialise le logger de données
         
         Args:
             data_dir: Répertoire pour stocker les données
+            fsync: Forcer l'écriture sur le support de chaque fichier JSON
         """
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
+        self.fsync = fsync
+        self.store: Optional[SQLiteDatastore] = None
+        self._sinks = {}
+        # Supports partagés par les threads des sorties (BatchWriter) : un lot à la fois
+        self._lock = threading.Lock()
+    
+    def open_store(self, filename: str = 'smart_bus.db', **options) -> SQLiteDatastore:
+        """
+        Ouvre la base SQLite utilisée par save_snapshot et save_event
+        
+        Args:
+            filename: Nom du fichier de la base dans le répertoire de données
+            **options: Paramètres de SQLiteDatastore (batch_size, flush_interval, retention_days)
         
+        Returns:
+            Base ouverte (pour les requêtes)
+        """
+        self.store = SQLiteDatastore(self.data_dir / filename, **options)
+        return self.store
+    
     def save_json(self, data: Dict, filename: Optional[str] = None) -> bool:
         """
         Enregistre les données au format JSON
@@ -38,17 +64,18 @@ class DataLogger:
         """
         try:
             if not filename:
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                # Millisecondes : deux cycles dans la même seconde ne s'écrasent pas
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]
                 filename = f'sensor_data_{timestamp}.json'
             
             filepath = self.data_dir / filename
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            # Fichier temporaire puis renommage : jamais de fichier tronqué après une coupure
+            atomic_write(filepath, json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8'), fsync=self.fsync)
             
             logger.debug(f"Données sauvegardées: {filepath}")
             return True
-            
+        
         except Exception as e:
             logger.error(f"Erreur sauvegarde JSON: {e}")
             return False
@@ -81,11 +108,106 @@ class DataLogger:
             
             logger.debug(f"Données ajoutées au CSV: {filepath}")
             return True
-            
+        
         except Exception as e:
             logger.error(f"Erreur sauvegarde CSV: {e}")
             return False
     
+    def save_snapshot(self, data: Dict) -> bool:
+        """
+        Enregistre un snapshot dans la base SQLite (écrit par lots)
+        
+        Args:
+            data: Snapshot produit par SmartBus.collect_data
+        
+        Returns:
+            True si succès, False sinon
+        """
+        try:
+            self.store.add_snapshot(data)
+            return True
+        except Exception as e:
+            logger.error(f"Erreur sauvegarde SQLite: {e}")
+            return False
+    
+    def save_event(self, event_type: str, data: Optional[Dict] = None, bus_id: Optional[str] = None) -> bool:
+        """
+        Enregistre un événement dans la base SQLite (sans effet sans base)
+        
+        Args:
+            event_type: Type d'événement (voir utils.uplink)
+            data: Informations complémentaires
+            bus_id: Identifiant du bus
+        
+        Returns:
+            True si succès, False sinon
+        """
+        if not self.store:
+            return False
+        try:
+            self.store.add_event(event_type, data, bus_id=bus_id)
+            return True
+        except Exception as e:
+            logger.error(f"Erreur sauvegarde événement SQLite: {e}")
+            return False
+    
+    def save_batch(self, batch: SnapshotBatch, fmt: str = 'json') -> bool:
+        """
+        Enregistre un lot de snapshots en une seule écriture par support
+        
+        Args:
+            batch: Lot de snapshots
+            fmt: 'json' (JSON Lines, un fichier par jour), 'csv', 'both', 'sqlite' ou 'parquet'
+        
+        Returns:
+            True si succès, False sinon
+        """
+        if not batch.size:
+            return True
+        formats = ('json', 'csv') if fmt == 'both' else (fmt,)
+        success = True
+        with self._lock:
+            for name in formats:
+                try:
+                    sink = self._sink(name)
+                    sink.write(batch)
+                    logger.debug(f"Lot de {batch.size} snapshots sauvegardé ({name})")
+                except Exception as e:
+                    logger.error(f"Erreur sauvegarde du lot ({name}): {e}")
+                    success = False
+        return success
+    
+    def close(self):
+        """Ferme les supports ouverts par save_batch et la base SQLite"""
+        with self._lock:
+            for sink in self._sinks.values():
+                if hasattr(sink, 'close'):
+                    sink.close()
+            self._sinks.clear()
+        if self.store:
+            self.store.close()
+            self.store = None
+    
+    def _sink(self, fmt: str):
+        """Support d'écriture des lots pour un format (créé au premier usage, appelé sous self._lock)"""
+        key = f"json_{datetime.now():%Y%m%d}" if fmt == 'json' else fmt
+        sink = self._sinks.get(key)
+        if sink is None:
+            if fmt == 'json':
+                for old in [k for k in self._sinks if k.startswith('json_')]:
+                    del self._sinks[old]
+                sink = JSONLSink(self.data_dir / f'sensor_data_{key[5:]}.jsonl')
+            elif fmt == 'csv':
+                sink = CSVSink(self.data_dir / 'sensor_data.csv')
+            elif fmt == 'sqlite':
+                sink = SQLiteSink(self.data_dir / 'sensor_data.db')
+            elif fmt == 'parquet':
+                sink = ParquetSink(self.data_dir)
+            else:
+                raise ValueError(f"Format inconnu: {fmt}")
+            self._sinks[key] = sink
+        return sink
+    
     def _flatten_dict(self, d: Dict, parent_key: str = '', sep: str = '_') -> Dict:
         """Aplatit un dictionnaire imbriqué"""
         items = []
@@ -98,6 +220,43 @@ class DataLogger:
         return dict(items)
 
 
+class BatchWriter:
+    """Classe pour accumuler les snapshots d'une sortie et les écrire par lots"""
+    
+    def __init__(self, data_logger: DataLogger, fmt: str, batch_size: int, flush_interval: float = 60):
+        """
+        Initialise l'écriture par lots d'un format
+        
+        Args:
+            data_logger: DataLogger qui écrit les lots (save_batch)
+            fmt: Format des lots ('json', 'csv', 'sqlite' ou 'parquet')
+            batch_size: Nombre de snapshots par lot
+            flush_interval: Âge maximal en secondes du premier snapshot d'un lot avant son écriture
+        """
+        self.data_logger = data_logger
+        self.fmt = fmt
+        self.flush_interval = flush_interval
+        self.batch = SnapshotBatch(max(1, batch_size))
+        self._started = None
+    
+    def write(self, data: Dict) -> bool:
+        """Ajoute un snapshot au lot et l'écrit s'il est plein ou trop ancien"""
+        if not self.batch.size:
+            self._started = time.monotonic()
+        self.batch.append(data)
+        if self.batch.full or time.monotonic() - self._started >= self.flush_interval:
+            return self.flush()
+        return True
+    
+    def flush(self) -> bool:
+        """Écrit les snapshots en attente"""
+        if not self.batch.size:
+            return True
+        success = self.data_logger.save_batch(self.batch, self.fmt)
+        self.batch.clear()
+        return success
+
+
 
 
 
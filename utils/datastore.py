@@ -0,0 +1,302 @@
+"""
+Module de stockage local SQLite
+Snapshots et événements sont enregistrés dans une base SQLite en mode WAL, par
+transactions groupées, avec des index sur l'horodatage, le bus et le type
+d'événement ; les données plus anciennes que la durée de rétention sont
+supprimées périodiquement
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    bus_id TEXT,
+    passengers INTEGER,
+    latitude REAL,
+    longitude REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_ts ON snapshots (ts);
+CREATE INDEX IF NOT EXISTS idx_snapshots_bus_ts ON snapshots (bus_id, ts);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    bus_id TEXT,
+    type TEXT NOT NULL,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS idx_events_type_ts ON events (type, ts);
+CREATE INDEX IF NOT EXISTS idx_events_bus_ts ON events (bus_id, ts);
+"""
+
+Timestamp = Union[float, str, datetime]
+
+
+def _to_epoch(value: Timestamp) -> float:
+    """Convertit un instant (epoch, datetime ou ISO 8601) en secondes epoch"""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+
+class SQLiteDatastore:
+    """Classe pour stocker et interroger l'historique local dans SQLite"""
+    
+    def __init__(self, path: str, batch_size: int = 50, flush_interval: float = 5.0,
+                 retention_days: float = 30.0, prune_interval: float = 3600.0):
+        """
+        Initialise la base
+        
+        Args:
+            path: Chemin du fichier SQLite
+            batch_size: Nombre d'enregistrements regroupés par transaction
+            flush_interval: Délai maximal en secondes avant l'écriture des enregistrements en attente
+            retention_days: Durée de conservation en jours (0 = illimitée)
+            prune_interval: Intervalle en secondes entre deux purges
+        """
+        self.path = str(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.prune_interval = prune_interval
+        
+        self._lock = threading.Lock()
+        self._pending_snapshots: List[tuple] = []
+        self._pending_events: List[tuple] = []
+        self._oldest_pending: Optional[float] = None
+        self._last_prune = 0.0
+        
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # En WAL, NORMAL ne synchronise qu'aux checkpoints : une coupure peut perdre
+        # les dernières transactions mais ne corrompt pas la base
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+    
+    def add_snapshot(self, data: Dict, bus_id: Optional[str] = None):
+        """
+        Ajoute un snapshot (écrit avec le prochain lot)
+        
+        Args:
+            data: Snapshot produit par SmartBus.collect_data
+            bus_id: Identifiant du bus (par défaut celui du snapshot)
+        """
+        gps = data.get('sensors', {}).get('gps') or {}
+        row = (
+            _to_epoch(data['timestamp']) if data.get('timestamp') else time.time(),
+            bus_id or data.get('bus_id'),
+            (data.get('passengers') or {}).get('count'),
+            gps.get('latitude'),
+            gps.get('longitude'),
+            json.dumps(data, ensure_ascii=False)
+        )
+        with self._lock:
+            self._pending_snapshots.append(row)
+            self._after_add()
+    
+    def add_event(self, event_type: str, data: Optional[Dict] = None,
+                  bus_id: Optional[str] = None, timestamp: Optional[Timestamp] = None):
+        """
+        Ajoute un événement (écrit avec le prochain lot)
+        
+        Args:
+            event_type: Type d'événement (voir utils.uplink)
+            data: Informations complémentaires
+            bus_id: Identifiant du bus
+            timestamp: Instant de l'événement (par défaut maintenant)
+        """
+        row = (
+            time.time() if timestamp is None else _to_epoch(timestamp),
+            bus_id,
+            event_type,
+            json.dumps(data, ensure_ascii=False) if data else None
+        )
+        with self._lock:
+            self._pending_events.append(row)
+            self._after_add()
+    
+    def flush(self) -> int:
+        """
+        Écrit les enregistrements en attente en une transaction
+        
+        Returns:
+            Nombre d'enregistrements écrits
+        """
+        with self._lock:
+            return self._flush()
+    
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        Supprime les données plus anciennes que la durée de rétention
+        
+        Args:
+            now: Instant de référence en secondes epoch (par défaut maintenant)
+        
+        Returns:
+            Nombre de lignes supprimées
+        """
+        if not self.retention_days:
+            return 0
+        cutoff = (time.time() if now is None else now) - self.retention_days * 86400
+        with self._lock:
+            with self._conn:
+                deleted = self._conn.execute('DELETE FROM snapshots WHERE ts < ?', (cutoff,)).rowcount
+                deleted += self._conn.execute('DELETE FROM events WHERE ts < ?', (cutoff,)).rowcount
+            self._last_prune = time.monotonic()
+        if deleted:
+            logger.info(f"Rétention: {deleted} enregistrement(s) de plus de {self.retention_days:g} jours supprimé(s)")
+        return deleted
+    
+    def snapshots(self, start: Optional[Timestamp] = None, end: Optional[Timestamp] = None,
+                  bus_id: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Retourne les snapshots d'une période, du plus ancien au plus récent
+        
+        Args:
+            start: Début de la période (inclus)
+            end: Fin de la période (exclue)
+            bus_id: Filtre sur le bus
+            limit: Nombre maximal de snapshots
+        
+        Returns:
+            Snapshots tels qu'enregistrés
+        """
+        where, params = self._range(start, end, bus_id)
+        sql = f'SELECT data FROM snapshots{where} ORDER BY ts'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        return [json.loads(row[0]) for row in self._query(sql, params)]
+    
+    def events(self, start: Optional[Timestamp] = None, end: Optional[Timestamp] = None,
+               event_type: Optional[str] = None, bus_id: Optional[str] = None) -> List[Dict]:
+        """
+        Retourne les événements d'une période, du plus ancien au plus récent
+        
+        Args:
+            start: Début de la période (inclus)
+            end: Fin de la période (exclue)
+            event_type: Filtre sur le type d'événement
+            bus_id: Filtre sur le bus
+        
+        Returns:
+            Événements {'type', 'timestamp', 'bus_id', 'data'}
+        """
+        where, params = self._range(start, end, bus_id)
+        if event_type:
+            where += (' AND' if where else ' WHERE') + ' type = ?'
+            params.append(event_type)
+        rows = self._query(f'SELECT ts, bus_id, type, data FROM events{where} ORDER BY ts', params)
+        return [
+            {'type': kind, 'timestamp': datetime.fromtimestamp(ts).isoformat(), 'bus_id': bus,
+             'data': json.loads(data) if data else {}}
+            for ts, bus, kind, data in rows
+        ]
+    
+    def count_events(self, start: Optional[Timestamp] = None, end: Optional[Timestamp] = None,
+                     bus_id: Optional[str] = None) -> Dict[str, int]:
+        """Retourne le nombre d'événements par type sur une période"""
+        where, params = self._range(start, end, bus_id)
+        return dict(self._query(f'SELECT type, COUNT(*) FROM events{where} GROUP BY type', params))
+    
+    def daily_totals(self, day: Optional[datetime] = None, bus_id: Optional[str] = None) -> Dict:
+        """
+        Retourne les totaux d'une journée (pour l'affichage à bord)
+        
+        Args:
+            day: Jour voulu (par défaut aujourd'hui, heure locale)
+            bus_id: Filtre sur le bus
+        
+        Returns:
+            Montées, descentes, occupation maximale et nombre de snapshots
+        """
+        start = (day or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+        end = start + timedelta(days=1)
+        counts = self.count_events(start, end, bus_id)
+        where, params = self._range(start, end, bus_id)
+        max_passengers, snapshots = self._query(f'SELECT MAX(passengers), COUNT(*) FROM snapshots{where}', params)[0]
+        return {
+            'date': start.date().isoformat(),
+            'boardings': counts.get('boarding', 0),
+            'alightings': counts.get('alighting', 0),
+            'max_passengers': max_passengers,
+            'snapshots': snapshots,
+        }
+    
+    def close(self):
+        """Écrit les enregistrements en attente et ferme la base"""
+        with self._lock:
+            self._flush()
+            self._conn.close()
+    
+    def _after_add(self):
+        """Écrit le lot s'il est complet ou trop ancien, purge périodiquement (verrou tenu)"""
+        now = time.monotonic()
+        if self._oldest_pending is None:
+            self._oldest_pending = now
+        pending = len(self._pending_snapshots) + len(self._pending_events)
+        if pending >= self.batch_size or now - self._oldest_pending >= self.flush_interval:
+            self._flush()
+            if self.retention_days and now - self._last_prune >= self.prune_interval:
+                self._last_prune = now
+                threading.Thread(target=self._safe_prune, name='datastore-prune', daemon=True).start()
+    
+    def _safe_prune(self):
+        try:
+            self.prune()
+        except Exception as e:
+            logger.error(f"Erreur purge de la base: {e}")
+    
+    def _flush(self) -> int:
+        """Écrit les lots en attente (verrou tenu)"""
+        snapshots, events = self._pending_snapshots, self._pending_events
+        if not snapshots and not events:
+            return 0
+        try:
+            with self._conn:
+                if snapshots:
+                    self._conn.executemany(
+                        'INSERT INTO snapshots (ts, bus_id, passengers, latitude, longitude, data) VALUES (?, ?, ?, ?, ?, ?)',
+                        snapshots
+                    )
+                if events:
+                    self._conn.executemany('INSERT INTO events (ts, bus_id, type, data) VALUES (?, ?, ?, ?)', events)
+        except sqlite3.Error as e:
+            # Les enregistrements restent en attente pour la prochaine tentative
+            logger.error(f"Erreur écriture SQLite: {e}")
+            return 0
+        self._pending_snapshots, self._pending_events = [], []
+        self._oldest_pending = None
+        return len(snapshots) + len(events)
+    
+    def _range(self, start: Optional[Timestamp], end: Optional[Timestamp], bus_id: Optional[str]):
+        """Clause WHERE et paramètres pour une période et un bus"""
+        clauses, params = [], []
+        if start is not None:
+            clauses.append('ts >= ?')
+            params.append(_to_epoch(start))
+        if end is not None:
+            clauses.append('ts < ?')
+            params.append(_to_epoch(end))
+        if bus_id:
+            clauses.append('bus_id = ?')
+            params.append(bus_id)
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+    
+    def _query(self, sql: str, params: list) -> list:
+        """Exécute une requête de lecture (les enregistrements en attente sont écrits avant)"""
+        with self._lock:
+            self._flush()
+            return self._conn.execute(sql, params).fetchall()
@@ -0,0 +1,143 @@
+"""
+Module d'échantillonnage des portes déclenché par les détecteurs PIR
+Un capteur PIR par porte signale les mouvements par interruption : les
+capteurs ultrason de la porte ne sont lus à cadence élevée que pendant un
+mouvement (et quelques secondes après), puis reviennent à une lecture de
+contrôle lente. Sans mouvement, la boucle principale dort au lieu de mesurer
+des distances en attente active.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DoorGate:
+    """Classe pour décider quand lire les capteurs ultrason des portes selon les détecteurs PIR"""
+    
+    def __init__(self, doors: Dict[str, object], active_interval: float = 0.05,
+                 idle_interval: float = 1.0, hold: float = 1.0, bouncetime: int = 50):
+        """
+        Initialise la surveillance des portes
+        
+        Args:
+            doors: Détecteur PIR par nom de capteur ultrason (ex: {'ultrasonic_entry': PIR(17)})
+            active_interval: Intervalle en secondes entre deux lectures pendant un mouvement
+            idle_interval: Intervalle en secondes des lectures de contrôle sans mouvement
+            hold: Durée en secondes pendant laquelle la porte reste active après le dernier mouvement
+            bouncetime: Durée d'anti-rebond des interruptions en ms
+        """
+        self.doors = doors
+        self.active_interval = active_interval
+        self.idle_interval = idle_interval
+        self.hold = hold
+        self.bouncetime = bouncetime
+        
+        self.stats = {'wakeups': 0, 'active_reads': 0, 'idle_reads': 0}
+        # Délais (s) entre un front montant et la première lecture de la porte
+        self.latencies = deque(maxlen=100)
+        self._motion = {name: False for name in doors}
+        self._active_until = {name: 0.0 for name in doors}
+        self._woken_at: Dict[str, Optional[float]] = {name: None for name in doors}
+        self._last_read: Dict[str, float] = {}
+        self._wake = threading.Event()
+    
+    def start(self):
+        """
+        Active les interruptions des détecteurs PIR
+        Une porte dont la détection de fronts n'a pas pu être activée reste active en permanence
+        (lue à cadence élevée comme pendant un mouvement) pour ne manquer aucun passager
+        """
+        watched = []
+        for name, pir in self.doors.items():
+            if not pir.watch(lambda motion, name=name: self._on_motion(name, motion), bouncetime=self.bouncetime):
+                self._motion[name] = True
+                logger.warning(f"Interruptions PIR indisponibles pour {name} - porte lue en continu")
+                continue
+            watched.append(name)
+            # État initial : un passager peut déjà être devant la porte
+            if pir.is_motion_detected():
+                self._on_motion(name, True)
+        logger.info(f"Portes surveillées par PIR: {', '.join(watched) or 'aucune'}")
+    
+    def stop(self):
+        """Désactive les interruptions et libère les broches"""
+        for pir in self.doors.values():
+            pir.cleanup()
+        self._wake.set()
+    
+    def is_active(self, name: str, now: Optional[float] = None) -> bool:
+        """Indique si un mouvement est en cours (ou récent) devant une porte"""
+        now = time.monotonic() if now is None else now
+        return self._motion.get(name, False) or now < self._active_until.get(name, 0.0)
+    
+    @property
+    def active(self) -> bool:
+        """Au moins une porte est active"""
+        now = time.monotonic()
+        return any(self.is_active(name, now) for name in self.doors)
+    
+    @property
+    def poll_interval(self) -> float:
+        """Intervalle de lecture des portes selon leur activité"""
+        return self.active_interval if self.active else self.idle_interval
+    
+    def due(self, name: str, now: Optional[float] = None) -> bool:
+        """
+        Indique si le capteur ultrason d'une porte doit être lu (et note la lecture)
+        Les capteurs sans détecteur PIR sont toujours lus.
+        
+        Args:
+            name: Nom du capteur ultrason
+            now: Instant courant (horloge monotone)
+        """
+        if name not in self.doors:
+            return True
+        now = time.monotonic() if now is None else now
+        if self.is_active(name, now):
+            self.stats['active_reads'] += 1
+            woken = self._woken_at[name]
+            if woken is not None:
+                self.latencies.append(now - woken)
+                self._woken_at[name] = None
+        else:
+            # Tolérance d'une demi-période pour absorber l'imprécision de l'attente
+            last = self._last_read.get(name)
+            if last is not None and now - last < self.idle_interval - self.active_interval / 2:
+                return False
+            self.stats['idle_reads'] += 1
+        self._last_read[name] = now
+        return True
+    
+    def keep_active(self, name: str, now: Optional[float] = None):
+        """Prolonge l'activité d'une porte (un passager immobile n'est plus vu par le PIR)"""
+        if name in self._active_until:
+            now = time.monotonic() if now is None else now
+            self._active_until[name] = max(self._active_until[name], now + self.hold)
+    
+    def wait(self, timeout: float) -> bool:
+        """
+        Attend la fin du délai ou un mouvement à une porte
+        
+        Returns:
+            True si l'attente a été interrompue par un mouvement
+        """
+        woken = self._wake.wait(timeout)
+        self._wake.clear()
+        return woken
+    
+    def _on_motion(self, name: str, motion: bool):
+        """Front du détecteur PIR (thread d'interruption)"""
+        now = time.monotonic()
+        if motion and not self.is_active(name, now):
+            self._woken_at[name] = now
+            self.stats['wakeups'] += 1
+        self._motion[name] = motion
+        if motion:
+            self._wake.set()
+        else:
+            self._active_until[name] = now + self.hold
@@ -0,0 +1,252 @@
+"""
+Module de diffusion des snapshots vers les sorties (fichiers JSON / CSV, base, serveur...)
+Chaque snapshot est publié une seule fois puis copié dans la file bornée de
+chaque sortie, vidée par un thread dédié : une carte SD lente ne retarde
+plus l'envoi au serveur, et inversement. Chaque sortie a sa propre
+politique de débordement et ses propres compteurs.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Politiques de débordement d'une file pleine
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+OVERFLOW_DROP_NEWEST = 'drop_newest'
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_BLOCK)
+
+
+class _SinkWorker:
+    """File bornée et thread d'écriture d'une sortie"""
+    
+    def __init__(self, name: str, write: Callable[[Dict], Any], flush: Optional[Callable[[], Any]],
+                 queue_size: int, overflow: str, block_timeout: float):
+        self.name = name
+        self.write = write
+        self.flush = flush
+        self.queue_size = max(1, queue_size)
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        
+        self._queue = deque()
+        self._cond = threading.Condition()
+        # Accepte les snapshots dès sa création ; ils sont écrits une fois le thread démarré
+        self._running = True
+        self._started = False
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {
+            'published': 0,
+            'written': 0,
+            'failed': 0,
+            'dropped': 0,
+            'blocked': 0,
+            'queue_max': 0,
+            'write_time': 0.0,
+            'latency_last': None,
+            'latency_max': 0.0,
+        }
+    
+    def start(self):
+        if self._started:
+            return
+        self._started = True
+        self._thread = threading.Thread(target=self._loop, name=f'sink-{self.name}', daemon=True)
+        self._thread.start()
+    
+    def signal_stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+    
+    def join(self, timeout: float):
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                logger.warning(f"Sortie {self.name} toujours bloquée à l'arrêt - {len(self._queue)} snapshot(s) perdu(s)")
+            self._thread = None
+    
+    def put(self, data: Dict):
+        """Ajoute un snapshot à la file (attente bornée à block_timeout avec OVERFLOW_BLOCK)"""
+        with self._cond:
+            self.stats['published'] += 1
+            if not self._running:
+                # Sortie arrêtée (pipeline remplacé ou fermé) : compté, jamais perdu en silence
+                self.stats['dropped'] += 1
+                logger.warning(f"Sortie {self.name} arrêtée - snapshot abandonné")
+                return
+            if len(self._queue) >= self.queue_size and self.overflow == OVERFLOW_BLOCK and self._running:
+                self.stats['blocked'] += 1
+                self._cond.wait_for(lambda: len(self._queue) < self.queue_size or not self._running,
+                                    timeout=self.block_timeout)
+            if len(self._queue) >= self.queue_size:
+                self.stats['dropped'] += 1
+                if self.overflow == OVERFLOW_DROP_OLDEST:
+                    self._queue.popleft()
+                else:
+                    return
+            self._queue.append((time.monotonic(), data))
+            self.stats['queue_max'] = max(self.stats['queue_max'], len(self._queue))
+            self._cond.notify_all()
+    
+    def pending(self) -> int:
+        return len(self._queue)
+    
+    def _loop(self):
+        """Écrit les snapshots de la file ; à l'arrêt, vide la file puis appelle flush"""
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or not self._running)
+                if not self._queue:
+                    break
+                queued, data = self._queue.popleft()
+                # Place libérée : réveille un publish en attente (OVERFLOW_BLOCK)
+                self._cond.notify_all()
+            
+            start = time.monotonic()
+            try:
+                ok = self.write(data) is not False
+            except Exception as e:
+                logger.error(f"Erreur sortie {self.name}: {e}")
+                ok = False
+            end = time.monotonic()
+            self.stats['written' if ok else 'failed'] += 1
+            self.stats['write_time'] += end - start
+            self.stats['latency_last'] = end - queued
+            self.stats['latency_max'] = max(self.stats['latency_max'], end - queued)
+        
+        if self.flush:
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erreur vidage de la sortie {self.name}: {e}")
+
+
+class OutputPipeline:
+    """Classe pour diffuser chaque snapshot vers plusieurs sorties indépendantes"""
+    
+    def __init__(self, queue_size: int = 100, overflow: str = OVERFLOW_DROP_OLDEST, block_timeout: float = 0.1,
+                 paused: bool = False):
+        """
+        Initialise le pipeline (sans sortie)
+        
+        Args:
+            queue_size: Taille par défaut de la file de chaque sortie
+            overflow: Politique par défaut quand une file est pleine : OVERFLOW_DROP_OLDEST (le plus
+                ancien snapshot est abandonné), OVERFLOW_DROP_NEWEST (le nouveau est abandonné) ou
+                OVERFLOW_BLOCK (publish attend une place au plus block_timeout, puis l'abandonne)
+            block_timeout: Attente maximale en secondes de publish avec OVERFLOW_BLOCK
+            paused: Les sorties mettent les snapshots en file sans les écrire jusqu'à resume
+                (remplacement d'un pipeline dont les sorties écrivent encore dans les mêmes fichiers)
+        """
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self._paused = paused
+        self._workers: Dict[str, _SinkWorker] = {}
+        self._lock = threading.Lock()
+    
+    def add_sink(self, name: str, write: Callable[[Dict], Any], flush: Optional[Callable[[], Any]] = None,
+                 queue_size: Optional[int] = None, overflow: Optional[str] = None,
+                 block_timeout: Optional[float] = None):
+        """
+        Ajoute une sortie et démarre son thread (au resume si le pipeline est en pause)
+        
+        Args:
+            name: Nom de la sortie (unique)
+            write: Fonction appelée avec chaque snapshot dans le thread de la sortie
+                (un retour False ou une exception compte un échec)
+            flush: Fonction appelée dans le thread de la sortie à l'arrêt, file vidée (lots en attente)
+            queue_size: Taille de la file (par défaut celle du pipeline)
+            overflow: Politique de débordement (par défaut celle du pipeline)
+            block_timeout: Attente maximale avec OVERFLOW_BLOCK (par défaut celle du pipeline)
+        """
+        overflow = overflow or self.overflow
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Politique de débordement inconnue: {overflow}")
+        worker = _SinkWorker(
+            name, write, flush,
+            queue_size if queue_size is not None else self.queue_size,
+            overflow,
+            block_timeout if block_timeout is not None else self.block_timeout
+        )
+        with self._lock:
+            if name in self._workers:
+                raise ValueError(f"Sortie déjà présente: {name}")
+            if not self._paused:
+                worker.start()
+            # Copie : publish parcourt les sorties sans verrou
+            self._workers = {**self._workers, name: worker}
+        logger.info(f"Sortie {name} ajoutée (file de {worker.queue_size}, {overflow})")
+    
+    def remove_sink(self, name: str, timeout: float = 5.0):
+        """
+        Retire une sortie après avoir écrit les snapshots en attente
+        
+        Args:
+            name: Nom de la sortie
+            timeout: Temps maximal d'attente du thread en secondes
+        """
+        with self._lock:
+            workers = dict(self._workers)
+            worker = workers.pop(name, None)
+            self._workers = workers
+        if worker:
+            worker.start()
+            worker.signal_stop()
+            worker.join(timeout)
+    
+    def resume(self):
+        """Démarre l'écriture des sorties d'un pipeline créé en pause"""
+        with self._lock:
+            self._paused = False
+            for worker in self._workers.values():
+                worker.start()
+    
+    def sinks(self) -> List[str]:
+        """Noms des sorties"""
+        return list(self._workers)
+    
+    def publish(self, data: Dict):
+        """
+        Publie un snapshot vers toutes les sorties (non bloquant sauf sortie OVERFLOW_BLOCK pleine)
+        Le même dictionnaire est partagé par les sorties : elles ne doivent pas le modifier
+        
+        Args:
+            data: Snapshot produit par SmartBus.collect_data
+        """
+        for worker in self._workers.values():
+            worker.put(data)
+    
+    def pending(self) -> Dict[str, int]:
+        """Nombre de snapshots en attente par sortie"""
+        return {name: worker.pending() for name, worker in self._workers.items()}
+    
+    def stats(self) -> Dict[str, Dict]:
+        """Compteurs par sortie (publiés, écrits, échecs, abandonnés, file, temps d'écriture, latence)"""
+        return {name: {**worker.stats, 'pending': worker.pending()} for name, worker in self._workers.items()}
+    
+    def stop(self, timeout: float = 5.0) -> Dict[str, Dict]:
+        """
+        Arrête toutes les sorties après avoir écrit les snapshots en attente
+        Les sorties restent listées : un publish ultérieur est compté comme abandonné (voir stats)
+        
+        Args:
+            timeout: Temps maximal d'attente par sortie en secondes
+        
+        Returns:
+            Compteurs finaux par sortie (voir stats)
+        """
+        with self._lock:
+            workers = list(self._workers.values())
+        # Toutes les sorties se vident en parallèle (y compris celles d'un pipeline en pause)
+        for worker in workers:
+            worker.start()
+            worker.signal_stop()
+        for worker in workers:
+            worker.join(timeout)
+        return {worker.name: {**worker.stats, 'pending': worker.pending()} for worker in workers}
@@ -0,0 +1,426 @@
+"""
+Module de fusion GPS / centrale inertielle
+Le GPS donne au mieux une position par seconde et disparaît dans les tunnels ;
+le MPU9250 mesure accélération, rotation et champ magnétique à cadence élevée.
+Un filtre de Kalman étendu (position est/nord, vitesse le long de la route,
+biais de l'accéléromètre) est propagé à chaque échantillon IMU et recalé sur
+chaque position GPS ; le cap est estimé par un filtre complémentaire
+(gyroscope recalé sur le cap GPS en mouvement et sur le magnétomètre
+calibré). Sans GPS, la position est estimée à l'estime.
+
+Le bus est supposé rouler à plat, IMU montée axe x vers l'avant, y vers la
+gauche, z vers le haut.
+"""
+
+import json
+import math
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from .persistence import atomic_write
+from .trajectory import EARTH_RADIUS
+
+logger = logging.getLogger(__name__)
+
+GRAVITY = 9.80665
+_DEG = math.pi / 180.0
+# Secteurs de cap à parcourir avant de calibrer le magnétomètre
+_CALIBRATION_SECTORS = 12
+_CALIBRATION_MIN_SAMPLES = 100
+# Vitesse (m/s) au-delà de laquelle le cap GPS est utilisé, en dessous de laquelle le bus est à l'arrêt
+_COURSE_MIN_SPEED = 3.0
+_STATIONARY_SPEED = 0.2
+# Distance (m) entre deux positions GPS pour en déduire un cap
+_COURSE_MIN_DISTANCE = 5.0
+# En dessous, la boucle Python est plus rapide que numpy (coût fixe des appels)
+_NUMPY_MIN_BATCH = 48
+
+
+def _wrap(angle: float) -> float:
+    """Ramène un angle dans ]-pi, pi]"""
+    return (angle + math.pi) % (2 * math.pi) - math.pi
+
+
+class MagnetometerCalibration:
+    """Calibration du magnétomètre : décalage (fer dur) et facteurs d'échelle par axe (fer doux)"""
+    
+    def __init__(self, offset: Sequence[float] = (0.0, 0.0, 0.0), scale: Sequence[float] = (1.0, 1.0, 1.0)):
+        self.offset = tuple(float(v) for v in offset)
+        self.scale = tuple(float(v) for v in scale)
+    
+    @classmethod
+    def fit(cls, minimum: Sequence[float], maximum: Sequence[float]) -> 'MagnetometerCalibration':
+        """
+        Calcule la calibration à partir des extrêmes mesurés pendant des tours complets
+        
+        Args:
+            minimum: Minimum mesuré sur chaque axe
+            maximum: Maximum mesuré sur chaque axe
+        """
+        offset = [(hi + lo) / 2 for lo, hi in zip(minimum, maximum)]
+        radii = [(hi - lo) / 2 for lo, hi in zip(minimum, maximum)]
+        # Axe vertical peu excité par les virages : seul le plan horizontal est mis à l'échelle
+        mean = (radii[0] + radii[1]) / 2
+        scale = [mean / r if r > 0 else 1.0 for r in radii[:2]] + [1.0]
+        return cls(offset, scale)
+    
+    def apply(self, mag: Sequence[float]) -> Tuple[float, float, float]:
+        return tuple((value - offset) * scale for value, offset, scale in zip(mag, self.offset, self.scale))
+    
+    def to_dict(self) -> Dict:
+        return {'offset': list(self.offset), 'scale': list(self.scale)}
+    
+    def save(self, path):
+        """Enregistre la calibration (écriture atomique)"""
+        atomic_write(path, json.dumps(self.to_dict()).encode('utf-8'))
+    
+    @classmethod
+    def load(cls, path) -> Optional['MagnetometerCalibration']:
+        """Charge une calibration enregistrée, None si absente ou illisible"""
+        try:
+            data = json.loads(Path(path).read_text(encoding='utf-8'))
+            return cls(data['offset'], data['scale'])
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Calibration du magnétomètre illisible ({path}): {e}")
+            return None
+
+
+class SensorFusion:
+    """Classe pour fusionner GPS et centrale inertielle (position, vitesse et cap à la cadence de l'IMU)"""
+    
+    def __init__(self, calibration_file=None, declination: float = 0.0, heading_tau: float = 5.0,
+                 course_tau: float = 5.0, gps_sigma: float = 5.0, speed_sigma: float = 0.5,
+                 accel_sigma: float = 0.5, bias_sigma: float = 0.005, heading_sigma: float = 0.05,
+                 gate: float = 25.0):
+        """
+        Initialise le filtre
+        
+        Args:
+            calibration_file: Fichier de la calibration du magnétomètre (chargée si présente,
+                calculée puis enregistrée après un tour complet sinon)
+            declination: Déclinaison magnétique locale en degrés (positive vers l'est)
+            heading_tau: Constante de temps en secondes du recalage du cap sur le magnétomètre
+            course_tau: Constante de temps en secondes du recalage du cap sur le cap GPS
+            gps_sigma: Écart-type des positions GPS en mètres
+            speed_sigma: Écart-type de la vitesse GPS en m/s
+            accel_sigma: Bruit de l'accélération longitudinale en m/s²
+            bias_sigma: Dérive du biais de l'accéléromètre en m/s² par √s
+            heading_sigma: Incertitude du cap en radians (erreur transversale à l'estime)
+            gate: Seuil (distance de Mahalanobis au carré) de rejet des positions GPS aberrantes
+        """
+        self.calibration_file = Path(calibration_file) if calibration_file else None
+        self.declination = declination
+        self.heading_tau = heading_tau
+        self.course_tau = course_tau
+        self.gps_sigma = gps_sigma
+        self.speed_sigma = speed_sigma
+        self.accel_sigma = accel_sigma
+        self.bias_sigma = bias_sigma
+        self.heading_sigma = heading_sigma
+        self.gate = gate
+        
+        # État : [est (m), nord (m), vitesse le long de la route (m/s), biais accéléromètre (m/s²)]
+        self.x = [0.0, 0.0, 0.0, 0.0]
+        self.P = [[1e6, 0, 0, 0], [0, 1e6, 0, 0], [0, 0, 25.0, 0], [0, 0, 0, 0.25]]
+        self.heading: Optional[float] = None  # radians, sens horaire depuis le nord
+        self.gyro_bias = 0.0  # rad/s
+        self.origin: Optional[Tuple[float, float]] = None
+        self.last_gps: Optional[float] = None
+        self._last_fix: Optional[Tuple[float, float]] = None
+        self._last_imu: Optional[float] = None
+        self._rejected = 0
+        self.stats = {'imu_samples': 0, 'gps_updates': 0, 'gps_rejected': 0}
+        
+        self.calibration = MagnetometerCalibration.load(self.calibration_file) if self.calibration_file else None
+        if self.calibration:
+            logger.info(f"Calibration du magnétomètre chargée: {self.calibration.to_dict()}")
+        self._mag_min = [math.inf] * 3
+        self._mag_max = [-math.inf] * 3
+        self._mag_count = 0
+        self._sectors = set()
+    
+    # ============================================
+    # Propagation (IMU)
+    # ============================================
+    
+    def update_imu(self, acceleration: Dict, gyroscope: Dict, magnetometer: Optional[Dict] = None,
+                   now: Optional[float] = None):
+        """
+        Propage le filtre avec un échantillon IMU (durée depuis l'appel précédent)
+        
+        Args:
+            acceleration: Accélération en g ({'x', 'y', 'z'})
+            gyroscope: Vitesse de rotation en °/s
+            magnetometer: Champ magnétique en µT (axes de l'AK8963)
+            now: Instant de la mesure (horloge monotone)
+        """
+        now = time.monotonic() if now is None else now
+        previous, self._last_imu = self._last_imu, now
+        if previous is None:
+            return
+        dt = min(max(now - previous, 0.0), 1.0)
+        if dt > 0:
+            self.update_imu_batch([(acceleration['x'], acceleration['y'], acceleration['z'])],
+                                  [(gyroscope['x'], gyroscope['y'], gyroscope['z'])], dt, magnetometer)
+    
+    def update_imu_batch(self, accel, gyro, dt: float, magnetometer: Optional[Dict] = None):
+        """
+        Propage le filtre avec une rafale d'échantillons à cadence fixe (FIFO du MPU9250)
+        
+        Args:
+            accel: Accélérations en g, N x 3 (tableau numpy ou liste de triplets)
+            gyro: Vitesses de rotation en °/s, N x 3
+            dt: Période d'échantillonnage en secondes
+            magnetometer: Dernier champ magnétique mesuré (µT, axes de l'AK8963)
+        """
+        n = len(accel)
+        if not n:
+            return
+        heading = self.heading if self.heading is not None else 0.0
+        x = self.x
+        
+        if NUMPY_AVAILABLE and n >= _NUMPY_MIN_BATCH:
+            accel = np.asarray(accel, dtype=float)
+            rates = (np.asarray(gyro, dtype=float)[:, 2] * _DEG - self.gyro_bias) * dt
+            # Rotation positive autour de z (vers la gauche) = cap décroissant
+            headings = heading - np.cumsum(rates)
+            speeds = np.maximum(x[2] + np.cumsum((accel[:, 0] * GRAVITY - x[3]) * dt), 0.0)
+            x[0] += float(np.dot(speeds, np.sin(headings))) * dt
+            x[1] += float(np.dot(speeds, np.cos(headings))) * dt
+            x[2] = float(speeds[-1])
+            final_heading = float(headings[-1])
+            mean_rate = float(np.mean(rates)) / dt
+        else:
+            speed, total = x[2], 0.0
+            for a, g in zip(accel, gyro):
+                rate = (g[2] * _DEG - self.gyro_bias) * dt
+                total += rate
+                heading -= rate
+                speed = max(speed + (a[0] * GRAVITY - x[3]) * dt, 0.0)
+                x[0] += speed * math.sin(heading) * dt
+                x[1] += speed * math.cos(heading) * dt
+            x[2] = speed
+            final_heading = heading
+            mean_rate = total / (n * dt)
+        
+        span = n * dt
+        if self.heading is not None:
+            self.heading = _wrap(final_heading)
+        self._propagate_covariance(span)
+        self.stats['imu_samples'] += n
+        
+        # Bus à l'arrêt : la rotation mesurée est le biais du gyroscope
+        if x[2] < _STATIONARY_SPEED and self.last_gps is not None:
+            weight = min(1.0, span / 10.0)
+            self.gyro_bias += weight * mean_rate
+        
+        if magnetometer is not None:
+            self._update_magnetometer(magnetometer, span)
+    
+    def _propagate_covariance(self, span: float):
+        """Propage la covariance sur la durée de la rafale (cap et vitesse supposés constants)"""
+        heading = self.heading or 0.0
+        s, c = math.sin(heading), math.cos(heading)
+        v = self.x[2]
+        F = [
+            [1, 0, s * span, -s * span * span / 2],
+            [0, 1, c * span, -c * span * span / 2],
+            [0, 0, 1, -span],
+            [0, 0, 0, 1],
+        ]
+        P = _mul(_mul(F, self.P), _transpose(F))
+        along = (self.accel_sigma * span * span / 2) ** 2
+        # L'incertitude du cap déplace la position perpendiculairement à la route
+        across = (v * span * self.heading_sigma) ** 2
+        P[0][0] += along * s * s + across * c * c
+        P[1][1] += along * c * c + across * s * s
+        P[0][1] += (along - across) * s * c
+        P[1][0] = P[0][1]
+        P[2][2] += self.accel_sigma ** 2 * span
+        P[3][3] += self.bias_sigma ** 2 * span
+        self.P = P
+    
+    # ============================================
+    # Recalage (GPS, magnétomètre)
+    # ============================================
+    
+    def update_gps(self, latitude: float, longitude: float, speed: Optional[float] = None,
+                   now: Optional[float] = None) -> bool:
+        """
+        Recale le filtre sur une position GPS
+        
+        Args:
+            latitude: Latitude en degrés
+            longitude: Longitude en degrés
+            speed: Vitesse GPS en km/h
+            now: Instant de réception (horloge monotone)
+        
+        Returns:
+            True si la position a été acceptée
+        """
+        now = time.monotonic() if now is None else now
+        if self.origin is None:
+            self.origin = (latitude, longitude)
+            logger.info(f"Origine de la fusion: {latitude:.6f}, {longitude:.6f}")
+        east, north = self._to_local(latitude, longitude)
+        
+        # Première position ou longue coupure : le filtre repart de la position GPS
+        if self.last_gps is None or now - self.last_gps > 300.0:
+            self.x[0], self.x[1] = east, north
+            self.P[0][0] = self.P[1][1] = self.gps_sigma ** 2
+            self.P[0][1] = self.P[1][0] = 0.0
+            self._accept_fix(east, north, speed, now)
+            return True
+        
+        innovation = [east - self.x[0], north - self.x[1]]
+        S = [[self.P[0][0] + self.gps_sigma ** 2, self.P[0][1]],
+             [self.P[1][0], self.P[1][1] + self.gps_sigma ** 2]]
+        det = S[0][0] * S[1][1] - S[0][1] * S[1][0]
+        S_inv = [[S[1][1] / det, -S[0][1] / det], [-S[1][0] / det, S[0][0] / det]]
+        distance = sum(innovation[i] * S_inv[i][j] * innovation[j] for i in range(2) for j in range(2))
+        # Rejet des positions aberrantes (multitrajets), sauf si elles se répètent
+        if distance > self.gate and self._rejected < 3:
+            self._rejected += 1
+            self.stats['gps_rejected'] += 1
+            logger.debug(f"Position GPS rejetée (distance {distance:.1f})")
+            return False
+        self._rejected = 0
+        
+        # Gain K = P H' S^-1 (H sélectionne la position)
+        K = [[self.P[i][0] * S_inv[0][j] + self.P[i][1] * S_inv[1][j] for j in range(2)] for i in range(4)]
+        for i in range(4):
+            self.x[i] += K[i][0] * innovation[0] + K[i][1] * innovation[1]
+        self.P = [[self.P[i][j] - K[i][0] * self.P[0][j] - K[i][1] * self.P[1][j] for j in range(4)]
+                  for i in range(4)]
+        self._accept_fix(east, north, speed, now)
+        return True
+    
+    def _accept_fix(self, east: float, north: float, speed: Optional[float], now: float):
+        """Vitesse et cap GPS d'une position acceptée"""
+        self.stats['gps_updates'] += 1
+        if speed is not None:
+            self._update_speed(speed / 3.6)
+        
+        if self._last_fix is not None and speed is not None and speed / 3.6 > _COURSE_MIN_SPEED:
+            dx, dy = east - self._last_fix[0], north - self._last_fix[1]
+            if math.hypot(dx, dy) > _COURSE_MIN_DISTANCE:
+                course = math.atan2(dx, dy)
+                if self.heading is None:
+                    self.heading = course
+                else:
+                    span = now - self.last_gps
+                    self.heading = _wrap(self.heading + span / (self.course_tau + span) * _wrap(course - self.heading))
+        self._last_fix = (east, north)
+        self.last_gps = now
+    
+    def _update_speed(self, speed: float):
+        """Recalage scalaire de la vitesse le long de la route"""
+        S = self.P[2][2] + self.speed_sigma ** 2
+        K = [self.P[i][2] / S for i in range(4)]
+        innovation = speed - self.x[2]
+        for i in range(4):
+            self.x[i] += K[i] * innovation
+        self.P = [[self.P[i][j] - K[i] * self.P[2][j] for j in range(4)] for i in range(4)]
+        self.x[2] = max(self.x[2], 0.0)
+    
+    def _update_magnetometer(self, magnetometer: Dict, span: float):
+        """Calibration (au premier tour complet) puis recalage du cap sur le magnétomètre"""
+        # Axes de l'AK8963 : x et y inversés par rapport à l'accéléromètre, z opposé
+        mag = (magnetometer['y'], magnetometer['x'], -magnetometer['z'])
+        if not any(mag):
+            # Magnétomètre absent ou simulé
+            return
+        if self.calibration is None:
+            self._collect_calibration(mag)
+            return
+        mx, my, _ = self.calibration.apply(mag)
+        if mx == 0 and my == 0:
+            return
+        heading = _wrap(math.atan2(my, mx) + self.declination * _DEG)
+        if self.heading is None:
+            self.heading = heading
+        else:
+            self.heading = _wrap(self.heading + span / (self.heading_tau + span) * _wrap(heading - self.heading))
+    
+    def _collect_calibration(self, mag: Tuple[float, float, float]):
+        """Accumule les extrêmes du champ pendant que le cap parcourt tous les secteurs"""
+        if self.heading is None:
+            return
+        for i in range(3):
+            self._mag_min[i] = min(self._mag_min[i], mag[i])
+            self._mag_max[i] = max(self._mag_max[i], mag[i])
+        self._mag_count += 1
+        self._sectors.add(int((self.heading % (2 * math.pi)) / (2 * math.pi) * _CALIBRATION_SECTORS))
+        if len(self._sectors) < _CALIBRATION_SECTORS or self._mag_count < _CALIBRATION_MIN_SAMPLES:
+            return
+        self.calibration = MagnetometerCalibration.fit(self._mag_min, self._mag_max)
+        logger.info(f"Magnétomètre calibré: {self.calibration.to_dict()}")
+        if self.calibration_file:
+            try:
+                self.calibration.save(self.calibration_file)
+            except Exception as e:
+                logger.error(f"Erreur sauvegarde calibration magnétomètre: {e}")
+    
+    # ============================================
+    # Résultat
+    # ============================================
+    
+    def _to_local(self, latitude: float, longitude: float) -> Tuple[float, float]:
+        lat0, lon0 = self.origin
+        east = (longitude - lon0) * _DEG * EARTH_RADIUS * math.cos(lat0 * _DEG)
+        north = (latitude - lat0) * _DEG * EARTH_RADIUS
+        return east, north
+    
+    def _to_global(self, east: float, north: float) -> Tuple[float, float]:
+        lat0, lon0 = self.origin
+        latitude = lat0 + north / EARTH_RADIUS / _DEG
+        longitude = lon0 + east / (EARTH_RADIUS * math.cos(lat0 * _DEG)) / _DEG
+        return latitude, longitude
+    
+    def position(self) -> Optional[Tuple[float, float]]:
+        """Position estimée (latitude, longitude), None avant la première position GPS"""
+        if self.origin is None:
+            return None
+        return self._to_global(self.x[0], self.x[1])
+    
+    def state(self, now: Optional[float] = None) -> Dict:
+        """
+        État estimé
+        
+        Returns:
+            Dictionnaire : latitude, longitude, vitesse (km/h), cap (degrés),
+            incertitude de position (m), durée sans GPS (s), mode ('gps' ou 'dead_reckoning')
+        """
+        now = time.monotonic() if now is None else now
+        position = self.position()
+        outage = now - self.last_gps if self.last_gps is not None else None
+        heading = self.heading
+        return {
+            'latitude': round(float(position[0]), 7) if position else None,
+            'longitude': round(float(position[1]), 7) if position else None,
+            'speed': round(float(self.x[2]) * 3.6, 2),
+            'heading': round(math.degrees(float(heading)) % 360, 1) if heading is not None else None,
+            'uncertainty': round(math.sqrt(max(float(self.P[0][0] + self.P[1][1]), 0.0)), 1),
+            'gps_outage': round(outage, 1) if outage is not None else None,
+            'mode': 'gps' if outage is not None and outage < 2.0 else 'dead_reckoning',
+            'mag_calibrated': self.calibration is not None
+        }
+
+
+def _mul(a: List[List[float]], b: List[List[float]]) -> List[List[float]]:
+    return [[sum(a[i][k] * b[k][j] for k in range(len(b))) for j in range(len(b[0]))] for i in range(len(a))]
+
+
+def _transpose(a: List[List[float]]) -> List[List[float]]:
+    return [list(row) for row in zip(*a)]
@@ -4,7 +4,7 @@ Module pour envoyer les données au serveur FastAPI via HTTP POST
 
 import requests
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 import json
 
@@ -23,17 +23,30 @@ class HTTPClient:
             timeout: Timeout en secondes pour les requêtes
             retry_count: Nombre de tentatives en cas d'échec
         """
+        self.timeout = timeout
+        self.retry_count = retry_count
+        self.set_server_url(server_url)
+        
+        logger.info(f"HTTP Client initialisé - Serveur: {self.server_url}")
+    
+    def set_server_url(self, server_url: str):
+        """
+        Change l'URL du serveur (utilisé lors du rechargement de la configuration)
+        
+        Args:
+            server_url: URL du serveur FastAPI (ex: http://192.168.1.100:8000)
+        """
         # S'assurer que l'URL ne se termine pas par /
         if server_url.endswith('/'):
             server_url = server_url.rstrip('/')
         
         self.server_url = server_url
-        self.timeout = timeout
-        self.retry_count = retry_count
         self.endpoint = f"{server_url}/api/data"
+        self.batch_endpoint = f"{server_url}/api/data/batch"
+        self.events_endpoint = f"{server_url}/api/events"
+        self.tracks_endpoint = f"{server_url}/api/tracks"
+        self.blackbox_endpoint = f"{server_url}/api/blackbox"
         self.health_endpoint = f"{server_url}/api/health"
-        
-        logger.info(f"HTTP Client initialisé - Serveur: {self.server_url}")
     
     def send_data(self, data: Dict) -> bool:
         """
@@ -53,11 +66,63 @@ class HTTPClient:
         if 'timestamp' not in data:
             data['timestamp'] = datetime.now().isoformat()
         
+        return self._post_with_retry(self.endpoint, data)
+    
+    def send_snapshots(self, bus_id: str, snapshots: List[Dict]) -> bool:
+        """
+        Envoie plusieurs snapshots en une seule requête
+        
+        Args:
+            bus_id: Identifiant du bus
+            snapshots: Snapshots produits par SmartBus.collect_data, du plus ancien au plus récent
+        
+        Returns:
+            True si succès, False sinon
+        """
+        return self._post_with_retry(self.batch_endpoint, {'bus_id': bus_id, 'snapshots': snapshots})
+    
+    def send_track(self, bus_id: str, segment: Dict) -> bool:
+        """
+        Envoie un segment de trajectoire compressé (voir utils.trajectory)
+        
+        Args:
+            bus_id: Identifiant du bus
+            segment: Segment produit par TrajectoryCompressor
+        
+        Returns:
+            True si succès, False sinon
+        """
+        return self._post_with_retry(self.tracks_endpoint, {'bus_id': bus_id, **segment})
+    
+    def send_blackbox(self, bus_id: str, window: Dict) -> bool:
+        """
+        Envoie une fenêtre de la boîte noire (voir utils.blackbox)
+        
+        Args:
+            bus_id: Identifiant du bus
+            window: Fenêtre figée par BlackBoxRecorder
+        
+        Returns:
+            True si succès, False sinon
+        """
+        return self._post_with_retry(self.blackbox_endpoint, {'bus_id': bus_id, **window})
+    
+    def _post_with_retry(self, url: str, payload: Dict) -> bool:
+        """
+        Envoie un document JSON avec plusieurs tentatives
+        
+        Args:
+            url: URL de destination
+            payload: Document à envoyer
+        
+        Returns:
+            True si succès, False sinon
+        """
         for attempt in range(self.retry_count):
             try:
                 response = requests.post(
-                    self.endpoint,
-                    json=data,
+                    url,
+                    json=payload,
                     headers={'Content-Type': 'application/json'},
                     timeout=self.timeout
                 )
@@ -92,6 +157,45 @@ class HTTPClient:
         logger.error(f"Échec de l'envoi après {self.retry_count} tentatives")
         return False
     
+    def send_events(self, bus_id: str, events: List[Dict]) -> bool:
+        """
+        Envoie un lot d'événements (montée, descente, bus plein, freinage...) en une seule requête
+        Une seule tentative : les nouvelles tentatives sont gérées par l'appelant
+        pour ne pas bloquer les événements suivants
+        
+        Args:
+            bus_id: Identifiant du bus
+            events: Liste d'événements à envoyer
+        
+        Returns:
+            True si succès, False sinon
+        """
+        try:
+            response = requests.post(
+                self.events_endpoint,
+                json={'bus_id': bus_id, 'events': events},
+                headers={'Content-Type': 'application/json'},
+                timeout=self.timeout
+            )
+            
+            if response.status_code in [200, 201, 202]:
+                logger.debug(f"{len(events)} événement(s) envoyé(s): {response.status_code}")
+                return True
+            
+            logger.warning(f"Erreur serveur lors de l'envoi des événements: {response.status_code} - {response.text}")
+            
+        except requests.exceptions.Timeout:
+            logger.warning(f"Timeout lors de l'envoi des événements: le serveur n'a pas répondu dans les {self.timeout}s")
+        except requests.exceptions.ConnectionError:
+            logger.warning(f"Erreur de connexion lors de l'envoi des événements au serveur {self.server_url}")
+        except Exception as e:
+            logger.error(f"Erreur inattendue lors de l'envoi des événements: {e}")
+        
+        return False
+    
+    def close(self):
+        """Rien à fermer : une connexion par requête (interface commune avec MQTTClient)"""
+    
     def test_connection(self) -> bool:
         """
         Teste la connexion au serveur FastAPI
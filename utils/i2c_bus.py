@@ -0,0 +1,293 @@
+"""
+Module de gestion du bus I2C partagé
+Le LCD (PCF8574) et le MPU9250 sont sur le même bus I2C : le gestionnaire
+possède le bus, sérialise les transactions par priorité (l'IMU passe avant
+l'afficheur), regroupe les écritures en lots et mesure le temps de bus
+consommé par chaque périphérique. Les pilotes reçoivent un accès qui expose
+l'interface smbus2.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import logging
+
+try:
+    from smbus2 import SMBus
+    SMBUS2_AVAILABLE = True
+except ImportError:
+    SMBus = None
+    SMBUS2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Priorités (la plus petite valeur passe en premier)
+PRIORITY_IMU = 0
+PRIORITY_DISPLAY = 10
+
+# Bits par transaction hors données (start, octet d'adresse et acquittement, stop) et par octet
+_TRANSACTION_BITS = 20
+_BYTE_BITS = 9
+
+
+class MockI2CBackend:
+    """Bus I2C simulé (interface smbus2) : registres en mémoire et durée de transfert réaliste"""
+    
+    def __init__(self, clock_hz: int = 100_000, simulate_timing: bool = True):
+        """
+        Initialise le bus simulé
+        
+        Args:
+            clock_hz: Fréquence du bus (100 kHz par défaut sur Raspberry Pi)
+            simulate_timing: Attendre la durée du transfert à chaque transaction
+        """
+        self.clock_hz = clock_hz
+        self.simulate_timing = simulate_timing
+        self.registers: Dict[tuple, int] = {}
+        self.transactions = 0
+        self.bytes = 0
+        self.busy_time = 0.0
+        # Transactions commencées alors qu'une autre était en cours (accès concurrents non coordonnés)
+        self.overlaps = 0
+        self._active = 0
+        self._lock = threading.Lock()
+    
+    def _transfer(self, length: int, segments: int = 1):
+        duration = (segments * _TRANSACTION_BITS + length * _BYTE_BITS) / self.clock_hz
+        with self._lock:
+            self.transactions += 1
+            self.bytes += length
+            self.busy_time += duration
+            if self._active:
+                self.overlaps += 1
+            self._active += 1
+        try:
+            if self.simulate_timing:
+                time.sleep(duration)
+        finally:
+            with self._lock:
+                self._active -= 1
+    
+    def _read(self, address: int, register: int, length: int) -> List[int]:
+        return [self.registers.get((address, register + i), 0) for i in range(length)]
+    
+    def write_byte(self, address: int, value: int):
+        self._transfer(1)
+        self.registers[(address, None)] = value
+    
+    def read_byte(self, address: int) -> int:
+        self._transfer(1)
+        return self.registers.get((address, None), 0)
+    
+    def write_byte_data(self, address: int, register: int, value: int):
+        self._transfer(2)
+        self.registers[(address, register)] = value
+    
+    def read_byte_data(self, address: int, register: int) -> int:
+        self._transfer(2, segments=2)
+        return self._read(address, register, 1)[0]
+    
+    def write_i2c_block_data(self, address: int, register: int, data: List[int]):
+        self._transfer(1 + len(data))
+        for i, value in enumerate(data):
+            self.registers[(address, register + i)] = value
+    
+    def read_i2c_block_data(self, address: int, register: int, length: int) -> List[int]:
+        self._transfer(1 + length, segments=2)
+        return self._read(address, register, length)
+    
+    def i2c_rdwr(self, *messages):
+        # Les messages de lecture gardent leur contenu initial (zéros)
+        self._transfer(sum(len(message) for message in messages), segments=len(messages))
+    
+    def close(self):
+        pass
+
+
+class I2CDevice:
+    """Accès d'un pilote au bus partagé (interface smbus2, adresse passée à chaque appel)"""
+    
+    def __init__(self, manager: 'I2CBus', name: str, priority: int, batch_size: int):
+        self.manager = manager
+        self.name = name
+        self.priority = priority
+        self.batch_size = batch_size
+        self.stats = {'transactions': 0, 'bytes': 0, 'bus_time': 0.0, 'wait_time': 0.0, 'max_wait': 0.0}
+        self._local = threading.local()
+    
+    @contextmanager
+    def batch(self):
+        """
+        Regroupe les écritures : elles sont envoyées par lots de batch_size
+        transactions, chaque lot en une seule prise du bus (un périphérique
+        plus prioritaire peut passer entre deux lots). Une lecture envoie
+        d'abord les écritures en attente. Les lots peuvent être imbriqués.
+        """
+        depth = getattr(self._local, 'depth', 0)
+        if not depth:
+            self._local.pending = []
+        self._local.depth = depth + 1
+        try:
+            yield self
+        finally:
+            self._local.depth = depth
+            if not depth:
+                self.flush()
+                self._local.pending = None
+    
+    def flush(self):
+        """Envoie les écritures en attente"""
+        pending = getattr(self._local, 'pending', None)
+        if not pending:
+            return
+        operations = list(pending)
+        pending.clear()
+        self._execute(operations)
+    
+    def _execute(self, operations: list):
+        """Exécute des opérations (nom de méthode, arguments, octets) en une seule prise du bus"""
+        nbytes = sum(operation[2] for operation in operations)
+        with self.manager.acquire(self, len(operations), nbytes) as backend:
+            result = None
+            for method, args, _ in operations:
+                result = getattr(backend, method)(*args)
+            return result
+    
+    def _write(self, method: str, args: tuple, nbytes: int):
+        pending = getattr(self._local, 'pending', None)
+        if pending is None:
+            self._execute([(method, args, nbytes)])
+            return
+        pending.append((method, args, nbytes))
+        if len(pending) >= self.batch_size:
+            self.flush()
+    
+    def _read(self, method: str, args: tuple, nbytes: int):
+        self.flush()
+        return self._execute([(method, args, nbytes)])
+    
+    def write_byte(self, address: int, value: int):
+        self._write('write_byte', (address, value), 1)
+    
+    def read_byte(self, address: int) -> int:
+        return self._read('read_byte', (address,), 1)
+    
+    def write_byte_data(self, address: int, register: int, value: int):
+        self._write('write_byte_data', (address, register, value), 2)
+    
+    def read_byte_data(self, address: int, register: int) -> int:
+        return self._read('read_byte_data', (address, register), 2)
+    
+    def write_i2c_block_data(self, address: int, register: int, data: List[int]):
+        self._write('write_i2c_block_data', (address, register, list(data)), 1 + len(data))
+    
+    def read_i2c_block_data(self, address: int, register: int, length: int) -> List[int]:
+        return self._read('read_i2c_block_data', (address, register, length), 1 + length)
+    
+    def i2c_rdwr(self, *messages):
+        self._read('i2c_rdwr', messages, sum(len(message) for message in messages))
+    
+    def close(self):
+        """Le bus appartient au gestionnaire : seules les écritures en attente sont envoyées"""
+        self.flush()
+
+
+class I2CBus:
+    """Classe pour partager un bus I2C entre plusieurs pilotes"""
+    
+    def __init__(self, bus: int = 1, batch_size: int = 4, backend=None):
+        """
+        Initialise le gestionnaire du bus
+        
+        Args:
+            bus: Numéro du bus I2C
+            batch_size: Nombre d'écritures envoyées par prise du bus dans un lot
+            backend: Bus déjà ouvert (interface smbus2) ; par défaut SMBus(bus),
+                ou un bus simulé si smbus2 n'est pas installé
+        """
+        if backend is None:
+            if SMBUS2_AVAILABLE:
+                backend = SMBus(bus)
+            else:
+                logger.warning("smbus2 non disponible (pip install smbus2), bus I2C simulé")
+                backend = MockI2CBackend()
+        self.backend = backend
+        self.batch_size = batch_size
+        self.devices: Dict[str, I2CDevice] = {}
+        self._cond = threading.Condition()
+        self._waiting: List[tuple] = []
+        self._seq = itertools.count()
+        self._busy = False
+        logger.info(f"Bus I2C {bus} partagé ({type(backend).__name__})")
+    
+    def device(self, name: str, priority: int = PRIORITY_DISPLAY, batch_size: Optional[int] = None) -> I2CDevice:
+        """
+        Crée (ou retourne) l'accès d'un pilote au bus
+        
+        Args:
+            name: Nom du périphérique (ex: 'mpu9250', 'lcd')
+            priority: Priorité des transactions (PRIORITY_IMU, PRIORITY_DISPLAY...)
+            batch_size: Taille des lots d'écritures (par défaut celle du gestionnaire)
+        """
+        if name not in self.devices:
+            self.devices[name] = I2CDevice(self, name, priority, batch_size or self.batch_size)
+        return self.devices[name]
+    
+    @contextmanager
+    def acquire(self, device: I2CDevice, transactions: int = 1, nbytes: int = 0):
+        """
+        Réserve le bus pour un périphérique : les demandes en attente sont
+        servies par priorité, puis dans l'ordre d'arrivée
+        
+        Args:
+            device: Périphérique demandeur
+            transactions: Nombre de transactions effectuées pendant la réservation
+            nbytes: Nombre d'octets transférés
+        """
+        requested = time.perf_counter()
+        with self._cond:
+            ticket = (device.priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            while self._busy or self._waiting[0] != ticket:
+                self._cond.wait()
+            heapq.heappop(self._waiting)
+            self._busy = True
+        acquired = time.perf_counter()
+        try:
+            yield self.backend
+        finally:
+            released = time.perf_counter()
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+            stats = device.stats
+            stats['transactions'] += transactions
+            stats['bytes'] += nbytes
+            stats['bus_time'] += released - acquired
+            stats['wait_time'] += acquired - requested
+            stats['max_wait'] = max(stats['max_wait'], acquired - requested)
+    
+    def stats(self) -> Dict[str, Dict]:
+        """Statistiques par périphérique (temps en ms)"""
+        return {
+            name: {
+                'transactions': device.stats['transactions'],
+                'bytes': device.stats['bytes'],
+                'bus_time_ms': round(device.stats['bus_time'] * 1000, 1),
+                'wait_time_ms': round(device.stats['wait_time'] * 1000, 1),
+                'max_wait_ms': round(device.stats['max_wait'] * 1000, 2)
+            }
+            for name, device in self.devices.items()
+        }
+    
+    def close(self):
+        """Envoie les écritures en attente et ferme le bus"""
+        for device in self.devices.values():
+            device.flush()
+        try:
+            self.backend.close()
+        except Exception as e:
+            logger.error(f"Erreur fermeture bus I2C: {e}")
@@ -0,0 +1,144 @@
+"""
+Module pour la configuration du logging asynchrone
+Les messages passent par une file (QueueHandler) et sont écrits sur la carte SD
+par un thread dédié, avec rotation des fichiers et limitation des messages répétés
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Filtre qui limite les messages similaires
+    
+    Deux messages sont similaires s'ils ont le même texte (même logger,
+    même niveau, message formaté identique) ou s'ils partagent la même clé
+    `rate_key` passée via `extra`. Un seul message par clé est émis par
+    intervalle ; le suivant indique combien de messages ont été supprimés.
+    Les messages ERROR et CRITICAL ne sont jamais supprimés.
+    """
+    
+    def __init__(self, interval: float = 60.0):
+        """
+        Initialise le filtre
+        
+        Args:
+            interval: Intervalle minimal en secondes entre deux messages similaires
+        """
+        super().__init__()
+        self.interval = interval
+        self._state: Dict[Tuple, list] = {}  # clé -> [dernier envoi, nb supprimés]
+        self._lock = threading.Lock()
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if (self.interval <= 0 or record.levelno >= logging.ERROR
+                or getattr(record, 'rate_limit', True) is False):
+            return True
+        
+        key = getattr(record, 'rate_key', None) or (record.name, record.levelno, record.getMessage())
+        now = time.monotonic()
+        
+        with self._lock:
+            state = self._state.get(key)
+            if state is None:
+                self._state[key] = [now, 0]
+                return True
+            
+            if now - state[0] < self.interval:
+                state[1] += 1
+                return False
+            
+            suppressed = state[1]
+            state[0] = now
+            state[1] = 0
+        
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} messages similaires supprimés)"
+        return True
+
+
+def setup_logging(level: str = 'INFO',
+                  log_file: Optional[str] = 'logs/smart_bus.log',
+                  max_bytes: int = 1024 * 1024,
+                  backup_count: int = 5,
+                  rate_limit_interval: float = 60.0,
+                  console: bool = True) -> logging.handlers.QueueListener:
+    """
+    Configure le logging racine en mode non bloquant
+    
+    Args:
+        level: Niveau de log (DEBUG, INFO, WARNING, ...)
+        log_file: Fichier de log (None pour désactiver l'écriture sur disque)
+        max_bytes: Taille maximale d'un fichier de log avant rotation
+        backup_count: Nombre de fichiers de log conservés après rotation
+        rate_limit_interval: Intervalle en secondes entre deux messages similaires (0 = désactivé)
+        console: Afficher aussi les messages sur la sortie standard
+    
+    Returns:
+        QueueListener démarré (arrêté par stop_logging ou à la sortie du programme)
+    """
+    global _listener, _queue_handler
+    stop_logging()
+    
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    
+    if log_file:
+        Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding='utf-8'
+        )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    
+    if console:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(formatter)
+        handlers.append(stream_handler)
+    
+    log_queue = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    _queue_handler.addFilter(RateLimitFilter(rate_limit_interval))
+    
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(_queue_handler)
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    
+    return _listener
+
+
+def stop_logging():
+    """Vide la file de logs et ferme les fichiers (appelé aussi à la sortie du programme)"""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    _queue_handler = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,411 @@
+"""
+Module pour envoyer les données au serveur via MQTT (alternative à HTTPClient)
+Une connexion permanente au broker remplace une requête HTTP par envoi :
+- un topic par bus et par capteur (`smartbus/Bus1/sensors/gps`), messages
+  retenus : le broker garde le dernier état de chaque capteur,
+- QoS 1 avec session persistante ; les messages non acquittés sont aussi
+  conservés sur disque et republiés après une coupure ou un redémarrage,
+- testament (LWT) `smartbus/Bus1/status` = "offline" publié par le broker
+  si le bus disparaît sans se déconnecter.
+Même interface que HTTPClient : Uplink utilise l'un ou l'autre (server.transport).
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+import logging
+
+try:
+    import paho.mqtt.client as mqtt
+    MQTT_AVAILABLE = True
+except ImportError:
+    MQTT_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+STATUS_ONLINE = 'online'
+STATUS_OFFLINE = 'offline'
+
+# Acquittement reçu avant que publish n'ait rendu son identifiant
+_UNKNOWN = object()
+
+
+def _encode(payload: Dict) -> bytes:
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class _InflightStore:
+    """Messages QoS 1 publiés et pas encore acquittés par le broker (SQLite, mode WAL)"""
+    
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS inflight ('
+            'id INTEGER PRIMARY KEY, topic TEXT NOT NULL, payload BLOB NOT NULL, retain INTEGER NOT NULL)'
+        )
+        self._conn.commit()
+        self._count = self._conn.execute('SELECT COUNT(*) FROM inflight').fetchone()[0]
+        self._acked: List[int] = []
+    
+    def __len__(self) -> int:
+        """Nombre de messages non acquittés"""
+        return self._count - len(self._acked)
+    
+    def add(self, messages: List[Tuple[str, bytes, bool]]) -> List[int]:
+        """Enregistre des messages (une transaction) et retourne leurs identifiants"""
+        with self._lock:
+            self._delete_acked()
+            ids = []
+            for topic, payload, retain in messages:
+                cursor = self._conn.execute(
+                    'INSERT INTO inflight (topic, payload, retain) VALUES (?, ?, ?)', (topic, payload, int(retain))
+                )
+                ids.append(cursor.lastrowid)
+            self._conn.commit()
+            self._count += len(ids)
+            return ids
+    
+    def ack(self, row: int):
+        """Note un message acquitté (supprimé à l'écriture suivante : pas de SQLite dans le thread réseau)"""
+        with self._lock:
+            self._acked.append(row)
+    
+    def rows(self) -> List[Tuple[int, str, bytes, bool]]:
+        with self._lock:
+            self._delete_acked()
+            self._conn.commit()
+            return [(row, topic, payload, bool(retain)) for row, topic, payload, retain
+                    in self._conn.execute('SELECT id, topic, payload, retain FROM inflight ORDER BY id')]
+    
+    def close(self):
+        with self._lock:
+            self._delete_acked()
+            self._conn.commit()
+            self._conn.close()
+    
+    def _delete_acked(self):
+        if self._acked:
+            self._conn.executemany('DELETE FROM inflight WHERE id = ?', [(row,) for row in self._acked])
+            self._count -= len(self._acked)
+            self._acked = []
+
+
+class MQTTClient:
+    """Classe pour publier les données sur un broker MQTT"""
+    
+    def __init__(self, server_url: str, bus_id: str = 'Bus1', store_path: Optional[str] = None,
+                 timeout: float = 5, retry_count: int = 3, topic_prefix: str = 'smartbus',
+                 keepalive: int = 30, qos: int = 1, retain: bool = True,
+                 max_stored: int = 10000, max_inflight: int = 100, client_id: Optional[str] = None):
+        """
+        Initialise le client MQTT et lance la connexion en arrière-plan (reconnexion automatique)
+        
+        Args:
+            server_url: Adresse du broker (mqtt://hôte:1883, mqtts://... ; une URL http donne l'hôte, port 1883)
+            bus_id: Identifiant du bus (testament et identifiant client par défaut)
+            store_path: Base SQLite des messages non acquittés (None : en mémoire seulement)
+            timeout: Attente maximale en secondes de la connexion (test_connection) et des
+                acquittements à la fermeture
+            retry_count: Inutilisé (interface de HTTPClient) : les messages sont republiés
+                jusqu'à leur acquittement
+            topic_prefix: Préfixe des topics
+            keepalive: Intervalle en secondes des PINGREQ (détection d'une connexion morte)
+            qos: Qualité de service des messages (1 : au moins une fois)
+            retain: Retenir les derniers messages des capteurs et de l'état du bus
+            max_stored: Nombre maximal de messages en attente d'acquittement (au-delà, l'envoi échoue)
+            max_inflight: Nombre maximal de messages QoS 1 en vol sur la connexion
+            client_id: Identifiant client MQTT (par défaut smartbus-<bus_id>), fixe pour retrouver la session
+        """
+        if not MQTT_AVAILABLE:
+            raise ImportError("paho-mqtt non disponible. Installation: pip install paho-mqtt")
+        self.bus_id = bus_id
+        self.timeout = timeout
+        self.retry_count = retry_count
+        self.topic_prefix = topic_prefix.rstrip('/')
+        self.keepalive = keepalive
+        self.qos = qos
+        self.retain = retain
+        self.max_stored = max_stored
+        self.max_inflight = max_inflight
+        self.client_id = client_id or f'smartbus-{bus_id}'
+        
+        self._store = _InflightStore(store_path) if store_path and qos > 0 else None
+        self._lock = threading.Lock()
+        # Enregistrement en base et publication d'un lot, republication : jamais en parallèle
+        self._publish_lock = threading.Lock()
+        self._pending: Dict[int, Optional[int]] = {}
+        self._acked_early = set()
+        self._connected = threading.Event()
+        self._replay = self._store is not None and len(self._store) > 0
+        self._client = None
+        self.stats = {
+            'messages': 0,
+            'payload_bytes': 0,
+            'acked': 0,
+            'replayed': 0,
+            'rejected': 0,
+            'connects': 0,
+            'disconnects': 0,
+        }
+        self.set_server_url(server_url)
+        
+        logger.info(f"MQTT Client initialisé - Broker: {self.host}:{self.port} ({self.client_id})")
+    
+    @property
+    def status_topic(self) -> str:
+        return f"{self.topic_prefix}/{self.bus_id}/status"
+    
+    def set_server_url(self, server_url: str):
+        """
+        Change le broker (utilisé lors du rechargement de la configuration) et se reconnecte
+        Les messages non acquittés de la base sont republiés sur la nouvelle connexion
+        
+        Args:
+            server_url: Adresse du broker
+        """
+        url = urlparse(server_url if '://' in server_url else f'mqtt://{server_url}')
+        tls = url.scheme == 'mqtts'
+        self.host = url.hostname or 'localhost'
+        self.port = url.port if url.scheme in ('mqtt', 'mqtts') and url.port else (8883 if tls else 1883)
+        self.server_url = f"{'mqtts' if tls else 'mqtt'}://{self.host}:{self.port}"
+        
+        if self._client:
+            self._disconnect()
+            with self._lock:
+                self._pending.clear()
+                self._acked_early.clear()
+            self._replay = self._store is not None
+        
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=self.client_id, clean_session=False)
+        if url.username:
+            client.username_pw_set(url.username, url.password)
+        if tls:
+            client.tls_set()
+        client.will_set(self.status_topic, STATUS_OFFLINE, qos=1, retain=True)
+        client.max_inflight_messages_set(self.max_inflight)
+        client.max_queued_messages_set(0)
+        client.reconnect_delay_set(1, 60)
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_publish = self._on_publish
+        self._client = client
+        client.connect_async(self.host, self.port, self.keepalive)
+        client.loop_start()
+    
+    def send_data(self, data: Dict) -> bool:
+        """
+        Publie un snapshot : un message par capteur et un message d'état (passagers, santé)
+        
+        Args:
+            data: Dictionnaire contenant les données des capteurs
+        
+        Returns:
+            True si les messages sont publiés (ou enregistrés pour être republiés), False sinon
+        """
+        return self._publish(self._snapshot_messages(data.get('bus_id') or self.bus_id, data))
+    
+    def send_snapshots(self, bus_id: str, snapshots: List[Dict]) -> bool:
+        """
+        Publie plusieurs snapshots (messages dans l'ordre, une seule écriture de la base)
+        
+        Args:
+            bus_id: Identifiant du bus
+            snapshots: Snapshots produits par SmartBus.collect_data, du plus ancien au plus récent
+        
+        Returns:
+            True si les messages sont publiés (ou enregistrés pour être republiés), False sinon
+        """
+        messages = []
+        for data in snapshots:
+            messages.extend(self._snapshot_messages(bus_id, data))
+        return self._publish(messages)
+    
+    def send_track(self, bus_id: str, segment: Dict) -> bool:
+        """
+        Publie un segment de trajectoire compressé (voir utils.trajectory)
+        
+        Args:
+            bus_id: Identifiant du bus
+            segment: Segment produit par TrajectoryCompressor
+        
+        Returns:
+            True si succès, False sinon
+        """
+        return self._publish([(f"{self.topic_prefix}/{bus_id}/tracks", _encode(segment), False)])
+    
+    def send_blackbox(self, bus_id: str, window: Dict) -> bool:
+        """
+        Publie une fenêtre de la boîte noire (voir utils.blackbox)
+        
+        Args:
+            bus_id: Identifiant du bus
+            window: Fenêtre figée par BlackBoxRecorder
+        
+        Returns:
+            True si succès, False sinon
+        """
+        return self._publish([(f"{self.topic_prefix}/{bus_id}/blackbox", _encode(window), False)])
+    
+    def send_events(self, bus_id: str, events: List[Dict]) -> bool:
+        """
+        Publie un lot d'événements, un message par événement (`.../events/boarding`...)
+        
+        Args:
+            bus_id: Identifiant du bus
+            events: Liste d'événements à envoyer
+        
+        Returns:
+            True si succès, False sinon
+        """
+        return self._publish([
+            (f"{self.topic_prefix}/{bus_id}/events/{event.get('type', 'unknown')}", _encode(event), False)
+            for event in events
+        ])
+    
+    def test_connection(self) -> bool:
+        """
+        Attend la connexion au broker (au plus `timeout` secondes)
+        
+        Returns:
+            True si le client est connecté, False sinon
+        """
+        if self._connected.wait(self.timeout):
+            return True
+        logger.warning(f"Impossible de se connecter au broker MQTT {self.server_url}")
+        return False
+    
+    def pending(self) -> int:
+        """Nombre de messages publiés en attente d'acquittement"""
+        if self._store is not None:
+            return len(self._store)
+        with self._lock:
+            return len(self._pending)
+    
+    def close(self):
+        """Publie l'état "offline", attend les acquittements en cours puis se déconnecte"""
+        if not self._client:
+            return
+        if self._connected.is_set():
+            self._send(self.status_topic, STATUS_OFFLINE.encode(), True, None)
+            deadline = time.monotonic() + self.timeout
+            while self.pending() and self._connected.is_set() and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self._disconnect()
+        self._client = None
+        if self._store is not None:
+            with self._publish_lock:
+                self._store.close()
+    
+    def _snapshot_messages(self, bus_id: str, data: Dict) -> List[Tuple[str, bytes, bool]]:
+        """Messages d'un snapshot : un par capteur, puis l'état du bus sans les capteurs"""
+        base = f"{self.topic_prefix}/{bus_id}"
+        timestamp = data.get('timestamp')
+        messages = [
+            (f"{base}/sensors/{name}", _encode({'timestamp': timestamp, 'data': values}), self.retain)
+            for name, values in (data.get('sensors') or {}).items()
+        ]
+        state = {key: value for key, value in data.items() if key != 'sensors'}
+        messages.append((f"{base}/state", _encode(state), self.retain))
+        return messages
+    
+    def _publish(self, messages: List[Tuple[str, bytes, bool]]) -> bool:
+        """Enregistre les messages dans la base (QoS 1) puis les publie sans attendre l'acquittement"""
+        if not messages:
+            return True
+        pending = self.pending()
+        if self.qos > 0 and pending + len(messages) > self.max_stored:
+            self.stats['rejected'] += len(messages)
+            logger.warning(f"Trop de messages MQTT en attente d'acquittement ({pending}) - envoi refusé")
+            return False
+        with self._publish_lock:
+            rows = [None] * len(messages)
+            if self._store is not None:
+                try:
+                    rows = self._store.add(messages)
+                except sqlite3.Error as e:
+                    logger.error(f"Erreur enregistrement des messages MQTT en vol: {e}")
+                    return False
+            
+            for (topic, payload, retain), row in zip(messages, rows):
+                if not self._send(topic, payload, retain, row):
+                    return False
+                self.stats['messages'] += 1
+                self.stats['payload_bytes'] += len(payload)
+        return True
+    
+    def _send(self, topic: str, payload: bytes, retain: bool, row: Optional[int]) -> bool:
+        """Publie un message (mis en file par paho si la connexion est coupée) et suit son acquittement"""
+        info = self._client.publish(topic, payload, qos=self.qos, retain=retain)
+        if info.rc not in (mqtt.MQTT_ERR_SUCCESS, mqtt.MQTT_ERR_NO_CONN):
+            logger.error(f"Erreur publication MQTT sur {topic}: {mqtt.error_string(info.rc)}")
+            return False
+        if self.qos == 0:
+            return True
+        # Le verrou n'est jamais tenu pendant publish : paho appelle on_publish sous son propre verrou
+        with self._lock:
+            if info.mid in self._acked_early:
+                self._acked_early.discard(info.mid)
+                if row is not None:
+                    self._store.ack(row)
+            else:
+                self._pending[info.mid] = row
+        return True
+    
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        if reason_code.is_failure:
+            logger.warning(f"Connexion au broker MQTT refusée: {reason_code}")
+            return
+        self.stats['connects'] += 1
+        self._connected.set()
+        logger.info(f"Connecté au broker MQTT {self.server_url} (session {'reprise' if flags.session_present else 'nouvelle'})")
+        self._send(self.status_topic, STATUS_ONLINE.encode(), True, None)
+        if self._replay:
+            # Lecture de la base hors du thread réseau (comme les suppressions, voir _InflightStore.ack)
+            self._replay = False
+            threading.Thread(target=self._replay_inflight, name='mqtt-replay', daemon=True).start()
+    
+    def _replay_inflight(self):
+        """Republie les messages non acquittés avant un redémarrage (ou un changement de broker)"""
+        with self._publish_lock:
+            with self._lock:
+                tracked = set(self._pending.values())
+            try:
+                rows = [row for row in self._store.rows() if row[0] not in tracked]
+            except sqlite3.Error as e:
+                # Base fermée (close) ou illisible : les messages restent en base pour le prochain démarrage
+                logger.error(f"Erreur lecture des messages MQTT en vol: {e}")
+                return
+            for row, topic, payload, retain in rows:
+                self._send(topic, payload, retain, row)
+        self.stats['replayed'] += len(rows)
+        if rows:
+            logger.info(f"{len(rows)} message(s) MQTT non acquitté(s) republié(s)")
+    
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties):
+        if self._connected.is_set():
+            self.stats['disconnects'] += 1
+            logger.warning(f"Déconnecté du broker MQTT ({reason_code}) - reconnexion automatique")
+        self._connected.clear()
+    
+    def _on_publish(self, client, userdata, mid, reason_code, properties):
+        with self._lock:
+            row = self._pending.pop(mid, _UNKNOWN)
+            if row is _UNKNOWN:
+                self._acked_early.add(mid)
+                return
+        self.stats['acked'] += 1
+        if row is not None:
+            self._store.ack(row)
+    
+    def _disconnect(self):
+        self._connected.clear()
+        self._client.disconnect()
+        self._client.loop_stop()
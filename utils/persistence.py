@@ -0,0 +1,209 @@
+"""
+Module de persistance résistante aux coupures d'alimentation
+Écritures atomiques (fichier temporaire puis renommage), journal d'état en
+ajout avec somme de contrôle par enregistrement, et récupération au démarrage
+qui supprime les fichiers temporaires orphelins et tronque les enregistrements
+partiels
+"""
+
+import json
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# En-tête d'un enregistrement du journal : longueur et CRC32 de la charge utile
+_RECORD_HEADER = struct.Struct('<II')
+_TAIL_WINDOW = 64 * 1024
+
+
+def atomic_write(path, data: bytes, fsync: bool = False):
+    """
+    Écrit un fichier de façon atomique : après une coupure, le fichier est
+    soit absent, soit complet
+    
+    Args:
+        path: Chemin du fichier
+        data: Contenu
+        fsync: Forcer l'écriture sur le support avant le renommage (plus lent sur carte SD)
+    """
+    path = Path(path)
+    # Nom caché : ignoré par la rétention et supprimé par recover_directory s'il reste orphelin
+    tmp = path.with_name(f'.{path.name}.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class StateJournal:
+    """Classe pour enregistrer l'état du compteur dans un journal en ajout avec somme de contrôle"""
+    
+    def __init__(self, path: str, fsync: bool = True, compact_after: int = 1000):
+        """
+        Initialise le journal
+        
+        Args:
+            path: Chemin du fichier journal
+            fsync: Forcer l'écriture sur le support à chaque enregistrement
+            compact_after: Nombre d'enregistrements au-delà duquel le journal est réécrit
+                avec le seul dernier état
+        """
+        self.path = Path(path)
+        self.fsync = fsync
+        self.compact_after = compact_after
+        self._records = 0
+        self._last: Optional[Dict] = None
+        self._file = None
+    
+    def load(self) -> Optional[Dict]:
+        """
+        Relit le journal et tronque un éventuel enregistrement partiel
+        
+        Returns:
+            Dernier enregistrement valide {'time', 'clean', 'state'} ou None
+        """
+        try:
+            data = self.path.read_bytes()
+        except FileNotFoundError:
+            return None
+        
+        offset, records, last = 0, 0, None
+        while offset + _RECORD_HEADER.size <= len(data):
+            length, crc = _RECORD_HEADER.unpack_from(data, offset)
+            payload = data[offset + _RECORD_HEADER.size:offset + _RECORD_HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            try:
+                last = json.loads(payload)
+            except ValueError:
+                break
+            offset += _RECORD_HEADER.size + length
+            records += 1
+        
+        if offset < len(data):
+            logger.warning(f"Journal d'état: {len(data) - offset} octet(s) partiels tronqués après {records} enregistrement(s)")
+            with open(self.path, 'r+b') as f:
+                f.truncate(offset)
+        self._records = records
+        self._last = last
+        return last
+    
+    def save(self, state: Dict, clean: bool = False):
+        """
+        Ajoute un enregistrement d'état
+        
+        Args:
+            state: État à enregistrer (sérialisable en JSON)
+            clean: Arrêt propre (aucune vérification nécessaire au prochain démarrage)
+        """
+        record = {'time': time.time(), 'clean': clean, 'state': state}
+        payload = json.dumps(record, separators=(',', ':')).encode('utf-8')
+        if self._records >= self.compact_after:
+            self._compact(payload)
+        else:
+            if self._file is None:
+                self._file = open(self.path, 'ab')
+            self._file.write(_RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._records += 1
+        self._last = record
+    
+    @property
+    def last(self) -> Optional[Dict]:
+        """Dernier enregistrement lu ou écrit"""
+        return self._last
+    
+    def close(self):
+        """Ferme le fichier journal"""
+        if self._file:
+            self._file.close()
+            self._file = None
+    
+    def _compact(self, payload: bytes):
+        """Remplace le journal par un seul enregistrement"""
+        self.close()
+        atomic_write(self.path, _RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload, fsync=self.fsync)
+        self._records = 1
+
+
+def recover_directory(directory: str, since: Optional[float] = None) -> Dict:
+    """
+    Répare le répertoire de données après une coupure
+    
+    Supprime les fichiers temporaires orphelins, tronque la dernière ligne
+    incomplète des fichiers en ajout (JSON Lines, CSV) et, si `since` est
+    fourni (arrêt non propre), vérifie les fichiers JSON modifiés depuis :
+    les fichiers illisibles sont renommés en .corrupt.
+    
+    Args:
+        directory: Répertoire des données
+        since: Instant (epoch) du dernier état connu avant la coupure, None après un arrêt propre
+    
+    Returns:
+        Statistiques de la récupération
+    """
+    start = time.perf_counter()
+    stats = {'tmp_removed': 0, 'tails_truncated': 0, 'json_checked': 0, 'json_corrupt': 0}
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return stats
+    
+    for entry in entries:
+        if not entry.is_file():
+            continue
+        name = entry.name
+        if name.startswith('.') and name.endswith('.tmp'):
+            os.unlink(entry.path)
+            stats['tmp_removed'] += 1
+        elif name.endswith(('.jsonl', '.csv')):
+            if _truncate_partial_line(entry.path):
+                stats['tails_truncated'] += 1
+        elif since is not None and name.endswith('.json') and entry.stat().st_mtime >= since:
+            stats['json_checked'] += 1
+            try:
+                with open(entry.path, encoding='utf-8') as f:
+                    json.load(f)
+            except (OSError, ValueError):
+                os.replace(entry.path, entry.path + '.corrupt')
+                stats['json_corrupt'] += 1
+                logger.warning(f"Fichier incomplet après coupure: {name} → {name}.corrupt")
+    
+    stats['duration_ms'] = (time.perf_counter() - start) * 1000
+    if stats['tmp_removed'] or stats['tails_truncated'] or stats['json_corrupt']:
+        logger.info(f"Récupération des données: {stats}")
+    return stats
+
+
+def _truncate_partial_line(path: str) -> bool:
+    """Tronque la dernière ligne si elle n'est pas terminée ; retourne True si le fichier a été modifié"""
+    with open(path, 'r+b') as f:
+        size = f.seek(0, os.SEEK_END)
+        if not size:
+            return False
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return False
+        # Recherche du dernier saut de ligne par blocs depuis la fin
+        keep, end = 0, size
+        while end > 0:
+            begin = max(0, end - _TAIL_WINDOW)
+            f.seek(begin)
+            newline = f.read(end - begin).rfind(b'\n')
+            if newline >= 0:
+                keep = begin + newline + 1
+                break
+            end = begin
+        f.truncate(keep)
+        logger.warning(f"Ligne incomplète supprimée en fin de {Path(path).name} ({size - keep} octets)")
+        return True
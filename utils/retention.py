@@ -0,0 +1,399 @@
+"""
+Module de gestion de l'espace disque du répertoire de données
+Les fichiers des jours passés sont compactés en archives quotidiennes
+compressées, puis, quand un quota est dépassé ou que la carte SD se remplit,
+les données les plus anciennes sont supprimées en commençant par celles que le
+serveur a déjà reçues. Le travail est découpé en petites étapes exécutées par
+un thread d'arrière-plan pour ne jamais bloquer la boucle principale.
+"""
+
+import gzip
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = 'archive'
+STATE_FILE = '.retention.json'
+
+# Fichiers jamais compactés ni supprimés : bases SQLite ouvertes en continu et leurs
+# fichiers -wal / -shm (smart_bus.db purgée par SQLiteDatastore, sensor_data.db,
+# mqtt_inflight.db), CSV en cours d'écriture, état du gestionnaire, journal d'état
+# du compteur et calibration du magnétomètre
+_PROTECTED_SUFFIXES = ('.db', '.db-wal', '.db-shm', '.db-journal')
+_PROTECTED_NAMES = ('sensor_data.csv', STATE_FILE, 'state.journal', 'mag_calibration.json')
+
+# Fichier d'une journée (sensor_data_AAAAMMJJ.jsonl[.gz]) : couvre la journée depuis son début
+_DAY_FILE = re.compile(r'_(\d{8})\.')
+# Plages de données reçues conservées (les plus anciennes sont oubliées au-delà)
+_MAX_ACKNOWLEDGED = 1000
+
+
+class RetentionManager:
+    """Classe pour limiter l'occupation disque des données et des logs"""
+    
+    def __init__(self, data_dir: str, log_dir: Optional[str] = None,
+                 max_bytes: int = 500 * 1024 * 1024, min_free_bytes: int = 200 * 1024 * 1024,
+                 keep_days: float = 90.0, compact_after_days: int = 1,
+                 interval: float = 60.0, step_files: int = 200):
+        """
+        Initialise le gestionnaire
+        
+        Args:
+            data_dir: Répertoire des données (DataLogger)
+            log_dir: Répertoire des logs (les sauvegardes de rotation peuvent être supprimées)
+            max_bytes: Quota du répertoire de données en octets
+            min_free_bytes: Espace libre minimal à préserver sur le disque
+            keep_days: Âge maximal des données en jours (0 = illimité)
+            compact_after_days: Âge en jours à partir duquel les fichiers sont compactés
+            interval: Intervalle en secondes entre deux passes ; les fichiers modifiés depuis moins
+                longtemps sont considérés en cours d'écriture et ne sont pas supprimés
+            step_files: Nombre maximal de fichiers traités par étape
+        """
+        self.data_dir = Path(data_dir)
+        self.log_dir = Path(log_dir) if log_dir else None
+        self.archive_dir = self.data_dir / ARCHIVE_DIR
+        self.max_bytes = max_bytes
+        self.min_free_bytes = min_free_bytes
+        self.keep_days = keep_days
+        self.compact_after_days = compact_after_days
+        self.interval = interval
+        self.step_files = step_files
+        
+        # Plages [début, fin] (secondes epoch) de snapshots reçus sans trou par le serveur
+        self.acknowledged: List[List[float]] = []
+        self.disk_low = False
+        self.stats = {
+            'files_compacted': 0,
+            'archives_written': 0,
+            'bytes_saved': 0,
+            'files_deleted': 0,
+            'bytes_deleted': 0,
+            'usage_bytes': 0,
+            'free_bytes': None,
+        }
+        self._state_file = self.data_dir / STATE_FILE
+        self._live: List[Callable[[], Iterable[Union[str, Path]]]] = []
+        self._load_state()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        """Démarre le thread d'arrière-plan"""
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='retention', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 5.0):
+        """Arrête le thread d'arrière-plan (l'étape en cours se termine)"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self._save_state()
+    
+    def protect(self, live_paths: Callable[[], Iterable[Union[str, Path]]]):
+        """
+        Protège les fichiers ouverts par un autre composant (jamais compactés ni supprimés)
+        
+        Args:
+            live_paths: Fonction retournant les chemins en cours d'utilisation, appelée à chaque
+                étape (ex: `lambda: [capture.path]`, le fichier change à chaque rotation)
+        """
+        self._live.append(live_paths)
+    
+    def acknowledge(self, start: float, end: float):
+        """
+        Note que le serveur a reçu toutes les données d'une plage (sans snapshot perdu entre les deux)
+        
+        Args:
+            start: Instant en secondes epoch du premier snapshot reçu de la plage
+            end: Instant en secondes epoch du dernier snapshot reçu de la plage
+        """
+        # Nouvelle liste : le thread de rétention lit l'ancienne sans verrou
+        ranges = sorted([list(r) for r in self.acknowledged] + [[start, end]])
+        merged = [ranges[0]]
+        for low, high in ranges[1:]:
+            if low <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], high)
+            else:
+                merged.append([low, high])
+        self.acknowledged = merged[-_MAX_ACKNOWLEDGED:]
+    
+    def is_acknowledged(self, start: float, end: float) -> bool:
+        """Indique si le serveur a reçu toutes les données entre deux instants"""
+        return any(low <= start and end <= high for low, high in self.acknowledged)
+    
+    def run_once(self, now: Optional[float] = None) -> Dict:
+        """
+        Exécute une passe complète : compactage puis suppression si nécessaire
+        
+        Args:
+            now: Instant de référence en secondes epoch (par défaut maintenant)
+        
+        Returns:
+            Statistiques cumulées
+        """
+        now = time.time() if now is None else now
+        while not self._stop.is_set() and self.compact_step(now):
+            pass
+        while not self._stop.is_set() and self.enforce_step(now):
+            pass
+        self._save_state()
+        return dict(self.stats)
+    
+    def usage(self) -> int:
+        """Occupation du répertoire de données (et des logs) en octets"""
+        total = sum(entry.stat().st_size for entry in self._files(self.data_dir, recursive=True))
+        if self.log_dir and self.log_dir.exists():
+            total += sum(entry.stat().st_size for entry in self._files(self.log_dir))
+        self.stats['usage_bytes'] = total
+        return total
+    
+    def free_bytes(self) -> int:
+        """Espace libre sur le disque des données"""
+        free = shutil.disk_usage(self.data_dir).free
+        self.stats['free_bytes'] = free
+        return free
+    
+    def compact_step(self, now: float) -> bool:
+        """
+        Compacte un lot de fichiers anciens
+        
+        Les snapshots et segments JSON d'un même jour sont ajoutés à l'archive
+        archive/AAAAMMJJ.jsonl.gz (une ligne {"file", "data"} par fichier) ;
+        les autres fichiers (JSON Lines, CSV) sont compressés individuellement.
+        
+        Returns:
+            True s'il reste des fichiers à compacter
+        """
+        cutoff = self._day_start(now) - (self.compact_after_days - 1) * 86400
+        live = self._live_paths()
+        candidates = [
+            entry for entry in self._files(self.data_dir)
+            if entry.stat().st_mtime < cutoff and self._compactable(entry.name) and entry.path not in live
+        ][:self.step_files]
+        if not candidates:
+            return False
+        
+        by_day: Dict[str, List[os.DirEntry]] = {}
+        for entry in candidates:
+            if entry.name.endswith('.json'):
+                by_day.setdefault(datetime.fromtimestamp(entry.stat().st_mtime).strftime('%Y%m%d'), []).append(entry)
+            else:
+                self._gzip_file(entry)
+        
+        self.archive_dir.mkdir(exist_ok=True)
+        for day, entries in by_day.items():
+            self._append_archive(day, entries)
+        return len(candidates) == self.step_files
+    
+    def enforce_step(self, now: float) -> bool:
+        """
+        Supprime les données les plus anciennes tant qu'une limite est dépassée
+        
+        Ordre : données trop anciennes (keep_days), puis, en cas de quota
+        dépassé ou de disque presque plein, archives et fichiers déjà reçus par
+        le serveur, puis les autres, puis les sauvegardes de rotation des logs.
+        Les fichiers protégés, ouverts (protect) ou modifiés depuis moins de
+        `interval` secondes ne sont jamais supprimés.
+        
+        Returns:
+            True si des fichiers ont été supprimés (une limite peut encore être dépassée)
+        """
+        expired = now - self.keep_days * 86400 if self.keep_days else None
+        over_quota = self.usage() > self.max_bytes
+        disk_low = self.free_bytes() < self.min_free_bytes
+        if disk_low != self.disk_low:
+            self.disk_low = disk_low
+            if disk_low:
+                logger.warning(f"Espace disque faible ({self.stats['free_bytes'] / 1e6:.0f} Mo libres) - suppression des données anciennes")
+        
+        candidates = self._deletion_candidates(now)
+        victims = [c for c in candidates if expired is not None and c['end'] < expired]
+        if not victims and (over_quota or disk_low):
+            # Données reçues par le serveur d'abord, puis les plus anciennes
+            victims = sorted(candidates, key=lambda c: (not self.is_acknowledged(c['start'], c['end']), c['end']))
+        if not victims:
+            return False
+        
+        excess = max(self.stats['usage_bytes'] - self.max_bytes, self.min_free_bytes - self.stats['free_bytes'], 0)
+        freed = deleted = 0
+        for victim in victims[:self.step_files]:
+            if victim['end'] >= (expired or 0) and freed >= excess:
+                break
+            try:
+                size = victim['path'].stat().st_size
+                victim['path'].unlink()
+            except OSError as e:
+                logger.error(f"Erreur suppression {victim['path']}: {e}")
+                continue
+            freed += size
+            deleted += 1
+        if deleted:
+            self.stats['files_deleted'] += deleted
+            self.stats['bytes_deleted'] += freed
+            logger.info(f"Rétention: {deleted} fichier(s) supprimé(s), {freed / 1e6:.1f} Mo libérés")
+        return deleted > 0
+    
+    def _deletion_candidates(self, now: float) -> List[Dict]:
+        """Fichiers supprimables avec les instants de leurs données la plus ancienne et la plus récente"""
+        candidates = []
+        live = self._live_paths()
+        recent = now - self.interval
+        for entry in self._files(self.data_dir, recursive=True):
+            if self._protected(entry.name) or entry.path in live:
+                continue
+            path = Path(entry.path)
+            if path.parent == self.archive_dir and entry.name[:8].isdigit():
+                # Une archive couvre toute sa journée (écrite par ce thread : jamais en cours d'écriture)
+                start = datetime.strptime(entry.name[:8], '%Y%m%d').timestamp()
+                end = start + 86400
+            elif entry.stat().st_mtime >= recent:
+                continue
+            else:
+                # Un snapshot ou un segment par fichier : l'instant de son écriture ;
+                # un fichier d'une journée : depuis le début de la journée
+                end = start = entry.stat().st_mtime
+                day = _DAY_FILE.search(entry.name)
+                if day:
+                    try:
+                        start = datetime.strptime(day.group(1), '%Y%m%d').timestamp()
+                    except ValueError:
+                        pass
+            candidates.append({'path': path, 'start': start, 'end': end})
+        if self.log_dir and self.log_dir.exists():
+            for entry in self._files(self.log_dir):
+                # Sauvegardes de rotation uniquement (smart_bus.log.1, ...), jamais le log courant
+                if entry.name.rsplit('.', 1)[-1].isdigit():
+                    candidates.append({'path': Path(entry.path), 'start': float('inf'), 'end': float('inf')})
+        return candidates
+    
+    def _append_archive(self, day: str, entries: List[os.DirEntry]):
+        """Ajoute des fichiers JSON à l'archive du jour puis les supprime"""
+        lines, sources = [], []
+        for entry in sorted(entries, key=lambda e: e.name):
+            try:
+                with open(entry.path, encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                # Fichier tronqué (coupure pendant l'écriture) : conservé tel quel dans l'archive
+                logger.warning(f"Fichier illisible archivé brut: {entry.name} ({e})")
+                data = Path(entry.path).read_text(encoding='utf-8', errors='replace')
+            lines.append(json.dumps({'file': entry.name, 'data': data}, ensure_ascii=False))
+            sources.append(entry)
+        
+        archive = self.archive_dir / f'{day}.jsonl.gz'
+        before = archive.stat().st_size if archive.exists() else 0
+        # Chaque étape ajoute un membre gzip : le fichier reste lisible d'un seul tenant.
+        # Les fichiers sources ne sont supprimés qu'une fois l'archive sur disque
+        with open(archive, 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='ab', compresslevel=6) as f:
+                f.write(('\n'.join(lines) + '\n').encode('utf-8'))
+            raw.flush()
+            os.fsync(raw.fileno())
+        written = archive.stat().st_size - before
+        
+        original = 0
+        for entry in sources:
+            original += entry.stat().st_size
+            os.unlink(entry.path)
+        self.stats['files_compacted'] += len(sources)
+        self.stats['archives_written'] += 1
+        self.stats['bytes_saved'] += original - written
+    
+    def _gzip_file(self, entry: os.DirEntry):
+        """Compresse un fichier en place (nom.gz), conserve sa date de modification"""
+        source = Path(entry.path)
+        target = source.with_name(source.name + '.gz')
+        stat = entry.stat()
+        with open(source, 'rb') as src, open(target, 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.utime(target, (stat.st_atime, stat.st_mtime))
+        self.stats['files_compacted'] += 1
+        self.stats['bytes_saved'] += stat.st_size - target.stat().st_size
+        source.unlink()
+    
+    def _compactable(self, name: str) -> bool:
+        return not self._protected(name) and name.endswith(('.json', '.jsonl', '.csv'))
+    
+    @staticmethod
+    def _protected(name: str) -> bool:
+        return name in _PROTECTED_NAMES or name.endswith(_PROTECTED_SUFFIXES) or name.startswith('.')
+    
+    def _live_paths(self) -> Set[str]:
+        """Chemins déclarés par les composants via protect (forme de os.DirEntry.path)"""
+        paths = set()
+        for live_paths in self._live:
+            try:
+                paths.update(os.path.join(self.data_dir, os.path.relpath(path, self.data_dir))
+                             for path in live_paths() if path)
+            except Exception as e:
+                logger.error(f"Erreur chemins protégés: {e}")
+        return paths
+    
+    @staticmethod
+    def _files(directory: Path, recursive: bool = False) -> List[os.DirEntry]:
+        """Fichiers d'un répertoire (et de ses sous-répertoires si recursive)"""
+        files = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        files.append(entry)
+                    elif recursive and entry.is_dir():
+                        files.extend(RetentionManager._files(Path(entry.path), recursive))
+        except FileNotFoundError:
+            pass
+        return files
+    
+    @staticmethod
+    def _day_start(now: float) -> float:
+        """Début du jour local contenant `now`"""
+        day = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0)
+        return day.timestamp()
+    
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                now = time.time()
+                # Une étape à la fois, avec une courte pause pour laisser la main à la boucle principale
+                while not self._stop.is_set() and self.compact_step(now):
+                    self._stop.wait(0.05)
+                while not self._stop.is_set() and self.enforce_step(now):
+                    self._stop.wait(0.05)
+                self._save_state()
+            except Exception as e:
+                logger.error(f"Erreur gestion de la rétention: {e}")
+            self._stop.wait(self.interval)
+    
+    def _load_state(self):
+        try:
+            with open(self._state_file, encoding='utf-8') as f:
+                acknowledged = json.load(f).get('acknowledged')
+            # Ancien format (un seul instant) : il ne tenait pas compte des snapshots perdus, ignoré
+            if isinstance(acknowledged, list):
+                self.acknowledged = [[float(low), float(high)] for low, high in acknowledged]
+        except (OSError, ValueError, TypeError):
+            pass
+    
+    def _save_state(self):
+        try:
+            tmp = self._state_file.with_suffix('.tmp')
+            tmp.write_text(json.dumps({'acknowledged': self.acknowledged}), encoding='utf-8')
+            os.replace(tmp, self._state_file)
+        except OSError as e:
+            logger.error(f"Erreur sauvegarde de l'état de rétention: {e}")
@@ -0,0 +1,122 @@
+"""
+Module de tampon circulaire en mémoire partagée
+Un producteur (processus d'acquisition) et un consommateur (processus principal)
+échangent des enregistrements de taille fixe sans verrou : chaque case porte un
+numéro de séquence avant et après les données pour détecter une lecture
+concurrente d'une écriture
+"""
+
+import struct
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct('<Q')  # nombre total d'enregistrements écrits
+_SEQ = struct.Struct('<Q')
+
+
+class SharedRingBuffer:
+    """Classe pour échanger des échantillons entre processus via multiprocessing.shared_memory"""
+    
+    def __init__(self, record_format: str, capacity: int = 1024,
+                 name: Optional[str] = None, create: bool = True):
+        """
+        Initialise ou ouvre le tampon
+        
+        Args:
+            record_format: Format struct d'un enregistrement (ex: 'dd' pour horodatage + distance)
+            capacity: Nombre d'enregistrements conservés (les plus anciens sont écrasés)
+            name: Nom du segment de mémoire partagée (obligatoire pour ouvrir un segment existant)
+            create: Créer le segment (producteur/propriétaire) ou ouvrir un segment existant
+        """
+        self.record = struct.Struct('<' + record_format)
+        self.capacity = capacity
+        self.slot_size = _SEQ.size * 2 + self.record.size
+        size = _HEADER.size + self.slot_size * capacity
+        
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.buf = self.shm.buf
+        if create:
+            _HEADER.pack_into(self.buf, 0, 0)
+        
+        # Position de lecture propre au consommateur
+        self.read_index = self._write_index()
+        self.dropped = 0
+    
+    @property
+    def name(self) -> str:
+        """Nom du segment, à transmettre au processus qui ouvre le tampon"""
+        return self.shm.name
+    
+    def push(self, *values):
+        """
+        Ajoute un enregistrement (côté producteur)
+        
+        Args:
+            values: Valeurs de l'enregistrement, dans l'ordre du format
+        """
+        index = self._write_index()
+        offset = _HEADER.size + (index % self.capacity) * self.slot_size
+        seq = index + 1
+        _SEQ.pack_into(self.buf, offset, seq)
+        self.record.pack_into(self.buf, offset + _SEQ.size, *values)
+        _SEQ.pack_into(self.buf, offset + _SEQ.size + self.record.size, seq)
+        _HEADER.pack_into(self.buf, 0, seq)
+    
+    def read_new(self) -> List[Tuple]:
+        """
+        Retourne les enregistrements écrits depuis la dernière lecture (côté consommateur)
+        
+        Returns:
+            Liste des enregistrements, du plus ancien au plus récent
+        """
+        end = self._write_index()
+        start = self.read_index
+        if end - start > self.capacity:
+            # Le producteur a fait plus d'un tour : les plus anciens sont perdus
+            self.dropped += end - start - self.capacity
+            start = end - self.capacity
+        
+        records = []
+        for index in range(start, end):
+            record = self._read_slot(index)
+            if record is None:
+                self.dropped += 1
+            else:
+                records.append(record)
+        self.read_index = end
+        return records
+    
+    def latest(self) -> Optional[Tuple]:
+        """Retourne le dernier enregistrement écrit sans déplacer la position de lecture"""
+        end = self._write_index()
+        return self._read_slot(end - 1) if end else None
+    
+    def close(self):
+        """Détache le segment du processus courant"""
+        self.buf = None
+        self.shm.close()
+    
+    def unlink(self):
+        """Supprime le segment (à appeler une seule fois par le propriétaire)"""
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+    
+    def _write_index(self) -> int:
+        return _HEADER.unpack_from(self.buf, 0)[0]
+    
+    def _read_slot(self, index: int) -> Optional[Tuple]:
+        """Lit une case ; None si elle a été réécrite pendant la lecture"""
+        offset = _HEADER.size + (index % self.capacity) * self.slot_size
+        seq = index + 1
+        # Lecture dans l'ordre inverse de l'écriture : fin, données, début
+        end_seq = _SEQ.unpack_from(self.buf, offset + _SEQ.size + self.record.size)[0]
+        values = self.record.unpack_from(self.buf, offset + _SEQ.size)
+        start_seq = _SEQ.unpack_from(self.buf, offset)[0]
+        if start_seq != seq or end_seq != seq:
+            return None
+        return values
@@ -0,0 +1,185 @@
+"""
+Module de démarrage rapide
+Les pilotes sont initialisés en parallèle, chacun avec un délai maximal : le
+programme attend seulement les capteurs de porte pour commencer à compter, les
+autres pilotes sont rattachés dès qu'ils sont prêts. Chaque étape est
+chronométrée pour produire un rapport de démarrage.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = 'pending'
+STATUS_READY = 'ready'
+STATUS_FAILED = 'failed'
+STATUS_TIMEOUT = 'timeout'
+
+
+class HardwareInitializer:
+    """Classe pour initialiser les pilotes en parallèle et mesurer les étapes du démarrage"""
+    
+    def __init__(self, parallel: bool = True, max_workers: int = 6, origin: Optional[float] = None):
+        """
+        Initialise le gestionnaire de démarrage
+        
+        Args:
+            parallel: Initialiser les pilotes dans des threads (False = à la soumission, l'un après l'autre)
+            max_workers: Nombre maximal d'initialisations simultanées
+            origin: Instant de référence du rapport (time.perf_counter, par défaut maintenant)
+        """
+        self.parallel = parallel
+        self.origin = time.perf_counter() if origin is None else origin
+        self.phases: Dict[str, float] = {}
+        self._tasks: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='init') if parallel else None
+    
+    def mark(self, phase: str):
+        """
+        Note la fin d'une étape du démarrage
+        
+        Args:
+            phase: Nom de l'étape (ex: 'config', 'doors_ready')
+        """
+        self.phases[phase] = self._elapsed_ms()
+    
+    def submit(self, name: str, factory: Callable[[], Any], timeout: float = 5.0):
+        """
+        Lance l'initialisation d'un pilote
+        
+        Args:
+            name: Nom du pilote (ex: 'gps', 'ultrasonic_entry', 'lcd')
+            factory: Fonction sans argument qui crée le pilote
+            timeout: Délai en secondes au-delà duquel le pilote est signalé en retard
+                (il est rattaché plus tard s'il finit par être prêt)
+        """
+        task = {
+            'timeout': timeout,
+            'submitted': time.perf_counter(),
+            'status': STATUS_PENDING,
+            'duration_ms': None,
+            'ready_at_ms': None,
+            'error': None,
+            'driver': None,
+            'delivered': False,
+            'done': threading.Event()
+        }
+        with self._lock:
+            self._tasks[name] = task
+        if self._executor:
+            self._executor.submit(self._run, name, factory)
+        else:
+            self._run(name, factory)
+    
+    def wait(self, names: Iterable[str], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Attend que des pilotes soient prêts
+        
+        Args:
+            names: Pilotes attendus (les noms non soumis sont ignorés)
+            timeout: Attente maximale en secondes pour l'ensemble
+                (chaque pilote est aussi limité par son propre délai)
+        
+        Returns:
+            Pilotes prêts parmi ceux attendus, non encore livrés
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for name in names:
+            task = self._tasks.get(name)
+            if task is None:
+                continue
+            limit = task['submitted'] + task['timeout']
+            if deadline is not None:
+                limit = min(limit, deadline)
+            task['done'].wait(max(0.0, limit - time.perf_counter()))
+        return self._collect(names)
+    
+    def poll(self) -> Dict[str, Any]:
+        """
+        Retourne sans attendre les pilotes devenus prêts depuis le dernier appel
+        Les pilotes qui dépassent leur délai sont signalés une fois
+        
+        Returns:
+            Pilotes prêts non encore livrés
+        """
+        now = time.perf_counter()
+        with self._lock:
+            for name, task in self._tasks.items():
+                if task['status'] == STATUS_PENDING and now - task['submitted'] > task['timeout']:
+                    task['status'] = STATUS_TIMEOUT
+                    logger.warning(
+                        f"Initialisation de {name} hors délai ({task['timeout']:g}s) - "
+                        f"démarrage sans ce capteur, rattaché s'il devient prêt"
+                    )
+        return self._collect(list(self._tasks))
+    
+    def pending(self) -> List[str]:
+        """Retourne les pilotes dont l'initialisation n'est pas terminée"""
+        return [name for name, task in self._tasks.items() if not task['done'].is_set()]
+    
+    def report(self) -> Dict:
+        """Retourne les étapes et, par pilote, l'état, la durée et l'instant où il était prêt (ms)"""
+        return {
+            'phases': dict(self.phases),
+            'drivers': {
+                name: {key: task[key] for key in ('status', 'duration_ms', 'ready_at_ms', 'error')}
+                for name, task in self._tasks.items()
+            }
+        }
+    
+    def format_report(self) -> str:
+        """Résumé lisible du démarrage pour les logs"""
+        phases = ', '.join(f"{phase} {ms:.0f} ms" for phase, ms in self.phases.items())
+        drivers = []
+        for name, task in self._tasks.items():
+            if task['duration_ms'] is None:
+                drivers.append(f"{name} {task['status']}")
+            else:
+                drivers.append(f"{name} {task['duration_ms']:.0f} ms ({task['status']})")
+        return f"étapes: {phases} | pilotes: {', '.join(drivers)}"
+    
+    def shutdown(self):
+        """Libère les threads (les initialisations en cours ne sont pas interrompues)"""
+        if self._executor:
+            self._executor.shutdown(wait=False)
+    
+    def _run(self, name: str, factory: Callable[[], Any]):
+        """Crée un pilote et enregistre le résultat"""
+        task = self._tasks[name]
+        start = time.perf_counter()
+        try:
+            driver, error = factory(), None
+        except Exception as e:
+            driver, error = None, str(e)
+            logger.error(f"Erreur initialisation {name}: {e}")
+        with self._lock:
+            task['duration_ms'] = (time.perf_counter() - start) * 1000
+            task['ready_at_ms'] = self._elapsed_ms()
+            task['driver'] = driver
+            task['error'] = error
+            if error:
+                task['status'] = STATUS_FAILED
+            else:
+                if task['status'] == STATUS_TIMEOUT:
+                    logger.info(f"{name} prêt après {task['duration_ms']:.0f} ms (hors délai)")
+                task['status'] = STATUS_READY
+        task['done'].set()
+    
+    def _collect(self, names: Iterable[str]) -> Dict[str, Any]:
+        """Livre une seule fois les pilotes prêts"""
+        ready = {}
+        with self._lock:
+            for name in names:
+                task = self._tasks.get(name)
+                if task and task['status'] == STATUS_READY and not task['delivered']:
+                    task['delivered'] = True
+                    ready[name] = task['driver']
+        return ready
+    
+    def _elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.origin) * 1000
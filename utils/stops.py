@@ -0,0 +1,202 @@
+"""
+Module de détection des arrêts de bus
+Les arrêts (lat/lon/rayon) sont rangés dans une grille spatiale pour retrouver
+en temps constant l'arrêt correspondant à une position GPS ; chaque passage à
+un arrêt donne une visite avec temps d'arrêt et montées/descentes
+"""
+
+import csv
+import json
+import math
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+METERS_PER_DEGREE = 111320.0
+
+
+class StopIndex:
+    """Classe pour indexer les arrêts dans une grille spatiale"""
+    
+    def __init__(self, stops: List[Dict], default_radius: float = 30.0):
+        """
+        Initialise l'index
+        
+        Args:
+            stops: Liste d'arrêts {'id', 'name', 'lat', 'lon', 'radius'} (radius optionnel, en mètres)
+            default_radius: Rayon en mètres utilisé si l'arrêt n'en précise pas
+        """
+        self.stops = []
+        for stop in stops:
+            self.stops.append({
+                'id': str(stop.get('id', len(self.stops))),
+                'name': stop.get('name', ''),
+                'lat': float(stop['lat']),
+                'lon': float(stop['lon']),
+                'radius': float(stop.get('radius') or default_radius)
+            })
+        
+        # La taille des cellules couvre le plus grand rayon : un point ne peut
+        # être dans un arrêt que si celui-ci est dans sa cellule ou une voisine
+        self.cell_size = max([s['radius'] for s in self.stops] + [default_radius])
+        ref_lat = sum(s['lat'] for s in self.stops) / len(self.stops) if self.stops else 0.0
+        self._lon_scale = METERS_PER_DEGREE * math.cos(math.radians(ref_lat))
+        self._cells: Dict[Tuple[int, int], List[Dict]] = {}
+        for stop in self.stops:
+            self._cells.setdefault(self._cell(stop['lat'], stop['lon']), []).append(stop)
+    
+    @classmethod
+    def from_file(cls, path: str, default_radius: float = 30.0) -> 'StopIndex':
+        """
+        Charge les arrêts depuis un fichier JSON (liste d'objets) ou CSV (colonnes id,name,lat,lon,radius)
+        
+        Args:
+            path: Chemin du fichier
+            default_radius: Rayon par défaut en mètres
+        
+        Returns:
+            Index des arrêts
+        """
+        path = Path(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.suffix.lower() == '.csv':
+                stops = list(csv.DictReader(f))
+            else:
+                stops = json.load(f)
+                if isinstance(stops, dict):
+                    stops = stops.get('stops', [])
+        logger.info(f"{len(stops)} arrêt(s) chargé(s) depuis {path}")
+        return cls(stops, default_radius=default_radius)
+    
+    def lookup(self, latitude: float, longitude: float) -> Optional[Dict]:
+        """
+        Retourne l'arrêt le plus proche contenant la position
+        
+        Args:
+            latitude: Latitude en degrés
+            longitude: Longitude en degrés
+        
+        Returns:
+            Arrêt trouvé ou None
+        """
+        cx, cy = self._cell(latitude, longitude)
+        best = None
+        best_distance = None
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for stop in self._cells.get((cx + dx, cy + dy), ()):
+                    distance = self.distance(stop, latitude, longitude)
+                    if distance <= stop['radius'] and (best is None or distance < best_distance):
+                        best, best_distance = stop, distance
+        return best
+    
+    def distance(self, stop: Dict, latitude: float, longitude: float) -> float:
+        """Distance approximative en mètres entre un arrêt et une position"""
+        x = (longitude - stop['lon']) * self._lon_scale
+        y = (latitude - stop['lat']) * METERS_PER_DEGREE
+        return math.hypot(x, y)
+    
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        """Cellule de la grille contenant la position"""
+        return (int(math.floor(longitude * self._lon_scale / self.cell_size)),
+                int(math.floor(latitude * METERS_PER_DEGREE / self.cell_size)))
+
+
+class StopDetector:
+    """Classe pour suivre les visites aux arrêts et les temps d'arrêt"""
+    
+    def __init__(self, index: StopIndex, stopped_speed: float = 3.0, exit_margin: float = 1.2):
+        """
+        Initialise le détecteur
+        
+        Args:
+            index: Index des arrêts
+            stopped_speed: Vitesse en km/h en dessous de laquelle le bus est considéré à l'arrêt
+            exit_margin: Facteur appliqué au rayon pour fermer une visite (évite les oscillations)
+        """
+        self.index = index
+        self.stopped_speed = stopped_speed
+        self.exit_margin = exit_margin
+        self.visit: Optional[Dict] = None
+        self.off_stop = {'boardings': 0, 'alightings': 0}
+        self._last_time = None
+        self._stopped = False
+    
+    def update(self, latitude: float, longitude: float, speed: Optional[float], timestamp: float) -> List[Dict]:
+        """
+        Traite une position GPS
+        
+        Args:
+            latitude: Latitude en degrés
+            longitude: Longitude en degrés
+            speed: Vitesse en km/h
+            timestamp: Instant de la mesure en secondes
+        
+        Returns:
+            Liste d'événements {'type': 'arrival'|'departure', 'visit': {...}}
+        """
+        events = []
+        visit = self.visit
+        
+        if visit is not None:
+            stop = visit['_stop']
+            if self.index.distance(stop, latitude, longitude) <= stop['radius'] * self.exit_margin:
+                self._accumulate_dwell(speed, timestamp)
+                return events
+            events.append({'type': 'departure', 'visit': self._close(timestamp)})
+        
+        stop = self.index.lookup(latitude, longitude)
+        if stop is not None:
+            self.visit = {
+                '_stop': stop,
+                'stop_id': stop['id'],
+                'stop_name': stop['name'],
+                'arrival': timestamp,
+                'departure': None,
+                'dwell': 0.0,
+                'boardings': 0,
+                'alightings': 0
+            }
+            self._last_time = timestamp
+            self._stopped = speed is not None and speed <= self.stopped_speed
+            events.append({'type': 'arrival', 'visit': self._public(self.visit)})
+        
+        return events
+    
+    def record_boarding(self):
+        """Attribue une montée à l'arrêt en cours (ou hors arrêt)"""
+        target = self.visit if self.visit is not None else self.off_stop
+        target['boardings'] += 1
+    
+    def record_alighting(self):
+        """Attribue une descente à l'arrêt en cours (ou hors arrêt)"""
+        target = self.visit if self.visit is not None else self.off_stop
+        target['alightings'] += 1
+    
+    def current_stop(self) -> Optional[Dict]:
+        """Retourne la visite en cours (sans état interne) ou None"""
+        return self._public(self.visit) if self.visit else None
+    
+    def _accumulate_dwell(self, speed: Optional[float], timestamp: float):
+        """Ajoute au temps d'arrêt la durée passée sous la vitesse d'arrêt"""
+        if self._stopped:
+            self.visit['dwell'] += max(0.0, timestamp - self._last_time)
+        self._stopped = speed is not None and speed <= self.stopped_speed
+        self._last_time = timestamp
+    
+    def _close(self, timestamp: float) -> Dict:
+        """Ferme la visite en cours"""
+        self._accumulate_dwell(None, timestamp)
+        self.visit['departure'] = timestamp
+        visit = self._public(self.visit)
+        visit['duration'] = round(timestamp - visit['arrival'], 1)
+        visit['dwell'] = round(visit['dwell'], 1)
+        self.visit = None
+        return visit
+    
+    @staticmethod
+    def _public(visit: Dict) -> Dict:
+        """Copie d'une visite sans les champs internes"""
+        return {k: v for k, v in visit.items() if not k.startswith('_')}
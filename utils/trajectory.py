@@ -0,0 +1,256 @@
+"""
+Module de compression de trajectoire GPS
+Filtre les points aberrants, simplifie la trace en ligne avec une erreur bornée
+(fenêtre glissante de type Douglas-Peucker) et produit des segments compacts
+encodés en polyline (format Google, précision 1e-5) par trajet
+"""
+
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS = 6371000.0  # mètres
+
+
+def encode_polyline(points: List[Tuple[float, float]], precision: int = 5) -> str:
+    """
+    Encode une liste de points (lat, lon) au format polyline de Google
+    
+    Args:
+        points: Liste de tuples (latitude, longitude)
+        precision: Nombre de décimales conservées
+    
+    Returns:
+        Chaîne encodée
+    """
+    factor = 10 ** precision
+    result = []
+    prev_lat = prev_lon = 0
+    
+    for lat, lon in points:
+        ilat = int(round(lat * factor))
+        ilon = int(round(lon * factor))
+        for delta in (ilat - prev_lat, ilon - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                result.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            result.append(chr(value + 63))
+        prev_lat, prev_lon = ilat, ilon
+    
+    return ''.join(result)
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> List[Tuple[float, float]]:
+    """
+    Décode une polyline Google en liste de points (lat, lon)
+    
+    Args:
+        encoded: Chaîne encodée
+        precision: Nombre de décimales utilisées à l'encodage
+    
+    Returns:
+        Liste de tuples (latitude, longitude)
+    """
+    factor = 10 ** precision
+    points = []
+    index = lat = lon = 0
+    
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = value = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                value |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(value >> 1) if value & 1 else value >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        points.append((lat / factor, lon / factor))
+    
+    return points
+
+
+class TrajectoryCompressor:
+    """Classe pour compresser en ligne le flux de positions GPS en segments de trajet"""
+    
+    def __init__(self, epsilon: float = 10.0, max_speed: float = 130.0,
+                 trip_gap: float = 300.0, max_window: int = 64, max_segment_points: int = 500):
+        """
+        Initialise le compresseur
+        
+        Args:
+            epsilon: Erreur maximale tolérée en mètres entre la trace simplifiée et les points reçus
+            max_speed: Vitesse maximale plausible en km/h (au-delà, le point est rejeté)
+            trip_gap: Durée sans position en secondes au-delà de laquelle un nouveau trajet commence
+            max_window: Nombre maximal de points en attente avant de forcer un point clé
+            max_segment_points: Nombre maximal de points clés par segment émis
+        """
+        self.epsilon = epsilon
+        self.max_speed = max_speed
+        self.trip_gap = trip_gap
+        self.max_window = max_window
+        self.max_segment_points = max_segment_points
+        self.max_rejected_in_row = 5
+        self._rejected_in_row = 0
+        
+        self.stats = {'received': 0, 'rejected': 0, 'kept': 0, 'segments': 0}
+        self._reset_trip()
+    
+    def add_fix(self, latitude: float, longitude: float, speed: Optional[float] = None,
+                timestamp: Optional[float] = None) -> List[Dict]:
+        """
+        Ajoute une position au flux
+        
+        Args:
+            latitude: Latitude en degrés
+            longitude: Longitude en degrés
+            speed: Vitesse rapportée par le GPS en km/h (optionnel)
+            timestamp: Instant de la mesure en secondes (time.time() par défaut)
+        
+        Returns:
+            Liste des segments terminés (vide le plus souvent)
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        segments = []
+        
+        # Une longue interruption termine le trajet en cours
+        if self._last is not None and timestamp - self._last[2] > self.trip_gap:
+            segment = self.flush()
+            if segment:
+                segments.append(segment)
+        
+        self.stats['received'] += 1
+        last = self._last
+        if last is not None:
+            dt = timestamp - last[2]
+            if dt <= 0 or self._is_outlier(latitude, longitude, speed, dt):
+                self.stats['rejected'] += 1
+                self._rejected_in_row += 1
+                if self._rejected_in_row < self.max_rejected_in_row:
+                    return segments
+                # Trop de rejets consécutifs : c'est le dernier point retenu qui était faux
+                logger.warning("Saut de position GPS persistant - nouveau trajet")
+                segment = self.flush()
+                if segment:
+                    segments.append(segment)
+                self.stats['rejected'] -= 1
+        self._rejected_in_row = 0
+        
+        point = (latitude, longitude, timestamp)
+        self._last = point
+        
+        if self._anchor is None:
+            self._anchor = point
+            self._emit_key(point)
+            return segments
+        
+        self._window.append(point)
+        if len(self._window) > 1 and (len(self._window) >= self.max_window or self._window_error() > self.epsilon):
+            # Le dernier point conforme devient un point clé et la nouvelle ancre
+            key = self._window[-2]
+            self._emit_key(key)
+            self._anchor = key
+            self._window = [point]
+        
+        if len(self._keys) >= self.max_segment_points:
+            segments.append(self._build_segment(keep_last=True))
+        
+        return segments
+    
+    def flush(self) -> Optional[Dict]:
+        """
+        Termine le trajet en cours et retourne son segment
+        
+        Returns:
+            Segment du trajet ou None si aucun point n'a été retenu
+        """
+        if self._window:
+            self._emit_key(self._window[-1])
+        segment = self._build_segment(keep_last=False) if len(self._keys) > 1 else None
+        self._reset_trip()
+        return segment
+    
+    def _reset_trip(self):
+        """Réinitialise l'état du trajet en cours"""
+        self._anchor = None
+        self._last = None
+        self._window: List[Tuple[float, float, float]] = []
+        self._keys: List[Tuple[float, float, float]] = []
+        self._segment_received = self.stats['received']
+    
+    def _emit_key(self, point: Tuple[float, float, float]):
+        """Ajoute un point clé au segment en cours"""
+        self._keys.append(point)
+        self.stats['kept'] += 1
+    
+    def _is_outlier(self, latitude: float, longitude: float, speed: Optional[float], dt: float) -> bool:
+        """Rejette un point si la vitesse implicite depuis le dernier point n'est pas plausible"""
+        last = self._last
+        distance = self._distance(last[0], last[1], latitude, longitude)
+        implied_speed = distance / dt * 3.6
+        limit = self.max_speed
+        if speed is not None:
+            # Tolérance : vitesse rapportée + marge pour le bruit de position (epsilon par seconde)
+            limit = min(limit, speed * 1.5 + self.epsilon / dt * 3.6 + 10.0)
+        return implied_speed > limit
+    
+    def _window_error(self) -> float:
+        """Écart maximal en mètres entre les points en attente et le segment ancre → dernier point"""
+        anchor = self._anchor
+        end = self._window[-1]
+        cos_lat = math.cos(math.radians(anchor[0]))
+        scale = math.pi / 180.0 * EARTH_RADIUS
+        
+        ex = (end[1] - anchor[1]) * cos_lat * scale
+        ey = (end[0] - anchor[0]) * scale
+        length_sq = ex * ex + ey * ey
+        
+        worst = 0.0
+        for lat, lon, _ in self._window[:-1]:
+            px = (lon - anchor[1]) * cos_lat * scale
+            py = (lat - anchor[0]) * scale
+            if length_sq == 0.0:
+                d = math.hypot(px, py)
+            else:
+                t = max(0.0, min(1.0, (px * ex + py * ey) / length_sq))
+                d = math.hypot(px - t * ex, py - t * ey)
+            if d > worst:
+                worst = d
+        return worst
+    
+    def _build_segment(self, keep_last: bool) -> Dict:
+        """Construit le segment compact à partir des points clés"""
+        keys = self._keys
+        start = keys[0][2]
+        received = self.stats['received'] - self._segment_received
+        segment = {
+            'start': start,
+            'end': keys[-1][2],
+            'polyline': encode_polyline([(lat, lon) for lat, lon, _ in keys]),
+            'times': [int(round(t - start)) for _, _, t in keys],
+            'points_received': received,
+            'points_kept': len(keys),
+            'epsilon_m': self.epsilon
+        }
+        self.stats['segments'] += 1
+        self._segment_received = self.stats['received']
+        # Le segment suivant repart du dernier point clé pour garder une trace continue
+        self._keys = [keys[-1]] if keep_last else []
+        logger.debug(f"Segment de trajet: {received} points → {len(keys)} points clés")
+        return segment
+    
+    @staticmethod
+    def _distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+        """Distance approximative en mètres (projection équirectangulaire)"""
+        x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+        y = math.radians(lat2 - lat1)
+        return math.hypot(x, y) * EARTH_RADIUS
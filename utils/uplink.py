@@ -0,0 +1,357 @@
+"""
+Module pour la remontée des données vers le serveur
+Les snapshots périodiques et les événements ponctuels (montée, descente, bus plein,
+freinage brusque, perte/reprise du fix GPS, anomalies des capteurs) passent par deux canaux indépendants :
+un envoi de snapshot bloqué ne retarde jamais un événement
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import logging
+
+from .http_client import HTTPClient
+
+logger = logging.getLogger(__name__)
+
+# Types d'événements remontés en priorité
+EVENT_BOARDING = 'boarding'
+EVENT_ALIGHTING = 'alighting'
+EVENT_BUS_FULL = 'bus_full'
+EVENT_HARSH_BRAKING = 'harsh_braking'
+EVENT_GPS_FIX_LOST = 'gps_fix_lost'
+EVENT_GPS_FIX_REGAINED = 'gps_fix_regained'
+EVENT_STOP_ARRIVAL = 'stop_arrival'
+EVENT_STOP_DEPARTURE = 'stop_departure'
+EVENT_BLACKBOX = 'blackbox'
+EVENT_ANOMALY = 'anomaly'
+
+
+class Uplink:
+    """Classe pour envoyer snapshots et événements au serveur en arrière-plan"""
+    
+    def __init__(self, http_client: HTTPClient, bus_id: str = 'Bus1',
+                 latency_budget: float = 0.5, coalesce_window: float = 0.05,
+                 snapshot_queue_size: int = 100, max_pending_events: int = 1000,
+                 retry_delay: float = 1.0, snapshot_batch_size: int = 1,
+                 on_sent: Optional[Callable[[str, List[Dict]], None]] = None,
+                 on_lost: Optional[Callable[[str, List[Dict]], None]] = None):
+        """
+        Initialise le canal de remontée
+        
+        Args:
+            http_client: Client utilisé pour les envois (HTTPClient, ou MQTTClient si server.transport = "mqtt")
+            bus_id: Identifiant du bus
+            latency_budget: Délai cible en secondes entre la détection d'un événement et sa réception
+            coalesce_window: Fenêtre en secondes pendant laquelle les événements d'une rafale sont regroupés
+            snapshot_queue_size: Nombre maximal de snapshots en attente (les plus anciens sont abandonnés)
+            max_pending_events: Nombre maximal d'événements en attente (les plus anciens sont abandonnés)
+            retry_delay: Délai en secondes avant de réessayer après un échec d'envoi
+            snapshot_batch_size: Nombre de snapshots regroupés par requête
+            on_sent: Fonction appelée avec le type ('snapshot', 'track' ou 'blackbox') et les
+                données après chaque envoi réussi (thread d'envoi)
+            on_lost: Fonction appelée avec le type et les données abandonnées (file pleine),
+                dans le thread qui les abandonne
+        """
+        self.http_client = http_client
+        self.bus_id = bus_id
+        self.latency_budget = latency_budget
+        self.coalesce_window = min(coalesce_window, latency_budget)
+        self.retry_delay = retry_delay
+        self.snapshot_batch_size = max(1, snapshot_batch_size)
+        self.on_sent = on_sent
+        self.on_lost = on_lost
+        
+        self._snapshots = deque(maxlen=snapshot_queue_size)
+        self._events = deque(maxlen=max_pending_events)
+        self._snapshot_cond = threading.Condition()
+        self._event_cond = threading.Condition()
+        self._running = False
+        self._drain_deadline = 0.0
+        self._threads = []
+        
+        self.stats = {
+            'snapshots_sent': 0,
+            'snapshots_failed': 0,
+            'snapshots_dropped': 0,
+            'snapshot_batches': 0,
+            'tracks_sent': 0,
+            'tracks_failed': 0,
+            'blackbox_sent': 0,
+            'blackbox_failed': 0,
+            'events_sent': 0,
+            'events_dropped': 0,
+            'event_batches': 0,
+            'event_latency_last': None,
+            'event_latency_max': 0.0,
+            'event_budget_exceeded': 0,
+        }
+    
+    def start(self):
+        """Démarre les threads d'envoi"""
+        if self._running:
+            return
+        
+        self._running = True
+        self._threads = [
+            threading.Thread(target=self._event_loop, name='uplink-events', daemon=True),
+            threading.Thread(target=self._snapshot_loop, name='uplink-snapshots', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Uplink démarré (budget événements: {self.latency_budget * 1000:.0f} ms)")
+    
+    def stop(self, timeout: float = 5.0) -> Dict[str, int]:
+        """
+        Arrête les threads d'envoi après avoir tenté d'envoyer les événements, snapshots,
+        segments et fenêtres en attente (jusqu'au premier échec d'envoi ou pendant `timeout`)
+        
+        Args:
+            timeout: Temps maximal d'attente par thread en secondes
+        
+        Returns:
+            Nombre de snapshots et d'événements restés dans les files (voir pending)
+        """
+        if not self._running:
+            return self.pending()
+        
+        self._drain_deadline = time.monotonic() + timeout
+        self._running = False
+        for cond in (self._event_cond, self._snapshot_cond):
+            with cond:
+                cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+        
+        left = self.pending()
+        if left['snapshots'] or left['events']:
+            logger.warning(f"Uplink arrêté - non envoyés: {left['snapshots']} snapshot(s), {left['events']} événement(s)")
+        else:
+            logger.info("Uplink arrêté")
+        return left
+    
+    def send_snapshot(self, data: Dict):
+        """
+        Place un snapshot périodique dans la file d'envoi (non bloquant)
+        
+        Args:
+            data: Snapshot produit par SmartBus.collect_data
+        """
+        self._enqueue('snapshot', data)
+    
+    def send_track(self, segment: Dict):
+        """
+        Place un segment de trajectoire dans la file d'envoi (non bloquant)
+        
+        Args:
+            segment: Segment produit par TrajectoryCompressor
+        """
+        self._enqueue('track', segment)
+    
+    def send_blackbox(self, window: Dict):
+        """
+        Place une fenêtre de la boîte noire en tête de la file d'envoi (non bloquant)
+        
+        Args:
+            window: Fenêtre figée par BlackBoxRecorder
+        """
+        with self._snapshot_cond:
+            if len(self._snapshots) == self._snapshots.maxlen:
+                # appendleft écarte le document le plus récent
+                self.stats['snapshots_dropped'] += 1
+                logger.warning("File des snapshots pleine - snapshot le plus récent abandonné")
+                self._lost(*self._snapshots[-1])
+            self._snapshots.appendleft(('blackbox', window))
+            self._snapshot_cond.notify()
+    
+    def _enqueue(self, kind: str, data: Dict):
+        """Ajoute un document à la file d'envoi périodique"""
+        with self._snapshot_cond:
+            if len(self._snapshots) == self._snapshots.maxlen:
+                self.stats['snapshots_dropped'] += 1
+                logger.warning("File des snapshots pleine - snapshot le plus ancien abandonné")
+                self._lost(*self._snapshots[0])
+            self._snapshots.append((kind, data))
+            self._snapshot_cond.notify()
+    
+    def _lost(self, kind: str, data: Dict):
+        """Signale un document abandonné (appelé sous self._snapshot_cond)"""
+        if self.on_lost:
+            try:
+                self.on_lost(kind, [data])
+            except Exception as e:
+                logger.error(f"Erreur notification d'abandon: {e}")
+    
+    def set_snapshot_batch_size(self, size: int):
+        """
+        Change le nombre de snapshots regroupés par requête (échantillonnage adaptatif)
+        
+        Args:
+            size: Nombre de snapshots par requête (1 = envoi immédiat)
+        """
+        with self._snapshot_cond:
+            self.snapshot_batch_size = max(1, size)
+            self._snapshot_cond.notify()
+    
+    def publish_event(self, event_type: str, data: Optional[Dict] = None):
+        """
+        Publie un événement prioritaire (non bloquant)
+        
+        Args:
+            event_type: Type d'événement (EVENT_BOARDING, EVENT_BUS_FULL, ...)
+            data: Informations complémentaires (compteur de passagers, accélération...)
+        """
+        event = {
+            'type': event_type,
+            'timestamp': datetime.now().isoformat(),
+            'data': data or {},
+        }
+        with self._event_cond:
+            if len(self._events) == self._events.maxlen:
+                self.stats['events_dropped'] += 1
+                logger.warning("File des événements pleine - événement le plus ancien abandonné")
+            self._events.append((time.monotonic(), event))
+            self._event_cond.notify()
+    
+    def pending(self) -> Dict[str, int]:
+        """Retourne le nombre de snapshots et d'événements en attente"""
+        return {'snapshots': len(self._snapshots), 'events': len(self._events)}
+    
+    def _event_loop(self):
+        """Envoie les événements dès qu'ils arrivent, en regroupant les rafales"""
+        while True:
+            with self._event_cond:
+                while self._running and not self._events:
+                    self._event_cond.wait()
+                if not self._events:
+                    return
+                
+                # Laisser une courte fenêtre aux événements de la même rafale
+                deadline = self._events[0][0] + self.coalesce_window
+                while self._running:
+                    wait = deadline - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._event_cond.wait(wait)
+                
+                batch = list(self._events)
+                self._events.clear()
+            
+            if self.http_client.send_events(self.bus_id, [event for _, event in batch]):
+                self._record_event_latency(batch)
+                continue
+            
+            # Échec : remettre les événements en tête de file et réessayer plus tard
+            with self._event_cond:
+                for item in reversed(batch):
+                    if len(self._events) == self._events.maxlen:
+                        self.stats['events_dropped'] += 1
+                        continue
+                    self._events.appendleft(item)
+                if not self._running:
+                    return
+                self._event_cond.wait(self.retry_delay)
+    
+    def _record_event_latency(self, batch):
+        """Met à jour les statistiques de latence des événements"""
+        now = time.monotonic()
+        latency = now - batch[0][0]
+        self.stats['events_sent'] += len(batch)
+        self.stats['event_batches'] += 1
+        self.stats['event_latency_last'] = latency
+        self.stats['event_latency_max'] = max(self.stats['event_latency_max'], latency)
+        if latency > self.latency_budget:
+            self.stats['event_budget_exceeded'] += 1
+            logger.warning(
+                f"Événement envoyé hors budget: {latency * 1000:.0f} ms "
+                f"(budget {self.latency_budget * 1000:.0f} ms)"
+            )
+    
+    def _snapshot_ready(self) -> bool:
+        """Les snapshots partent par lots complets ; un segment ou une fenêtre en attente débloque l'envoi"""
+        if len(self._snapshots) >= self.snapshot_batch_size:
+            return True
+        return any(kind != 'snapshot' for kind, _ in self._snapshots)
+    
+    def _snapshot_loop(self):
+        """Envoie les snapshots périodiques dans l'ordre d'arrivée ; à l'arrêt, vide la file (lots incomplets compris)"""
+        sent = True
+        while True:
+            with self._snapshot_cond:
+                while self._running and not self._snapshot_ready():
+                    self._snapshot_cond.wait()
+                if not self._snapshots:
+                    return
+                # Arrêt : serveur injoignable ou délai écoulé, le reste est compté par stop
+                if not self._running and (not sent or time.monotonic() >= self._drain_deadline):
+                    return
+                kind, data = self._snapshots.popleft()
+                batch = [data]
+                while kind == 'snapshot' and len(batch) < self.snapshot_batch_size \
+                        and self._snapshots and self._snapshots[0][0] == 'snapshot':
+                    batch.append(self._snapshots.popleft()[1])
+            
+            sent = False
+            if len(batch) > 1:
+                if self.http_client.send_snapshots(self.bus_id, batch):
+                    sent = True
+                    self.stats['snapshots_sent'] += len(batch)
+                    self.stats['snapshot_batches'] += 1
+                    logger.info(f"✅ {len(batch)} snapshots envoyés au serveur FastAPI")
+                else:
+                    self.stats['snapshots_failed'] += len(batch)
+                    logger.warning("⚠️ Échec de l'envoi d'un lot de snapshots au serveur")
+            elif kind == 'track':
+                if self.http_client.send_track(self.bus_id, data):
+                    sent = True
+                    self.stats['tracks_sent'] += 1
+                else:
+                    self.stats['tracks_failed'] += 1
+                    logger.warning("⚠️ Échec de l'envoi d'un segment de trajectoire")
+            elif kind == 'blackbox':
+                if self.http_client.send_blackbox(self.bus_id, data):
+                    sent = True
+                    self.stats['blackbox_sent'] += 1
+                    logger.info("✅ Fenêtre de la boîte noire envoyée au serveur")
+                else:
+                    # La fenêtre reste sur disque (data/blackbox) : pas de nouvel essai
+                    self.stats['blackbox_failed'] += 1
+                    logger.warning("⚠️ Échec de l'envoi d'une fenêtre de la boîte noire")
+                    continue
+            elif self.http_client.send_data(data):
+                sent = True
+                self.stats['snapshots_sent'] += 1
+                logger.info("✅ Données envoyées au serveur FastAPI")
+            else:
+                self.stats['snapshots_failed'] += 1
+                logger.warning("⚠️ Échec de l'envoi des données au serveur")
+            
+            if not sent:
+                self._requeue(kind, batch)
+                continue
+            if self.on_sent:
+                try:
+                    self.on_sent(kind, batch)
+                except Exception as e:
+                    logger.error(f"Erreur notification d'envoi: {e}")
+    
+    def _requeue(self, kind: str, batch: List[Dict]):
+        """Échec : remet les documents en tête de file (dans la limite de la file) et attend avant de réessayer"""
+        with self._snapshot_cond:
+            for data in reversed(batch):
+                # File pleine : les documents en échec sont les plus anciens, ce sont eux qui sont abandonnés
+                if len(self._snapshots) == self._snapshots.maxlen:
+                    self.stats['snapshots_dropped'] += 1
+                    self._lost(kind, data)
+                    continue
+                self._snapshots.appendleft((kind, data))
+            # Les nouveaux snapshots réveillent la condition : attente jusqu'à l'échéance
+            deadline = time.monotonic() + self.retry_delay
+            while self._running:
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    break
+                self._snapshot_cond.wait(wait)